@@ -103,7 +103,8 @@ class TestSuite(Object):
 
         If profile_prefix is specified, use the profile module to run each
         test, sending the outputs to a file
-        profile_prefix + '.' + testname + '.dat'
+        profile_prefix + '.' + testname + '.dat'.  Each test is profiled
+        separately, and its profile is written even if the test fails.
         """
         for test in tests:
             desc = self.descriptions[test]
@@ -113,10 +114,12 @@ class TestSuite(Object):
             if profile_prefix is None:
                 apply(fct)
             else:
-                import __main__
-                __main__.test_to_profile = fct
                 outfile = profile_prefix + '.' + test + '.dat'
-                profile.run('test_to_profile()', outfile)
+                profiler = profile.Profile()
+                try:
+                    profiler.runcall(fct)
+                finally:
+                    profiler.dump_stats(outfile)
             sys.stdout.flush()
 
     def run_foreground(self, profile_prefix = None):
@@ -0,0 +1,423 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Throughput benchmark of the dictation interpreter on a corpus of
+recorded utterances"""
+
+import gc, glob, os, shutil, string, sys, time
+import util, vc_globals
+import latency
+import CmdInterp, NewMediatorObject, EdSim
+from bench_server import latency_stats, process_usage, DiscardOutput
+
+
+def help():
+    print """
+
+Usage: python bench_interp.py [-c corpus] [-n num_utterances] [-r repeats]
+       [-d dict_file] [-u user_config] [--stages]
+
+Replays a corpus of recorded utterances through the command interpreter
+(CmdInterp.interpret_utterance), dictating into an EdSim editor, with
+the command set of vc_config and a copy of the symbol dictionary file.
+
+By default, the corpus consists of the utterances heard during the
+regression tests, as recorded in Data/Benchmark/correct_results.dat
+(lines starting with 'Heard ').  Any other file with one utterance
+(spoken forms separated by blanks) per line can be used instead.
+
+Reports the time taken by the startup of the mediator and by the first
+utterance after startup, then for the first (cold) pass over the corpus
+and for the following (warm) passes: the number of utterances per
+second, the distribution of the latency of each utterance, and the
+number of objects allocated (or at least still alive after each pass)
+per utterance.
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+-c corpus  : file containing the utterances
+
+-n num     : replay at most that many utterances of the corpus (default:
+             all)
+
+-r repeats : number of warm passes over the corpus (default: 3)
+
+-d file    : symbol dictionary file, copied before use (default: the
+             dictionary of the user, Data/State/symdict.dict)
+
+-u file    : user configuration file (default: Config/user_config.py,
+             or the configuration of the regression tests if there is
+             none)
+
+--stages   : also print the time taken by each stage of the
+             interpretation of the utterances, during the warm passes
+    """
+
+def read_corpus(file_name):
+    """reads the utterances of a corpus
+
+    **INPUTS**
+
+    *STR file_name* -- path of the corpus.  If some lines start with
+    'Heard ' (like in the output of the regression tests), only those
+    lines are utterances, otherwise every non-blank line is.
+
+    **OUTPUTS**
+
+    *[[STR]]* -- the spoken forms of each utterance
+    """
+    lines = open(file_name).readlines()
+    heard = []
+    for a_line in lines:
+        if a_line[:6] == 'Heard ':
+            heard.append(a_line[6:])
+    if heard:
+        lines = heard
+    utterances = []
+    for a_line in lines:
+        words = string.split(a_line)
+        if words:
+            utterances.append(words)
+    return utterances
+
+def live_objects():
+    """returns the number of objects tracked by the garbage collector,
+    after a collection
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *INT* -- the number of objects
+    """
+    gc.collect()
+    return len(gc.get_objects())
+
+def allocations():
+    """returns the number of objects allocated so far, if the
+    interpreter was built to count them (with COUNT_ALLOCS)
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *INT* -- the number of allocations, or None if unknown
+    """
+    if not hasattr(sys, 'getcounts'):
+        return None
+    total = 0
+    for type_name, allocs, frees, max_alloc in sys.getcounts():
+        total = total + allocs
+    return total
+
+def start_mediator(sym_file, user_config_file):
+    """creates and configures a mediator, with an EdSim editor
+
+    **INPUTS**
+
+    *STR sym_file* -- symbol dictionary file to use
+
+    *STR user_config_file* -- user configuration file
+
+    **OUTPUTS**
+
+    *(NewMediatorObject, EdSim)* -- the mediator and the editor
+    """
+# don't overwrite the abbreviation preferences of the user
+# (Data/State/abbrevs.py and abbrevs.on_init.py), which the dictionary
+# exports as soon as it is read
+    interp = CmdInterp.CmdInterp(sym_file = sym_file, 
+        disable_dlg_select_symbol_matches = 1, 
+        export_file = os.path.join(vc_globals.tmp, 'bench_interp_abbrevs'))
+    mediator = NewMediatorObject.NewMediatorObject(interp = interp,
+        symbol_match_dlg = 0, temporary = 1)
+    mediator.configure(user_config_file = user_config_file)
+    app = EdSim.EdSim()
+    mediator.new_editor(app, server = 0, check_window = 0)
+    return mediator, app
+
+def replay(interp, app, utterances, buff_file, times):
+    """replays a corpus once, into a new buffer
+
+    **INPUTS**
+
+    *CmdInterp interp* -- the command interpreter
+
+    *EdSim app* -- the editor
+
+    *[[STR]] utterances* -- the spoken forms of each utterance
+
+    *STR buff_file* -- file to open before replaying the corpus
+
+    *[FLOAT] times* -- list to which to append the time taken by each
+    utterance
+
+    **OUTPUTS**
+
+    *INT* -- number of utterances which raised an exception
+    """
+    app.init_for_test(save = 0)
+    app.open_file(buff_file)
+    errors = 0
+    for words in utterances:
+        started = latency.begin_utterance(string.join(words))
+        start = latency.timer()
+        try:
+            try:
+                interp.interpret_NL_cmd(words, app)
+            except Exception:
+                errors = errors + 1
+        finally:
+            times.append(latency.timer() - start)
+            if started:
+                latency.end_utterance()
+    return errors
+
+def print_pass(name, num_passes, times, elapsed, errors, objects, allocs):
+    """prints the results of one or more passes over the corpus
+
+    **INPUTS**
+
+    *STR name* -- name of the passes
+
+    *INT num_passes* -- number of passes
+
+    *[FLOAT] times* -- time taken by each utterance, in seconds
+
+    *FLOAT elapsed* -- total time taken by the passes, in seconds
+
+    *INT errors* -- number of utterances which raised an exception
+
+    *INT objects* -- increase in the number of live objects
+
+    *INT allocs* -- number of objects allocated, or None if unknown
+
+    **OUTPUTS**
+
+    *none*
+    """
+    count = max(len(times), 1)
+    stats = latency_stats(times)
+    print '%s (%d passes): %d utterances, %d errors, %.1f utterances/sec' \
+        % (name, num_passes, len(times), errors,
+           len(times) / max(elapsed, 1e-6))
+    print '   latency: mean %.2f ms, p50 %.2f ms, p90 %.2f ms, p99 %.2f ms, max %.2f ms' \
+        % (stats.get('mean', 0), stats.get('p50', 0), stats.get('p90', 0),
+           stats.get('p99', 0), stats.get('max', 0))
+    line = '   objects: %.1f still alive per utterance' \
+        % (float(objects) / count)
+    if allocs is not None:
+        line = line + ', %.1f allocated per utterance' \
+            % (float(allocs) / count)
+    print line
+
+def print_stages(timings):
+    """prints the mean time taken by each stage of the interpretation
+    of utterances
+
+    **INPUTS**
+
+    *[UtteranceTimings]* timings -- the timings of the utterances
+
+    **OUTPUTS**
+
+    *none*
+    """
+    totals = {}
+    for utterance in timings:
+        stages = utterance.stages()
+        for name in stages.keys():
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + stages[name][0], total + stages[name][1])
+    ranked = []
+    for name in totals.keys():
+        ranked.append((-totals[name][1], name))
+    ranked.sort()
+    print 'stages (mean time per utterance, calls per utterance):'
+    for total, name in ranked:
+        print '   %-40s %8.3f ms %6.1f' % (name,
+            -total / max(len(timings), 1) * 1000,
+            float(totals[name][0]) / max(len(timings), 1))
+
+def run_passes(interp, app, utterances, buff_file, num_passes):
+    """replays a corpus a number of times
+
+    **INPUTS**
+
+    *CmdInterp interp* -- the command interpreter
+
+    *EdSim app* -- the editor
+
+    *[[STR]] utterances* -- the spoken forms of each utterance
+
+    *STR buff_file* -- file to open before each pass
+
+    *INT num_passes* -- number of passes
+
+    **OUTPUTS**
+
+    *([FLOAT], FLOAT, INT, INT, INT)* -- time taken by each utterance,
+    total time taken, number of errors, increase in the number of live
+    objects and number of allocations (or None)
+    """
+    times = []
+    errors = 0
+    objects = live_objects()
+    allocs = allocations()
+    start = time.time()
+    for ii in range(num_passes):
+        errors = errors + replay(interp, app, utterances, buff_file, times)
+    elapsed = time.time() - start
+    if allocs is not None:
+        allocs = allocations() - allocs
+    objects = live_objects() - objects
+    return times, elapsed, errors, objects, allocs
+
+def bench_interp(utterances, sym_file, user_config_file, repeats,
+                 show_stages = 0):
+    """benchmarks the interpretation of a corpus of utterances
+
+    **INPUTS**
+
+    *[[STR]] utterances* -- the spoken forms of each utterance
+
+    *STR sym_file* -- symbol dictionary file, which is copied before
+    use
+
+    *STR user_config_file* -- user configuration file
+
+    *INT repeats* -- number of warm passes
+
+    *BOOL show_stages* -- if true, print the time taken by each stage
+    of the interpretation during the warm passes
+
+    **OUTPUTS**
+
+    *none*
+    """
+    sym_copy = os.path.join(vc_globals.tmp, 'bench_interp.dict')
+    if sym_file and os.path.exists(sym_file):
+        shutil.copyfile(sym_file, sym_copy)
+    else:
+        sym_copy = None
+    buff_file = os.path.join(vc_globals.tmp, 'bench_interp.py')
+    open(buff_file, 'w').close()
+    latency.config_latency(max_utterances = len(utterances) * max(repeats, 1))
+
+    real_stdout = sys.stdout
+    real_stderr = sys.stderr
+    sys.stdout = DiscardOutput()
+    try:
+        try:
+            start = time.time()
+            cpu_start, rss = process_usage()
+            mediator, app = start_mediator(sym_copy, user_config_file)
+            interp = mediator.interpreter()
+            startup_time = time.time() - start
+            startup_cpu = process_usage()[0] - cpu_start
+
+# utterances which fail are counted, but their tracebacks are not
+# printed
+            sys.stderr = DiscardOutput()
+            first = []
+            replay(interp, app, utterances[:1], buff_file, first)
+            cold = run_passes(interp, app, utterances, buff_file, 1)
+            latency.the_log.clear()
+            warm = run_passes(interp, app, utterances, buff_file, repeats)
+            cpu, max_rss = process_usage()
+            mediator.quit(save_speech_files = 0, disconnect = 0)
+        finally:
+            sys.stdout = real_stdout
+            sys.stderr = real_stderr
+    finally:
+        remove_temporary_files(sym_copy, buff_file)
+
+    print 'startup: %.2f s (%.2f s CPU)' % (startup_time, startup_cpu)
+    print 'first utterance: %.2f ms' % (first[0] * 1000)
+    apply(print_pass, ('cold', 1) + cold)
+    if repeats:
+        apply(print_pass, ('warm', repeats) + warm)
+    if max_rss is not None:
+        print 'maximum resident set size: %d kB' % max_rss
+    if show_stages and repeats:
+        print_stages(latency.the_log.recent())
+
+def remove_temporary_files(sym_copy, buff_file):
+    """removes the files created by bench_interp
+
+    **INPUTS**
+
+    *STR sym_copy* -- the copy of the symbol dictionary file, or None
+
+    *STR buff_file* -- the file into which the corpus is replayed
+
+    **OUTPUTS**
+
+    *none*
+    """
+    temporary = [buff_file,
+                 os.path.join(vc_globals.tmp, 'bench_interp.bak'),
+                 os.path.join(vc_globals.tmp, 'bench_interp_abbrevs.py'),
+                 os.path.join(vc_globals.tmp, 'bench_interp_abbrevs.bak'),
+                 os.path.join(vc_globals.tmp, 'bench_interp_abbrevs.on_init.py'),
+                 os.path.join(vc_globals.tmp, 
+                              'bench_interp_abbrevs.on_init.bak')]
+    if sym_copy:
+# SymDict renames a dictionary in an older format to
+# bench_interp.<version>.dict when it converts it
+        temporary = temporary + [sym_copy, sym_copy + '.jnl',
+                                 sym_copy + '.failed'] \
+            + glob.glob(os.path.join(vc_globals.tmp, 'bench_interp.*.dict'))
+    for a_file in temporary:
+        if os.path.exists(a_file):
+            os.remove(a_file)
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        'c=', os.path.join(vc_globals.benchmark_dir, 'correct_results.dat'),
+        'n=', None,
+        'r=', 3,
+        'd=', vc_globals.sym_state_file,
+        'u=', None,
+        'stages', None))
+    if opts['h']:
+        help()
+        sys.exit(0)
+    utterances = read_corpus(opts['c'])
+    if opts['n']:
+        utterances = utterances[:int(opts['n'])]
+    if not utterances:
+        sys.stderr.write('no utterances in corpus %s\n' % opts['c'])
+        sys.exit(1)
+    user_config_file = opts['u']
+    if not user_config_file:
+        user_config_file = vc_globals.default_user_config_file
+        if not os.path.exists(user_config_file):
+            user_config_file = vc_globals.regression_user_config_file
+    bench_interp(utterances, opts['d'], user_config_file, int(opts['r']),
+        show_stages = opts['stages'])
@@ -0,0 +1,392 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Benchmarks for the encoding of messages exchanged with external
+editors"""
+
+import Queue, socket, sys, threading, time
+import util
+import messaging
+import tcp_client, tcp_threads
+
+
+def help():
+    print """
+
+Usage: python bench_messaging.py [-u num_updates] [-t text_len] [-r repeats]
+       [encoding ...]
+       python bench_messaging.py --transfer [-s size] [-r repeats]
+       [packaging ...]
+       python bench_messaging.py --latency [-r repeats]
+
+Benchmarks encoding and decoding of a typical 'updates' message (as sent
+by an editor after the user typed or the mediator inserted some text),
+with each of the given message encodings (by default, all encodings
+known to messaging.encoders).
+
+For each encoding, prints the size of the encoded message and the
+number of messages encoded and decoded per second.
+
+With --transfer, benchmarks sending messages over a local socket
+connection with each of the given message packagings (by default, all
+packagings known to messaging.packagers), for a small message and for
+a message the size of a large buffer.
+
+With --latency, measures the round-trip time of small messages between
+an editor client and the mediator, going through the same data threads
+as the TCP client (tcp_client.ClientConnection) and server.
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+--transfer : benchmark the packaging of messages instead of their encoding
+
+--latency  : measure the round-trip time of messages
+
+-s size    : with --transfer, length of the large message (default: 200000)
+
+-u num     : number of insert updates in the message (default: 2)
+
+-t len     : length of the text inserted by each update (default: 40)
+
+-r repeats : number of times the message is encoded and decoded, or
+             small messages are sent with --transfer (default: 2000).
+             With --latency, one tenth that many messages are sent.
+    """
+
+def updates_message(num_updates, text_len):
+    """returns the arguments of a typical 'updates' message
+
+    **INPUTS**
+
+    *INT num_updates* -- number of insert updates in the message
+
+    *INT text_len* -- length of the text inserted by each update
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the arguments of the message
+    """
+    text = ('x = y + 1\n' * (text_len / 10 + 1))[:text_len]
+    updates = []
+    pos = 1234
+    for ii in range(num_updates):
+        updates.append({'action': 'insert', 'buff_name': 'C:\\src\\foo.py',
+                        'range': (pos, pos + 3), 'text': text})
+        pos = pos + len(text)
+    updates.append({'action': 'pos_selection', 'buff_name': 'C:\\src\\foo.py',
+                    'pos': pos, 'selection': (pos, pos)})
+    return {'updates': updates, 'value': None}
+
+def bench_encoding(encoding, mess_argvals, repeats):
+    """benchmarks one message encoding
+
+    **INPUTS**
+
+    *STR encoding* -- name of the encoding
+
+    *{STR: ANY} mess_argvals* -- arguments of the message to encode
+
+    *INT repeats* -- number of times to encode and decode the message
+
+    **OUTPUTS**
+
+    *BOOL* -- true if the decoded message had the same name and
+    arguments as the original one
+    """
+    encoder = messaging.new_encoder(encoding)
+    packager = messaging.MessPackager_FixedLenSeq()
+    start = time.clock()
+    for ii in xrange(repeats):
+        str_mess = encoder.encode('updates', mess_argvals)
+    encode_time = time.clock() - start
+    start = time.clock()
+    for ii in xrange(repeats):
+        mess_name, argvals = encoder.decode(str_mess)
+    decode_time = time.clock() - start
+    wire_len = len(packager.pack_mess(str_mess))
+    print '%-8s: %6d bytes (%6d on the wire), %8.0f encodes/sec, %8.0f decodes/sec' \
+        % (encoding, len(str_mess), wire_len, repeats / max(encode_time, 1e-6),
+           repeats / max(decode_time, 1e-6))
+    same = mess_name == 'updates' and \
+        len(argvals['updates']) == len(mess_argvals['updates']) and \
+        messaging.messarg_is_None(argvals['value'])
+    if not same:
+        print 'MISMATCH in the message decoded with encoding %s' % encoding
+    return same
+
+def bench_messaging(encodings, num_updates, text_len, repeats):
+    """benchmarks encoding and decoding of an 'updates' message
+
+    **INPUTS**
+
+    *[STR] encodings* -- names of the encodings to benchmark
+
+    *INT num_updates* -- number of insert updates in the message
+
+    *INT text_len* -- length of the text inserted by each update
+
+    *INT repeats* -- number of times to encode and decode the message
+
+    **OUTPUTS**
+
+    *BOOL* -- true if all encodings decoded the message correctly
+    """
+    mess_argvals = updates_message(num_updates, text_len)
+    ok = 1
+    for encoding in encodings:
+        if not bench_encoding(encoding, mess_argvals, repeats):
+            ok = 0
+    return ok
+
+def connected_sockets():
+    """returns a pair of sockets connected to each other through the
+    loopback interface
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *(socket, socket)* -- the two ends of the connection
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(server.getsockname())
+    accepted, dummy = server.accept()
+    server.close()
+    return client, accepted
+
+def send_messages(messenger, text, repeats):
+    """sends the same 'updates' message repeatedly
+
+    **INPUTS**
+
+    [Messenger] *messenger* -- messenger to send the messages with
+
+    *STR text* -- text to send in each message
+
+    *INT repeats* -- number of messages to send
+
+    **OUTPUTS**
+
+    *none*
+    """
+    for ii in xrange(repeats):
+        messenger.send_mess('updates', {'text': text})
+
+def bench_packaging(packaging, text, repeats):
+    """benchmarks sending messages with one message packaging
+
+    **INPUTS**
+
+    *STR packaging* -- name of the packaging
+
+    *STR text* -- text to send in each message
+
+    *INT repeats* -- number of messages to send
+
+    **OUTPUTS**
+
+    *BOOL* -- true if all messages were received correctly
+    """
+    sender_sock, receiver_sock = connected_sockets()
+    sender = messaging.messenger_factory(sender_sock, encoding = 'binary1',
+        packaging = packaging)
+    receiver = messaging.messenger_factory(receiver_sock, 
+        encoding = 'binary1', packaging = packaging)
+    thread = threading.Thread(target = send_messages, 
+        args = (sender, text, repeats))
+    same = 1
+    start = time.time()
+    thread.start()
+    for ii in xrange(repeats):
+        mess_name, argvals = receiver.get_mess(expect = ['updates'])
+        if argvals['text'] != text:
+            same = 0
+    elapsed = time.time() - start
+    thread.join()
+    sender_sock.close()
+    receiver_sock.close()
+    wire_len = len(sender.packager.pack_mess(
+        sender.encoder.encode('updates', {'text': text})))
+    print '%-9s: %7d bytes (%7d on the wire), %8.0f messages/sec' \
+        % (packaging, len(text), wire_len, repeats / max(elapsed, 1e-6))
+    if not same:
+        print 'MISMATCH in the messages sent with packaging %s' % packaging
+    return same
+
+def bench_transfer(packagings, size, repeats):
+    """benchmarks sending small and large messages over a socket
+
+    **INPUTS**
+
+    *[STR] packagings* -- names of the packagings to benchmark
+
+    *INT size* -- length of the text of the large message
+
+    *INT repeats* -- number of small messages to send.  Fewer large
+    messages are sent.
+
+    **OUTPUTS**
+
+    *BOOL* -- true if all messages were received correctly
+    """
+    ok = 1
+    large_repeats = max(1, repeats / 100)
+    for packaging in packagings:
+        if not bench_packaging(packaging, 'x = 1\n', repeats):
+            ok = 0
+        if not bench_packaging(packaging, 'y' * size, large_repeats):
+            ok = 0
+    return ok
+
+def answer_pings(messages, messenger):
+    """answers each 'ping' message received from a queue with a 'pong'
+    message, until a 'bye' message is received
+
+    **INPUTS**
+
+    *Queue.Queue messages* -- queue of the messages received
+
+    [Messenger] *messenger* -- messenger to send the answers with
+
+    **OUTPUTS**
+
+    *none*
+    """
+    while 1:
+        mess_name, argvals = messages.get()
+        if mess_name != 'ping':
+            break
+        messenger.send_mess('pong', argvals)
+
+def bench_latency(repeats):
+    """measures the round-trip time of messages between a client and a
+    server data thread
+
+    **INPUTS**
+
+    *INT repeats* -- number of messages to send
+
+    **OUTPUTS**
+
+    *BOOL* -- true if all answers were received correctly
+    """
+    client_sock, server_sock = connected_sockets()
+    encoding = messaging.choose_encoding(messaging.preferred_encodings)
+    packaging = messaging.choose_packaging(messaging.preferred_packagings)
+
+    # server side, like ServerMainThread.new_data_thread_given_event
+    connection_ending = messaging.WakeupEvent()
+    server_thread = tcp_threads.ListenAndQueueMsgsThread(
+        messaging.messenger_factory(server_sock, sleep = 0.05,
+            sleeper = messaging.LightSleeper(connection_ending),
+            encoding = encoding, packaging = packaging),
+        Queue.Queue(), tcp_client.DummyDataEvent(), connection_ending,
+        ('connection_broken', {}))
+    server_thread.setDaemon(1)
+    server_thread.start()
+    responder = threading.Thread(target = answer_pings,
+        args = (server_thread.message_queue(), 
+                messaging.messenger_factory(server_sock, encoding = encoding,
+                    packaging = packaging)))
+    responder.setDaemon(1)
+    responder.start()
+
+    # client side
+    connection = tcp_client.ClientConnection()
+    connection.encoding = encoding
+    connection.packaging = packaging
+    client_thread = connection.new_data_thread_given_event(client_sock,
+        tcp_client.DummyDataEvent())
+    client_thread.setDaemon(1)
+    client_thread.start()
+    answers = client_thread.message_queue()
+    sender = messaging.messenger_factory(client_sock, encoding = encoding,
+        packaging = packaging)
+
+    times = []
+    ok = 1
+    for ii in xrange(repeats):
+        start = time.time()
+        sender.send_mess('ping', {'value': ii})
+        mess_name, argvals = answers.get()
+        times.append(time.time() - start)
+        if mess_name != 'pong' or messaging.messarg2int(argvals['value']) != ii:
+            ok = 0
+    sender.send_mess('bye')
+    responder.join()
+
+    start = time.time()
+    connection_ending.set()
+    connection.client_quitting.set()
+    server_thread.join()
+    client_thread.join()
+    shutdown_time = time.time() - start
+    connection_ending.close()
+    connection.client_quitting.close()
+    client_sock.close()
+    server_sock.close()
+
+    times.sort()
+    total = 0.0
+    for a_time in times:
+        total = total + a_time
+    print 'round trip: median %.2f ms, mean %.2f ms, max %.2f ms' \
+        % (times[len(times) / 2] * 1000, total / len(times) * 1000,
+           times[-1] * 1000)
+    print 'data threads stopped in %.2f ms' % (shutdown_time * 1000)
+    if not ok:
+        print 'MISMATCH in the answers received'
+    return ok
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        'transfer', None,
+        'latency', None,
+        'u=', 2,
+        't=', 40,
+        's=', 200000,
+        'r=', 2000))
+    if opts['h']:
+        help()
+    elif opts['latency']:
+        if not bench_latency(int(opts['r']) / 10):
+            sys.exit(1)
+    elif opts['transfer']:
+        if not args:
+            args = messaging.packagers.keys()
+            args.sort()
+        if not bench_transfer(args, int(opts['s']), int(opts['r'])):
+            sys.exit(1)
+    else:
+        if not args:
+            args = messaging.encoders.keys()
+            args.sort()
+        if not bench_messaging(args, int(opts['u']), int(opts['t']),
+                               int(opts['r'])):
+            sys.exit(1)
@@ -0,0 +1,719 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Load test of the TCP server with many simulated editors"""
+
+import os, sys, threading, time
+try:
+    import resource
+except ImportError:
+    resource = None
+import util
+import messaging
+import AppState
+import tcp_client, tcp_server
+
+results_prefix = 'bench_server results: '
+
+
+def help():
+    print """
+
+Usage: python bench_server.py [-n num_clients] [-r rounds] [-u updates]
+       [-i interval] [-T timeout] [-o file] [--host host]
+       [--listen listen_port] [--talk talk_port]
+
+Starts a TCP server in a separate process, and connects to it the given
+number of simulated editors (EdSim instances wrapped in a
+tcp_client.ClientEditor, each running in its own thread), using the
+usual handshake.
+
+In place of the mediator, the server sends each editor, in turn, an
+'insert' and a 'set_selection' command, for the given number of rounds,
+and times each command until the editor's response has been applied to
+the server's cache.  Meanwhile, each editor simulates a user typing, by
+sending 'updates' messages at regular intervals, whose latency is the
+time until the server has read them.
+
+When done, prints one 'name value' pair per line, sorted by name, with
+the latency percentiles of each kind of message (in milliseconds), the
+number of messages per second handled by the server, and the CPU time
+and memory used by the server process, so that the results of different
+versions can be compared.
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+-n num     : number of simulated editors (default: 10)
+
+-r rounds  : number of insert and set_selection commands sent by the
+             server to each editor (default: 50)
+
+-u updates : number of 'updates' messages sent by each editor (default: 50)
+
+-i interval: number of seconds between the 'updates' messages of an
+             editor (default: 0.02)
+
+-T timeout : number of seconds after which the test is abandoned
+             (default: 300)
+
+-o file    : also write the results to that file
+
+--host host:
+  host name or IP address on which the server listens (defaults to the
+  local host)
+
+--listen listen_port:
+  port number to use for the listen connection (default: 25770)
+
+--talk talk_port:
+  port number to use for the talk connection (default: 25771)
+
+  Since the editors keep trying to connect until the server is ready,
+  these ports should not be in the range the system assigns to outgoing
+  connections (otherwise an editor may end up connected to itself).
+
+--server   : run the server side of the test (used internally)
+    """
+
+def latency_stats(times):
+    """computes statistics on a list of latencies
+
+    **INPUTS**
+
+    *[FLOAT] times* -- the latencies, in seconds
+
+    **OUTPUTS**
+
+    *{STR: FLOAT}* -- number of latencies ('count'), and their mean,
+    median ('p50'), 90th, 99th percentile and maximum, in milliseconds
+    """
+    stats = {'count': len(times)}
+    if not times:
+        return stats
+    times = times[:]
+    times.sort()
+    total = 0.0
+    for a_time in times:
+        total = total + a_time
+    stats['mean'] = total / len(times) * 1000
+    for name, fraction in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]:
+        index = min(len(times) - 1, int(fraction * len(times)))
+        stats[name] = times[index] * 1000
+    stats['max'] = times[-1] * 1000
+    return stats
+
+def process_usage():
+    """returns the resources used so far by the current process
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *(FLOAT, INT)* -- CPU time (user and system) in seconds, and
+    maximum resident set size in kilobytes, or None if unknown (e.g.
+    on Windows)
+    """
+    times = os.times()
+    max_rss = None
+    if resource != None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF)[2]
+    return times[0] + times[1], max_rss
+
+
+class DiscardOutput:
+    """file-like object discarding what is written to it (EdSim prints
+    its buffer after each change)"""
+    def write(self, text):
+        pass
+
+
+class TimedMessenger(messaging.MixedMessenger):
+    """MixedMessenger which records the time at which each 'updates'
+    message is read
+
+    **INSTANCE ATTRIBUTES**
+
+    *[FLOAT] times* -- the times at which the messages were read
+    """
+    def __init__(self, times, **args):
+        self.deep_construct(TimedMessenger,
+                            {'times': times},
+                            args)
+
+    def get_mess(self, expect = None):
+        mess = messaging.MixedMessenger.get_mess(self, expect = expect)
+        if mess != None and mess[0] == 'updates':
+            self.times.append(time.time())
+        return mess
+
+
+class LoadAppFactory(tcp_server.AppStateFactorySimple):
+    """AppStateFactory which records when 'updates' messages from each
+    editor are read
+
+    **INSTANCE ATTRIBUTES**
+
+    *{STR: [FLOAT]} received* -- map from the ID of each editor to the
+    times at which its 'updates' messages were read
+    """
+    def __init__(self, **args):
+        self.deep_construct(LoadAppFactory,
+                            {'received': {}},
+                            args)
+
+    def new_instance(self, app_name, id, listen_msgr, talk_msgr,
+        listen_can_block = 0):
+        times = []
+        self.received[id] = times
+        timed_msgr = TimedMessenger(times, sender = listen_msgr.sender,
+            receiver = listen_msgr.receiver)
+        return tcp_server.AppStateFactorySimple.new_instance(self,
+            app_name, id, timed_msgr, talk_msgr,
+            listen_can_block = listen_can_block)
+
+
+class LoadMediator(AppState.AppCbkHandler):
+    """stand-in for NewMediatorObject, which replays scripted commands
+    to the editors connected to the server
+
+    **INSTANCE ATTRIBUTES**
+
+    *ServerNewMediator server* -- the server
+
+    *INT rounds* -- number of insert and set_selection commands to send
+    to each editor
+
+    *{STR: AppStateMessaging} editors* -- map from instance names to
+    the connected editors
+
+    *[STR] names* -- names of the editors, in order of connection
+
+    *{STR: INT} rounds_done* -- number of rounds done for each editor
+
+    *INT next_editor* -- index in names of the editor to which to send
+    the next commands
+
+    *{STR: [FLOAT]} latencies* -- map from the name of each command to
+    the time taken by each of those commands
+
+    *FLOAT start* -- time when the first editor connected, or None
+    """
+    def __init__(self, server, rounds, **args):
+        self.deep_construct(LoadMediator,
+                            {'server': server,
+                             'rounds': rounds,
+                             'editors': {},
+                             'names': [],
+                             'rounds_done': {},
+                             'next_editor': 0,
+                             'latencies': {'insert': [], 'set_selection': []},
+                             'start': None},
+                            args)
+
+    def new_editor(self, app, server = 1, check_window = 1,
+            window_info = None, test_editor = 0):
+        instance_name = 'load%d' % len(self.names)
+        self.editors[instance_name] = app
+        self.names.append(instance_name)
+        self.rounds_done[instance_name] = 0
+        app.set_manager(self)
+        if self.start == None:
+            self.start = time.time()
+        return instance_name
+
+    def user_message(self, message, instance = None):
+        pass
+
+    def close_app_cbk(self, instance, unexpected = 0):
+        if self.editors.has_key(instance):
+            del self.editors[instance]
+            self.server.delete_instance_cbk(instance, unexpected = unexpected)
+
+    def close_buffer_cbk(self, instance, buff_name):
+        pass
+
+    def open_buffer_cbk(self, instance, buff_name):
+        pass
+
+    def curr_buff_name_cbk(self, instance, buff_name):
+        pass
+
+    def rename_buffer_cbk(self, instance, old_buff_name, new_buff_name):
+        pass
+
+    def new_window(self, instance):
+        pass
+
+    def suspend_cbk(self, instance):
+        pass
+
+    def resume_cbk(self, instance):
+        pass
+
+    def commands_done(self, num_editors):
+        """indicates whether all commands have been sent
+
+        **INPUTS**
+
+        *INT num_editors* -- number of editors expected to connect
+
+        **OUTPUTS**
+
+        *BOOL* -- true if that many editors have connected, and all
+        rounds have been done for each one which is still connected
+        """
+        if len(self.names) < num_editors:
+            return 0
+        for name in self.editors.keys():
+            if self.rounds_done[name] < self.rounds:
+                return 0
+        return 1
+
+    def next_round(self):
+        """sends the next insert and set_selection commands to one of
+        the editors
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if any commands were sent
+        """
+        for ii in range(len(self.names)):
+            name = self.names[self.next_editor]
+            self.next_editor = (self.next_editor + 1) % len(self.names)
+            if self.editors.has_key(name) and \
+               self.rounds_done[name] < self.rounds:
+                break
+        else:
+            return 0
+        app = self.editors[name]
+        done = self.rounds_done[name]
+        try:
+            start = time.time()
+            app.insert('x%d = y + %d\n' % (done, done))
+            self.latencies['insert'].append(time.time() - start)
+            pos = app.cur_pos()
+            start = time.time()
+            app.set_selection((max(0, pos - 3), pos), cursor_at = 0)
+            self.latencies['set_selection'].append(time.time() - start)
+        except messaging.SocketError:
+            self.close_app_cbk(name, unexpected = 1)
+            return 1
+        self.rounds_done[name] = done + 1
+        return 1
+
+
+class LoadServer(tcp_server.ExtLoopSelect):
+    """ExtLoopSelect running a ServerNewMediator with a LoadMediator
+
+    **INSTANCE ATTRIBUTES**
+
+    *ServerNewMediator the_server* -- the server
+
+    *LoadAppFactory factory* -- the factory creating the AppStates of
+    the editors
+
+    *LoadMediator mediator* -- the stand-in for the mediator
+
+    *INT num_editors* -- number of editors expected to connect
+
+    *INT num_updates* -- number of 'updates' messages expected from
+    each editor
+
+    *FLOAT deadline* -- time after which the test is abandoned
+
+    *FLOAT end* -- time when the last command was done and the last
+    'updates' message was received, or None
+    """
+    def __init__(self, num_editors, rounds, num_updates, time_limit, 
+            **args):
+        self.deep_construct(LoadServer,
+                            {'the_server': None,
+                             'factory': LoadAppFactory(),
+                             'mediator': None,
+                             'num_editors': num_editors,
+                             'num_updates': num_updates,
+                             'deadline': time.time() + time_limit,
+                             'end': None},
+                            args)
+        self.the_server = tcp_server.ServerNewMediator(data_events = self,
+            editor_factory = self.factory)
+        self.mediator = LoadMediator(self.the_server, rounds)
+        self.the_server.set_mediator(self.mediator)
+        self.add_owned('the_server')
+
+    def server(self):
+        return self.the_server
+
+    def updates_done(self):
+        """indicates whether all 'updates' messages have been received
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if all editors which are still connected have
+        sent all their 'updates' messages
+        """
+        for name, app in self.mediator.editors.items():
+            if len(self.factory.received[app.id]) < self.num_updates:
+                return 0
+        return 1
+
+    def process_other_events(self):
+        if time.time() > self.deadline:
+            sys.stderr.write('bench_server: timed out\n')
+            self.quit()
+            return 0
+        if self.mediator.next_round():
+            return 1
+        if self.mediator.commands_done(self.num_editors) and \
+           self.updates_done():
+            self.end = time.time()
+            self.the_server.mediator_closing()
+            self.quit()
+        return 0
+
+    def results(self):
+        """returns the measurements made by the server
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: ANY}* -- the latencies of the commands ('latencies'),
+        the times at which the 'updates' messages were received from
+        each editor ('received'), the time during which editors were
+        connected ('elapsed'), the CPU time used ('cpu') and the
+        maximum resident set size of the server ('max_rss')
+        """
+        cpu, max_rss = process_usage()
+        elapsed = None
+        if self.mediator.start != None and self.end != None:
+            elapsed = self.end - self.mediator.start
+        return {'latencies': self.mediator.latencies,
+                'received': self.factory.received,
+                'elapsed': elapsed,
+                'cpu': cpu,
+                'max_rss': max_rss}
+
+
+class LoadClient(tcp_client.UneventfulLoop):
+    """simulated editor which connects to the server, answers its
+    commands, and sends 'updates' messages as if a user was typing
+
+    **INSTANCE ATTRIBUTES**
+
+    *INT num_updates* -- number of 'updates' messages to send
+
+    *FLOAT interval* -- number of seconds between 'updates' messages
+
+    *[FLOAT] sent* -- times at which the 'updates' messages were sent
+
+    *BOOL ok* -- true if the client connected, and the mediator closed
+    the connection normally
+    """
+    def __init__(self, num_updates, interval, **args):
+        self.deep_construct(LoadClient,
+                            {'num_updates': num_updates,
+                             'interval': interval,
+                             'sent': [],
+                             'ok': 0},
+                            args)
+
+    def mediator_closing(self, ID, unexpected = 0):
+        if not unexpected:
+            self.ok = 1
+        self.quit_flag = 1
+
+    def type_text(self, text):
+        """inserts text in the editor, and sends the corresponding
+        'updates' message, as if the user had typed it
+
+        **INPUTS**
+
+        *STR text* -- the text
+
+        **OUTPUTS**
+
+        *none*
+        """
+        editor = self.editor
+        buff_name = editor.editor.curr_buffer_name()
+        editor.awaiting_response = []
+        editor.editor.insert(text)
+        updates = editor.awaiting_response
+        editor.awaiting_response = None
+        self.sent.append(time.time())
+        editor.send_updates(updates + editor.pos_selection_update(buff_name))
+
+    def run(self, host = None, listen_port = None, talk_port = None,
+            timeout = 30):
+        data_event = tcp_client.DummyDataEvent()
+        deadline = time.time() + timeout
+        while 1:
+            messengers = self.connection.connect('EdSim', data_event,
+                host = host, listen_port = listen_port,
+                talk_port = talk_port)
+            if messengers != None or time.time() > deadline:
+                break
+# the server may still be starting
+            time.sleep(0.1)
+        if messengers == None:
+            sys.stderr.write('Unable to connect to server\n')
+            return
+        talk, listen = messengers
+        self.editor.connect(talk, listen)
+        self.quit_flag = 0
+        next_update = time.time()
+        while not self.quit_flag:
+            if not listen.receiver.empty():
+                self.editor.mediator_cmd()
+                continue
+            now = time.time()
+            if len(self.sent) < self.num_updates and now >= next_update:
+                self.type_text('y = x + 1\n')
+                next_update = now + self.interval
+            else:
+                wait = 0.05
+                if len(self.sent) < self.num_updates:
+                    wait = min(wait, max(0, next_update - now))
+                data_event.data_ready.wait(wait)
+                data_event.data_ready.clear()
+        self.editor.disconnected()
+        self.connection.disconnect()
+
+
+def run_server(num_editors, rounds, num_updates, timeout, host,
+        listen_port, talk_port):
+    """runs the server side of the load test, and prints its results
+    as a single line on stdout
+
+    **INPUTS**
+
+    *INT num_editors* -- number of editors expected to connect
+
+    *INT rounds* -- number of insert and set_selection commands to send
+    to each editor
+
+    *INT num_updates* -- number of 'updates' messages expected from
+    each editor
+
+    *FLOAT timeout* -- number of seconds after which to give up
+
+    *STR host* -- host name or IP address on which to listen, or None
+    for the local host
+
+    *INT listen_port, talk_port* -- ports on which to listen
+
+    **OUTPUTS**
+
+    *none*
+    """
+    loop = LoadServer(num_editors, rounds, num_updates, timeout,
+        host = host, listen_port = listen_port, talk_port = talk_port,
+        timeout = 0.5)
+    loop.run()
+    results = loop.results()
+    sys.stdout.write(results_prefix + repr(results) + '\n')
+
+def start_server(num_clients, rounds, num_updates, timeout, host,
+        listen_port, talk_port):
+    """starts the server side of the load test in a new process
+
+    **INPUTS**
+
+    *INT num_clients, rounds, num_updates, FLOAT timeout, STR host,
+    INT listen_port, talk_port* -- see run_load_test
+
+    **OUTPUTS**
+
+    *FILE* -- pipe from which the output of the server can be read
+    """
+    args = ['--server', '-n', num_clients, '-r', rounds, '-u', num_updates,
+            '-T', timeout, '--listen', listen_port, '--talk', talk_port]
+    if host != None:
+        args = args + ['--host', host]
+    command = '"%s" "%s"' % (sys.executable, os.path.abspath(sys.argv[0]))
+    for an_arg in args:
+        command = command + ' ' + str(an_arg)
+    return os.popen(command, 'r')
+
+def run_load_test(num_clients, rounds, num_updates, interval, timeout,
+        host, listen_port, talk_port):
+    """runs the load test
+
+    **INPUTS**
+
+    *INT num_clients* -- number of simulated editors
+
+    *INT rounds* -- number of insert and set_selection commands sent
+    to each editor
+
+    *INT num_updates* -- number of 'updates' messages sent by each
+    editor
+
+    *FLOAT interval* -- number of seconds between 'updates' messages
+
+    *FLOAT timeout* -- number of seconds after which to give up
+
+    *STR host* -- host name or IP address of the server, or None for
+    the local host
+
+    *INT listen_port, talk_port* -- ports on which the server listens
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the results, or None if the server didn't report
+    any
+    """
+    server_output = start_server(num_clients, rounds, num_updates, timeout,
+        host, listen_port, talk_port)
+    clients = []
+    threads = []
+    stdout = sys.stdout
+    sys.stdout = DiscardOutput()
+    try:
+        for ii in range(num_clients):
+            a_client = LoadClient(num_updates, interval)
+            clients.append(a_client)
+            a_thread = threading.Thread(target = a_client.run,
+                args = (host, listen_port, talk_port, timeout))
+            a_thread.setDaemon(1)
+            threads.append(a_thread)
+            a_thread.start()
+        deadline = time.time() + timeout
+        for a_thread in threads:
+            a_thread.join(max(0, deadline - time.time()))
+    finally:
+        sys.stdout = stdout
+
+    server_results = None
+    for line in server_output.readlines():
+        if line[:len(results_prefix)] == results_prefix:
+            server_results = eval(line[len(results_prefix):])
+    server_output.close()
+    if server_results == None:
+        return None
+
+    results = {'clients': num_clients, 'rounds': rounds,
+               'updates_per_client': num_updates}
+    results['clients_ok'] = 0
+    updates_latencies = []
+    for a_client in clients:
+        if a_client.ok:
+            results['clients_ok'] = results['clients_ok'] + 1
+        received = server_results['received'].get(a_client.connection.ID,
+            [])
+        for ii in range(min(len(a_client.sent), len(received))):
+            updates_latencies.append(received[ii] - a_client.sent[ii])
+        a_client.cleanup()
+    latencies = server_results['latencies']
+    latencies['updates'] = updates_latencies
+    num_messages = 0
+    for name in latencies.keys():
+        for stat, value in latency_stats(latencies[name]).items():
+            results['%s.%s' % (name, stat)] = value
+# each command is a message and its response
+        if name == 'updates':
+            num_messages = num_messages + len(latencies[name])
+        else:
+            num_messages = num_messages + 2 * len(latencies[name])
+    results['messages'] = num_messages
+    elapsed = server_results['elapsed']
+    if elapsed:
+        results['elapsed'] = elapsed
+        results['messages_per_sec'] = num_messages / elapsed
+        results['server.cpu_percent'] = \
+            server_results['cpu'] / elapsed * 100
+    results['server.cpu_sec'] = server_results['cpu']
+    if server_results['max_rss'] != None:
+        results['server.max_rss_kb'] = server_results['max_rss']
+    return results
+
+def print_results(results, f = None):
+    """prints the results of a load test, one 'name value' pair per
+    line, sorted by name
+
+    **INPUTS**
+
+    *{STR: ANY}* results -- the results
+
+    *FILE f* -- file to print them to, or None for stdout
+
+    **OUTPUTS**
+
+    *none*
+    """
+    if f == None:
+        f = sys.stdout
+    names = results.keys()
+    names.sort()
+    for name in names:
+        value = results[name]
+        if type(value) == type(0.0):
+            value = '%.3f' % value
+        f.write('%s %s\n' % (name, value))
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        'server', None,
+        'n=', 10,
+        'r=', 50,
+        'u=', 50,
+        'i=', 0.02,
+        'T=', 300,
+        'o=', None,
+        'host=', None,
+        'listen=', 25770,
+        'talk=', 25771))
+    if opts['h']:
+        help()
+    elif opts['server']:
+        run_server(int(opts['n']), int(opts['r']), int(opts['u']),
+            float(opts['T']), opts['host'], int(opts['listen']),
+            int(opts['talk']))
+    else:
+        results = run_load_test(int(opts['n']), int(opts['r']),
+            int(opts['u']), float(opts['i']), float(opts['T']),
+            opts['host'], int(opts['listen']), int(opts['talk']))
+        if results == None:
+            sys.stderr.write('the server did not report any results\n')
+            sys.exit(1)
+        print_results(results)
+        if opts['o']:
+            f = open(opts['o'], 'w')
+            print_results(results, f)
+            f.close()
+        if results['clients_ok'] != results['clients']:
+            sys.exit(1)
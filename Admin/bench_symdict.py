@@ -0,0 +1,474 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Benchmarks for the symbol dictionary (SymDict)"""
+
+import os, re, sys, time
+import cPickle
+import vc_globals
+import util
+import SymDict, SectionedFile
+import DiffCrawler
+from LangDef import LangDef
+
+#
+# Same definition as in vc_config.py
+#
+python_definition = \
+    LangDef(regexp_symbol='([a-zA-Z]|_+[a-zA-Z])[a-zA-Z0-9_]*',
+            regexps_no_symbols=['#[^\n]*\n', '"""[\s\S]*?"""',
+                                '"([^"]|\\")*?"',
+                                '\'([^\']|\\\')*?\''])
+
+
+def help():
+    print """
+
+Usage: python bench_symdict.py [-d dict_file] [-n num_symbols] [-r repeats]
+       [-k num_known]
+       python bench_symdict.py --parse [-s size] [-r repeats] [source ...]
+       python bench_symdict.py --load [-d dict_file] [-r repeats]
+
+Benchmarks matching of pseudo symbols against the known symbols of a
+symbol dictionary file, using the regexp scan over
+SymDict.symbols_as_one_string, the PseudoSymbolIndex, and the
+PseudoSymbolIndex with the cache of compiled regexps.
+
+With --parse, benchmarks the extraction of symbols from Python source
+files (by default, Data/TestData/large_buff.py and native_python.py),
+comparing LangDef.symbols_in with the old chunk by chunk algorithm.
+
+With --load, benchmarks reading the symbol dictionary file stored as a
+text pickle and as a sectioned file (in full, and only the sections
+needed at startup).
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+--parse    : benchmark parsing of symbols instead of pseudo symbol matching
+
+--load     : benchmark reading the symbol dictionary file instead of pseudo
+             symbol matching
+
+-s size    : with --parse, repeat each source file until it is at least
+             that many bytes long (default: 1000000)
+
+-d file    : symbol dictionary file (default: Data/State/symdict.dict)
+
+-n num     : number of pseudo symbols to match (default: 200)
+
+-r repeats : number of times each pseudo symbol is matched (default: 3)
+
+-k num     : add compounds of two known symbols (e.g. foo_bar for foo and
+             bar), until there are at least num known symbols, to
+             simulate a larger dictionary (default: 0)
+    """
+
+def read_dict_file(dict_file):
+    """reads the complete dictionary stored in a symbol dictionary file,
+    in either format
+
+    **INPUTS**
+
+    *STR dict_file* -- path of the symbol dictionary file
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the dictionary
+    """
+    if SectionedFile.is_sectioned_file(dict_file):
+        return SectionedFile.SectionedFileReader(dict_file).load_all()
+    f = open(dict_file, 'r')
+    values = cPickle.load(f)
+    f.close()
+    return values
+
+def load_symbols(dict_file, min_known = 0):
+    """creates a SymDict containing the symbols (but not the SR
+    vocabulary entries) stored in a symbol dictionary file
+
+    **INPUTS**
+
+    *STR dict_file* -- path of the symbol dictionary file
+
+    *INT min_known* -- if the file has fewer symbols, add compounds of
+    two of its symbols until the SymDict has that many
+
+    **OUTPUTS**
+
+    *(SymDict, {STR: SymbolInfo})* -- the symbol dictionary, and the
+    symbol information read from the file
+    """
+    values = read_dict_file(dict_file)
+    symbols = SymDict.SymDict(sym_file = None)
+    symbols.word_exists = lambda spoken, written = None: 1
+    symbol_info = values['symbol_info']
+    for written_as in symbol_info.keys():
+        symbols.symbol_info[written_as] = symbol_info[written_as]
+        symbols._add_symbol_starting_with(written_as)
+    written = symbol_info.keys()
+    written.sort()
+    num_written = len(written)
+    ii = 0
+    while len(symbols.symbol_info) < min_known:
+        compound = written[ii % num_written] + '_' \
+            + written[(ii / num_written + ii * 7 + 1) % num_written]
+        if not symbols.symbol_info.has_key(compound):
+            symbols.symbol_info[compound] = SymDict.SymbolInfo()
+            symbols._add_symbol_starting_with(compound)
+        ii = ii + 1
+    return symbols, symbol_info
+
+def sample_pseudo_symbols(symbol_info, num):
+    """picks pseudo symbols from the spoken forms of known symbols
+
+    Every other pseudo symbol has its words truncated, so that the
+    sample contains approximate as well as exact matches.
+
+    **INPUTS**
+
+    *{STR: SymbolInfo} symbol_info* -- the known symbols
+
+    *INT num* -- maximum number of pseudo symbols
+
+    **OUTPUTS**
+
+    *[STR]* -- the pseudo symbols
+    """
+    written = symbol_info.keys()
+    written.sort()
+    step = max(1, len(written) / max(1, num))
+    pseudo_symbols = []
+    for ii in range(0, len(written), step):
+        forms = symbol_info[written[ii]].spoken_forms
+        if not forms:
+            continue
+        words = forms[0].split()
+        if len(pseudo_symbols) % 2:
+            words = map(lambda word: word[:max(1, len(word) - 2)], words)
+        pseudo_symbols.append(' '.join(words))
+        if len(pseudo_symbols) >= num:
+            break
+    return pseudo_symbols
+
+def time_matching(symbols, pseudo_symbols, repeats):
+    """matches a list of pseudo symbols and times it
+
+    **INPUTS**
+
+    *SymDict symbols* -- the symbol dictionary
+
+    *[STR] pseudo_symbols* -- the pseudo symbols to match
+
+    *INT repeats* -- number of times to match each pseudo symbol
+
+    **OUTPUTS**
+
+    *(FLOAT, [ANY])* -- the elapsed time in seconds, and the results
+    of the last round of matches
+    """
+    results = []
+    start = time.clock()
+    for ii in range(repeats):
+        results = []
+        for a_pseudo_symbol in pseudo_symbols:
+            results.append(symbols.match_pseudo_symbol(a_pseudo_symbol))
+    return time.clock() - start, results
+
+def time_raw_matching(symbols, pseudo_symbols, repeats):
+    """times only the search for candidate native symbols matching a
+    list of pseudo symbols (i.e. without compiling the regexps or
+    scoring the matches)
+
+    **INPUTS**
+
+    *SymDict symbols* -- the symbol dictionary
+
+    *[STR] pseudo_symbols* -- the pseudo symbols to match
+
+    *INT repeats* -- number of times to match each pseudo symbol
+
+    **OUTPUTS**
+
+    *FLOAT* -- the elapsed time in seconds
+    """
+    queries = []
+    for a_pseudo_symbol in pseudo_symbols:
+        words = filter(None, re.split('[^a-zA-Z0-9]+', a_pseudo_symbol))
+        queries.append((words, symbols.reg_pseudo_to_native_symbol(words)))
+    start = time.clock()
+    for ii in range(repeats):
+        for words, regexp in queries:
+            if symbols.use_pseudo_symbol_index:
+                matches = symbols._pseudo_symbol_index.matches(regexp, words)
+            else:
+                matches = regexp.finditer(symbols._symbols_to_scan(words[0]))
+            for a_match in matches:
+                pass
+    return time.clock() - start
+
+def bench_match_pseudo_symbol(dict_file, num, repeats, min_known = 0):
+    """compares the regexp scan and the index for matching pseudo
+    symbols, and checks that both give the same results
+
+    **INPUTS**
+
+    *STR dict_file* -- path of the symbol dictionary file
+
+    *INT num* -- number of pseudo symbols to match
+
+    *INT repeats* -- number of times to match each pseudo symbol
+
+    *INT min_known* -- minimum number of known symbols (see 
+    load_symbols)
+
+    **OUTPUTS**
+
+    *BOOL* -- true if both methods gave the same results
+    """
+    symbols, symbol_info = load_symbols(dict_file, min_known)
+    pseudo_symbols = sample_pseudo_symbols(symbol_info, num)
+    print 'Matching %d pseudo symbols against %d known symbols' \
+        % (len(pseudo_symbols), len(symbols.symbol_info))
+
+    num_matches = repeats * len(pseudo_symbols)
+    max_size = symbols._matcher_cache.max_size
+    symbols._matcher_cache.max_size = 0
+    symbols.use_pseudo_symbol_index = 0
+    scan_raw = time_raw_matching(symbols, pseudo_symbols, repeats)
+    scan_time, scan_results = \
+        time_matching(symbols, pseudo_symbols, repeats)
+    print 'regexp scan:  %.3f sec (%.3f msec/match, %.3f msec/search)' \
+        % (scan_time, 1000. * scan_time / num_matches,
+           1000. * scan_raw / num_matches)
+
+    symbols.use_pseudo_symbol_index = 1
+    index_raw = time_raw_matching(symbols, pseudo_symbols, repeats)
+    index_time, index_results = \
+        time_matching(symbols, pseudo_symbols, repeats)
+    print 'symbol index: %.3f sec (%.3f msec/match, %.3f msec/search)' \
+        % (index_time, 1000. * index_time / num_matches,
+           1000. * index_raw / num_matches)
+    if index_time and index_raw:
+        print 'speedup: %.1f overall, %.1f for the search' \
+            % (scan_time / index_time, scan_raw / index_raw)
+
+    #
+    # Only use as many pseudo symbols as fit in the cache, otherwise
+    # cycling through them would defeat the LRU policy
+    #
+    symbols._matcher_cache.max_size = max_size
+    symbols._matcher_cache.reset_stats()
+    cached_symbols = pseudo_symbols[:max_size]
+    cached_time, cached_results = \
+        time_matching(symbols, cached_symbols, repeats)
+    print 'index+cache:  %.3f sec (%.3f msec/match)' \
+        % (cached_time, 1000. * cached_time / (repeats * len(cached_symbols)))
+    print 'cache counters: %s' % symbols.matcher_cache_stats()
+    if cached_results != index_results[:max_size]:
+        print 'MISMATCH between cached and uncached results'
+        return 0
+
+    same = 1
+    for ii in range(len(pseudo_symbols)):
+        if scan_results[ii] != index_results[ii]:
+            same = 0
+            print 'MISMATCH for \'%s\':\n  scan: %s\n  index: %s' \
+                % (pseudo_symbols[ii], scan_results[ii], index_results[ii])
+    return same
+
+def old_strip_source(source, language_definition):
+    """the algorithm used by SymDict.strip_source before
+    LangDef.strip_source was introduced, which searches all the
+    regexps again after each stripped chunk
+    """
+    stripped_source = ''
+    while source != '':
+        non_symbol_start = None
+        non_symbol_end = None
+        for a_regexp in language_definition.regexps_no_symbols:
+            a_match = re.search(a_regexp, source)
+            if a_match:
+                if non_symbol_start == None or a_match.start() < non_symbol_start:
+                    non_symbol_start = a_match.start()
+                    non_symbol_end = a_match.end()
+        if non_symbol_start != None:
+            stripped_source = stripped_source + source[0:non_symbol_start]
+            source = source[non_symbol_end:]
+        else:
+            stripped_source = stripped_source + source
+            source = ''
+    return stripped_source
+
+def old_symbols_in(source, language_definition):
+    """the algorithm used by SymDict.parse_symbols before
+    LangDef.symbols_in was introduced
+    """
+    symbols = []
+    stripped_contents = old_strip_source(source, language_definition)
+    while stripped_contents != '':
+        a_match = re.search('(' + \
+            language_definition.regexp_symbol + ')', stripped_contents)
+        if a_match:
+            symbols.append(a_match.group(1))
+            stripped_contents = stripped_contents[a_match.end()+1:]
+        else:
+            stripped_contents = ''
+    return symbols
+
+def bench_parse_symbols(file_names, size, repeats):
+    """compares the old and new algorithms for extracting the symbols
+    from source files, and checks that both give the same results
+
+    **INPUTS**
+
+    *[STR] file_names* -- paths of the Python source files
+
+    *INT size* -- each source is repeated until it is at least *size*
+    bytes long
+
+    *INT repeats* -- number of times each source is parsed
+
+    **OUTPUTS**
+
+    *BOOL* -- true if both algorithms gave the same results
+    """
+    same = 1
+    for a_file in file_names:
+        f = open(a_file, 'r')
+        contents = f.read()
+        f.close()
+        source = contents
+        while len(source) < size:
+            source = source + contents
+        print 'Parsing %s (%d bytes)' % (util.within_VCode(a_file), 
+            len(source))
+
+        start = time.clock()
+        for ii in range(repeats):
+            old_symbols = old_symbols_in(source, python_definition)
+        old_time = (time.clock() - start) / repeats
+        print 'old algorithm:     %.3f sec' % old_time
+
+        start = time.clock()
+        for ii in range(repeats):
+            new_symbols = list(python_definition.symbols_in(source))
+        new_time = (time.clock() - start) / repeats
+        print 'single pass scan:  %.3f sec' % new_time
+        if new_time:
+            print 'speedup: %.1f' % (old_time / new_time)
+
+        if old_symbols != new_symbols:
+            same = 0
+            print 'MISMATCH: %d symbols with old algorithm, %d with new one' \
+                % (len(old_symbols), len(new_symbols))
+    return same
+
+def bench_load(dict_file, repeats):
+    """compares reading a symbol dictionary stored as a text pickle and
+    as a sectioned file
+
+    **INPUTS**
+
+    *STR dict_file* -- path of the symbol dictionary file (in either
+    format)
+
+    *INT repeats* -- number of times each file is read
+
+    **OUTPUTS**
+
+    *BOOL* -- true if both files gave the same dictionary
+    """
+    values = read_dict_file(dict_file)
+    text_file = os.path.join(vc_globals.tmp, 'bench_symdict.text.dict')
+    sectioned_file = os.path.join(vc_globals.tmp, 'bench_symdict.sect.dict')
+    f = open(text_file, 'w')
+    cPickle.dump(values, f)
+    f.close()
+    f = open(sectioned_file, 'wb')
+    SectionedFile.write_sections(f, values)
+    f.close()
+    print 'text pickle:    %d bytes' % os.path.getsize(text_file)
+    print 'sectioned file: %d bytes' % os.path.getsize(sectioned_file)
+
+    start = time.clock()
+    for ii in range(repeats):
+        f = open(text_file, 'r')
+        text_values = cPickle.load(f)
+        f.close()
+    text_time = (time.clock() - start) / repeats
+    print 'text pickle, in full:       %.3f sec' % text_time
+
+    start = time.clock()
+    for ii in range(repeats):
+        sectioned_values = \
+            SectionedFile.SectionedFileReader(sectioned_file).load_all()
+    sectioned_time = (time.clock() - start) / repeats
+    print 'sectioned file, in full:    %.3f sec' % sectioned_time
+
+#   SymDict.init_from_dictionary loads spoken_form_info lazily
+    start = time.clock()
+    for ii in range(repeats):
+        reader = SectionedFile.SectionedFileReader(sectioned_file)
+        for name in reader.keys():
+            if name != 'spoken_form_info':
+                reader[name]
+    startup_time = (time.clock() - start) / repeats
+    print 'sectioned file, at startup: %.3f sec' % startup_time
+    if sectioned_time and startup_time:
+        print 'speedup: %.1f in full, %.1f at startup' \
+            % (text_time / sectioned_time, text_time / startup_time)
+
+    os.remove(text_file)
+    os.remove(sectioned_file)
+    o = DiffCrawler.ObjDiff(all = 1)
+    o.compare(text_values, sectioned_values)
+    same = not o.differences()
+    if not same:
+        print 'MISMATCH between the dictionaries read from both files'
+    return same
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        'parse', None,
+        'load', None,
+        'd=', vc_globals.sym_state_file,
+        'n=', 200,
+        'r=', 3,
+        'k=', 0,
+        's=', 1000000))
+    if opts['h']:
+        help()
+    elif opts['load']:
+        if not bench_load(opts['d'], int(opts['r'])):
+            sys.exit(1)
+    elif opts['parse']:
+        if not args:
+            args = [os.path.join(vc_globals.test_data, 'large_buff.py'),
+                    os.path.join(vc_globals.test_data, 'native_python.py')]
+        if not bench_parse_symbols(args, int(opts['s']), int(opts['r'])):
+            sys.exit(1)
+    else:
+        if not bench_match_pseudo_symbol(opts['d'], int(opts['n']),
+                                         int(opts['r']), int(opts['k'])):
+            sys.exit(1)
@@ -0,0 +1,216 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Benchmark of the text stores used by SourceBuffCached to cache the
+contents of buffers"""
+
+import random, sys, time
+import util
+import TextStore
+
+
+def help():
+    print """
+
+Usage: python bench_textstore.py [-s size_kb] [-e num_edits] [-u edits]
+       [-r seed]
+
+Replays a trace of edits over a large buffer with each class of text
+store (see TextStore.py), the way SourceBuffCached does when the editor
+reports changes with insert_cbk and delete_cbk: each edit replaces a
+range of the text, then the text around the cursor is read.  The whole
+contents are read once per utterance.
+
+The trace types characters at the cursor, with backspaces, pastes,
+deleted lines and jumps of the cursor to random places in the buffer.
+
+Prints the time per edit, per read around the cursor and per read of
+the whole contents, for each class of text store.
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+-s size    : initial size of the buffer, in kilobytes (default: 1024)
+
+-e num     : number of edits (default: 5000)
+
+-u edits   : number of edits per utterance, or 0 to never read the whole
+             contents (default: 20)
+
+-r seed    : seed of the random trace (default: 1)
+    """
+
+def initial_text(size):
+    """returns the initial contents of the buffer
+
+    **INPUTS**
+
+    *INT size* -- the length of the contents
+
+    **OUTPUTS**
+
+    *STR* -- the contents
+    """
+    lines = ['class Shape:\n',
+             '    def __init__(self, x, y):\n',
+             '        self.x = x\n',
+             '        self.y = y\n',
+             '\n',
+             '    def moved(self, dx, dy):\n',
+             '        return Shape(self.x + dx, self.y + dy)\n',
+             '\n']
+    block = ''
+    for a_line in lines:
+        block = block + a_line
+    return (block * (size / len(block) + 1))[:size]
+
+def edit_trace(size, num_edits, seed):
+    """generates a trace of edits
+
+    **INPUTS**
+
+    *INT size* -- the initial length of the buffer
+
+    *INT num_edits* -- the number of edits
+
+    *INT seed* -- the seed of the random generator
+
+    **OUTPUTS**
+
+    *[(INT, INT, STR, INT)]* -- the range replaced, the text replacing
+    it and the cursor position after each edit
+    """
+    rand = random.Random(seed)
+    typed = 'x_coordinate = self.x + dx\n'
+    pasted = 'def area(self):\n        return self.width * self.height\n' * 3
+    trace = []
+    length = size
+    pos = rand.randint(0, length)
+    for ii in range(num_edits):
+        kind = rand.randint(0, 99)
+        if kind < 2:
+            pos = rand.randint(0, length)
+            continue
+        if kind < 80:
+            start, end, text = pos, pos, typed[ii % len(typed)]
+        elif kind < 95:
+            start, end, text = max(pos - 1, 0), pos, ''
+        elif kind < 98:
+            start, end, text = pos, pos, pasted
+        else:
+            start, end, text = pos, min(pos + 40, length), ''
+        length = length + len(text) - (end - start)
+        pos = start + len(text)
+        trace.append((start, end, text, pos))
+    return trace
+
+def replay(store, trace, edits_per_utterance):
+    """replays a trace of edits on a text store
+
+    **INPUTS**
+
+    *TextStore store* -- the initial store
+
+    *[(INT, INT, STR, INT)]* trace -- the trace
+
+    *INT edits_per_utterance* -- number of edits per utterance, or 0
+    to never read the whole contents
+
+    **OUTPUTS**
+
+    *(FLOAT, FLOAT, FLOAT, INT, TextStore)* -- the time spent editing,
+    reading around the cursor and reading the whole contents, the
+    number of reads of the whole contents, and the final store
+    """
+    edit_time = 0.0
+    read_time = 0.0
+    whole_time = 0.0
+    whole_reads = 0
+    count = 0
+    for start, end, text, pos in trace:
+        before = time.time()
+        store = store.replace(start, end, text)
+        after_edit = time.time()
+        store.text(max(pos - 200, 0), pos + 200)
+        after_read = time.time()
+        edit_time = edit_time + after_edit - before
+        read_time = read_time + after_read - after_edit
+        count = count + 1
+        if edits_per_utterance and count % edits_per_utterance == 0:
+            store.text()
+            whole_time = whole_time + time.time() - after_read
+            whole_reads = whole_reads + 1
+    return edit_time, read_time, whole_time, whole_reads, store
+
+def bench_textstore(size, num_edits, edits_per_utterance, seed):
+    """compares the text stores on a trace of edits
+
+    **INPUTS**
+
+    *INT size* -- the initial length of the buffer
+
+    *INT num_edits* -- the number of edits
+
+    *INT edits_per_utterance* -- number of edits per utterance, or 0
+    to never read the whole contents
+
+    *INT seed* -- the seed of the random generator
+
+    **OUTPUTS**
+
+    *none*
+    """
+    text = initial_text(size)
+    trace = edit_trace(size, num_edits, seed)
+    print 'buffer of %d characters, %d edits' % (size, len(trace))
+    results = []
+    for store_class in [TextStore.StringTextStore, TextStore.RopeTextStore]:
+        start = time.time()
+        store = store_class(text)
+        build_time = time.time() - start
+        edit_time, read_time, whole_time, whole_reads, store = \
+            replay(store, trace, edits_per_utterance)
+        results.append(store.text())
+        print '%s: build %.2f ms, edit %.1f usec, read around cursor %.1f usec' \
+            % (store_class.__name__, build_time * 1000,
+               edit_time / max(len(trace), 1) * 1e6,
+               read_time / max(len(trace), 1) * 1e6)
+        if whole_reads:
+            print '   read whole contents %.2f ms (%d times), total %.1f usec per edit' \
+                % (whole_time / whole_reads * 1000, whole_reads,
+                   (edit_time + read_time + whole_time) \
+                   / max(len(trace), 1) * 1e6)
+    if results[0] != results[1]:
+        print 'ERROR: the stores have different contents after the trace'
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        's=', 1024,
+        'e=', 5000,
+        'u=', 20,
+        'r=', 1))
+    if opts['h']:
+        help()
+        sys.exit(0)
+    bench_textstore(int(opts['s']) * 1024, int(opts['e']), int(opts['u']),
+        int(opts['r']))
@@ -0,0 +1,211 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Benchmarks of the overhead of debug traces when they are not printed"""
+
+import sys, time
+import util
+import debug
+import messaging
+from bench_messaging import updates_message
+
+
+def help():
+    print """
+
+Usage: python bench_trace.py [-u num_updates] [-t text_len] [-r repeats] [--on]
+
+Measures the overhead of calls to debug.trace when the traces are not
+printed, comparing messages built lazily by debug.trace (the current
+call sites) with messages built by the caller before each call (as the
+call sites used to do).
+
+Prints the cost of a single call with each style, then the time spent
+per utterance encoding and decoding the 'updates' message of a typical
+utterance with the length prefixed encoding (whose encoder traces every
+item it encodes), and the number of trace calls made per utterance.
+
+OPTIONS
+-------
+
+-h         : print this help message
+
+--on       : turn traces on, but only for a trace id which is never used
+             (by default, traces are off)
+
+-u num     : number of insert updates in the message (default: 2)
+
+-t len     : length of the text inserted by each update (default: 40)
+
+-r repeats : number of utterances (default: 500).  Single calls are
+             repeated 100 times more.
+    """
+
+class EagerTrace:
+    """replacement for debug.trace which behaves like it did before
+    messages were built lazily: the message is formatted before each call,
+    and the active trace ids are scanned every time traces are on.
+
+    **INSTANCE ATTRIBUTES**
+
+    *INT* calls -- number of calls so far
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, trace_id, message, *args):
+        self.calls = self.calls + 1
+        if args:
+            message = message % args
+        if callable(message):
+            message = message()
+        if debug.trace_fct is not debug.dont_print_trace and \
+           debug._trace_is_active(trace_id):
+            debug.trace_fct(trace_id, message)
+
+class LazyTrace:
+    """wrapper around debug.trace which counts the calls
+
+    **INSTANCE ATTRIBUTES**
+
+    *INT* calls -- number of calls so far
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, trace_id, message, *args):
+        self.calls = self.calls + 1
+        return debug.trace(trace_id, message, *args)
+
+def bench_calls(repeats):
+    """measures the cost of single trace calls which print nothing
+
+    **INPUTS**
+
+    *INT repeats* -- number of calls with each style
+
+    **OUTPUTS**
+
+    *none*
+    """
+    item = updates_message(1, 40)['updates'][0]
+    start = time.clock()
+    for ii in xrange(repeats):
+        pass
+    empty_time = time.clock() - start
+
+    start = time.clock()
+    for ii in xrange(repeats):
+        debug.trace('encode_data_item', 'item=\'%s\'' % repr(item))
+    eager_time = time.clock() - start - empty_time
+
+    start = time.clock()
+    for ii in xrange(repeats):
+        debug.trace('encode_data_item', 'item=\'%r\'', item)
+    lazy_time = time.clock() - start - empty_time
+
+    start = time.clock()
+    for ii in xrange(repeats):
+        if debug.tracing('encode_data_item'):
+            debug.trace('encode_data_item', 'item=\'%r\'', item)
+    guarded_time = time.clock() - start - empty_time
+
+    print 'single call: eager %.2f usec, lazy %.2f usec, guarded %.2f usec' \
+        % (eager_time / repeats * 1e6, lazy_time / repeats * 1e6,
+           guarded_time / repeats * 1e6)
+
+def time_utterances(a_trace, mess_argvals, repeats):
+    """times the encoding and decoding of 'updates' messages with a
+    given trace function
+
+    **INPUTS**
+
+    *FCT* a_trace -- the trace function to use in [messaging]
+
+    *{STR: ANY} mess_argvals* -- arguments of the message
+
+    *INT repeats* -- number of messages to encode and decode
+
+    **OUTPUTS**
+
+    *FLOAT* -- the time per message, in seconds
+
+    .. [messaging] file:///./messaging.html"""
+    encoder = messaging.MessEncoder_LenPrefArgs()
+    old_trace = messaging.trace
+    messaging.trace = a_trace
+    try:
+        start = time.clock()
+        for ii in xrange(repeats):
+            encoder.decode(encoder.encode('updates', mess_argvals))
+        elapsed = time.clock() - start
+    finally:
+        messaging.trace = old_trace
+    return elapsed / repeats
+
+def bench_utterances(num_updates, text_len, repeats):
+    """compares the time spent per utterance with eager and lazy trace
+    messages
+
+    **INPUTS**
+
+    *INT num_updates* -- number of insert updates in the message
+
+    *INT text_len* -- length of the text inserted by each update
+
+    *INT repeats* -- number of utterances
+
+    **OUTPUTS**
+
+    *none*
+    """
+    mess_argvals = updates_message(num_updates, text_len)
+    eager = EagerTrace()
+    lazy = LazyTrace()
+    eager_time = time_utterances(eager, mess_argvals, repeats)
+    lazy_time = time_utterances(lazy, mess_argvals, repeats)
+    print 'per utterance: %d trace calls, eager %.3f ms, lazy %.3f ms (%.1fx)' \
+        % (lazy.calls / repeats, eager_time * 1000, lazy_time * 1000,
+           eager_time / max(lazy_time, 1e-9))
+
+if __name__ == '__main__':
+    opts, args = util.gopt(('h', None,
+        'on', None,
+        'u=', 2,
+        't=', 40,
+        'r=', 500))
+    if opts['h']:
+        help()
+        sys.exit(0)
+    if opts['on']:
+        debug.config_traces(status = 'on',
+            active_traces = {'bench_trace.never_used': 1})
+    repeats = int(opts['r'])
+    bench_calls(repeats * 100)
+    bench_utterances(int(opts['u']), int(opts['t']), repeats)
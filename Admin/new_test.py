@@ -97,7 +97,13 @@ OPTIONS
            done on a bug-free (yeah, right ;-) version of the system.
 
 -p pfile : profile the code, writing the output of the python profiler
-           to pfile (see Python Profiler in the Python library manual)
+           to pfile (see Python Profiler in the Python library manual).
+           Each test is profiled separately, to pfile.testname.dat, and
+           a report of the hot spots of each subsystem is printed at the
+           end of the tests.  A summary of the run is saved to
+           pfile.summary, and if a file pfile.baseline exists (e.g. the
+           summary of an earlier run), the report is compared with it
+           (see also readprof.py)
 
 --bypass : bypass natlink for dictation utterances (used for profiling)
 
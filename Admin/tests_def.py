@@ -46,6 +46,7 @@ import KnownTargetModule, NewMediatorObject, TargetWindow, WinIDClient
 import test_helpers
 import debug
 import DiffCrawler
+import SectionedFile
 import difflib
 from config_helpers import alpha_bravo
 
@@ -181,6 +182,221 @@ def test_SymDict():
 add_test('SymDict', test_SymDict, desc='self-test for SymDict.py')
 
 
+def compare_pseudo_symbol_matching(symbols, pseudo_symbols):
+    """Checks that matching pseudo symbols with the PseudoSymbolIndex
+    gives the same results as scanning SymDict.symbols_as_one_string,
+    and that the cache of matchers returns those same results.
+    """
+    max_size = symbols._matcher_cache.max_size
+    for a_symbol in pseudo_symbols:
+        symbols._matcher_cache.max_size = 0
+        symbols.use_pseudo_symbol_index = 0
+        scanned = symbols.match_pseudo_symbol(a_symbol)
+        symbols.use_pseudo_symbol_index = 1
+        indexed = symbols.match_pseudo_symbol(a_symbol)
+        symbols._matcher_cache.max_size = max_size
+        symbols.match_pseudo_symbol(a_symbol)
+        cached = symbols.match_pseudo_symbol(a_symbol)
+        if scanned == indexed and indexed == cached:
+            print '\'%s\': same matches (%d good)' % (a_symbol, len(indexed[0]))
+        else:
+            print '\'%s\': DIFFERENT MATCHES\n   scan: %s\n   index: %s\n   cache: %s' \
+                % (a_symbol, scanned, indexed, cached)
+
+def test_pseudo_symbol_index():
+    """Test the index used for matching pseudo symbols"""
+
+    temp_config = temp_factory.new_config()
+    interp = temp_config.interpreter()
+    interp.cleanup_dictionary()
+    interp.parse_symbols_from_file(large_buff_py)
+    symbols = interp.known_symbols
+    pseudo_symbols = ['set attribute', 'expand variables', 'execute file', 
+        'profile Constructor Large Object', 'profile construct large object',
+        'auto test', 'new symbol', 'F. O. K.', 'os path', 'self',
+        'no such symbol anywhere']
+
+    print '\n*** Matching with all symbols ***\n'
+    compare_pseudo_symbol_matching(symbols, pseudo_symbols)
+
+    print '\n*** Matching after removing some symbols ***\n'
+    known = symbols.symbol_info.keys()
+    known.sort()
+    for a_symbol in known[::3]:
+        symbols.remove_symbol(a_symbol, remove_sr_entries = 0)
+    compare_pseudo_symbol_matching(symbols, pseudo_symbols)
+
+    print '\n*** Matching after adding symbols back ***\n'
+    for a_symbol in known[::6]:
+        symbols.add_symbol(a_symbol, add_sr_entries = 0)
+    compare_pseudo_symbol_matching(symbols, pseudo_symbols)
+
+    print '\n*** Matching a symbol starting with a digit ***\n'
+    digit_symbol = '2 d array'
+    good_matches = lambda symbols = symbols, digit_symbol = digit_symbol: \
+        map(lambda match: match[1], 
+            symbols.match_pseudo_symbol(digit_symbol)[0])
+    print 'before adding: %s' % good_matches()
+    symbols.add_symbol('2darray', add_sr_entries = 0)
+    print 'after adding: %s' % good_matches()
+    compare_pseudo_symbol_matching(symbols, [digit_symbol, '2 d'])
+    symbols.remove_symbol('2darray', remove_sr_entries = 0)
+    print 'after removing: %s' % good_matches()
+
+    print '\n*** Matcher cache counters ***\n'
+    stats = symbols.matcher_cache_stats()
+    for a_counter in ['hits', 'regexp_hits', 'invalidations']:
+        print '%s > 0: %s' % (a_counter, stats[a_counter] > 0)
+
+    print '\n*** Matcher cache eviction ***\n'
+    import PseudoSymbolIndex
+    cache = PseudoSymbolIndex.PseudoSymbolMatcherCache(max_size = 3)
+    for a_word in ['one', 'two', 'three']:
+        cache.store([a_word], 'x', a_word, [])
+    for ii in range(100):
+        cache.lookup(['two'])
+        cache.lookup(['one'])
+    cache.store(['four'], 'x', 'four', [])
+    cache.lookup(['four'])
+    cache.store(['five'], 'x', 'five', [])
+    cached = cache.entries.keys()
+    cached.sort()
+    print 'cached after evicting twice: %s' % cached
+    print 'uses remembered: %d' % (len(cache.uses) - cache.first_use)
+
+    temp_config.quit()
+
+add_test('pseudo_symbol_index', test_pseudo_symbol_index, 
+    desc='testing the index used for matching pseudo symbols')
+
+
+def harvested_symbols(symbols, num_processes, file_list):
+    """Parses symbols from a list of files with a given number of
+    worker processes, and returns the resulting symbols and spoken forms
+    """
+    symbols.harvest_processes = num_processes
+    symbols.cleanup_dictionary(resave = 0)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    known = symbols.symbol_info.keys()
+    known.sort()
+    return known, symbols.spoken_form_info.all_phrase_values()
+
+def test_parallel_harvest():
+    """Test parsing of symbols in worker processes"""
+
+    temp_config = temp_factory.new_config()
+    symbols = temp_config.interpreter().known_symbols
+    file_list = [large_buff_py, small_buff_py, small_buff_c, 
+        unusual_symbols_py, 
+        vc_globals.test_data + os.sep + 'native_python.py']
+
+    in_process = harvested_symbols(symbols, 0, file_list)
+    in_workers = harvested_symbols(symbols, 3, file_list)
+    print 'Parsed %d symbols in the mediator process' % len(in_process[0])
+    print 'Parsed %d symbols in worker processes' % len(in_workers[0])
+    if in_process == in_workers:
+        print 'Same symbols and spoken forms'
+    else:
+        print 'DIFFERENT symbols or spoken forms'
+
+    symbols.harvest_processes = 0
+    temp_config.quit()
+
+add_test('parallel_harvest', test_parallel_harvest, 
+    desc='testing parsing of symbols in worker processes')
+
+
+def write_symbol_source(file_name, contents, mod_time):
+    """Writes a source file and sets its modification time"""
+    f = open(file_name, 'w')
+    f.write(contents)
+    f.close()
+    os.utime(file_name, (mod_time, mod_time))
+
+def print_harvested_symbols(symbols, candidates):
+    """Prints which of a list of symbols are in the dictionary, and the
+    counters of the harvest cache"""
+    for a_symbol in candidates:
+        print '%s known: %s' % (a_symbol, 
+            symbols.symbol_info.has_key(a_symbol))
+    stats = symbols._harvest_cache.stats()
+    print 'hits=%d, digest_hits=%d, misses=%d' % \
+        (stats['hits'], stats['digest_hits'], stats['misses'])
+    symbols._harvest_cache.reset_stats()
+
+def test_harvest_cache():
+    """Test parsing of only the changed standard symbol sources"""
+
+    temp_config = temp_factory.new_config()
+    symbols = temp_config.interpreter().known_symbols
+    changed_file = os.path.join(vc_globals.tmp, 'harvest_changed.py')
+    touched_file = os.path.join(vc_globals.tmp, 'harvest_touched.py')
+    file_list = [changed_file, touched_file]
+    candidates = ['harvest_old_name', 'harvest_new_name', 
+        'harvest_shared_name', 'harvest_moved_name', 'harvest_touched_name',
+        'harvest_user_name']
+    mod_time = time.time() - 1000
+
+    write_symbol_source(changed_file, 
+        'harvest_old_name = harvest_shared_name\nharvest_moved_name()\n', 
+        mod_time)
+    write_symbol_source(touched_file, 
+        'harvest_shared_name = harvest_touched_name\n', mod_time)
+    symbols.standard_symbols_in(file_list)
+    symbols._harvest_cache.reset_stats()
+
+    print '\n*** Parsing standard symbol sources ***\n'
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, candidates)
+
+    print '\n*** Parsing again without changes ***\n'
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, candidates)
+
+    print '\n*** Parsing after changing one file and touching the other ***\n'
+    write_symbol_source(changed_file, 
+        'harvest_new_name = harvest_shared_name\n', mod_time + 10)
+    write_symbol_source(touched_file, 
+        'harvest_shared_name = harvest_touched_name\n', mod_time + 10)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, candidates)
+
+    print '\n*** Parsing after moving a symbol to the other file ***\n'
+    write_symbol_source(touched_file, 
+        'harvest_shared_name = harvest_touched_name\nharvest_moved_name()\n', 
+        mod_time + 20)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, candidates)
+
+    print '\n*** Parsing after removing a symbol also added by the user ***\n'
+    write_symbol_source(changed_file, 
+        'harvest_new_name = harvest_user_name\n', mod_time + 30)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    symbols.add_symbol('harvest_user_name', tentative = 0, add_sr_entries = 0)
+    write_symbol_source(changed_file, 
+        'harvest_new_name = harvest_shared_name\n', mod_time + 40)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, candidates)
+
+    print '\n*** Parsing after removing a symbol whose abbreviation was resolved ***\n'
+    symbols.word_exists = lambda word, hyphenated = 0: 0
+    write_symbol_source(changed_file, 
+        'harvest_new_name = harvest_hqzw_name\n', mod_time + 50)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    symbols.add_abbreviation('hocus', 'hqzw')
+    write_symbol_source(changed_file, 
+        'harvest_new_name = harvest_shared_name\n', mod_time + 60)
+    symbols.parse_symbols_from_files(file_list, add_sr_entries = 0)
+    print_harvested_symbols(symbols, ['harvest_hqzw_name'])
+
+    for a_file in file_list:
+        os.remove(a_file)
+    temp_config.quit()
+
+add_test('harvest_cache', test_harvest_cache, 
+    desc='testing parsing of only the changed standard symbol sources')
+
+
 
 
 ##############################################################################
@@ -1003,6 +1219,9 @@ def test_SymDict_storage():
     recovered_symbols.finish_config(mark_user = 0)
 
     d_recovered = recovered_symbols.persistent_dict()
+# finish_config started a journal for the junk file
+    if os.path.exists(junk_file + '.jnl'):
+        os.remove(junk_file + '.jnl')
 
     print "comparing modified persistent dictionary with the recovered one"
 
@@ -1305,6 +1524,1165 @@ add_test('SymDict_storage', test_SymDict_storage,
     desc='testing storage and version updating system for SymDict')
 
 
+def test_SymDict_sectioned_file():
+    """Test storage of SymDict as a text pickle and as a sectioned file"""
+
+    temp_config = temp_factory.new_config()
+    symbols = temp_config.interpreter().known_symbols
+    symbols.parse_symbols_from_files([small_buff_py], add_sr_entries = 0)
+    text_file = os.path.join(vc_globals.tmp, 'tmp_symdict_text.dict')
+    sectioned_file = os.path.join(vc_globals.tmp, 'tmp_symdict_sect.dict')
+
+    symbols.use_sectioned_file = 0
+    symbols.save(text_file, export_abbreviations = 0)
+    symbols.use_sectioned_file = 1
+    symbols.save(sectioned_file, export_abbreviations = 0)
+    print 'text file is sectioned: %d' % \
+        SectionedFile.is_sectioned_file(text_file)
+    print 'sectioned file is sectioned: %d' % \
+        SectionedFile.is_sectioned_file(sectioned_file)
+
+    fail = DictReadFailure()
+    persistent_symbols = SymDict.SymDict()
+    persistent_symbols.word_exists = word_exists
+    persistent_symbols.sym_file = text_file
+    d_text = persistent_symbols.dict_from_file(on_failure = fail.on_failure)
+    persistent_symbols.sym_file = sectioned_file
+    d_sectioned = persistent_symbols.dict_from_file(on_failure = fail.on_failure)
+    if fail.failed:
+        print "ERROR: failed to read persistent SymDict"
+        print fail.msg
+        return
+
+    print "comparing dictionaries read from both files"
+    o = DiffCrawler.ObjDiff(all = 1)
+    o.compare(d_text, d_sectioned)
+    differences = o.differences()
+    if differences:
+        print "ERROR: Differences found:"
+        for diff in differences:
+            print diff.location()
+            print diff.description()
+            print ""
+    else:
+        print "no differences found"
+
+    print "\ninitializing SymDict lazily from the sectioned file"
+    d_lazy = persistent_symbols.dict_from_file(on_failure = fail.on_failure, 
+        lazy = 1)
+    okay = persistent_symbols.init_from_dictionary(d_lazy, 
+        on_failure = fail.on_failure)
+    print 'initialized: %d' % okay
+    print 'spoken forms loaded: %d' % \
+        (not isinstance(persistent_symbols.spoken_form_info, 
+                        SectionedFile.LazySection))
+    phrase = ['a', 'method']
+    print 'match_phrase(%s) = %s' % (phrase, 
+        persistent_symbols.match_phrase(phrase))
+    print 'spoken forms loaded: %d' % \
+        (not isinstance(persistent_symbols.spoken_form_info, 
+                        SectionedFile.LazySection))
+    print 'same as original: %d' % \
+        (symbols.match_phrase(phrase) == 
+         persistent_symbols.match_phrase(phrase))
+
+    print "\nsaving a SymDict loaded lazily from the sectioned file"
+    import StringIO
+    lazy_symbols = SymDict.SymDict()
+    lazy_symbols.word_exists = word_exists
+    lazy_symbols.sym_file = sectioned_file
+    d_lazy = lazy_symbols.dict_from_file(on_failure = fail.on_failure, 
+        lazy = 1)
+    lazy_symbols.init_from_dictionary(d_lazy, on_failure = fail.on_failure)
+    errors = StringIO.StringIO()
+    real_stderr = sys.stderr
+    sys.stderr = errors
+    try:
+        lazy_symbols.save(export_abbreviations = 0)
+    finally:
+        sys.stderr = real_stderr
+    print 'warnings while saving: %s' % repr(errors.getvalue())
+    persistent_symbols.sym_file = sectioned_file
+    d_saved = persistent_symbols.dict_from_file(on_failure = fail.on_failure)
+    persistent_symbols.init_from_dictionary(d_saved, 
+        on_failure = fail.on_failure)
+    print 'same as original after saving: %d' % \
+        (symbols.match_phrase(phrase) == 
+         persistent_symbols.match_phrase(phrase))
+
+    os.remove(text_file)
+    os.remove(sectioned_file)
+    for a_file in [os.path.splitext(sectioned_file)[0] + '.bak', 
+                   sectioned_file + '.jnl']:
+        if os.path.exists(a_file):
+            os.remove(a_file)
+    temp_config.quit()
+
+add_test('SymDict_sectioned_file', test_SymDict_sectioned_file, 
+    desc='testing storage of SymDict as a sectioned file')
+
+
+def journaled_symdict(dict_file, export_file):
+    """Creates a SymDict from a persistent file, replaying its journal"""
+    symbols = SymDict.SymDict(export_file = export_file)
+    symbols.word_exists = word_exists
+    symbols.sym_file = dict_file
+    fail = DictReadFailure()
+    okay = symbols.init_from_file(on_failure = fail.on_failure)
+    if not okay:
+        print "ERROR: failed to read \n%s:" % util.within_VCode(dict_file)
+        print fail.msg
+    return symbols
+
+def test_SymDict_journal():
+    """Test recovery of SymDict changes from the journal"""
+
+    temp_config = temp_factory.new_config()
+    symbols = temp_config.interpreter().known_symbols
+    symbols.parse_symbols_from_files([small_buff_py], add_sr_entries = 0)
+    dict_file = os.path.join(vc_globals.tmp, 'tmp_symdict_jnl.dict')
+    export_file = os.path.join(vc_globals.tmp, 'abbrevs_jnl')
+    symbols.save(dict_file, export_abbreviations = 0)
+
+    journaled = journaled_symdict(dict_file, export_file)
+    journaled.start_journal()
+    journaled.add_symbol('journal_test_symbol', add_sr_entries = 0)
+    journaled.add_abbreviation('journal', 'jnl')
+    journaled.add_symbol('jnl_entry', add_sr_entries = 0)
+    journaled.remove_symbol('a_method', remove_sr_entries = 0)
+    journaled.flush_journal()
+    print 'journal entries: %d' % journaled._journal.num_entries
+
+    print '\nsimulating a crash after a partial write to the journal'
+    f = open(journaled._journal.file_name, 'ab')
+    f.write('\000\000\000\100partial record')
+    f.close()
+    recovered = journaled_symdict(dict_file, export_file)
+    for a_symbol in ['journal_test_symbol', 'jnl_entry', 'a_method']:
+        print '%s known: %d' % (a_symbol, recovered.known_symbol(a_symbol))
+    print 'spoken forms of jnl_entry: %s' % recovered.spoken_forms('jnl_entry')
+    print 'same as before the crash: %d' % \
+        (recovered.spoken_forms('jnl_entry') == 
+         journaled.spoken_forms('jnl_entry'))
+
+    print '\ncompacting the journal'
+    recovered.start_journal()
+    recovered.max_journal_entries = 2
+    for a_symbol in ['compacted_one', 'compacted_two']:
+        recovered.add_symbol(a_symbol, add_sr_entries = 0)
+    recovered.flush_journal()
+    print 'journal entries: %d' % recovered._journal.num_entries
+    compacted = journaled_symdict(dict_file, export_file)
+    print 'compacted_two known: %d' % compacted.known_symbol('compacted_two')
+
+    print '\njournaling calls made by journaled methods'
+    compacted.word_exists = lambda spoken_form, written_form = None: 0
+    compacted.start_journal()
+    compacted.add_symbol('nstd_entry', add_sr_entries = 0)
+# re-adds nstd_entry, now that nstd is no longer unresolved
+    compacted.add_abbreviation('nested', 'nstd')
+    print 'spoken forms of nstd_entry: %s' % \
+        compacted.spoken_forms('nstd_entry')
+    print 'journal entries: %d' % len(compacted._journal.pending)
+    compacted.flush_journal()
+
+    for a_file in [dict_file, dict_file + '.jnl', 
+                   os.path.splitext(dict_file)[0] + '.bak',
+                   export_file + '.py', export_file + '.bak',
+                   export_file + '.on_init.py', 
+                   export_file + '.on_init.bak']:
+        if os.path.exists(a_file):
+            os.remove(a_file)
+    temp_config.quit()
+
+add_test('SymDict_journal', test_SymDict_journal, 
+    desc='testing recovery of SymDict changes from the journal')
+
+
+def sorted_keys(dict):
+    keys = dict.keys()
+    keys.sort()
+    return keys
+
+def test_SymDict_spoken_forms():
+    """Test memoized and bounded generation of spoken forms"""
+
+    symbols = SymDict.SymDict()
+    symbols.word_exists = word_exists
+    for word, abbreviation in [('manager', 'mgr'), ('management', 'mgr'),
+                               ('configuration', 'cfg'), ('config', 'cfg'), 
+                               ('pointer', 'ptr'), ('index', 'idx'), 
+                               ('indices', 'idx')]:
+        symbols.add_abbreviation(word, abbreviation)
+    a_symbol = 'cfg_mgr_ptr_idx'
+    symbols.max_spoken_forms = 0
+    all_forms = symbols.get_spoken_forms(a_symbol)
+    print 'all %d spoken forms of %s:' % (len(all_forms), a_symbol)
+    for a_form in all_forms:
+        print '   %s' % a_form
+    for max_forms in [1, 5]:
+        symbols.max_spoken_forms = max_forms
+        best_forms = symbols.get_spoken_forms(a_symbol)
+        print '\nbest %d spoken forms: %s' % (max_forms, best_forms)
+        missing = filter(lambda form, all = all_forms: form not in all, 
+            best_forms)
+        if missing:
+            print 'ERROR: spoken forms which are not possible: %s' % missing
+
+    print '\nmemoized words: %s' % sorted_keys(symbols._expansion_memo)
+    print 'expansions of mgrs: %s' % symbols.expand_word('mgrs', a_symbol)
+    symbols.add_abbreviation('messenger', 'mgr')
+    print 'after adding an expansion of mgr, memoized words: %s' % \
+        sorted_keys(symbols._expansion_memo)
+    print 'expansions of mgrs: %s' % symbols.expand_word('mgrs', a_symbol)
+
+    symbols.max_spoken_forms = 0
+    symbols.get_spoken_forms('qzx_mgr')
+    symbols.get_spoken_forms('qzx_ptr')
+    print '\nunresolved qzx found in: %s' % \
+        sorted_keys(symbols.unresolved_abbreviations['qzx'])
+
+add_test('SymDict_spoken_forms', test_SymDict_spoken_forms, 
+    desc='testing memoized and bounded generation of spoken forms')
+
+
+def test_expansion_memo_vocabulary():
+    """Test that memoized expansions follow changes to the SR vocabulary"""
+
+    vocabulary = sr_interface.LocalVocabulary({'pointer': 1})
+    previous = sr_interface.use_vocabulary_engine(vocabulary)
+    try:
+        symbols = SymDict.SymDict()
+        symbols.add_abbreviation('pointer', 'ptr')
+        a_symbol = 'qzx_ptr'
+        print '%s: %s' % (a_symbol, symbols.get_spoken_forms(a_symbol))
+        print 'memoized words: %s' % sorted_keys(symbols._expansion_memo)
+        sr_interface.addWord('qzx')
+        print '\nafter adding qzx, %s: %s' % (a_symbol, 
+            symbols.get_spoken_forms(a_symbol))
+        print 'memoized words: %s' % sorted_keys(symbols._expansion_memo)
+        sr_interface.addWord('qzx pointer')
+        print '\nafter adding an unrelated word, qzx expansions: %s' % \
+            symbols.expand_word('qzx', a_symbol)
+        symbols.get_spoken_forms('zqx_ptr')
+        print '\nmemoized words: %s' % sorted_keys(symbols._expansion_memo)
+        symbols.add_symbol('zqx', user_supplied_spoken_forms = ['Zqx'])
+        symbols.expand_word('ptr', 'zqx_ptr')
+        print 'after adding symbol zqx with spoken form Zqx: %s' % \
+            sorted_keys(symbols._expansion_memo)
+    finally:
+        sr_interface.use_vocabulary_engine(previous)
+
+add_test('expansion_memo_vocabulary', test_expansion_memo_vocabulary, 
+    desc='testing that memoized expansions follow changes to the SR vocabulary')
+
+
+def test_word_info_cache():
+    """Test caching of vocabulary lookups in the speech engine"""
+
+    vocabulary = sr_interface.LocalVocabulary({'manager': 1, 'pointer': 1,
+        'Index': 1})
+    previous = sr_interface.use_vocabulary_engine(vocabulary)
+    cache = sr_interface.word_info_cache
+    try:
+        cache.reset_stats()
+        symbols = SymDict.SymDict()
+        symbols.add_abbreviation('manager', 'mgr')
+        for a_symbol in ['mgr_ptr', 'ptr_mgr', 'pointer_index', 
+                         'index_pointer']:
+            print '%s: %s' % (a_symbol, symbols.get_spoken_forms(a_symbol))
+        print 'engine lookups: %d' % vocabulary.num_lookups
+        print 'cache (entries, hits, misses): %s' % (cache.stats(),)
+
+        print '\nlooking up unknown words again'
+        symbols.clear_expansion_memo()
+        lookups = vocabulary.num_lookups
+        symbols.get_spoken_forms('ptr_pointer')
+        print 'engine lookups: %d' % (vocabulary.num_lookups - lookups)
+
+        print '\nadding and deleting words'
+        print 'ptr exists: %d' % sr_interface.word_exists('ptr')
+        sr_interface.addWord('ptr')
+        print 'after addWord, ptr exists: %d' % sr_interface.word_exists('ptr')
+        sr_interface.addWord('ptr pointer')
+        print 'ptr pointer exists: %d' % \
+            sr_interface.word_exists('ptr pointer')
+        sr_interface.deleteWord('ptr pointer')
+        print 'after deleteWord, ptr pointer exists: %d' % \
+            sr_interface.word_exists('ptr pointer')
+    finally:
+        sr_interface.use_vocabulary_engine(previous)
+
+add_test('word_info_cache', test_word_info_cache, 
+    desc='testing caching of vocabulary lookups in the speech engine')
+
+
+def test_vocabulary_transaction():
+    """Test batching of changes to the SR vocabulary"""
+
+    vocabulary = sr_interface.LocalVocabulary()
+    previous = sr_interface.use_vocabulary_engine(vocabulary)
+    try:
+        transaction = sr_interface.begin_vocabulary_transaction()
+        try:
+            for a_word in ['open file', 'open', 'file', 'close file', 
+                           'close', 'file', 'open file']:
+                sr_interface.addWord(a_word)
+            sr_interface.deleteWord('close file')
+            print 'changes made so far: %d' % vocabulary.num_changes
+            sr_interface.begin_vocabulary_transaction()
+            sr_interface.addWord('save file')
+            sr_interface.end_vocabulary_transaction()
+            print 'after nested transaction: %d' % vocabulary.num_changes
+            print 'open exists: %d' % sr_interface.word_exists('open')
+            print 'changes made so far: %d' % vocabulary.num_changes
+        finally:
+            sr_interface.end_vocabulary_transaction()
+        words = vocabulary.words.keys()
+        words.sort()
+        print 'vocabulary: %s' % words
+        print 'requested %d, made %d, saved %d' % \
+            (transaction.num_requested, transaction.num_applied,
+             transaction.saved_calls())
+        print 'current transaction: %s' % sr_interface.vocabulary_transaction
+
+        print '\ncompiling symbols'
+        temp_config = temp_factory.new_config()
+        symbols = temp_config.interpreter().known_symbols
+        saved = sr_interface.vocabulary_calls_saved
+        symbols.parse_symbols_from_files([small_buff_py], add_sr_entries = 1)
+        print 'changes made: %d' % vocabulary.num_changes
+        print 'changes saved: %d' % \
+            (sr_interface.vocabulary_calls_saved - saved)
+        temp_config.quit()
+    finally:
+        sr_interface.use_vocabulary_engine(previous)
+
+add_test('vocabulary_transaction', test_vocabulary_transaction, 
+    desc='testing batching of changes to the SR vocabulary')
+
+
+##############################################################################
+# Testing encoding of messages
+##############################################################################
+
+def test_binary_encoder():
+    """Test the compact binary encoding of messages"""
+
+    import messaging, struct
+    encoder = messaging.MessEncoderBinary()
+    argvals = {'updates': [{'action': 'insert', 'range': (12, 15),
+                            'buff_name': 'foo.py', 'text': 'x = 1\n'},
+                           {'action': 'pos_selection', 'pos': 18,
+                            'selection': [18, 18]}],
+               'value': None, 'flag': 1, 'big': 12345678901L, 'neg': -7,
+               'ratio': 0.5, 'title': u'caf\xe9'}
+    str_mess = encoder.encode('updates', argvals)
+    packager = messaging.MessPackager_FixedLenSeq()
+    unpacked = packager.unpack_mess(packager.pack_mess(str_mess))
+    mess_name, decoded = encoder.decode(unpacked)
+    print 'message name: %s' % mess_name
+    for a_key in sorted_keys(decoded):
+        print '%s: %s' % (a_key, repr(decoded[a_key]))
+    print 'encoded length: %d' % len(str_mess)
+    for bad in [str_mess[:-1], str_mess[:4] + 'z' + str_mess[5:]]:
+        try:
+            encoder.decode(bad)
+            print 'malformed message was decoded'
+        except messaging.MalformedMessage, err:
+            print 'malformed message: %s' % err
+
+    print '\ndecoding correctly framed messages with corrupted contents'
+    def item(tag, data):
+        return tag + struct.pack('>I', len(data)) + data
+    def message(key, value):
+        body = item('s', 'updates') + 'D' + struct.pack('>I', 1) \
+            + key + value
+        return struct.pack('>I', len(body)) + body
+    corrupted = {'invalid UTF-8': message(item('s', 'title'), 
+                                          item('u', 'caf\xe9')),
+                 'invalid long': message(item('s', 'big'), 
+                                         item('l', '12x')),
+                 'unhashable key': message('L' + struct.pack('>I', 0), 
+                                           item('s', 'value'))}
+    for a_key in sorted_keys(corrupted):
+        try:
+            encoder.decode(corrupted[a_key])
+            print '%s: malformed message was decoded' % a_key
+        except messaging.MalformedMessage:
+            print '%s: MalformedMessage' % a_key
+
+    print '\nencoding for a packaging which delimits messages'
+    framed = messaging.new_encoder('binary1', 'lenprefix')
+    packager = messaging.new_packager('lenprefix')
+    str_framed = framed.encode('updates', argvals)
+    packed = packager.pack_mess(str_framed)
+    print 'encoded length: %d, packed length: %d' % (len(str_framed), 
+        len(packed))
+    print 'decoded as before: %d' % \
+        (framed.decode(packager.unpack_mess(packed)) == (mess_name, decoded))
+    try:
+        framed.decode(str_framed[:-1])
+        print 'truncated message was decoded'
+    except messaging.MalformedMessage, err:
+        print 'truncated message: MalformedMessage'
+
+    print '\nchoosing encodings'
+    for offered in [None, [], ['binary1'], ['binary99'], 
+                    ['binary99', 'binary1']]:
+        print '%s: %s' % (offered, messaging.choose_encoding(offered))
+
+add_test('binary_encoder', test_binary_encoder, 
+    desc='testing the compact binary encoding of messages')
+
+
+def test_message_packagers():
+    """Test the packaging of messages"""
+
+    import messaging
+    for packaging in ['fixed', 'lenprefix']:
+        packager = messaging.new_packager(packaging)
+        print '\npackaging %s' % packaging
+        for length in [0, 1, 1023, 1024, 5000]:
+            mess = 'x' * length
+            packed = packager.pack_mess(mess)
+            unpacked = packager.unpack_mess(packed)
+            print 'message of %d bytes: %d packed, unpacked %s' % \
+                (length, len(packed), 
+                 unpacked.rstrip() == mess)
+
+    print '\nchoosing packagings'
+    for offered in [None, [], ['lenprefix'], ['lenprefix99']]:
+        print '%s: %s' % (offered, messaging.choose_packaging(offered))
+
+add_test('message_packagers', test_message_packagers, 
+    desc='testing the packaging of messages')
+
+
+def test_find_packed_mess():
+    """Test finding packed messages in data received incrementally"""
+
+    import messaging
+    for packaging in ['fixed', 'lenprefix']:
+        packager = messaging.new_packager(packaging)
+        print '\npackaging %s' % packaging
+        packed = []
+        for length in [5, 1500, 3000]:
+            packed.append(packager.pack_mess('x' * length))
+        data = string.join(packed, '')
+        print 'lengths: %s' % map(len, packed)
+        found = []
+        start = 0
+        for dummy in packed:
+            length = packager.find_packed_mess(data, start)
+            found.append(length)
+            start = start + length
+        print 'found in concatenated packets: %s' % found
+        for piece_len in [1, 3, 700, 1024, 5000]:
+# search each piece of the data once, the way ListenAndQueueMsgsSelect
+# does (with the start of the message until head_len bytes of it have
+# been searched)
+            found = []
+            mess_start = 0
+            searched = 0
+            length = None
+            for end in range(piece_len, len(data) + piece_len, piece_len):
+                end = min(end, len(data))
+                while 1:
+                    if length == None:
+                        piece_start = searched
+                        if searched - mess_start < packager.head_len:
+                            piece_start = mess_start
+                        length = packager.find_packed_mess(
+                            data[piece_start:end], mess_start - piece_start, 
+                            searched - piece_start)
+                        searched = end
+                    if length == None or mess_start + length > end:
+                        break
+                    found.append(length)
+                    mess_start = mess_start + length
+                    searched = mess_start
+                    length = None
+            print 'found in pieces of %d bytes: %s' % (piece_len, found)
+        for length in range(len(packed[0])):
+            if packager.find_packed_mess(packed[0][:length]) \
+                    not in [None, len(packed[0])]:
+                print 'wrong length found in truncated packet'
+
+add_test('find_packed_mess', test_find_packed_mess, 
+    desc='testing finding packed messages in data received incrementally')
+
+
+def test_select_reader():
+    """Test reading messages with ListenAndQueueMsgsSelect"""
+
+    import messaging, tcp_server, threading, Queue, StringIO
+    class FakeSocket:
+        def __init__(self, pieces):
+            self.pieces = pieces
+        def recv(self, size):
+            if not self.pieces:
+                return ''
+            piece = self.pieces[0]
+            del self.pieces[0]
+            return piece
+    class CountEvents:
+        def __init__(self):
+            self.count = 0
+        def notify(self):
+            self.count = self.count + 1
+    def reader(pieces, packaging, encoding):
+        return tcp_server.ListenAndQueueMsgsSelect(None, 
+            FakeSocket(pieces), messaging.new_packager(packaging),
+            messaging.new_encoder(encoding, packaging), Queue.Queue(-1), 
+            CountEvents(), threading.Event(), 
+            ('connection_broken', {}))
+    def read_all(a_reader):
+        results = []
+        while 1:
+            alive = a_reader.read_ready()
+            results.append(alive)
+            if not alive:
+                return results
+
+    messages = [('updates', {'value': [1, 2, 3]}),
+                ('insert', {'text': 'y' * 3000, 'range': [0, 1]}),
+                ('ok', {})]
+    for packaging in ['fixed', 'lenprefix']:
+        for encoding in ['wddx', 'binary1']:
+            packager = messaging.new_packager(packaging)
+            encoder = messaging.new_encoder(encoding, packaging)
+            data = ''
+            expected = []
+            for name, argvals in messages:
+                packed = packager.pack_mess(encoder.encode(name, argvals))
+                data = data + packed
+                expected.append(encoder.decode(packager.unpack_mess(packed)))
+            for piece_len in [1, 3, 1000, 100000]:
+                pieces = []
+                for start in range(0, len(data), piece_len):
+                    pieces.append(data[start:start + piece_len])
+                a_reader = reader(pieces, packaging, encoding)
+                read_all(a_reader)
+                received = []
+                while not a_reader.completed_msgs.empty():
+                    received.append(a_reader.completed_msgs.get())
+                print '%s, %s, pieces of %d bytes: %d messages, ' \
+                    'as expected %d, then %s, events %d' % (packaging, 
+                    encoding, piece_len, len(received) - 1, 
+                    received[:-1] == expected, received[-1][0], 
+                    a_reader.event.count)
+
+    print '\nreading messages which cannot be decoded'
+    packager = messaging.new_packager('fixed')
+    bad_data = {'not WDDX': packager.pack_mess('<wddxPacket><oops'),
+                'no message name': packager.pack_mess(
+                    messaging.new_encoder('wddx').encode('ok', {})\
+                        .replace('message_name', 'message_game'))}
+    good = packager.pack_mess(messaging.new_encoder('wddx').encode('ok', 
+        {}))
+    for a_key in sorted_keys(bad_data):
+        a_reader = reader([good + bad_data[a_key] + good], 'fixed', 'wddx')
+        saved_stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            alive = a_reader.read_ready()
+        finally:
+            sys.stderr = saved_stderr
+        received = []
+        while not a_reader.completed_msgs.empty():
+            received.append(a_reader.completed_msgs.get()[0])
+        print '%s: still reading %d, messages %s' % (a_key, alive, 
+            received)
+
+add_test('select_reader', test_select_reader, 
+    desc='testing reading messages with ListenAndQueueMsgsSelect')
+
+
+def test_wakeup_event():
+    """Test waking up threads waiting for data with a WakeupEvent"""
+
+    import messaging, select, socket, threading
+    def readable(sock):
+        return len(select.select([sock], [], [], 0)[0])
+    def is_closed(sock):
+        try:
+            sock.fileno()
+        except socket.error:
+            return 1
+        return 0
+
+    event = messaging.WakeupEvent()
+    wakeup_sock = event.wakeup_socket()
+    print 'readable before set: %d' % readable(wakeup_sock)
+    event.set()
+    print 'readable after set: %d' % readable(wakeup_sock)
+    event.clear()
+    print 'readable after clear: %d, set: %d' % (readable(wakeup_sock),
+        event.isSet())
+
+    print '\nwaiting for data'
+    one_end, other_end = messaging.connected_socket_pair()
+    transporter = messaging.MessTransporter_Socket(other_end,
+        sleeper = messaging.LightSleeper(event))
+    one_end.send('x')
+    transporter.wait_for_data()
+    print 'received: %s' % other_end.recv(1)
+    outcome = []
+    def wait_for_data(transporter = transporter, outcome = outcome):
+        try:
+            transporter.wait_for_data()
+            outcome.append('data')
+        except messaging.WokenUp:
+            outcome.append('woken up')
+    waiting = threading.Thread(target = wait_for_data)
+    waiting.setDaemon(1)
+    waiting.start()
+    event.set()
+    waiting.join(10)
+    print 'thread waiting without data: %s' % outcome
+
+    print '\nclosing the event'
+    event.close()
+    print 'wakeup socket: %s, sockets closed: %d' % (event.wakeup_socket(),
+        is_closed(wakeup_sock))
+    one_end.send('x')
+    try:
+        transporter.wait_for_data()
+        print 'waiting after close: data'
+    except messaging.WokenUp:
+        print 'waiting after close: woken up'
+    event.set()
+    print 'set after close: %d' % event.isSet()
+    one_end.close()
+    other_end.close()
+
+add_test('wakeup_event', test_wakeup_event, 
+    desc='testing waking up threads waiting for data with a WakeupEvent')
+
+
+##############################################################################
+# Testing timing of utterances
+##############################################################################
+
+def test_latency_log():
+    """Test the log of the timings of utterances"""
+
+    import latency
+    log = latency.LatencyLog(max_utterances = 2)
+    for words in ['x equals one', 'new statement', 'y equals two']:
+        print 'begin %s: %s' % (repr(words), log.begin_utterance(words))
+        print 'nested utterance begun: %s' % log.begin_utterance('nested')
+        timings = log.timed()
+        outer = timings.start('outer')
+        timings.start('inner')
+        timings.end(outer)
+        inner = timings.start('inner')
+        timings.end(inner)
+        timings.messages_sent = timings.messages_sent + 1
+        log.end_utterance()
+    print 'timing outside of an utterance: %s' % log.timed()
+
+    for timings in log.recent():
+        exported = timings.as_dict()
+        print '\nutterance #%d %s, finished %s, sent %d' % \
+            (exported['number'], repr(exported['words']),
+             exported['total'] is not None, exported['messages_sent'])
+        for a_span in exported['spans']:
+            print '%s at depth %d' % (a_span['name'], a_span['depth'])
+        stages = timings.stages()
+        for name in sorted_keys(stages):
+            print '%s ran %d times' % (name, stages[name][0])
+    print '\nlast utterance: %s' % repr(log.recent(1)[0].words)
+
+    print '\nJSON: %s' % latency.json_value({'list': [1, 2L, 0.5, None],
+        'text': 'say "hi"\n', 'tuple': (u'caf\xe9',), 3: {}})
+
+add_test('latency_log', test_latency_log, 
+    desc='testing the log of the timings of utterances')
+
+
+def test_profile_report():
+    """Test the summary of the profiles of regression tests"""
+
+    import messaging, profile, readprof
+    def encode_messages():
+        encoder = messaging.MessEncoder_LenPrefArgs()
+        for ii in range(20):
+            encoder.decode(encoder.encode('updates', {'value': 'x'}))
+    prefix = os.path.join(vc_globals.tmp, 'tmp_profile')
+    for test in ['first', 'second']:
+        profiler = profile.Profile()
+        profiler.runcall(encode_messages)
+        profiler.dump_stats('%s.%s.dat' % (prefix, test))
+    profiles, cumulative = readprof.read_all('tmp_profile', vc_globals.tmp,
+        verbose = 0)
+    summary = readprof.summarize(profiles, cumulative)
+    print 'tests: %s' % sorted_keys(summary['tests'])
+    functions = summary['functions']
+    for func in sorted_keys(functions):
+        if func.find('(decode_data_item)') >= 0:
+            subsystem, own_time, cum_time, calls = functions[func]
+            print '%s: %s, %d calls' % (func[func.find('('):], subsystem,
+                calls)
+    for file_name in ['SourceBuffCached.py', 'SourceBuffState.py',
+                      'CmdInterp.py', 'sr_interface.py', 'string.py', '~']:
+        print '%s: %s' % (file_name, readprof.subsystem(file_name))
+    summary_file = prefix + '.summary'
+    readprof.save_summary(summary, summary_file)
+    same = readprof.load_summary(summary_file) == summary
+    print 'summary saved and reloaded: %s' % same
+    for test in ['first', 'second']:
+        os.remove('%s.%s.dat' % (prefix, test))
+    os.remove(summary_file)
+
+add_test('profile_report', test_profile_report, 
+    desc='testing the summary of the profiles of regression tests')
+
+
+def test_line_index():
+    """Test the index of line starts of SB_ServiceLineManip against a
+    scan of the buffer, on random edits"""
+
+    import random
+    editor = EdSim.EdSim()
+    buffer = editor.curr_buffer()
+    lines = buffer.line_srv
+    rand = random.Random(5)
+    pieces = ['a', 'bc', ' ', '\n', '\r\n', '\r', 'de\nf']
+    checks = 0
+    mismatches = []
+    for edit in range(400):
+        text = ''
+        for ii in range(rand.randint(0, 4)):
+            text = text + rand.choice(pieces)
+        length = buffer.len()
+        start = rand.randint(0, length)
+        end = rand.randint(start, min(length, start + 3))
+        kind = rand.randint(0, 99)
+        if kind == 0:
+            buffer.set_text(text)
+        elif kind < 30:
+            buffer.delete((start, end))
+        else:
+            buffer.insert(text, (start, end))
+# don't check after every edit, so that changes accumulate between
+# checks
+        if rand.randint(0, 2):
+            continue
+        for ii in range(3):
+            checks = checks + 1
+            pos = rand.randint(0, buffer.len())
+# positions between the \r and the \n of a newline are not valid
+# cursor positions, and the scan doesn't find their line
+            if buffer.get_text(pos - 1, pos + 1) == '\r\n':
+                pos = pos + 1
+            found = (lines.line_num_of(pos), lines.beginning_of_line(pos))
+            expected = (lines.line_num_of_scan(pos),
+                lines.beginning_of_line_scan(pos))
+            if found != expected:
+                mismatches.append((edit, 'position', pos, found, expected))
+            line_num = rand.randint(0, lines.line_num_of_scan(buffer.len()) + 1)
+            where = rand.choice([-1, 1])
+            lines.goto_line(line_num, where)
+            found = buffer.cur_pos()
+            lines.goto_line_scan(line_num, where)
+            expected = buffer.cur_pos()
+            if found != expected:
+                mismatches.append((edit, 'goto_line', (line_num, where),
+                    found, expected))
+    print 'checked %d positions and lines, in %d lines' % (checks, 
+        lines.line_num_of(buffer.len()))
+    print '%d mismatches' % len(mismatches)
+    for mismatch in mismatches[:10]:
+        print 'after edit %d, %s %s: found %s, expected %s' % mismatch
+
+    print '\nchanging the contents without reporting the change'
+    buffer.set_text('first line\nsecond line\n')
+    print 'line of position 15: %d' % lines.line_num_of(15)
+# a buffer which isn't told about all changes has no generation (see 
+# SourceBuffTB)
+    buffer.contents_generation = None
+    buffer.content = 'first line second line\n'
+    print 'line of position 15: %d (scan: %d)' % (lines.line_num_of(15),
+        lines.line_num_of_scan(15))
+
+add_test('line_index', test_line_index, 
+    desc='testing the index of line starts of SB_ServiceLineManip')
+
+
+def test_text_store():
+    """Test the rope text store against the string text store, on random
+    edits"""
+
+    import random, TextStore
+    rand = random.Random(7)
+    old_leaf_length = TextStore.leaf_length
+# use short leaves, so that the ropes are deep
+    TextStore.leaf_length = 8
+    try:
+        initial = 'class Foo:\n    def bar(self):\n        pass\n' * 3
+        rope = TextStore.RopeTextStore(initial)
+        string_store = TextStore.StringTextStore(initial)
+        snapshot = (rope, initial)
+        pieces = ['x', 'yz', '\n', 'def f(a, b):\n    return a + b\n', '']
+        mismatches = []
+        max_depth = 0
+        for edit in range(500):
+            length = string_store.len()
+            start = rand.randint(0, length)
+            end = rand.randint(start, min(length, start + 20))
+            text = rand.choice(pieces)
+            rope = rope.replace(start, end, text)
+            string_store = string_store.replace(start, end, text)
+            if edit == 250:
+                snapshot = (rope, string_store.text())
+            start = rand.randint(-5, string_store.len() + 5)
+            end = rand.randint(-5, string_store.len() + 5)
+            found = (rope.len(), rope.text(start, end), rope.text(start),
+                rope.text(end = end))
+            expected = (string_store.len(), string_store.text(start, end),
+                string_store.text(start), string_store.text(end = end))
+            if found != expected:
+                mismatches.append((edit, start, end))
+            max_depth = max(max_depth, TextStore._depth(rope.rope))
+        print '%d mismatches' % len(mismatches)
+        for mismatch in mismatches[:10]:
+            print 'after edit %d, text(%d, %d) differs' % mismatch
+        print 'whole text equal: %s' % (rope.text() == string_store.text())
+        print 'snapshot unchanged: %s' % (snapshot[0].text() == snapshot[1])
+        leaves = rope.len() / TextStore.leaf_length + 1
+        bound = 2
+        while 2 ** (bound - 2) < leaves:
+            bound = bound + 1
+        print 'rope balanced: %s' % (max_depth <= 2 * bound)
+    finally:
+        TextStore.leaf_length = old_leaf_length
+
+add_test('text_store', test_text_store, 
+    desc='testing the rope and string text stores of SourceBuffCached')
+
+
+def test_buffer_snapshots():
+    """Test that the buffer states stored by BufferStatesBasic share the
+    contents of unchanged buffers"""
+
+    import ResMgr
+    editor = EdSim.EdSim(multiple = 1)
+    editor.open_file('first.py')
+    editor.insert('first buffer\n')
+    editor.open_file('second.py')
+    editor.insert('second buffer\n')
+    first = editor.find_buff('first.py')
+    second = editor.find_buff('second.py')
+    before = ResMgr.BufferStatesBasic(editor)
+    unchanged = ResMgr.BufferStatesBasic(editor)
+    print 'same cookies when nothing changed: %d' % \
+        (before.cookie('first.py') is unchanged.cookie('first.py') and
+         before.cookie('second.py') is unchanged.cookie('second.py'))
+    second.goto(0)
+    moved = ResMgr.BufferStatesBasic(editor)
+    print 'contents shared when only the cursor moved: %d' % \
+        (moved.cookie('second.py') is not before.cookie('second.py') and
+         moved.cookie('second.py').contents() is \
+         before.cookie('second.py').contents())
+    print 'same contents as before: %d' % \
+        before.compare_with_current(editor)
+    print 'same contents and selection as before: %d' % \
+        before.compare_with_current(editor, selection = 1)
+    second.insert('more ')
+    after = ResMgr.BufferStatesBasic(editor)
+    print 'first buffer shared after change to second: %d' % \
+        (after.cookie('first.py') is before.cookie('first.py'))
+    print 'changed buffers: %s' % before.changed_buffers(editor)
+    second.delete((0, len('more ')))
+    print 'changed buffers after undoing the change by hand: %s' % \
+        before.changed_buffers(editor)
+    editor.close_buffer('first.py', save = -1)
+    editor.open_file('first.py')
+    editor.insert('first buffer\n')
+    print 'reopened buffer compares by contents: %d' % \
+        before.compare_with_current(editor)
+    editor.find_buff('first.py').insert('x')
+    print 'changed buffers after editing reopened buffer: %s' % \
+        before.changed_buffers(editor)
+    for states in [before, unchanged, moved, after]:
+        states.cleanup()
+    editor.cleanup()
+
+add_test('buffer_snapshots', test_buffer_snapshots, 
+    desc='testing the sharing of contents between buffer states')
+
+
+def test_buffer_generations():
+    """Test the generations of the contents of buffers, and their use
+    to avoid comparing the states of unchanged buffers"""
+
+    import ResMgr
+    editor = EdSim.EdSim(multiple = 1)
+    editor.open_file('first.py')
+    editor.insert('first buffer\n')
+    editor.open_file('second.py')
+    editor.insert('second buffer\n')
+    first = editor.find_buff('first.py')
+    second = editor.find_buff('second.py')
+    generation = second.generation()
+    second.goto(0)
+    print 'changed after moving the cursor: %d' % \
+        second.changed_since(generation)
+    second.delete((3, 3))
+    second.insert('', (3, 3))
+    print 'changed after empty changes: %d' % \
+        second.changed_since(generation)
+    second.insert('x', (3, 3))
+    second.delete((3, 4))
+    print 'changed after insert and delete: %d' % \
+        second.changed_since(generation)
+    print 'changed since unknown generation: %d' % \
+        second.changed_since(None)
+    print 'generations unique across buffers: %d' % \
+        (first.generation() != second.generation())
+
+# count the comparisons of the contents of buffers
+    buffer_class = second.__class__
+    compare = buffer_class.compare_with_current
+    compared = []
+    def counting(buffer, cookie, selection = 0, compare = compare,
+                 compared = compared):
+        compared.append(buffer.name())
+        return compare(buffer, cookie, selection = selection)
+    buffer_class.compare_with_current = counting
+    try:
+        states = ResMgr.BufferStatesBasic(editor)
+        print 'same as stored state: %d' % \
+            states.compare_with_current(editor)
+        print 'same selection as stored state: %d' % \
+            states.compare_with_current(editor, selection = 1)
+        print 'contents compared for %d buffers' % len(compared)
+        second.insert('y')
+        print 'changed buffers: %s' % states.changed_buffers(editor, 
+            selection = 1)
+        print 'contents compared for %s' % compared
+    finally:
+        buffer_class.compare_with_current = compare
+    states.cleanup()
+    editor.cleanup()
+
+add_test('buffer_generations', test_buffer_generations, 
+    desc='testing the generations of the contents of buffers')
+
+
+class ListLeakyStack:
+    """the original implementation of IndexedLeakyStack, with a list,
+    used by test_leaky_stacks to check the ring buffer implementation"""
+    def __init__(self, max_height = None):
+        self.max_height = max_height
+        self.dropped = 0
+        self.stack = []
+    def push(self, item):
+        self.stack.append(item)
+        if not (self.max_height is None) and len(self.stack) > self.max_height:
+            dropping = self.stack[0]
+            del self.stack[0]
+            self.dropped = self.dropped + 1
+            return dropping
+    def height(self):
+        return len(self.stack) + self.dropped
+    def empty(self):
+        return len(self.stack) == 0
+    def pop(self):
+        return self.stack.pop()
+    def items(self):
+        return self.stack[:]
+    def lowest(self):
+        return self.dropped
+    def drop_below(self, index):
+        to_drop = index - self.dropped
+        if to_drop > 0:
+            del self.stack[0:to_drop]
+            self.dropped = self.dropped + to_drop
+            return to_drop
+        return 0
+    def peek(self, index):
+        current = index - self.dropped
+        if current < 0:
+            raise IndexError()
+        else:
+            return self.stack[current]
+
+def test_leaky_stacks():
+    """Test the ring buffer implementation of the leaky stacks against
+    the original one, on random operations, and the search of the
+    cookie jar of SourceBuffWithDiffs against a scan"""
+
+    import random
+    import LeakyStack, SourceBuffWithDiffs
+    rand = random.Random(11)
+
+    def outcome(method, *args):
+        try:
+            return apply(method, args)
+        except IndexError:
+            return 'IndexError'
+        except KeyError:
+            return 'KeyError'
+
+    mismatches = []
+    operations = 0
+    for max_height in [None, 0, 1, 3, 20]:
+        stacks = []
+        for ii in range(3):
+            stack = LeakyStack.IndexedLeakyStack(max_height = max_height)
+            reference = ListLeakyStack(max_height = max_height)
+            stacks.append((stack, reference))
+        keyed = LeakyStack.KeyedLeakyStack(LeakyStack.KeyGeneratorSequential(),
+            max_height = max_height)
+        keyed_reference = LeakyStack.KeyedLeakyStack(
+            LeakyStack.KeyGeneratorSequential(), max_height = max_height)
+        keyed_reference.stack = ListLeakyStack(max_height = max_height)
+        keyed_reference.key_stack = ListLeakyStack(max_height = max_height)
+        stacks.append((keyed, keyed_reference))
+        for step in range(2000):
+            operations = operations + 1
+            stack, reference = rand.choice(stacks)
+            kind = rand.randint(0, 9)
+            height = reference.height()
+            index = rand.randint(reference.lowest() - 2, height + 2)
+            if kind < 5:
+                results = (outcome(stack.push, step), 
+                    outcome(reference.push, step))
+            elif kind < 7:
+                results = (outcome(stack.pop), outcome(reference.pop))
+            elif kind == 7:
+                index = rand.randint(reference.lowest() - 1, height + 1)
+                results = (outcome(stack.drop_below, index), 
+                    outcome(reference.drop_below, index))
+            elif kind == 8 and stack is keyed:
+                key = rand.randint(0, step)
+                results = (outcome(stack.peek_by_key, key), 
+                    outcome(reference.peek_by_key, key))
+            else:
+                results = (outcome(stack.peek, index), 
+                    outcome(reference.peek, index))
+            state = (stack.height(), stack.lowest())
+            reference_state = (reference.height(), reference.lowest())
+            if stack is not keyed:
+                state = state + (stack.empty(), stack.items())
+                reference_state = reference_state + (reference.empty(),
+                    reference.items())
+            if results[0] != results[1] or state != reference_state:
+                mismatches.append((max_height, step, kind, results, state,
+                    reference_state))
+    print '%d operations, %d mismatches' % (operations, len(mismatches))
+    for mismatch in mismatches[:10]:
+        print 'max_height %s, step %d, operation %d: results %s, state %s, expected %s' % mismatch
+
+    buffer = SourceBuffWithDiffs.SourceBuffWithDiffs(app = None, 
+        buff_name = 'leaky.py', max_cookies = 10)
+# a short change history, so that changes (and cookies) are dropped
+    buffer.change_history = LeakyStack.IndexedLeakyStack(max_height = 15)
+    searches = 0
+    mismatches = []
+    for step in range(1000):
+        kind = rand.randint(0, 9)
+        if kind < 3:
+            buffer.push_cookie(SourceBuffWithDiffs.CookieData(
+                buffer.change_history.height(), (0, 0)))
+        elif kind < 9:
+# alternate between distant ranges, so that the changes aren't merged
+            start = (step % 2) * 10
+            buffer._push_change(SourceBuffWithDiffs.ReverseBufferChange('x',
+                (start, start + 1)))
+        elif buffer.cookie_jar.height() > buffer.cookie_jar.lowest():
+# undo like restore_state: pop cookies, then changes
+            index = rand.randint(buffer.cookie_jar.lowest(), 
+                buffer.cookie_jar.height() - 1)
+            level = buffer.cookie_jar.peek(index).level
+            while buffer.cookie_jar.height() > index:
+                buffer.cookie_jar.pop()
+            while buffer.change_history.height() > level:
+                buffer.change_history.pop()
+        top = buffer.change_history.height()
+        for level in range(max(top - 20, 0), top + 2):
+            searches = searches + 1
+            found = buffer._first_cookie_above(level)
+            expected = buffer._first_cookie_above_scan(level)
+            if found != expected:
+                mismatches.append((step, level, found, expected))
+    print '%d searches of the cookie jar, %d mismatches' % (searches,
+        len(mismatches))
+    for mismatch in mismatches[:10]:
+        print 'step %d, level %d: found %d, expected %d' % mismatch
+
+add_test('leaky_stacks', test_leaky_stacks, 
+    desc='testing the ring buffer implementation of the leaky stacks')
+
+def test_coalesced_changes():
+    """Test that contiguous changes are merged in the change history of
+    SourceBuffWithDiffs, without merging changes across cookies, by
+    undoing the merged changes on random edits and comparing with the
+    text at the time each cookie was stored"""
+
+    import random
+    import SourceBuffWithDiffs
+    rand = random.Random(5)
+    buffer = SourceBuffWithDiffs.SourceBuffWithDiffs(app = None, 
+        buff_name = 'coalesce.py')
+    text = 'def area(self):\n    return self.width * self.height\n'
+    snapshots = [(0, text)]
+    pos = 0
+    changes = 0
+    for step in range(3000):
+        kind = rand.randint(0, 99)
+        if kind < 3:
+            buffer.push_cookie(SourceBuffWithDiffs.CookieData(
+                buffer.change_history.height(), (pos, pos)))
+            snapshots.append((buffer.change_history.height(), text))
+            continue
+        if kind < 8:
+            pos = rand.randint(0, len(text))
+            continue
+        if kind < 70:
+            start, end, new_text = pos, pos, rand.choice('abc_ (\n')
+        elif kind < 85:
+            start, end, new_text = max(pos - 1, 0), pos, ''
+        elif kind < 92:
+            start, end, new_text = pos, min(pos + 3, len(text)), ''
+        else:
+            start = rand.randint(0, len(text))
+            end = min(start + rand.randint(0, 10), len(text))
+            new_text = 'self.x'
+        if text[start:end] == new_text:
+            continue
+        buffer._push_change(SourceBuffWithDiffs.ReverseBufferChange(
+            text[start:end], (start, start + len(new_text))))
+        changes = changes + 1
+        text = text[:start] + new_text + text[end:]
+        pos = start + len(new_text)
+
+    print '%d changes, %d entries in the change history' % (changes,
+        buffer.change_history.height())
+    mismatches = 0
+    checked = 0
+    for level, expected in snapshots:
+# the changes before the oldest cookies have been dropped
+        if level < buffer.change_history.lowest():
+            continue
+        checked = checked + 1
+        restored = text
+        for index in range(buffer.change_history.height() - 1, level - 1, -1):
+            change = buffer.change_history.peek(index)
+            start, end = change.range
+            restored = restored[:start] + change.old_text + restored[end:]
+        if restored != expected:
+            mismatches = mismatches + 1
+    print '%d cookies, %d restored with the wrong text' % (checked,
+        mismatches)
+
+add_test('coalesced_changes', test_coalesced_changes, 
+    desc='testing the merging of contiguous changes in the change history')
+
+
 
 ##############################################################################
 # Testing redundant translation of LSAs and symbols
@@ -63,6 +63,21 @@ symbol_files.append(C_Cpp_std_sym)
 
 standard_symbols_in(symbol_files)
 
+#
+# Uncomment this to extract symbols from the standard symbol files in
+# several worker processes, which speeds up scanning of large numbers of
+# files on multi-processor machines
+#
+# harvest_symbols_in_parallel(4)
+
+#
+# Maximum number of spoken forms generated for each symbol (symbols
+# made of many abbreviations with several expansions each can have
+# hundreds).  Only the forms using the preferred expansions are kept.
+# Use 0 for no limit.
+#
+# max_spoken_forms_per_symbol(32)
+
 ###################################################################
 # Standard abbreviations:
 #
@@ -51,7 +51,7 @@ class ForwardToBuffer:
         self.application = application
         self.method = method
     def __call__(self, *positional, **keys):
-        debug.trace('ForwardToBuffer.__call__', 'positional=%s, keys=%s' % (positional, keys))
+        debug.trace('ForwardToBuffer.__call__', 'positional=%s, keys=%s', positional, keys)
         buff_name = None
         if keys.has_key("buff_name"):
             buff_name = keys["buff_name"]
@@ -111,8 +111,7 @@ def create_update(upd_descr):
     upd_class = use_update_class(upd_descr['action'])
     upd_object = upd_class(descr=upd_descr)
     debug.trace('AppState.create_update', 
-        '%s with attributes %s' % (upd_class.__name__, 
-        repr(upd_object.__dict__)))
+        '%s with attributes %r', upd_class.__name__, upd_object.__dict__)
     return upd_object
 
 
@@ -903,7 +902,7 @@ class AppState(OwnerObject):
 
         *none*
         """
-        debug.trace('AppState.on_change', 'self.change_callback=%s' % self.change_callback)
+        debug.trace('AppState.on_change', 'self.change_callback=%s', self.change_callback)
         if self.change_callback:
             buff = self.find_buff(buff_name)
             if buff:
@@ -1087,7 +1086,7 @@ class AppState(OwnerObject):
             self.process_pending_updates()
             updates = self.updates_from_app(what, exclude)
             debug.trace('AppState.synchronize_with_app', 
-                'received updates:\n%s\n' % repr(updates))
+                'received updates:\n%r\n', updates)
         self.apply_updates(updates)
 
 
@@ -1187,10 +1186,10 @@ class AppState(OwnerObject):
         # If not, use the editor's active buffer.
         #
         buff_name = self.is_bound_to_buffer()
-        debug.trace('AppState.curr_buffer_name', 'bound buffer is %s' % buff_name)
+        debug.trace('AppState.curr_buffer_name', 'bound buffer is %s', buff_name)
         if buff_name == None:
             buff_name = self.app_active_buffer_name()
-            debug.trace('AppState.curr_buffer_name', 'app buffer is %s' % buff_name)
+            debug.trace('AppState.curr_buffer_name', 'app buffer is %s', buff_name)
 
         return buff_name
 
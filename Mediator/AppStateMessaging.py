@@ -312,19 +312,19 @@ class AppStateMessaging(AppStateCached.AppStateCached):
         if mess == None:
             return 0
         debug.trace('AppStateMessaging.listen_one_transaction', 
-            'heard %s' % repr(mess))
+            'heard %r', mess)
         mess_name = mess[0]
         debug.trace('AppStateMessaging.listen_one_transaction', 
-            'heard "%s"' % mess_name)
+            'heard "%s"', mess_name)
         if mess_name == 'updates':
             debug.trace('AppStateMessaging.listen_one_transaction', 
                 'was updates')
             mess_cont = mess[1]
             debug.trace('AppStateMessaging.listen_one_transaction', 
-                'content was %s' % mess_cont)
+                'content was %s', mess_cont)
             upd_list = mess_cont['value']
             debug.trace('AppStateMessaging.listen_one_transaction', 
-                'updates %s' % str(upd_list))
+                'updates %s', str(upd_list))
             self.apply_updates(upd_list)
             return 1
         elif mess_name == 'suspended':
@@ -421,12 +421,12 @@ class AppStateMessaging(AppStateCached.AppStateCached):
 
         ..[AS_Update] file:///./AppState.AS_Update.html"""
 
-        debug.trace('AppStateMessaging.apply_upd_descr', 'upd_descr_list=%s' % repr(upd_descr_list))
+        debug.trace('AppStateMessaging.apply_upd_descr', 'upd_descr_list=%r', upd_descr_list)
         updates = []
         for a_descr in upd_descr_list:
             the_update = AppState.create_update(a_descr)
             updates.append(the_update)
-            debug.trace('AppStateMessaging.apply_upd_descr', 'the_update=%s' % repr(the_update))
+            debug.trace('AppStateMessaging.apply_upd_descr', 'the_update=%r', the_update)
             the_update.apply(self)
         return updates
 
@@ -23,7 +23,7 @@ import os, re, string, sys
 import copy
 import debug
 
-import actions_gen, auto_test, vc_globals
+import actions_gen, auto_test, latency, vc_globals
 from debug import trace, config_warning, trace_is_active
 from actions_C_Cpp import *
 from actions_py import *
@@ -981,7 +981,7 @@ class UtteranceInterpretation(Object):
         by the speech engine
         """
         spoken_words = map(lambda x: x[0], self.utterance.words())
-        debug.trace('UtteranceInterpretation.phrase', '** returning %s' % spoken_words)
+        debug.trace('UtteranceInterpretation.phrase', '** returning %s', spoken_words)
         return spoken_words
         
     def phrase_as_string(self):
@@ -1080,7 +1080,7 @@ class SymbolConstruction(Object):
             word_element = self.interp.make_word_element(word)
             word_element.add_to(self.builder)
         debug.trace('SymbolConstruction.add_symbol',
-              'allow_inexact = %d' % self.allow_inexact)
+              'allow_inexact = %d', self.allow_inexact)
             
     def add_word(self, word):
         """
@@ -1102,7 +1102,7 @@ class SymbolConstruction(Object):
         word_element = self.interp.make_word_element(word)
         word_element.add_to(self.builder)
         trace('SymbolConstruction.add_word',
-              'allow_inexact = %d' % self.allow_inexact)
+              'allow_inexact = %d', self.allow_inexact)
 
     def add_alias(self, alias, spoken_form):
         """
@@ -1120,7 +1120,7 @@ class SymbolConstruction(Object):
         """
         self.exact_symbol = 0
         trace('SymbolConstruction.add_alias',
-              'allow_inexact = %d' % self.allow_inexact)
+              'allow_inexact = %d', self.allow_inexact)
         if self.builder is None:
             self.new_builder()
         written = alias.written()
@@ -1129,8 +1129,8 @@ class SymbolConstruction(Object):
             if not written.isalnum():
                 self.allow_inexact = 0
         trace('SymbolConstruction.add_alias',
-              'written = %s, now allow_inexact = %d' % \
-              (written, self.allow_inexact))
+              'written = %s, now allow_inexact = %d',
+              written, self.allow_inexact)
         element = alias.make_element(spoken_form)
         element.add_to(self.builder)
 
@@ -1149,7 +1149,7 @@ class SymbolConstruction(Object):
         self.exact_symbol = 0
         self.allow_inexact = 1
         trace('SymbolConstruction.reset',
-              'allow_inexact = %d' % self.allow_inexact)
+              'allow_inexact = %d', self.allow_inexact)
 
     def words(self):
         """
@@ -1194,7 +1194,8 @@ class SymbolConstruction(Object):
         *none*
         """
         debug.trace('SymbolConstruction.insert_existing_symbol',
-            'exact_matches=%s, symbol = %s, found_in_utter=%s' % (exact_matches, symbol, found_in_utter))
+            'exact_matches=%s, symbol = %s, found_in_utter=%s',
+            exact_matches, symbol, found_in_utter)
             
         insertion = actions_gen.ActionInsert(code_bef=symbol, code_after='')
         block, dummy = insertion.log_execute(self.app, None, None)
@@ -1237,7 +1238,8 @@ class SymbolConstruction(Object):
         *STR* -- the written form of the new symbol
         """
         debug.trace('SymbolConstruction.insert_new_symbol',
-            'exact_matches=%s, interp_phrase = %s' % (exact_matches, interp_phrase))
+            'exact_matches=%s, interp_phrase = %s',
+            exact_matches, interp_phrase)
         symbol = self.builder.finish()
         insertion = actions_gen.ActionInsert(code_bef=symbol, code_after='')
         block, dummy = insertion.log_execute(self.app, None, None)
@@ -1307,7 +1309,7 @@ class CmdInterp(OwnerObject):
     
     def __init__(self, sym_file = None,
                  disable_dlg_select_symbol_matches = None, mediator =
-                 None, **attrs):
+                 None, export_file = None, **attrs):
         
         """
         **INPUTS**
@@ -1316,6 +1318,10 @@ class CmdInterp(OwnerObject):
         reading/writing the symbol dictionary. If *None*, then don't
         read/write the symbol dictionary from/to file.
 
+        *STR export_file = None* -- name of the file to which the
+        symbol dictionary exports abbreviation preferences (see
+        [SymDict]), or *None* for the default
+
         *BOOL disable_dlg_select_symbol_matches = None* -- If true, then
         do not prompt the user for confirmation of new symbols.
 
@@ -1340,7 +1346,8 @@ class CmdInterp(OwnerObject):
         self.name_parent('mediator')
         self.add_owned('known_symbols')
         self.add_owned('state_interface')
-        self.known_symbols = SymDict.SymDict(sym_file = sym_file, interp = self)
+        self.known_symbols = SymDict.SymDict(sym_file = sym_file, 
+            export_file = export_file, interp = self)
         self.styling_state = SymStyling(self.builder_factory)
         self.state_interface = InterpState(self.styling_state)
                 
@@ -1436,7 +1443,7 @@ class CmdInterp(OwnerObject):
               for cmd_dict in  self.commands.items():
                  if cmd_dict[1].generate_discrete_cmd:
                     spoken_form = string.join(cmd_dict[0])
-                    debug.trace("CmdInterp.gram_spec_spoken_cmd", "** adding %s" % spoken_form)
+                    debug.trace("CmdInterp.gram_spec_spoken_cmd", "** adding %s", spoken_form)
                     known_spoken_forms[spoken_form] = 1
  
 # For now, never add LSAs... later, allow adding discrete commands for LSAs where
@@ -1547,6 +1554,7 @@ class CmdInterp(OwnerObject):
         *BOOL clear_state* -- if true, clear formatting and spacing
         *states before interpreting the utterance
         """
+        span = latency.start('CmdInterp.interpret_utterance')
         interp_phrase = UtteranceInterpretation(utterance)
         phrase_str = utterance.normalized_spoken_phrase()           
 
@@ -1567,7 +1575,7 @@ class CmdInterp(OwnerObject):
 
         while len(phrase_str) > 0:
             trace('CmdInterp.interpret_utterance', 
-                'now, phrase_str = %s' % phrase_str)
+                'now, phrase_str = %s', phrase_str)
                 
             #
             # Identify leading CSC, LSA, symbol and ordinary word
@@ -1597,9 +1605,10 @@ class CmdInterp(OwnerObject):
             most_definite = max((LSA_consumes, symbol_consumes, word_consumes))
 
             trace('CmdInterp.interpret_utterance', 
-            'possible_CSCs=%s, chopped_LSA=%s, LSA_consumes=%s, chopped_symbol=%s, symbol_consumes=%s, chopped_word=%s, word_consumes=%s' % (possible_CSCs, chopped_LSA, LSA_consumes, chopped_symbol, symbol_consumes, chopped_word, word_consumes))
+            'possible_CSCs=%s, chopped_LSA=%s, LSA_consumes=%s, chopped_symbol=%s, symbol_consumes=%s, chopped_word=%s, word_consumes=%s',
+            possible_CSCs, chopped_LSA, LSA_consumes, chopped_symbol, symbol_consumes, chopped_word, word_consumes)
             trace('CmdInterp.interpret_utterance', 
-                'most_definite = %d' % most_definite)
+                'most_definite = %d', most_definite)
             head_was_translated = 0
 
             #
@@ -1633,7 +1642,7 @@ class CmdInterp(OwnerObject):
                 # LSA consumed the most words from command. Insert it.
                 #
                 trace('CmdInterp.interpret_utterance',
-                      'processing leading LSA=\'%s\'' % chopped_LSA)
+                      'processing leading LSA=\'%s\'', chopped_LSA)
                 
                 preceding_symbol = not symbols.empty()
                 if not chopped_LSA.interp_now(preceding_symbol):
@@ -1663,7 +1672,7 @@ class CmdInterp(OwnerObject):
                 #       SomeprefixSomeClass or SomeClassSomepostfix.
                 #
                 trace('CmdInterp.interpret_utterance',
-                      'processing leading symbol=\'%s\'' % chopped_symbol)
+                      'processing leading symbol=\'%s\'', chopped_symbol)
                 symbols.add_symbol(chopped_symbol)
 
                 phrase_str = phrase_str[symbol_consumes:]
@@ -1677,7 +1686,7 @@ class CmdInterp(OwnerObject):
                 # it as untranslated text.
                 #                 
                 trace('CmdInterp.interpret_utterance',
-                      'processing leading word=\'%s\'' % chopped_word)
+                      'processing leading word=\'%s\'', chopped_word)
                 symbols.add_word(chopped_word)
 
                 phrase_str = phrase_str[word_consumes:]
@@ -1702,7 +1711,8 @@ class CmdInterp(OwnerObject):
             if trace_is_active('CmdInterp.interpret_utterance'):
                 untranslated_text = string.join(symbols.words())
                 trace('CmdInterp.interpret_utterance',
-                      'End of *while* iteration. untranslated_text=\'%s\', app.curr_buffer().cur_pos=%s' % (untranslated_text, app.curr_buffer().cur_pos()))
+                      'End of *while* iteration. untranslated_text=\'%s\', app.curr_buffer().cur_pos=%s',
+                      untranslated_text, app.curr_buffer().cur_pos())
 
         interp_phrase.symbol_results = symbols.inserted_symbols()
         # make sure to unbind the buffer before returning
@@ -1711,7 +1721,15 @@ class CmdInterp(OwnerObject):
         #
         # Notify external editor of the end of recognition
         #
+        end_span = latency.start('AppState.recog_end')
         app.recog_end()
+        latency.end(end_span)
+
+        #
+        # Record any symbols or abbreviations added by this utterance
+        #
+        self.known_symbols.flush_journal()
+        latency.end(span)
         return interp_phrase
 
     def apply_CSC(self, app, possible_CSCs, spoken_list,
@@ -1748,7 +1766,7 @@ class CmdInterp(OwnerObject):
         for match in possible_CSCs:
             meanings, CSC_consumes = match
             trace('CmdInterp.apply_CSC', 
-                'possible CSC %s, consumes %d' % (meanings, CSC_consumes))
+                'possible CSC %s, consumes %d', meanings, CSC_consumes)
             if CSC_consumes < most_definite:
 # LSA or symbol consumes more than the rest of the CSCs, so defer to
 # them
@@ -1758,7 +1776,7 @@ class CmdInterp(OwnerObject):
                 continue
             context, action = applicable[0]
             trace('CmdInterp.apply_CSC', 
-                'applicable = %s' % repr(applicable))
+                'applicable = %r', applicable)
             if len(applicable) > 1:
                 msg = 'Configuration Warning: phrase %s\n' \
                     % spoken_list[:CSC_consumes]
@@ -1847,21 +1865,32 @@ class CmdInterp(OwnerObject):
         
         *none* -- 
         """
+        span = latency.start('CmdInterp.match_untranslated_text')
+        try:
+            self._match_untranslated_text(symbols, app, interp_phrase)
+        finally:
+            latency.end(span)
+
+    def _match_untranslated_text(self, symbols, app, interp_phrase):
+        """private method which does the work of 
+        [match_untranslated_text].
+
+        .. [match_untranslated_text] file:///./CmdInterp.CmdInterp.html#match_untranslated_text"""
         utterance = interp_phrase.utterance
         phrase = map(SpokenUtterance.remove_periods_from_initials, symbols.words())
         untranslated_text = string.join(phrase)
         spoken_form = untranslated_text
         trace('CmdInterp.match_untranslated_text',
-              'untranslated_text="%s"' % untranslated_text)
+              'untranslated_text="%s"', untranslated_text)
         trace('CmdInterp.match_untranslated_text',
-              'phrase = %s' % phrase)
+              'phrase = %s', phrase)
         complete_match = self.known_symbols.complete_match(phrase)        
-        trace('CmdInterp.match_untranslated_text', 'complete_match=%s' % complete_match)
+        trace('CmdInterp.match_untranslated_text', 'complete_match=%s', complete_match)
         if symbols.exact_symbol and \
                not self.builder_factory.manually_specified():
             trace('CmdInterp.match_untranslated_text', 
-                'exact symbol spoken "%s"' % (spoken_form))
-            trace('CmdInterp.match_untranslated_text', 'complete_match=%s' % complete_match)
+                'exact symbol spoken "%s"', (spoken_form))
+            trace('CmdInterp.match_untranslated_text', 'complete_match=%s', complete_match)
             if len(complete_match) > 0:
                 written_symbol = self.choose_best_symbol(spoken_form, 
                     complete_match)
@@ -1897,21 +1926,22 @@ class CmdInterp(OwnerObject):
         inexact_matches = None
         forbidden = None
         trace('CmdInterp.match_untranslated_text',
-              'allow_inexact, manual = %d, %d' % (symbols.allow_inexact,
-              self.builder_factory.manually_specified()))
+              'allow_inexact, manual = %d, %d',
+              symbols.allow_inexact, self.builder_factory.manually_specified())
         if symbols.allow_inexact and \
                 not self.builder_factory.manually_specified():
             symbol_matches, weak_matches, forbidden = \
                 self.match_pseudo_symbol(untranslated_text)
             trace('CmdInterp.match_untranslated_text',
-                  'symbol_matches=%s' % symbol_matches)
+                  'symbol_matches=%s', symbol_matches)
             symbol_matches = self.adjust_match_scores(symbol_matches)
             weak_matches = self.adjust_match_scores(weak_matches)
             forbidden = self.adjust_match_scores(forbidden)
             inexact_matches = symbol_matches[:] + weak_matches
 
         trace('CmdInterp.match_untranslated_text',
-              'symbol_matches=%s, inexact_matches=%s, forbidden=%s' % (symbol_matches, inexact_matches, forbidden))
+              'symbol_matches=%s, inexact_matches=%s, forbidden=%s',
+              symbol_matches, inexact_matches, forbidden)
         if symbol_matches:
             symbols.insert_existing_symbol(symbol_matches[0][1], interp_phrase,
                                     exact_matches = complete_match,
@@ -2085,9 +2115,9 @@ class CmdInterp(OwnerObject):
 
         *SymWord* -- the new symbol element
         """
-        trace('CmdInterp.make_word_element', 'word = %s' % repr(word))
+        trace('CmdInterp.make_word_element', 'word = %r', word)
         abbreviations = self.known_symbols.preferred_abbreviations(word)
-        trace('CmdInterp.make_word_element', 'abbreviations = %s' % repr(abbreviations))
+        trace('CmdInterp.make_word_element', 'abbreviations = %r', abbreviations)
         return SymWord(abbreviations[0], original = word)
 
     def enable_symbol_match_dlg(self, enable = 1):
@@ -2123,7 +2153,7 @@ class CmdInterp(OwnerObject):
         .. [SymbolMatch] file:///./SymDict.SymbolMatch.html"""
         
 
-        trace('CmdInterp.dlg_select_symbol_match', 'self.disable_dlg_select_symbol_matches=%s' % self.disable_dlg_select_symbol_matches)
+        trace('CmdInterp.dlg_select_symbol_match', 'self.disable_dlg_select_symbol_matches=%s', self.disable_dlg_select_symbol_matches)
 
         if self.disable_dlg_select_symbol_matches:
             choice_index = 0
@@ -2145,7 +2175,7 @@ class CmdInterp(OwnerObject):
                 if not answer_match:
                     trace('CmdInterp.dlg_select_symbol_match', 'no match')
                 else:
-                    trace('CmdInterp.dlg_select_symbol_match', 'answer=%s, answer_match=%s, answer_match.groups()=%s' % (answer, answer_match, answer_match.groups()))
+                    trace('CmdInterp.dlg_select_symbol_match', 'answer=%s, answer_match=%s, answer_match.groups()=%s', answer, answer_match, answer_match.groups())
                     choice_index = int(answer_match.group(1)) - 1
                     if choice_index < len(symbol_matches) and choice_index >= -1:
                         good_answer = 1
@@ -2155,7 +2185,7 @@ class CmdInterp(OwnerObject):
         #
         # Accept the match
         #
-        trace('CmdInterp.dlg_select_symbol_match', 'choice_index=%s' % choice_index)
+        trace('CmdInterp.dlg_select_symbol_match', 'choice_index=%s', choice_index)
 #        print '-- CmdInterp.dlg_select_symbol_match: choice_index=%s' % choice_index
         if choice_index >= 0:
             #
@@ -2176,15 +2206,15 @@ class CmdInterp(OwnerObject):
             code_after='').log_execute(app, None, self.state_interface)            
             if choice_index != 0:
                 trace('CmdInterp.dlg_select_symbol_match.mismatch', 
-                'selected alternative match %d: %s' % \
-                (choice_index, chosen_match.native_symbol))
+                'selected alternative match %d: %s',
+                choice_index, chosen_match.native_symbol)
         else:
             actions_gen.ActionInsert(code_bef=untranslated_text,
             code_after='').log_execute(app, None, self.state_interface)                        
             if untranslated_text != symbol_matches[0].native_symbol:
                 trace('CmdInterp.dlg_select_symbol_match.mismatch', 
-                'untranslated text %s != first match %s' % \
-                (untranslated_text, symbol_matches[0].native_symbol))
+                'untranslated text %s != first match %s',
+                untranslated_text, symbol_matches[0].native_symbol)
         
     def chop_CSC_phrase(self, phrase, app):
         """Chops the start of a command if it starts with a CSC.
@@ -2211,14 +2241,13 @@ class CmdInterp(OwnerObject):
         """
         matches = self.commands.all_matches(phrase)
         trace('CmdInterp.chop_CSC_phrase',
-            '%d matches' % len(matches))
+            '%d matches', len(matches))
         match_consumed = []
         for match in matches:
             cmd_dict, rest_spoken = match
             consumed = len(phrase) - len(rest_spoken)
             trace('CmdInterp.chop_CSC_phrase',
-                'words = %d, phrase = %s' % (consumed,
-                phrase[:consumed]))
+                'words = %d, phrase = %s', consumed, phrase[:consumed])
             match_consumed.append((cmd_dict, consumed))
 
         return match_consumed
@@ -2276,10 +2305,10 @@ class CmdInterp(OwnerObject):
          the command
         """
         debug.trace('CmdInterp.chop_symbol_phrase', 
-            'phrase = %s' % repr(phrase))
+            'phrase = %r', phrase)
         match = self.known_symbols.match_phrase(phrase)
         debug.trace('CmdInterp.chop_symbol_phrase', 
-            'match = %s' % repr(match))
+            'match = %r', match)
         if match[0] is None:
             return None, 0
         symbols, rest_spoken = match
@@ -2352,7 +2381,7 @@ class CmdInterp(OwnerObject):
         .. [CSCmd] file:///./CSCmd.CSCmd.html"""
 
 #        debug.trace('CmdInterp.index_csc', 'acmd=%s, acmd.spoken_forms=%s, =%s' % (acmd, acmd.spoken_forms, acmd.meanings))
-        debug.trace('CmdInterp.index_csc', 'spoken_forms=%s' % acmd.spoken_forms)
+        debug.trace('CmdInterp.index_csc', 'spoken_forms=%s', acmd.spoken_forms)
         cmd_dict = acmd.get_meanings()
 
         for a_spoken_form in acmd.spoken_forms:
@@ -2367,7 +2396,7 @@ class CmdInterp(OwnerObject):
             #
             phrase = string.split(a_spoken_form)
             meanings = self.commands.complete_match(phrase)
-            trace('CmdInterp.index_csc', 'adding phrase %s' % phrase)
+            trace('CmdInterp.index_csc', 'adding phrase %s', phrase)
             if meanings:
                 try:
                     meanings.merge(cmd_dict)
@@ -2426,7 +2455,7 @@ class CmdInterp(OwnerObject):
         *none*
         """
         debug.trace('CmdInterp.add_csc_set', 
-            'adding CSCs from set %s' % set.name)
+            'adding CSCs from set %s', set.name)
         for cmd in set.commands.values():
 #            print cmd.spoken_forms
             self.add_csc(cmd)
@@ -2480,10 +2509,9 @@ class CmdInterp(OwnerObject):
                 phrase = string.split(clean_spoken)
                 self.language_specific_aliases[language].add_phrase(phrase, 
                     meaning)
-                trace('CmdInterp.add_lsa', 'language = %s' % language)
+                trace('CmdInterp.add_lsa', 'language = %s', language)
                 trace('CmdInterp.add_lsa', 
-                    'spoken, written = "%s", "%s"' % (clean_spoken,
-                    written_as))
+                    'spoken, written = "%s", "%s"', clean_spoken, written_as)
 
 
                 #
@@ -2491,7 +2519,7 @@ class CmdInterp(OwnerObject):
                 #
                 if self.add_sr_entries_for_LSAs_and_CSCs:
                     trace('CmdInterp.add_lsa', 
-                        'adding entry "%s"' % entry)
+                        'adding entry "%s"', entry)
 #                    print 'clean_spoken, written, entry: "%s", "%s", "%s"' \
 #                        % (clean_spoken, hacked_written_as, entry)
                     sr_interface.addWord(entry)
@@ -2538,7 +2566,7 @@ class CmdInterp(OwnerObject):
             #
             if self.add_sr_entries_for_LSAs_and_CSCs:
                 trace('CmdInterp.add_capitalization_word', 
-                    'adding entry "%s"' % vc_entry)
+                    'adding entry "%s"', vc_entry)
 #                    print 'clean_spoken, written, entry: "%s", "%s", "%s"' \
 #                        % (clean_spoken, hacked_written_as, entry)
                 sr_interface.addWord(vc_entry)
@@ -2624,6 +2652,17 @@ class CmdInterp(OwnerObject):
         """Specify source files defining expansions and abbreviations"""
         self.known_symbols.abbreviations_in(file_list)
 
+    def harvest_symbols_in_parallel(self, num_processes):
+        """Specify the maximum number of worker processes used to
+        extract symbols from standard symbol files (0 or 1 to parse
+        them in the mediator process)"""
+        self.known_symbols.harvest_processes = num_processes
+
+    def max_spoken_forms_per_symbol(self, max_forms):
+        """Specify the maximum number of spoken forms generated for
+        each symbol (0 for no limit)"""
+        self.known_symbols.max_spoken_forms = max_forms
+
     def peek_at_unresolved(self):
         """returns a reference to the dictionary of unresolved 
         abbreviations maintained by the SymDict, and the symbols 
@@ -20,6 +20,7 @@
 ##############################################################################
 
 from Object import Object
+import re, string
 
 
 class LangDef(Object):
@@ -34,6 +35,15 @@ class LangDef(Object):
     *ANY regexps_no_symbols=None* -- a regexp that matches portions of
      code that don't contain symbols (e.g. quoted strings, comments)
     
+    *(STR, [STR])* _compiled_from -- the values of *regexp_symbol* and
+     *regexps_no_symbols* from which *_reg_symbol* and *_reg_no_symbols*
+     were compiled, or None if they haven't been compiled yet.
+
+    *regexp* _reg_symbol -- compiled version of *regexp_symbol*
+
+    *regexp* _reg_no_symbols -- single compiled regexp which is the
+     alternation of all the *regexps_no_symbols*, or None if there are
+     none.
 
     CLASS ATTRIBUTES**
     
@@ -44,6 +54,105 @@ class LangDef(Object):
         self.deep_construct(LangDef, \
                             {'name': name, \
                              'regexp_symbol': regexp_symbol, \
-                             'regexps_no_symbols': regexps_no_symbols}, \
+                             'regexps_no_symbols': regexps_no_symbols, \
+                             '_compiled_from': None, \
+                             '_reg_symbol': None, \
+                             '_reg_no_symbols': None}, \
                             attrs, \
                             {})
+
+    def _compile(self):
+        """private method which compiles the regexps of the language
+        definition, unless they were already compiled from the current
+        values of *regexp_symbol* and *regexps_no_symbols*.
+
+        The regexps for chunks without symbols are combined into a
+        single alternation.  At a given position, Python tries the
+        alternatives in order, so the leftmost match of the alternation
+        is the earliest match of any of the regexps, with ties going to
+        the first regexp in the list.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        no_symbols = self.regexps_no_symbols
+        if no_symbols is None:
+            no_symbols = []
+        compiled_from = (self.regexp_symbol, list(no_symbols))
+        if self._compiled_from == compiled_from:
+            return
+        self._reg_symbol = re.compile('(' + self.regexp_symbol + ')')
+        if no_symbols:
+            alternatives = map(lambda a_regexp: '(?:%s)' % a_regexp, 
+                               no_symbols)
+            self._reg_no_symbols = re.compile(string.join(alternatives, '|'))
+        else:
+            self._reg_no_symbols = None
+        self._compiled_from = compiled_from
+
+    def strip_source(self, source):
+        """Removes all parts of a source file that don't contain symbols.
+
+        This includes comments and quoted strings.
+
+        The source is scanned only once, with a single regexp matching
+        all the chunks without symbols.
+
+        **NOTE:** Since the regexps are matched at a position in the
+        source rather than at the start of what remains of the source,
+        the regexps in *regexps_no_symbols* should not use *^* or
+        lookbehind assertions.
+        
+        **INPUTS**
+        
+        *STR* source -- the source
+
+        **OUTPUTS**
+        
+        *STR* stripped_source -- source stripped of all non-symbols chunks
+        """
+        self._compile()
+        if self._reg_no_symbols is None:
+            return source
+        chunks = []
+        pos = 0
+        length = len(source)
+        while pos < length:
+            a_match = self._reg_no_symbols.search(source, pos)
+            if a_match is None:
+                break
+            chunks.append(source[pos:a_match.start()])
+            pos = a_match.end()
+        chunks.append(source[pos:])
+        return string.join(chunks, '')
+
+    def symbols_in(self, source):
+        """Generates the symbols found in a source file, after
+        stripping the parts which don't contain symbols.
+
+        **INPUTS**
+        
+        *STR* source -- the source
+
+        **OUTPUTS**
+        
+        *generator of STR* -- the symbols, in the order in which they
+        appear in the source (including duplicates)
+        """
+        stripped = self.strip_source(source)
+        reg_symbol = self._reg_symbol
+        pos = 0
+        length = len(stripped)
+        while pos < length:
+            a_match = reg_symbol.search(stripped, pos)
+            if a_match is None:
+                break
+            yield a_match.group(1)
+#           skip the character following the symbol, which can't be
+#           part of it
+            pos = a_match.end() + 1
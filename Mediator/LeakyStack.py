@@ -34,9 +34,19 @@ class LeakyStack(Object):
     finite stack, with the oldest elements being dropped off the bottom
     of the stack.
 
+    The items are kept in a ring buffer, so that dropping items off the
+    bottom of the stack doesn't move the others.  The ring grows (up to
+    max_height) as needed.
+
     **INSTANCE ATTRIBUTES**
 
-    *ANY stack* -- the stack
+    *[ANY] ring* -- the ring buffer holding the items, with unused
+    slots set to None
+
+    *INT bottom* -- index in the ring of the item at the bottom of the
+    stack
+
+    *INT size* -- number of items on the stack
 
     *INT max_height* -- maximum height of the stack, or None for an
     unlimited stack
@@ -55,8 +65,29 @@ class LeakyStack(Object):
                             {
                              'max_height': max_height,
                              'dropped':0,
-                             'stack': []
+                             'ring': [None] * 8,
+                             'bottom': 0,
+                             'size': 0
                             }, args)
+
+    def _grow(self):
+        """private method which enlarges the ring buffer, moving the
+        bottom of the stack to the start of the ring
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        capacity = 2 * len(self.ring)
+        if not (self.max_height is None):
+            capacity = max(min(capacity, self.max_height), 1)
+        self.ring = self.items() + [None] * (capacity - self.size)
+        self.bottom = 0
+
     def push(self, item):
         """push an item onto the top of the stack
         (possibly dropping an old item off the bottom)
@@ -69,12 +100,20 @@ class LeakyStack(Object):
 
         *ANY* -- the dropped item, or None if none was dropped
         """
-        self.stack.append(item)
-        if not (self.max_height is None) and len(self.stack) > self.max_height:
-            dropping = self.stack[0]
-            del self.stack[0]
+        if not (self.max_height is None) and self.size >= self.max_height:
             self.dropped = self.dropped + 1
+            if self.size == 0:
+                return item
+# the stack is full, so the bottom item is dropped to make room
+            dropping = self.ring[self.bottom]
+            self.ring[self.bottom] = None
+            self.bottom = (self.bottom + 1) % len(self.ring)
+            self.ring[(self.bottom + self.size - 1) % len(self.ring)] = item
             return dropping
+        if self.size == len(self.ring):
+            self._grow()
+        self.ring[(self.bottom + self.size) % len(self.ring)] = item
+        self.size = self.size + 1
 
     def height(self):
         """apparent height of the stack (including items which have been
@@ -86,7 +125,7 @@ class LeakyStack(Object):
 
         **OUTPUTS**
         """
-        return len(self.stack) + self.dropped
+        return self.size + self.dropped
 
     def empty(self):
         """tells whether the stack is empty
@@ -99,7 +138,7 @@ class LeakyStack(Object):
 
         *BOOL* -- true if the stack is empty
         """
-        return len(self.stack) == 0
+        return self.size == 0
 
     def pop(self):
         """pops an item off the top of the stack
@@ -114,7 +153,29 @@ class LeakyStack(Object):
 
         *ANY* -- the item on the top of the stack
         """
-        return self.stack.pop()
+        if self.size == 0:
+            raise exceptions.IndexError('pop from empty stack')
+        self.size = self.size - 1
+        top = (self.bottom + self.size) % len(self.ring)
+        item = self.ring[top]
+        self.ring[top] = None
+        return item
+
+    def items(self):
+        """returns the items remaining on the stack
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *[ANY]* -- the items, from the bottom to the top of the stack
+        """
+        end = self.bottom + self.size
+        if end <= len(self.ring):
+            return self.ring[self.bottom:end]
+        return self.ring[self.bottom:] + self.ring[:end - len(self.ring)]
 
 class IndexedLeakyStack(LeakyStack):
     """a LeakyStack which allows you to peek at an item by index from
@@ -159,7 +220,13 @@ class IndexedLeakyStack(LeakyStack):
         """
         to_drop = index - self.dropped
         if to_drop > 0:
-            del self.stack[0:to_drop]
+# the index may be above the top of the stack, in which case the stack
+# is emptied, but its apparent height still becomes index
+            removed = min(to_drop, self.size)
+            for i in range(removed):
+                self.ring[(self.bottom + i) % len(self.ring)] = None
+            self.bottom = (self.bottom + removed) % len(self.ring)
+            self.size = self.size - removed
             self.dropped = self.dropped + to_drop
             return to_drop
         return 0
@@ -182,10 +249,10 @@ class IndexedLeakyStack(LeakyStack):
         *ANY* -- a reference to the item
         """
         current = index - self.dropped
-        if current < 0:
+        if current < 0 or current >= self.size:
             raise exceptions.IndexError()
         else:
-            return self.stack[current]
+            return self.ring[(self.bottom + current) % len(self.ring)]
 
 
 class KeyGenerator:
@@ -35,6 +35,7 @@ import RecogStartMgrNL
 import ResMgr
 import sr_grammarsNL
 import auto_test
+import readprof
 import regression
 import cPickle
 
@@ -664,10 +665,14 @@ class NewMediatorObject(Object.OwnerObject):
             alt_sym_file = alt_sym_file,
             symbol_match_dlg = sym_dlg,
             add_sr_entries_for_LSAs_and_CSCs = add_sr_entries_for_LSAs_and_CSCs)
-        file = config_file
-        if not file:
-            file = vc_globals.default_config_file
-        execfile(file, config_dict)
+# collect the changes made to the SR vocabulary by the configuration
+# files and the compilation of standard symbols, and make them in one batch
+        sr_interface.begin_vocabulary_transaction()
+        try:
+            file = config_file
+            if not file:
+                file = vc_globals.default_config_file
+            execfile(file, config_dict)
 # doing execfile directly actually provides better error reporting (the
 # traceback is actually reported from the proper line, even when it is
 # in another module imported from the config file).  (Probably the same
@@ -678,43 +683,50 @@ class NewMediatorObject(Object.OwnerObject):
 #        except Exception, err:
 #            print 'ERROR: in configuration file %s.\n' % file
 #            raise err
-        user_file = user_config_file
-        debug.trace('NewMediatorObject._configure_from_file', 'initially, user_file="%s", test_next=%s, vc_globals.regression_user_config_file="%s", vc_globals.default_user_config_file="%s"' % 
-                    (user_file, not (self.test_suite is None), vc_globals.regression_user_config_file, vc_globals.default_user_config_file))         
-        if not user_file:
-            if testing or self.test_suite:
-                user_file = vc_globals.regression_user_config_file
-            else:
-                user_file = vc_globals.default_user_config_file
+            user_file = user_config_file
+            debug.trace('NewMediatorObject._configure_from_file', 'initially, user_file="%s", test_next=%s, vc_globals.regression_user_config_file="%s", vc_globals.default_user_config_file="%s"' % 
+                        (user_file, not (self.test_suite is None), vc_globals.regression_user_config_file, vc_globals.default_user_config_file))         
+            if not user_file:
+                if testing or self.test_suite:
+                    user_file = vc_globals.regression_user_config_file
+                else:
+                    user_file = vc_globals.default_user_config_file
                 
-        debug.trace('NewMediatorObject._configure_from_file', 'user_file="%s"' % user_file) 
+            debug.trace('NewMediatorObject._configure_from_file', 'user_file="%s"' % user_file) 
 
-        okay = os.path.exists(user_file)
-        if not okay:
-            console = self.console()
-            if console:
-                okay = console.copy_user_config(user_file, vc_globals.sample_config)
+            okay = os.path.exists(user_file)
             if not okay:
-                sys.stderr.write("\n\nVCode ERROR: non-existant user ")
-                sys.stderr.write("configuration file \n'%s'\n" % user_file)
-                sys.stderr.write("Create this file by copying one of the ")
-                sys.stderr.write("sample configuration files from \n")
-                sys.stderr.write("%s, and re-run the mediator.\n" \
-                    % vc_globals.sample_config)
-                return 0
+                console = self.console()
+                if console:
+                    okay = console.copy_user_config(user_file, vc_globals.sample_config)
+                if not okay:
+                    sys.stderr.write("\n\nVCode ERROR: non-existant user ")
+                    sys.stderr.write("configuration file \n'%s'\n" % user_file)
+                    sys.stderr.write("Create this file by copying one of the ")
+                    sys.stderr.write("sample configuration files from \n")
+                    sys.stderr.write("%s, and re-run the mediator.\n" \
+                        % vc_globals.sample_config)
+                    return 0
                 
-        execfile(user_file, config_dict)
+            execfile(user_file, config_dict)
 
 # if successful, store file name so the reconfigure method can reuse it
-        self.config_file = config_file
-        self.user_config_file = user_config_file
-
-        #
-        # Compile standard symbols for the different languages
-        #
-        if not 'interp' in exclude:
-            self.interp.finish_config()
-        return 1
+            self.config_file = config_file
+            self.user_config_file = user_config_file
+
+            #
+            # Compile standard symbols for the different languages
+            #
+            if not 'interp' in exclude:
+                self.interp.finish_config()
+            return 1
+        finally:
+            transaction = sr_interface.end_vocabulary_transaction()
+            if transaction:
+                debug.trace('NewMediatorObject._configure_from_file',
+                    '%d of %d changes to the SR vocabulary saved' \
+                    % (transaction.saved_calls(), 
+                       transaction.num_requested))
 
     def before_app_mgr_config(self, config_dict, ignore = 0):
         """called by configure to add the functions pertaining to
@@ -795,6 +807,8 @@ class NewMediatorObject(Object.OwnerObject):
             config_dict['clear_standard_symbols_file_list'] = do_nothing            
             config_dict['standard_symbols_in'] = do_nothing
             config_dict['abbreviations_in'] = do_nothing
+            config_dict['harvest_symbols_in_parallel'] = do_nothing
+            config_dict['max_spoken_forms_per_symbol'] = do_nothing
             config_dict['add_identifier'] = do_nothing
             config_dict['set_builder_preferences'] = do_nothing
             config_dict['print_abbreviations'] = do_nothing
@@ -813,6 +827,10 @@ class NewMediatorObject(Object.OwnerObject):
             config_dict['clear_standard_symbols_file_list'] = self.clear_standard_symbols_file_list          
             config_dict['standard_symbols_in'] = self.standard_symbols_in
             config_dict['abbreviations_in'] = self.abbreviations_in
+            config_dict['harvest_symbols_in_parallel'] = \
+                self.harvest_symbols_in_parallel
+            config_dict['max_spoken_forms_per_symbol'] = \
+                self.max_spoken_forms_per_symbol
             config_dict['add_identifier'] = self.add_identifier
             config_dict['set_builder_preferences'] = self.set_builder_preferences
             config_dict['print_abbreviations'] = self.print_abbreviations
@@ -1176,6 +1194,8 @@ class NewMediatorObject(Object.OwnerObject):
         print '\n\n\n-----------------------------------------------'
         print 'Test suite completed in:  %s secs' % elapsed_time
         print '-----------------------------------------------'            
+        if self.profile_prefix:
+            self.report_profiles()
         if self.console():
             self.console().finished_tests()
         del self.test_space['testing']
@@ -1184,6 +1204,30 @@ class NewMediatorObject(Object.OwnerObject):
         self.editors.delete_instance(instance_name)
         return 1
 
+    def report_profiles(self):
+        """prints where the time went in the regression tests which
+        were just profiled, and saves a summary to profile_prefix +
+        '.summary'.  If a summary of an earlier run was saved to
+        profile_prefix + '.baseline', the report is compared with it.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        baseline = self.profile_prefix + '.baseline'
+        if not os.path.exists(baseline):
+            baseline = None
+        try:
+            readprof.report_profiles(self.profile_prefix, 
+                baseline_file = baseline,
+                summary_file = self.profile_prefix + '.summary')
+        except:
+            traceback.print_exc()
+
     def new_editor(self, app, server = 1, check_window = 1, 
             window_info = None, test_editor = 0):
         """add a new editor application instance
@@ -1385,6 +1429,17 @@ class NewMediatorObject(Object.OwnerObject):
         """Specify source files defining expansions and abbreviations"""
         self.interp.abbreviations_in(file_list)
 
+    def harvest_symbols_in_parallel(self, num_processes):
+        """Specify the maximum number of worker processes used to
+        extract symbols from standard symbol files (0 or 1 to parse
+        them in the mediator process)"""
+        self.interp.harvest_symbols_in_parallel(num_processes)
+
+    def max_spoken_forms_per_symbol(self, max_forms):
+        """Specify the maximum number of spoken forms generated for
+        each symbol (0 for no limit)"""
+        self.interp.max_spoken_forms_per_symbol(max_forms)
+
     def print_symbols(self, symbols = None):
         self.interp.print_symbols(symbols)
 
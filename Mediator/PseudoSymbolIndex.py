@@ -0,0 +1,579 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Index of known native symbols used to find candidate matches for a
+pseudo symbol without scanning every known symbol, and cache of the
+regexps used to match recently dictated pseudo symbols.
+"""
+
+from Object import Object
+import debug
+import bisect, re, string
+
+class PseudoSymbolIndex(Object):
+    """Index of native symbols, used by [SymDict] to find the symbols
+    which can possibly match a pseudo symbol without scanning all the
+    known symbols.
+
+    The regexp built by [SymDict.reg_pseudo_to_native_symbol] requires
+    the first letter of every word of the pseudo symbol to appear in the
+    native symbol, and allows the other letters of each word to be
+    dropped.  So if we ignore the non-alphanumeric characters, a native
+    symbol can only match if its letters and digits (its *skeleton*)
+    are obtained by dropping some of the non-initial letters of the
+    words of the pseudo symbol.  For example, the skeleton of
+    *aNewSym* is *anewsym*, which can be obtained from the words
+    ['a', 'new', 'symbol'].
+
+    The index keeps the skeletons of all the symbols in a sorted list,
+    and looks up a pseudo symbol by walking the (implicit) trie of
+    skeletons, following only the branches which the pseudo symbol can
+    still match.  Each step of the walk is a binary search in the sorted
+    list.  The regexp is then run only on the symbols whose skeleton
+    matched, so the results are exactly the same as when running it on
+    the string returned by [SymDict.symbols_as_one_string] (or on all
+    the symbols, for a pseudo symbol starting with a digit).
+
+    Symbols containing blanks can be matched partially by the regexp,
+    so they are not put in the trie and are always considered as
+    candidates.
+
+    The index is maintained incrementally by [SymDict.add_symbol] and
+    [SymDict.remove_symbol], and always contains the same symbols as
+    *SymDict._symbols_starting_with*.
+
+    **INSTANCE ATTRIBUTES**
+
+    *[STR]* skeletons -- sorted list of the distinct skeletons of the
+    indexed symbols.
+
+    *{STR: {STR: 1}}* symbols_with_skeleton -- the set of indexed
+    symbols having a given skeleton.
+
+    *{STR: {STR: 1}}* symbols_with_blanks -- set of the indexed symbols
+    which contain blanks, indexed by their first letter.
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [SymDict] file:///./SymDict.SymDict.html
+    .. [SymDict.reg_pseudo_to_native_symbol] file:///./SymDict.SymDict.html#reg_pseudo_to_native_symbol
+    .. [SymDict.symbols_as_one_string] file:///./SymDict.SymDict.html#symbols_as_one_string
+    .. [SymDict.add_symbol] file:///./SymDict.SymDict.html#add_symbol
+    .. [SymDict.remove_symbol] file:///./SymDict.SymDict.html#remove_symbol"""
+
+    def __init__(self, **args):
+        self.deep_construct(PseudoSymbolIndex,
+                            {'skeletons': [],
+                             'symbols_with_skeleton': {},
+                             'symbols_with_blanks': {}},
+                            args)
+
+    def skeleton(self, symbol):
+        """returns the skeleton of a symbol, i.e. its letters and
+        digits in lower case
+
+        **INPUTS**
+
+        *STR symbol* -- the written form of the symbol
+
+        **OUTPUTS**
+
+        *STR* -- the skeleton
+        """
+        return re.sub('[^a-z0-9]+', '', string.lower(symbol))
+
+    def add_symbol(self, symbol, first_letter):
+        """adds a symbol to the index
+
+        **INPUTS**
+
+        *STR symbol* -- the written form of the symbol
+
+        *STR first_letter* -- the (lower case) first letter of the
+        symbol, as returned by [SymDict.first_letter]
+
+        **OUTPUTS**
+
+        *none*
+
+        .. [SymDict.first_letter] file:///./SymDict.SymDict.html#first_letter"""
+        if re.search('\s', symbol):
+            try:
+                self.symbols_with_blanks[first_letter][symbol] = 1
+            except KeyError:
+                self.symbols_with_blanks[first_letter] = {symbol: 1}
+            return
+        skeleton = self.skeleton(symbol)
+        try:
+            self.symbols_with_skeleton[skeleton][symbol] = 1
+        except KeyError:
+            self.symbols_with_skeleton[skeleton] = {symbol: 1}
+            bisect.insort(self.skeletons, skeleton)
+
+    def remove_symbol(self, symbol, first_letter):
+        """removes a symbol from the index
+
+        **INPUTS**
+
+        *STR symbol* -- the written form of the symbol
+
+        *STR first_letter* -- the (lower case) first letter of the
+        symbol, as returned by [SymDict.first_letter]
+
+        **OUTPUTS**
+
+        *none*
+
+        .. [SymDict.first_letter] file:///./SymDict.SymDict.html#first_letter"""
+        if re.search('\s', symbol):
+            try:
+                del self.symbols_with_blanks[first_letter][symbol]
+            except KeyError:
+                pass
+            return
+        skeleton = self.skeleton(symbol)
+        try:
+            same_skeleton = self.symbols_with_skeleton[skeleton]
+            del same_skeleton[symbol]
+        except KeyError:
+            return
+        if not same_skeleton:
+            del self.symbols_with_skeleton[skeleton]
+            del self.skeletons[bisect.bisect_left(self.skeletons, skeleton)]
+
+    def clear(self):
+        """removes all symbols from the index
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.skeletons = []
+        self.symbols_with_skeleton = {}
+        self.symbols_with_blanks = {}
+
+    def candidates(self, words):
+        """returns the indexed symbols which may match a pseudo symbol
+
+        **INPUTS**
+
+        *[STR] words* -- the words of the pseudo symbol (the first one
+        must be non-empty)
+
+        **OUTPUTS**
+
+        *[STR]* -- the symbols whose skeleton can be obtained by
+        dropping non-initial letters from *words*, plus the symbols with
+        blanks starting with the same letter as *words*.
+        """
+        chars = ''
+        initial = []
+        for a_word in words:
+            if a_word:
+                a_word = string.lower(a_word)
+                chars = chars + a_word
+                initial.append(1)
+                initial.extend([0] * (len(a_word) - 1))
+        if not chars:
+            return []
+        last_initial = len(initial) - 1
+        while not initial[last_initial]:
+            last_initial = last_initial - 1
+
+        found = []
+        self._walk(chars, initial, last_initial, '', {0: 1},
+                   0, len(self.skeletons), found)
+
+        candidates = []
+        for a_skeleton in found:
+            candidates.extend(self.symbols_with_skeleton[a_skeleton].keys())
+        try:
+            candidates.extend(self.symbols_with_blanks[chars[0]].keys())
+        except KeyError:
+            pass
+        debug.trace('PseudoSymbolIndex.candidates',
+            'words=%s, %d candidates' % (repr(words), len(candidates)))
+        return candidates
+
+    def _walk(self, chars, initial, last_initial, prefix, states, lo, hi,
+              found):
+        """private method which walks the branch of the (implicit) trie
+        of skeletons starting with a given prefix, collecting the
+        skeletons which match a pseudo symbol
+
+        **INPUTS**
+
+        *STR chars* -- the letters of the words of the pseudo symbol,
+        in lower case
+
+        *[BOOL] initial* -- for each letter in *chars*, true if it is
+        the first letter of a word (and therefore cannot be dropped)
+
+        *INT last_initial* -- index in *chars* of the first letter of
+        the last word
+
+        *STR prefix* -- the prefix of the branch
+
+        *{INT: 1}* states -- set of the positions in *chars* which can
+        be reached after matching *prefix*
+
+        *INT lo, hi* -- slice of *self.skeletons* containing the
+        skeletons starting with *prefix*
+
+        *[STR] found* -- list to which matching skeletons are appended
+
+        **OUTPUTS**
+
+        *none*
+        """
+        skeletons = self.skeletons
+        if prefix and skeletons[lo] == prefix:
+            for a_state in states.keys():
+                if a_state > last_initial:
+                    found.append(prefix)
+                    break
+        next_states = {}
+        num_chars = len(chars)
+        for a_state in states.keys():
+            pos = a_state
+            while pos < num_chars:
+                try:
+                    next_states[chars[pos]][pos + 1] = 1
+                except KeyError:
+                    next_states[chars[pos]] = {pos + 1: 1}
+                if initial[pos]:
+                    break
+                pos = pos + 1
+        for a_char, char_states in next_states.items():
+            branch = prefix + a_char
+            branch_lo = bisect.bisect_left(skeletons, branch, lo, hi)
+            if branch_lo < hi and skeletons[branch_lo].startswith(branch):
+                #
+                # Note: skeletons only contain lower case letters and 
+                # digits, which all come before '{'
+                #
+                branch_hi = bisect.bisect_left(skeletons, branch + '{',
+                                               branch_lo, hi)
+                self._walk(chars, initial, last_initial, branch,
+                           char_states, branch_lo, branch_hi, found)
+
+    def matches(self, regexp, words):
+        """finds all indexed symbols matching the regexp for a pseudo
+        symbol
+
+        **INPUTS**
+
+        *regexp* -- the compiled regexp returned by
+        [SymDict.reg_pseudo_to_native_symbol] for *words*
+
+        *[STR] words* -- the words of the pseudo symbol (the first one
+        must be non-empty)
+
+        **OUTPUTS**
+
+        *Iterator over Match objects* -- the matches, in the same form
+        as those returned by running *regexp.finditer* on the string
+        returned by [SymDict.symbols_as_one_string] (i.e. each match
+        includes the blanks surrounding the native symbol)
+
+        .. [SymDict.reg_pseudo_to_native_symbol] file:///./SymDict.SymDict.html#reg_pseudo_to_native_symbol
+        .. [SymDict.symbols_as_one_string] file:///./SymDict.SymDict.html#symbols_as_one_string"""
+        candidates = self.candidates(words)
+        #
+        # Note: as in symbols_as_one_string, symbols must be separated
+        #       by two spaces, because the regexp requires a space before
+        #       and after the symbol, and finditer only returns
+        #       non-overlapping matches.
+        #
+        return regexp.finditer(' ' + string.join(candidates, '  ') + ' ')
+
+
+class PseudoSymbolMatcherCache(Object):
+    """LRU cache of the compiled regexps used by [SymDict] to match
+    pseudo symbols, and of the native symbols they matched.
+
+    Users tend to dictate the same pseudo symbols over and over, so we
+    remember the regexp compiled by
+    [SymDict.reg_pseudo_to_native_symbol] for the most recent pseudo
+    symbols, along with the list of matches it found.  Entries are keyed
+    by the tuple of the (lower case) words of the pseudo symbol, since
+    the regexp is case insensitive.
+
+    The list of matches is only valid as long as the set of known
+    symbols starting with the same letter doesn't change, so [SymDict]
+    must call [invalidate] whenever that happens.  The compiled regexp
+    remains valid forever.
+
+    **INSTANCE ATTRIBUTES**
+
+    *INT* max_size=256 -- maximum number of entries in the cache.  If 0,
+    nothing is cached.
+
+    *{(STR): [ANY]}* entries -- the cache entries.  The key is the tuple
+    of words, and the value is a list [regexp, first_letter, matches,
+    last_used] where *matches* is the list of re.MatchObjects found
+    with *regexp*, or None if it has been invalidated, and *last_used*
+    is the value of *clock* when the entry was last used.
+
+    *{STR: {(STR): 1}}* with_letter -- for each first letter, set of
+    the keys of the entries whose matches are still valid.
+
+    *INT* clock -- incremented at each lookup, used to find the least
+    recently used entry.
+
+    *[(INT, (STR))]* uses -- (clock, key) for each use of an entry, in
+    the order of use.  A use is stale if the entry has been used again
+    since (or dropped), so the least recently used entry is the one of
+    the first use which isn't stale.
+
+    *INT* first_use -- index in *uses* of the first use which may not
+    be stale.  Uses before it have already been skipped by [_evict].
+
+    *INT* hits -- number of lookups which found both the regexp and
+    the matches.
+
+    *INT* regexp_hits -- number of lookups which found the regexp, but
+    whose matches had been invalidated.
+
+    *INT* misses -- number of lookups which found nothing.
+
+    *INT* evictions -- number of entries dropped because the cache was
+    full.
+
+    *INT* invalidations -- number of lists of matches invalidated.
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [SymDict] file:///./SymDict.SymDict.html
+    .. [SymDict.reg_pseudo_to_native_symbol] file:///./SymDict.SymDict.html#reg_pseudo_to_native_symbol
+    .. [invalidate] file:///./PseudoSymbolIndex.PseudoSymbolMatcherCache.html#invalidate
+    .. [_evict] file:///./PseudoSymbolIndex.PseudoSymbolMatcherCache.html#_evict"""
+
+    def __init__(self, max_size = 256, **args):
+        self.deep_construct(PseudoSymbolMatcherCache,
+                            {'max_size': max_size,
+                             'entries': {},
+                             'with_letter': {},
+                             'clock': 0,
+                             'uses': [],
+                             'first_use': 0,
+                             'hits': 0,
+                             'regexp_hits': 0,
+                             'misses': 0,
+                             'evictions': 0,
+                             'invalidations': 0},
+                            args)
+
+    def key(self, words):
+        """returns the cache key for a pseudo symbol
+
+        **INPUTS**
+
+        *[STR] words* -- the words of the pseudo symbol
+
+        **OUTPUTS**
+
+        *(STR)* -- the key
+        """
+        return tuple(map(string.lower, words))
+
+    def lookup(self, words):
+        """looks up the regexp and matches for a pseudo symbol
+
+        **INPUTS**
+
+        *[STR] words* -- the words of the pseudo symbol
+
+        **OUTPUTS**
+
+        *(regexp, [re.MatchObject])* -- the compiled regexp and the
+        list of matches, either of which may be None if not cached
+        """
+        self.clock = self.clock + 1
+        key = self.key(words)
+        try:
+            entry = self.entries[key]
+        except KeyError:
+            self.misses = self.misses + 1
+            return None, None
+        entry[3] = self.clock
+        self._record_use(key)
+        if entry[2] is None:
+            self.regexp_hits = self.regexp_hits + 1
+        else:
+            self.hits = self.hits + 1
+        return entry[0], entry[2]
+
+    def store(self, words, first_letter, regexp, matches):
+        """stores the regexp and matches for a pseudo symbol
+
+        **INPUTS**
+
+        *[STR] words* -- the words of the pseudo symbol
+
+        *STR first_letter* -- the first letter of the symbols which
+        *matches* were taken from
+
+        *regexp* -- the compiled regexp for *words*
+
+        *[re.MatchObject] matches* -- the matches found with *regexp*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if self.max_size <= 0:
+            return
+        key = self.key(words)
+        old_entry = self.entries.get(key)
+        if old_entry is None and len(self.entries) >= self.max_size:
+            self._evict()
+        self.entries[key] = [regexp, first_letter, matches, self.clock]
+# a lookup of the same words may already have recorded this use
+        if old_entry is None or old_entry[3] != self.clock:
+            self._record_use(key)
+        try:
+            self.with_letter[first_letter][key] = 1
+        except KeyError:
+            self.with_letter[first_letter] = {key: 1}
+
+    def _evict(self):
+        """private method which drops the least recently used entry
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        while 1:
+            used_at, oldest = self.uses[self.first_use]
+            self.first_use = self.first_use + 1
+            entry = self.entries.get(oldest)
+            if entry is not None and entry[3] == used_at:
+                break
+        del self.entries[oldest]
+        try:
+            del self.with_letter[entry[1]][oldest]
+        except KeyError:
+            pass
+        self.evictions = self.evictions + 1
+
+    def _record_use(self, key):
+        """private method which appends a use of an entry to *uses*.
+
+        Stale uses are dropped once they make up most of the list, so
+        that it stays proportional to the number of entries.
+
+        **INPUTS**
+
+        *(STR) key* -- the key of the entry, which was just used at
+        time *clock*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.uses.append((self.clock, key))
+        if len(self.uses) - self.first_use > 2 * self.max_size + 16:
+            live = []
+            for used_at, a_key in self.uses[self.first_use:]:
+                entry = self.entries.get(a_key)
+                if entry is not None and entry[3] == used_at:
+                    live.append((used_at, a_key))
+            self.uses = live
+            self.first_use = 0
+        elif self.first_use > len(self.uses) / 2:
+            del self.uses[:self.first_use]
+            self.first_use = 0
+
+    def invalidate(self, first_letter = None):
+        """invalidates the matches found for pseudo symbols starting
+        with a given letter, because the set of known symbols starting
+        with that letter has changed.  The compiled regexps are kept.
+
+        **INPUTS**
+
+        *STR first_letter* -- the first letter, or None to invalidate
+        the matches for all letters
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if first_letter is None:
+            letters = self.with_letter.keys()
+        elif self.with_letter.has_key(first_letter):
+            letters = [first_letter]
+        else:
+            return
+        for a_letter in letters:
+            for key in self.with_letter[a_letter].keys():
+                self.entries[key][2] = None
+                self.invalidations = self.invalidations + 1
+            del self.with_letter[a_letter]
+
+    def stats(self):
+        """returns the cache counters
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: INT}* -- the values of the counters, plus the current
+        number of entries (*size*)
+        """
+        return {'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'regexp_hits': self.regexp_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations}
+
+    def reset_stats(self):
+        """resets the cache counters to 0
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.hits = 0
+        self.regexp_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
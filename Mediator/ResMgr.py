@@ -24,6 +24,7 @@
 
 from Object import Object, OwnerObject
 import debug
+import latency
 import re
 import string
 import threading
@@ -784,6 +785,11 @@ class BufferStatesBasic(BufferStates):
 
     *{STR: SourceBuffCookie} cookies* -- map from buffer names to
     cookies representing the state of the buffer
+
+    *{STR: INT} generations* -- map from buffer names to the generation
+    of the contents of the buffer (see SourceBuff.generation) when the
+    state was stored.  The contents of buffers which haven't changed
+    since then are not compared.
     """
     def __init__(self, app, buffers = None, **args):
         """
@@ -796,7 +802,8 @@ class BufferStatesBasic(BufferStates):
         """
         self.deep_construct(BufferStatesBasic,
                             {
-                             'cookies': {}
+                             'cookies': {},
+                             'generations': {}
                             },
                             args)
         self.add_owned('cookies')
@@ -811,6 +818,7 @@ class BufferStatesBasic(BufferStates):
             buffer = app.find_buff(buff_name)
             if buffer != None:
                 self.cookies[buff_name] = buffer.store_current_state()
+                self.generations[buff_name] = buffer.generation()
 
     def known_buffer(self, buff_name):
         """does the state have a cookie for a buffer with a given buff_name?
@@ -902,6 +910,8 @@ class BufferStatesBasic(BufferStates):
         try:
             self.cookies[new_buff_name] = self.cookies[old_buff_name]
             del self.cookies[old_buff_name]
+            self.generations[new_buff_name] = self.generations[old_buff_name]
+            del self.generations[old_buff_name]
         except KeyError:
             pass
 
@@ -918,6 +928,7 @@ class BufferStatesBasic(BufferStates):
         """
         try:
             del self.cookies[buff_name]
+            del self.generations[buff_name]
         except KeyError:
             pass
 
@@ -943,11 +954,37 @@ class BufferStatesBasic(BufferStates):
         buffer = app.find_buff(buff_name)
         if buffer is None:
             return 0
-        if not buffer.compare_with_current(self.cookies[buff_name],
-            selection = selection):
+        if not self._compare_buffer(buffer, buff_name, selection):
             return 0
         return 1
 
+    def _compare_buffer(self, buffer, buff_name, selection = 0):
+        """private method which compares the stored state of a buffer
+        to its current state.  If the contents of the buffer haven't
+        changed since the state was stored, only the selection is
+        compared (if requested), and the contents are assumed to be the
+        same even if the cookie has since expired.
+
+        **INPUTS**
+
+        *SourceBuff buffer* -- the buffer
+
+        *STR buff_name* -- the name of the buffer
+
+        *BOOL* selection -- compare selection as well as contents
+
+        **OUTPUTS**
+
+        *BOOL* -- true if states are the same, false if they are not, or
+        it cannot be determined due to expiration of cookies
+        """
+        cookie = self.cookies[buff_name]
+        if buffer.changed_since(self.generations[buff_name]):
+            return buffer.compare_with_current(cookie, selection = selection)
+        if selection:
+            return buffer.compare_selection_with_current(cookie)
+        return 1
+
     def compare_with_current(self, app, selection = 0,
         ignore_new = 1, ignore_deleted = 0):
         """compares the stored state to the current one.
@@ -986,7 +1023,7 @@ class BufferStatesBasic(BufferStates):
                 debug.trace('BufferStatesBasic.compare_with_current',
                     'SourceBuff for known buffer %s not found' % buff_name)
                 return 0
-            if not buffer.compare_with_current(self.cookies[buff_name],
+            if not self._compare_buffer(buffer, buff_name, 
                 selection = selection):
                 debug.trace('BufferStatesBasic.compare_with_current',
                     'buffer %s compared false' % buff_name)
@@ -1039,7 +1076,8 @@ class BufferStatesBasic(BufferStates):
                 return None
 # now, the buffer should still exist and the cookie should be valid, so a 
 # comparison should only fail if the buffer was indeed changed
-            if not buffer.compare_with_current(cookie, selection = selection):
+            if not self._compare_buffer(buffer, buff_name, 
+                selection = selection):
                 changed.append(buff_name)
 
         return changed
@@ -1424,6 +1462,7 @@ class StateStackBasic(StateStack):
 
         *none*
         """
+        span = latency.start('StateStack.before_interp')
         if self.after_utterance and \
             not self.after_utterance.compare_with_current(app, 
                 ignore_new = self.ignore_new,
@@ -1436,6 +1475,7 @@ class StateStackBasic(StateStack):
         if initial_buffer is None:
             initial_buffer = app.curr_buffer_name()
         self._push(current, initial_buffer)
+        latency.end(span)
 
     def interp_state_valid(self, app):
         """determines whether the user has done anything which would
@@ -2242,6 +2282,7 @@ class ResMgrBasic(ResMgrStd):
         *none*
         """
         debug.trace('ResMgrBasic.interpret_dictation', 'about to interpret, initial_buffer=%s' % initial_buffer)
+        span = latency.start('ResMgrBasic.interpret_dictation')
         if debug.trace_is_active('ResMgrBasic.interpret_dictation'):
             debug.trace('ResMgrBasic.interpret_dictation',
                  'called from thread %s' %
@@ -2269,6 +2310,7 @@ class ResMgrBasic(ResMgrStd):
         else:
             self.store(result, interpreted, initial_buffer = initial_buffer, 
                 number = utterance_number)
+        latency.end(span)
         debug.trace('ResMgrBasic.interpret_dictation', 
             'returning')
 
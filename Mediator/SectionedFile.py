@@ -0,0 +1,447 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Binary files storing a dictionary as a series of separately
+loadable sections.
+
+Persistent dictionaries like the one of [SymDict] used to be stored as
+a single text pickle, which has to be unpickled in full before anything
+can be used.  A sectioned file stores each value of the dictionary as a
+separate binary pickle, preceded by an index, so that a reader can
+unpickle only the sections it needs right away, and the others later
+(or never).
+
+The layout of the file is:
+
+   magic string (8 bytes)
+   format version, number of sections (2 x 4 bytes)
+   for each section:
+      length of the name (2 bytes), name,
+      offset, length and CRC32 of the data (3 x 4 bytes)
+   data of each section, in the same order
+
+All integers are unsigned and big-endian.  The format version is the
+version of this layout, and is unrelated to the version of the
+contents of the dictionary (e.g. [SymDict.current_version]), which is
+upgraded by [DictConverter] as usual.
+
+.. [SymDict] file:///./SymDict.SymDict.html
+.. [SymDict.current_version] file:///./SymDict.html
+.. [DictConverter] file:///./DictConverter.DictConverter.html"""
+
+import cPickle, os, string, struct, zlib
+from Object import Object
+
+magic = 'VCSECTS\n'
+format_version = 1
+
+_header_format = '>II'
+_name_format = '>H'
+_entry_format = '>III'
+
+
+class BadSectionedFile(RuntimeError):
+    def __init__(self, message):
+        RuntimeError.__init__(self, message)
+        self.message = message
+
+
+def is_sectioned_file(file_name):
+    """indicates whether a file is a sectioned file
+
+    **INPUTS**
+
+    *STR file_name* -- path of the file
+
+    **OUTPUTS**
+
+    *BOOL* -- true if the file starts with the magic string of
+    sectioned files
+    """
+    try:
+        f = open(file_name, 'rb')
+        start = f.read(len(magic))
+        f.close()
+    except (IOError, OSError):
+        return 0
+    return start == magic
+
+def write_sections(f, sections):
+    """writes a dictionary to a sectioned file
+
+    **INPUTS**
+
+    *FILE f* -- the file, opened for writing in binary mode
+
+    *{STR: ANY} sections* -- the dictionary.  Each value must be
+    picklable.
+
+    **OUTPUTS**
+
+    *none*
+    """
+    names = sections.keys()
+    names.sort()
+    data = []
+    offset = len(magic) + struct.calcsize(_header_format)
+    for name in names:
+        data.append(cPickle.dumps(sections[name], 1))
+        offset = offset + struct.calcsize(_name_format) + len(name) \
+            + struct.calcsize(_entry_format)
+    chunks = [magic, struct.pack(_header_format, format_version, len(names))]
+    for ii in range(len(names)):
+        chunks.append(struct.pack(_name_format, len(names[ii])))
+        chunks.append(names[ii])
+        chunks.append(struct.pack(_entry_format, offset, len(data[ii]),
+            zlib.crc32(data[ii]) & 0xffffffffL))
+        offset = offset + len(data[ii])
+    f.write(string.join(chunks, ''))
+    for a_section in data:
+        f.write(a_section)
+
+
+class SectionedFileReader(Object):
+    """read-only, dictionary-like view of a sectioned file, which
+    unpickles each section the first time it is accessed.
+
+    The file is only kept open while reading, so the reader checks
+    that the file hasn't changed (size and modification time) before
+    loading a section.
+
+    **INSTANCE ATTRIBUTES**
+
+    *STR file_name* -- path of the file
+
+    *{STR: (INT, INT, INT)}* index -- map from the name of each section
+    to the offset, length and CRC32 of its data
+
+    *{STR: ANY}* loaded -- the values of the sections loaded so far
+
+    *(INT, FLOAT)* signature -- size and modification time of the file
+    when the index was read
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+    """
+
+    def __init__(self, file_name, **args):
+        self.deep_construct(SectionedFileReader,
+                            {'file_name': file_name,
+                             'index': {},
+                             'loaded': {},
+                             'signature': None},
+                            args)
+        self._read_index()
+
+    def _signature(self):
+        """private method which returns the current size and
+        modification time of the file
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *(INT, FLOAT)* -- the signature
+        """
+        info = os.stat(self.file_name)
+        return (info.st_size, info.st_mtime)
+
+    def _read_index(self):
+        """private method which reads the index of the file
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        try:
+            f = open(self.file_name, 'rb')
+            try:
+                self.signature = self._signature()
+                if f.read(len(magic)) != magic:
+                    raise BadSectionedFile('%s is not a sectioned file' \
+                        % self.file_name)
+                version, num_sections = struct.unpack(_header_format,
+                    f.read(struct.calcsize(_header_format)))
+                if version != format_version:
+                    raise BadSectionedFile(
+                        'unknown format version %d of sectioned file %s' \
+                        % (version, self.file_name))
+                for ii in range(num_sections):
+                    length, = struct.unpack(_name_format,
+                        f.read(struct.calcsize(_name_format)))
+                    name = f.read(length)
+                    self.index[name] = struct.unpack(_entry_format,
+                        f.read(struct.calcsize(_entry_format)))
+            finally:
+                f.close()
+        except (IOError, OSError, struct.error), e:
+            raise BadSectionedFile('error reading index of %s: %s' \
+                % (self.file_name, e))
+
+    def keys(self):
+        """returns the names of the sections
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *[STR]* -- the names
+        """
+        return self.index.keys()
+
+    def has_key(self, name):
+        """indicates whether the file has a given section
+
+        **INPUTS**
+
+        *STR name* -- name of the section
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the section exists
+        """
+        return self.index.has_key(name)
+
+    def is_loaded(self, name):
+        """indicates whether a given section has already been loaded
+
+        **INPUTS**
+
+        *STR name* -- name of the section
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the section has been loaded
+        """
+        return self.loaded.has_key(name)
+
+    def __getitem__(self, name):
+        if not self.loaded.has_key(name):
+            self.loaded[name] = self.load(name)
+        return self.loaded[name]
+
+    def get(self, name, default = None):
+        """returns the value of a section, loading it if necessary
+
+        **INPUTS**
+
+        *STR name* -- name of the section
+
+        *ANY default* -- value to return if there is no such section
+
+        **OUTPUTS**
+
+        *ANY* -- the value
+        """
+        if not self.index.has_key(name):
+            return default
+        return self[name]
+
+    def load(self, name):
+        """reads and unpickles a section
+
+        Note: the value is not remembered, use [__getitem__] for that.
+
+        **INPUTS**
+
+        *STR name* -- name of the section
+
+        **OUTPUTS**
+
+        *ANY* -- the value of the section
+
+        .. [__getitem__] file:///./SectionedFile.SectionedFileReader.html#__getitem__"""
+        offset, length, crc = self.index[name]
+        try:
+            if self._signature() != self.signature:
+                raise BadSectionedFile('%s has changed since it was opened' \
+                    % self.file_name)
+            f = open(self.file_name, 'rb')
+            try:
+                f.seek(offset)
+                data = f.read(length)
+            finally:
+                f.close()
+        except (IOError, OSError), e:
+            raise BadSectionedFile('error reading section %s of %s: %s' \
+                % (name, self.file_name, e))
+        if len(data) != length or zlib.crc32(data) & 0xffffffffL != crc:
+            raise BadSectionedFile('section %s of %s is corrupted' \
+                % (name, self.file_name))
+        return cPickle.loads(data)
+
+    def load_all(self):
+        """loads all sections which haven't been loaded yet
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: ANY}* -- the complete dictionary (a new dictionary, but
+        whose values are shared with this reader)
+        """
+        d = {}
+        for name in self.index.keys():
+            d[name] = self[name]
+        return d
+
+
+class LazySection(Object):
+    """stand-in for an attribute whose value is a section of a
+    sectioned file which hasn't been loaded yet.
+
+    The first time any regular attribute of the stand-in is accessed,
+    it loads the section, replaces itself with the value in its owner,
+    and forwards the access to the value, so callers don't need to know
+    whether the value was loaded yet.  Special attributes (like
+    __getstate__) are not forwarded, so owners must call [resolved] on
+    the attribute before pickling or copying it.
+
+    **INSTANCE ATTRIBUTES**
+
+    [SectionedFileReader] *reader* -- the file containing the section
+
+    *STR name* -- name of the section
+
+    *ANY owner* -- object having the stand-in as an attribute
+
+    *STR attribute* -- name of that attribute
+
+    *FCT(STR) on_failure* -- function to call with an error message if
+    the section can't be loaded.  Its return value is used in place of
+    the value of the section.
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [resolved] file:///./SectionedFile.html#resolved
+    .. [SectionedFileReader] file:///./SectionedFile.SectionedFileReader.html"""
+
+    def __init__(self, reader, name, owner, attribute, on_failure, **args):
+        self.deep_construct(LazySection,
+                            {'reader': reader,
+                             'name': name,
+                             'owner': owner,
+                             'attribute': attribute,
+                             'on_failure': on_failure},
+                            args)
+
+    def resolve(self):
+        """loads the section and replaces the stand-in with it in its
+        owner
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *ANY* -- the value of the section
+        """
+        try:
+            value = self.reader[self.name]
+        except (BadSectionedFile, cPickle.UnpicklingError, EOFError), e:
+            value = self.on_failure(str(e))
+        if self.owner is not None:
+            setattr(self.owner, self.attribute, value)
+            self.owner = None
+        return value
+
+    def __getattr__(self, name):
+        if name[:2] == '__' or not self.__dict__.get('owner'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+
+def lazy_section(sections, name, owner, attribute, on_failure):
+    """returns the value to assign to an attribute which should be
+    loaded lazily from a section
+
+    **INPUTS**
+
+    *{STR: ANY}* sections -- a dictionary or a [SectionedFileReader]
+
+    *STR name* -- name of the section
+
+    *ANY owner* -- object whose attribute is being initialized
+
+    *STR attribute* -- name of the attribute
+
+    *FCT(STR) on_failure* -- function to call if the section can't be
+    loaded (see [LazySection])
+
+    **OUTPUTS**
+
+    *ANY* -- the value of the section if it is already available,
+    otherwise a [LazySection]
+
+    .. [SectionedFileReader] file:///./SectionedFile.SectionedFileReader.html
+    .. [LazySection] file:///./SectionedFile.LazySection.html"""
+    if isinstance(sections, SectionedFileReader) and \
+       not sections.is_loaded(name):
+        return LazySection(sections, name, owner, attribute, on_failure)
+    return sections[name]
+
+def resolved(value):
+    """loads the value of an attribute which may not have been loaded
+    yet
+
+    **INPUTS**
+
+    *ANY* value -- value of the attribute, possibly a [LazySection]
+
+    **OUTPUTS**
+
+    *ANY* -- the actual value
+
+    .. [LazySection] file:///./SectionedFile.LazySection.html"""
+    if isinstance(value, LazySection):
+        return value.resolve()
+    return value
+
+def loaded(sections):
+    """returns a plain dictionary with all the sections
+
+    **INPUTS**
+
+    *{STR: ANY}* sections -- a dictionary or a [SectionedFileReader]
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the dictionary itself, or all the sections loaded
+    from the reader
+
+    .. [SectionedFileReader] file:///./SectionedFile.SectionedFileReader.html"""
+    if isinstance(sections, SectionedFileReader):
+        return sections.load_all()
+    return sections
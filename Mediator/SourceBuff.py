@@ -36,6 +36,28 @@ import AppTracker
 
 import sb_mixins
 
+# stamp given to the most recent version of the contents of any buffer
+# (see new_generation)
+last_generation = 0
+
+def new_generation():
+    """returns a new stamp for a version of the contents of a buffer.
+    Stamps increase with each call, and are unique across all buffers,
+    so a stamp stored with the state of a buffer can't match the
+    contents of another buffer (even one with the same name).
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *INT* -- the stamp
+    """
+    global last_generation
+    last_generation = last_generation + 1
+    return last_generation
+
 class SourceBuff(OwnerObject):
     """Interface to a buffer being edited in the programming environment
    
@@ -62,6 +84,10 @@ class SourceBuff(OwnerObject):
     INT *print_nlines* -- When printing content of buffer to STDOUT
     (*print_buff* methods), print this number of lines before and
     after current line.
+
+    INT *contents_generation* -- stamp of the current version of the
+    contents of the buffer (see new_generation), renewed by on_change,
+    or None if the buffer isn't told about all changes to its contents
     
 
     CLASS ATTRIBUTES**
@@ -73,7 +99,8 @@ class SourceBuff(OwnerObject):
         self.deep_construct(SourceBuff,
                             {'app': app,
                              'buff_name': buff_name,
-                             'print_nlines': 3},
+                             'print_nlines': 3,
+                             'contents_generation': new_generation()},
                             attrs
                             )                            
         self.name_parent('app')  
@@ -89,6 +116,37 @@ class SourceBuff(OwnerObject):
         
         STR -- name of the buffer."""
         return self.buff_name
+
+    def generation(self):
+        """returns the generation of the contents of the buffer, which
+        changes whenever the contents change
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *INT* -- the generation, or None if the buffer can't tell when
+        its contents change
+        """
+        return self.contents_generation
+
+    def changed_since(self, generation):
+        """tells whether the contents of the buffer may have changed
+        since they had a given generation
+
+        **INPUTS**
+
+        *INT generation* -- the generation previously returned by the
+        generation method of this buffer, or None
+
+        **OUTPUTS**
+
+        *BOOL* -- false if the contents are known to be unchanged (though
+        changes which restored the same contents count as changes)
+        """
+        return generation is None or generation != self.contents_generation
         
     def on_change(self, start, end, text, program_initiated):
         """method which should be called after the contents of a buffer
@@ -119,6 +177,11 @@ class SourceBuff(OwnerObject):
         if program_initiated:
             debug.trace('SourceBuff.on_change', 
                 '(%d, %d) "%s" in %s\n' % (start, end, text, self.name()))
+# don't start a new generation for changes which replace nothing with
+# nothing
+        if self.contents_generation is not None \
+                and (start is None or start != end or text):
+            self.contents_generation = new_generation()
         self.app.on_change(self.name(), start, end, text, program_initiated)
 
     def rename_buffer_cbk(self, new_buff_name):
@@ -27,7 +27,7 @@ import debug
 from debug import trace, tracing
 
 import SourceBuff
-import util
+import find_difference, TextStore, util
 
 from Object import Object
 
@@ -75,25 +75,34 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
 
     {STR: STR} *cache* -- Key is the name of a cached information
     about the buffer, and value is the value of that information.
+    The contents of the buffer (under 'get_text') are cached in a
+    [TextStore].
     
     BOOL *use_cache=1* -- If *false*, disable use of the cache. Use this ONLY 
     if you are debugging a problem and suspect it has something to do with the 
     caching.
 
+    CLASS *text_store_class* -- subclass of [TextStore] used to cache
+    the contents of the buffer (by default, TextStore.default_store_class)
+
     CLASS ATTRIBUTES**
     
     *none* -- 
 
     ..[synchronize_with_app] file:///./AppStateCached.AppStateCached.html#synchronize
     ..[AppState] AppState.AppState.html
-    ..[SourceBuff] SourceBuff.SourceBuff.html"""
+    ..[SourceBuff] SourceBuff.SourceBuff.html
+    ..[TextStore] file:///./TextStore.TextStore.html"""
 
-    def __init__(self, **attrs):
+    def __init__(self, text_store_class = None, **attrs):
         self.init_attrs({'cache': {}})        
         self.deep_construct(SourceBuffCached,
-                            {'use_cache': 1},
+                            {'use_cache': 1,
+                             'text_store_class': text_store_class},
                             attrs
                             )
+        if self.text_store_class is None:
+            self.text_store_class = TextStore.default_store_class
         # Set use_cache=0 ONLY if you are debugging a problem and suspect it 
         # has something to do with the caching.
 #        self.use_cache = 0                    
@@ -129,13 +138,13 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
            return not (self.cache.has_key(name) and self.cache[name] != None)
            
     def _not_cached_multiple(self, names):
-        trace('SourceBuffCached._not_cached_multiple', 'names=%s' % names)
+        trace('SourceBuffCached._not_cached_multiple', 'names=%s', names)
         answer = 0
         for a_name in names:
            if self._not_cached(a_name):
               answer = 1
               break
-        trace('SourceBuffCached._not_cached_multiple', 'returning %s' % answer)
+        trace('SourceBuffCached._not_cached_multiple', 'returning %s', answer)
         return answer  
 
     def _put_cache(self, name, value):
@@ -144,7 +153,7 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
            
     def _put_cache_multiple(self, names, values):
         if tracing('SourceBuffCached._put_cache_multiple'):
-            trace('SourceBuffCached._put_cache_multiple', 'names=%s, values=%s' % (repr(names), repr(values)))
+            trace('SourceBuffCached._put_cache_multiple', 'names=%r, values=%r', names, values)
         for ii in range(len(names)):
             self._put_cache(names[ii], values[ii])
            
@@ -155,12 +164,12 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
            return None
            
     def _get_cache_multiple(self, names):
-        trace('SourceBuffCached._get_cache_multiple', 'names=%s' % repr(names))
+        trace('SourceBuffCached._get_cache_multiple', 'names=%r', names)
         values = []
         for a_name in names:
             values.append(self._get_cache(a_name))
         if tracing('SourceBuffCached._get_cache_multiple'):
-            trace('SourceBuffCached._get_cache_multiple', 'returning values=%s' % repr(values))
+            trace('SourceBuffCached._get_cache_multiple', 'returning values=%r', values)
         return values
 
     def _get_cache_element(self, elt_name, get_from_app_method):
@@ -195,8 +204,8 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
         
         [ANY] *values* -- values of each of the elements.
         """ 
-        trace('SourceBuffCached._get_cache_element_multiple', 'elt_names=%s, get_from_app_method=%s, self.use_cache=%s' % 
-                                                              (repr(elt_names), get_from_app_method, self.use_cache))
+        trace('SourceBuffCached._get_cache_element_multiple', 'elt_names=%r, get_from_app_method=%s, self.use_cache=%s',
+                                                              elt_names, get_from_app_method, self.use_cache)
         if not self.use_cache:
            debug.trace('SourceBuffCached._get_cache_element_multiple', 'not using cache')        
            values = apply(get_from_app_method)
@@ -221,7 +230,7 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
            values = self._get_cache_multiple(elt_names)
            
         if tracing('SourceBuffCached._get_cache_element_multiple'):
-            debug.trace('SourceBuffCached._get_cache_element_multiple', 'returning values=%s' % repr(values))
+            debug.trace('SourceBuffCached._get_cache_element_multiple', 'returning values=%r', values)
         return values
         
 
@@ -356,9 +365,9 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
 
         *STR* -- contents of specified range of the buffer
         """
-        trace('SourceBuffCached.get_text', 'start=%s, end=%s' % (start, end))
+        trace('SourceBuffCached.get_text', 'start=%s, end=%s', start, end)
                     
-        text = self._get_cache_element('get_text', self._get_text_from_app)
+        store = self._text_store()
 
         #
         # Note: cannot invoke self.make_valid_range() because it causes
@@ -367,14 +376,42 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
         #      | _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ _ | 
         #             
         if start == None: start = 0
-        if end == None: end = len(text)
+        if end == None: end = store.len()
         if end < start:
             tmp = end
             end = start
             start = tmp
 
 
-        return text[start:end]
+        return store.text(start, end)
+
+    def _text_store(self):
+        """returns the contents of the buffer, from the cache (or from
+        the external editor if they are not cached)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *TextStore* -- the contents
+        """
+        return self._get_cache_element('get_text', self._text_store_from_app)
+
+    def _text_store_from_app(self):
+        """retrieves the contents of the buffer directly from external
+        editor
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *TextStore* -- the contents
+        """
+        return self.text_store_class(self._get_text_from_app())
 
 
     def _get_text_from_app(self, start = None, end = None):
@@ -437,7 +474,7 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
 
         *INT* length 
         """
-        return len(self.contents())
+        return self._text_store().len()
 
 
     def newline_conventions(self):
@@ -549,8 +586,8 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
                 'no cache - ignoring callback')
             pass
         else:
-            old_text = self.get_text()
-            self._put_cache('get_text', old_text[:range[0]] + old_text[range[1]:])
+            old_text = self._get_cache('get_text')
+            self._put_cache('get_text', old_text.replace(range[0], range[1], ''))
 
         self.uncache_data_after_buffer_change(what_changed = 'get_text')
         
@@ -575,7 +612,7 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
                 'range=%s, len(text) = %d, text="%s..."' \
                 % (range, len(text), text[0:60]))
         if tracing('SourceBuffCached.insert_cbk'):
-            trace('SourceBuffCached.insert_cbk', 'range=%s, text=\'%s\'' % (range, text))
+            trace('SourceBuffCached.insert_cbk', 'range=%s, text=\'%s\'', range, text)
 
 #        if range == None:
 #            range = self.get_selection()
@@ -600,9 +637,9 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
             pass
         else:
             trace('SourceBuffCached.insert_cbk', 'updating cached value')
-            old_text = self.get_text()
-            self._put_cache('get_text', old_text[:range[0]] + text + \
-                     old_text[range[1]:])
+            old_text = self._get_cache('get_text')
+            self._put_cache('get_text', old_text.replace(range[0], range[1],
+                text))
 
         self.uncache_data_after_buffer_change(what_changed = 'get_text')
         
@@ -624,24 +661,25 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
                 'len(text) = %d, text="%s..."' \
                 % (len(text), text[0:60]))
         if tracing('SourceBuffCached.contents_cbk'):
-            trace('SourceBuffCached.contents_cbk', 'range=%s, text=\'%s\'' % (range, text))
+            trace('SourceBuffCached.contents_cbk', 'range=%s, text=\'%s\'', range, text)
 
 
         SourceBuff.SourceBuff.contents_cbk(self, text)
         if self._not_cached('get_text'):
 # if contents are not cached, cache them
-            self._put_cache('get_text', text)
+            self._put_cache('get_text', self.text_store_class(text))
             self.uncache_data_after_buffer_change(what_changed = 'get_text')
             if tracing('SourceBuffCached.contents_cbk'):
                 trace('SourceBuffCached.contents_cbk', 
                     ('** upon exit, self._get_cache("cur_pos")=%s,' +
                      ' self._get_cache("get_text")=%s') % \
                     (self._get_cache("cur_pos"), 
-                    repr(self._get_cache("get_text"))))
+                    repr(self._get_cache("get_text").text())))
         else:
 # otherwise, treat this as an insert_cbk
             start, end, change = \
-                find_difference.find_difference(self.cache['get_text'], text)
+                find_difference.find_difference(self.cache['get_text'].text(),
+                text)
             self.insert_cbk(range = (start, end), text = change)
         
 
@@ -664,8 +702,7 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
         *none* -- 
         """
         trace('SourceBuffCached.pos_selection_cbk',
-            'pos is %d, selection is %d, %d' % (pos, selection[0],
-            selection[1]))
+            'pos is %d, selection is %d, %d', pos, selection[0], selection[1])
         self._put_cache('get_selection', selection)
         self._put_cache('cur_pos', pos)
         self._put_cache('get_visible', visible_range) 
@@ -691,14 +728,14 @@ class SourceBuffCached(SourceBuff.SourceBuffWithServices):
 
     def uncache_data_after_buffer_change(self, what_changed=None):
         trace('SourceBuffCached.uncache_data_after_buffer_change',
-              'invoked, what_changed="%s"' % what_changed)
+              'invoked, what_changed="%s"', what_changed)
         #
         # Uncache data that may have become obsolete as a result of a
         # buffer change.
         #
         for cache_entry_name in ('cur_pos', 'get_visible', 'get_selection'):
             trace('SourceBuffCached.uncache_data_after_buffer_change',
-                  '** cache_entry_name="%s"' % cache_entry_name)
+                  '** cache_entry_name="%s"', cache_entry_name)
             
             if cache_entry_name != what_changed:
                 #
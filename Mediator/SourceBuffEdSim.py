@@ -200,6 +200,34 @@ class SourceBuffEdSim(SourceBuff.BackspaceMixIn,
     def make_position_visible(self):
         pass
 
+    def on_change(self, start, end, text, program_initiated):
+        """method which should be called after the contents of a buffer
+        is changed.  Also keeps the index of line starts of the
+        [SB_ServiceLineManip] up to date.
+
+        **INPUTS**
+
+        *INT* start -- start of the modified range
+
+        *INT* end -- end of the modified range.
+
+        If both start and end are None, this is a buffer contents
+        update (which may or may not reflect an actual change)
+
+        *STR* text -- the new text replacing this range
+
+        *BOOL* program_initiated -- true if the change was initiated by
+        the mediator
+
+        **OUTPUTS**
+
+        *none*
+
+        ..[SB_ServiceLineManip] file:///./sb_services.SB_ServiceLineManip.html"""
+        self.line_srv.on_change(start, end, text)
+        SourceBuffNonCached.SourceBuffNonCached.on_change(self, start, end,
+            text, program_initiated)
+
     def line_num_of(self, position = None):
         """Returns the line number for a particular cursor position
         
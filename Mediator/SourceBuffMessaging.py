@@ -119,13 +119,13 @@ class SourceBuffMessaging(SourceBuffWithDiffs.SourceBuffWithDiffs):
         response = self.app.talk_msgr.get_mess(expect=['get_pos_selection_resp'])
         value = response[1]['value']
         trace('SourceBuffMessaging._get_pos_selection_from_app',
-            'value = %s' % value)
+            'value = %s', value)
         pos = messaging.messarg2int(value['pos'])
         trace('SourceBuffMessaging._get_pos_selection_from_app',
-            'pos = %d' % pos)
+            'pos = %d', pos)
         selection = messaging.messarg2inttuple(value['selection'])
         trace('SourceBuffMessaging._get_pos_selection_from_app',
-            'selection = %s' % repr(selection))
+            'selection = %r', selection)
         return (pos, selection)
 
     def set_selection(self, range, cursor_at = 1):
@@ -182,7 +182,7 @@ class SourceBuffMessaging(SourceBuffWithDiffs.SourceBuffWithDiffs):
         *STR* -- contents of specified range of the buffer
         """
 
-        trace('SourceBuffMessaging._get_text_from_app', 'start=%s, end=%s' % (start, end))
+        trace('SourceBuffMessaging._get_text_from_app', 'start=%s, end=%s', start, end)
         
         args = {'start': start, 'end': end,
             'buff_name': self.name()}
@@ -390,7 +390,7 @@ class SourceBuffMessaging(SourceBuffWithDiffs.SourceBuffWithDiffs):
         
         *none* -- 
         """
-        trace('SourceBuffMessaging.move_relative_page', 'direction=%s, num=%s' % (direction, num))
+        trace('SourceBuffMessaging.move_relative_page', 'direction=%s, num=%s', direction, num)
         args = {'direction': direction, 'num': num,
             'buff_name': self.name()}
         self.app.talk_msgr.send_mess('move_relative_page', args)
@@ -500,7 +500,7 @@ class SourceBuffMessaging(SourceBuffWithDiffs.SourceBuffWithDiffs):
         insertion reported by the editor.
         """
 
-        trace('SourceBuffMessaging.insert', 'text=%s, range=%s, self.name()=%s' % (text, range, self.name()))
+        trace('SourceBuffMessaging.insert', 'text=%s, range=%s, self.name()=%s', text, range, self.name())
         
         args = {'text': text, 'range': range,
             'buff_name': self.name()}
@@ -580,7 +580,7 @@ class SourceBuffMessaging(SourceBuffWithDiffs.SourceBuffWithDiffs):
         
     def copy_selection(self):
         """Copy the selected text"""
-        trace('SourceBuffMessaging.copy_selection', '** invoked on buffer %s' % self.name())
+        trace('SourceBuffMessaging.copy_selection', '** invoked on buffer %s', self.name())
         self.app.talk_msgr.send_mess('copy_selection', {'buff_name': self.name()})
         response = self.app.talk_msgr.get_mess(expect=['copy_selection_resp'])
         self.app.update_response = 1
@@ -698,7 +698,7 @@ class SourceBuffInsertIndentMess(SourceBuffMessaging):
         self.app.talk_msgr.send_mess('insert_indent', args)
         response = self.app.talk_msgr.get_mess(expect=['insert_indent_resp'])        
         trace('SourceBuffInsertIndentMess.insert_indent',
-            'updates = %s' % response[1]['updates'])
+            'updates = %s', response[1]['updates'])
         self.app.update_response = 1
         updates = self.app.apply_upd_descr(response[1]['updates'])
         self.app.update_response = 0
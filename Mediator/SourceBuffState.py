@@ -44,17 +44,22 @@ class SourceBuffState(SourceBuffCookie):
     or end (1) of the selection_range
 
     *(INT, INT)* selection_range -- range of the selection
+
+    *INT* contents_generation -- generation of the contents of the
+    buffer when the state was stored, or None if unknown (see
+    sb_services.SB_ServiceFullState)
     
     """
     
     def __init__(self, buff_name, contents, selection, cursor_at = 1,
-                 last_search = None, **attrs):
+                 last_search = None, generation = None, **attrs):
         self.deep_construct(SourceBuffState,
                             {'text': contents,
                             'buff_name': buff_name,
                             'selection_range': selection,
                             'cursor_at_end': cursor_at,
-                             'logged_search': last_search},
+                             'logged_search': last_search,
+                             'contents_generation': generation},
                             attrs
                             )
 
@@ -141,6 +146,20 @@ class SourceBuffState(SourceBuffCookie):
         *STR* -- contents of the buffer
         """
         return self.text
+
+    def generation(self):
+        """returns the generation of the stored contents
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *INT* -- the generation, or None if unknown
+        """
+        return self.contents_generation
+
     def last_search(self):
         """returns last logged search
 
@@ -63,6 +63,38 @@ class ReverseBufferChange(Object):
                              'range': range
                             }, args)
 
+    def compose(self, next):
+        """composes this reverse change with the next one, if the region 
+        replaced by the next change overlaps or touches the new text of 
+        this change
+
+        **INPUTS**
+
+        *ReverseBufferChange next* -- the inverse of the immediately 
+        subsequent change
+
+        **OUTPUTS**
+
+        *ReverseBufferChange* -- a single reverse change which would undo 
+        both changes, or None if the regions were not contiguous
+        """
+        start, end = self.range
+        next_start, next_end = next.range
+# end of the text replaced by the next change, before that change
+        next_old_end = next_start + len(next.old_text)
+        if next_start > end or next_old_end < start:
+            return None
+# the parts of the text replaced by the next change which lie outside
+# the new text of this change were not changed by this change
+        old_text = self.old_text
+        if next_start < start:
+            old_text = next.old_text[:start - next_start] + old_text
+        if next_old_end > end:
+            old_text = old_text + next.old_text[end - next_start:]
+        new_start = min(start, next_start)
+        new_end = max(end, next_old_end) + next_end - next_old_end
+        return ReverseBufferChange(old_text, (new_start, new_end))
+
 class AccumulatedBufferChange(Object):
     """object representing a change to a contiguous region of a
     buffer
@@ -313,7 +345,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
         debug.trace('SourceBuffWithDiffs', 'clearing stacks')
         self.change_history = IndexedLeakyStack()
         self.cookie_jar = KeyedLeakyStack(generator = KeyGeneratorRandom(), 
-            max_cookies = self.max_cookies)
+            max_height = self.max_cookies)
 
     def push_cookie(self, data):
         """push a cookie onto the cookie_jar stack, while also
@@ -356,6 +388,17 @@ class SourceBuffWithDiffs(SourceBuffCached):
             debug.trace('SourceBuffWithDiffs._push_change',
                 'change to buff %s: old text "%s", replaced range = %s' \
                 % (self.name(), change.old_text, repr(change.range)))
+# merge contiguous changes made since the last cookie was stored, so
+# that they can be undone in one step
+        if not self.change_history.empty() and not self._cookie_at_top():
+            top = self.change_history.height() - 1
+            merged = self.change_history.peek(top).compose(change)
+            if merged:
+                debug.trace('SourceBuffWithDiffs._push_change',
+                    'merged with previous change')
+                self.change_history.pop()
+                self.change_history.push(merged)
+                return
         dropped = self.change_history.push(change)
         if dropped:
             if tracing('SourceBuffWithDiffs._push_change'):
@@ -365,39 +408,116 @@ class SourceBuffWithDiffs(SourceBuffCached):
 # level of the dropped change was:
             dropped_level = self.change_history.lowest()
             debug.trace('SourceBuffWithDiffs._push_change',
-                'dropped level %d' % dropped_level)
-# look through the cookie stack for cookies which referred to changes at or
-# below the dropped level, and drop them, since they are no longer valid
-            lowest_cookie = self.cookie_jar.lowest()
-            jar_height = self.cookie_jar.height()
+                'dropped level %d', dropped_level)
+# drop the cookies which referred to changes at or below the dropped
+# level, since they are no longer valid
+            i = self._first_cookie_above(dropped_level)
             debug.trace('SourceBuffWithDiffs._push_change',
-                'cookie jar lowest, height = %d, %d' % (lowest_cookie,
-                jar_height))
+                'dropping cookies below index %d', i)
+            dropped_cookies = self.cookie_jar.drop_below(i)
             debug.trace('SourceBuffWithDiffs._push_change',
-                'looking through cookie jar...')
-            found = 0
-            for i in range(lowest_cookie, jar_height):
-                cookie_data = self.cookie_jar.peek(i)
-                level = cookie_data.level
-                debug.trace('SourceBuffWithDiffs._push_change',
-                    'at index %d, level = %d' % (i, level))
-                if level > dropped_level:
-                    debug.trace('SourceBuffWithDiffs._push_change',
-                        'found level')
-                    found = 1
-                    break
-            if found:
-                debug.trace('SourceBuffWithDiffs._push_change',
-                    'dropping cookies below index %d' % i)
-                dropped_cookies = self.cookie_jar.drop_below(i)
-                debug.trace('SourceBuffWithDiffs._push_change',
-                    'dropped %d cookies' % dropped_cookies)
+                'dropped %d cookies', dropped_cookies)
+
+    def _net_change(self, change):
+        """private method which trims the text common to the old text of 
+        a reverse change and the current text of its range, since a 
+        change merged from several contiguous changes may restore some 
+        of the text which is already there (e.g. after typing a word and 
+        then backspacing over part of it)
+
+        **INPUTS**
+
+        *ReverseBufferChange change* -- the change to undo
+
+        **OUTPUTS**
+
+        *(STR, INT, INT)* -- the text to restore, and the start and end 
+        of the range it should replace, or (None, None, None) if the 
+        range already contains the old text
+        """
+        text = change.old_text
+        start, end = change.range
+        current = self.get_text(start, end)
+        if current == text:
+            return None, None, None
+        shorter = min(len(current), len(text))
+        prefix = 0
+        while prefix < shorter and current[prefix] == text[prefix]:
+            prefix = prefix + 1
+        suffix = 0
+        while suffix < shorter - prefix and \
+                current[-1 - suffix] == text[-1 - suffix]:
+            suffix = suffix + 1
+        return text[prefix:len(text) - suffix], start + prefix, end - suffix
+
+    def _cookie_at_top(self):
+        """private method which tells whether the top cookie in the
+        cookie_jar refers to the current top of the change_history (in
+        which case the next change must not be merged with the previous 
+        one)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the top cookie refers to the top of the
+        change_history
+        """
+        height = self.cookie_jar.height()
+        if height <= self.cookie_jar.lowest():
+            return 0
+        return self.cookie_jar.peek(height - 1).level \
+            >= self.change_history.height()
+
+    def _first_cookie_above(self, level):
+        """private method which finds the lowest cookie in the
+        cookie_jar which refers to a level above a given level of the
+        change_history.
+
+        Cookies are pushed with the current height of the change_history,
+        and restore_state pops cookies before popping changes, so the
+        levels of the cookies never decrease from the bottom to the top
+        of the cookie_jar, and a binary search can be used.
+
+        **INPUTS**
+
+        *INT level* -- the level in the change_history
+
+        **OUTPUTS**
+
+        *INT* -- the index of the cookie in the cookie_jar, or the height
+        of the cookie_jar if no cookie refers to a higher level
+        """
+        low = self.cookie_jar.lowest()
+        high = self.cookie_jar.height()
+        while low < high:
+            middle = (low + high) / 2
+            if self.cookie_jar.peek(middle).level > level:
+                high = middle
             else:
-                debug.trace('SourceBuffWithDiffs._push_change',
-                    'dropping cookies below height' % i)
-                self.cookie_jar.drop_below(self.cookie_jar.height())
-                debug.trace('SourceBuffWithDiffs._push_change',
-                    'dropped %d cookies' % dropped_cookies)
+                low = middle + 1
+        return low
+
+    def _first_cookie_above_scan(self, level):
+        """private method equivalent to _first_cookie_above, which looks
+        through the whole cookie_jar (used only to check
+        _first_cookie_above)
+
+        **INPUTS**
+
+        *INT level* -- the level in the change_history
+
+        **OUTPUTS**
+
+        *INT* -- the index of the cookie in the cookie_jar, or the height
+        of the cookie_jar if no cookie refers to a higher level
+        """
+        for i in range(self.cookie_jar.lowest(), self.cookie_jar.height()):
+            if self.cookie_jar.peek(i).level > level:
+                return i
+        return self.cookie_jar.height()
 
     def during_undo(self, text, range):
         """while undoing, accumulates consecutive changes so we can
@@ -445,7 +565,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
         if upper is None:
             upper = self.change_history.height()
         debug.trace('SourceBuffWithDiffs.no_change',
-            'lower, upper = %d, %d' % (lower, upper))
+            'lower, upper = %d, %d', lower, upper)
         return lower == upper
 
 
@@ -467,7 +587,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
         *none* -- 
         """
         debug.trace('SourceBuffWithDiffs.delete_cbk',
-            'buff %s: deleting range = %s' % (self.name(), repr(range)))
+            'buff %s: deleting range = %r', self.name(), range)
         if self.undoing:
             debug.trace('SourceBuffWithDiffs.delete_cbk',
                 'in process of undoing')
@@ -486,11 +606,11 @@ class SourceBuffWithDiffs(SourceBuffCached):
             else:
 # we need the old text, so we have to do all this processing before
 # calling SourceBuffCached.delete_cbk
-                deleted = self.cache['get_text'][range[0]:range[1]]
+                deleted = self.cache['get_text'].text(range[0], range[1])
 # don't record deletions of nothing
                 if tracing('SourceBuffWithDiffs.delete_cbk'):
                     debug.trace('SourceBuffWithDiffs.delete_cbk',
-                        'deleted text "%s"' % deleted)
+                        'deleted text "%s"', deleted)
                 if deleted:
 # for the reverse diff, we need the range of the new text
 # The start of the new text is the same as the start of the old text,
@@ -545,11 +665,12 @@ class SourceBuffWithDiffs(SourceBuffCached):
 # calling SourceBuffCached.insert_cbk
                 range_non_nil = [range[0], range[1]]
                 if range_non_nil[1] == None:
-                   range_non_nil[1] = len(self._get_cache('get_text')) - 1
-                replaced = self.cache['get_text'][range_non_nil[0]:range_non_nil[1]]
+                   range_non_nil[1] = self._get_cache('get_text').len() - 1
+                replaced = self.cache['get_text'].text(range_non_nil[0],
+                    range_non_nil[1])
                 if tracing('SourceBuffWithDiffs.insert_cbk'):
                     debug.trace('SourceBuffWithDiffs.insert_cbk',
-                        'replaced text "%s"' % replaced)
+                        'replaced text "%s"', replaced)
 # don't record non-changes
                 if replaced != text:
 # for the reverse diff, we need the range of the new text
@@ -599,7 +720,8 @@ class SourceBuffWithDiffs(SourceBuffCached):
         
 # otherwise, treat this as an insert callback
         start, end, change = \
-               find_difference.find_difference(self.cache['get_text'], text)
+               find_difference.find_difference(self.cache['get_text'].text(),
+               text)
         self.insert_cbk(range = (start, end), text = change)
 
     def _state_cookie_class(self):
@@ -657,7 +779,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
         """
         level = self.change_history.height()
         debug.trace('SourceBuffWithDiffs.store_current_state',
-            'current level is %d' % level)
+            'current level is %d', level)
         selection = self.get_selection()
         pos = self.cur_pos()
         if pos == selection[0]:
@@ -668,7 +790,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
                           last_search = self.last_search)
         key = self.push_cookie(data)
         debug.trace('SourceBuffWithDiffs.store_current_state',
-            'key is %s' % key)
+            'key is %s', key)
         return DiffCookie(buff_name = self.name(), cookie_key = key)
 
     def restore_state(self, cookie):
@@ -697,16 +819,15 @@ class SourceBuffWithDiffs(SourceBuffCached):
                 'already inside a restore_state call')
             return 0
         debug.trace('SourceBuffWithDiffs.restore_state',
-            'key is %s' % cookie.cookie_key)
+            'key is %s', cookie.cookie_key)
         index = self.cookie_jar.index(cookie.cookie_key)
         debug.trace('SourceBuffWithDiffs.restore_state',
-            'at index %d in the cookie jar' % index)
+            'at index %d in the cookie jar', index)
         data = self.cookie_jar.peek(index)
 
         level = data.level
         debug.trace('SourceBuffWithDiffs.restore_state',
-            'data.level = %d out of %d' % \
-            (level, self.change_history.height()))
+            'data.level = %d out of %d', level, self.change_history.height())
 # later, we may put this stuff on a forward stack, but for now, just pop
 # it
         while self.cookie_jar.height() > index:
@@ -723,8 +844,11 @@ class SourceBuffWithDiffs(SourceBuffCached):
                     'change history height = %d, popping' \
                     % self.change_history.height())
                 change = self.change_history.pop()
-                text = change.old_text
-                start, end = change.range
+                text, start, end = self._net_change(change)
+                if start is None:
+                    debug.trace('SourceBuffWithDiffs.restore_state',
+                        'no net change')
+                    continue
                 self.accumulated = []
                 if tracing('SourceBuffWithDiffs.restore_state'):
                     debug.trace('SourceBuffWithDiffs.restore_state',
@@ -742,12 +866,13 @@ class SourceBuffWithDiffs(SourceBuffCached):
                 if text != accumulated_text:
                     if tracing('SourceBuffWithDiffs.restore_state'):
                         debug.trace('SourceBuffWithDiffs.restore_state',
-                           'text "%s" != expected "%s"' % (accumulated_text, text))
+                           'text "%s" != expected "%s"',
+                           accumulated_text, text)
                     break
-                if change.range != accumulated_range:
+                if (start, end) != accumulated_range:
                     debug.trace('SourceBuffWithDiffs.restore_state',
                        'range %s != expected %s' \
-                       % (repr(accumulated_range), repr(change.range)))
+                       % (repr(accumulated_range), repr((start, end))))
                     break
             success = 1
         finally:
@@ -903,12 +1028,12 @@ class SourceBuffWithDiffs(SourceBuffCached):
 
         if data.get_selection() != self.get_selection():
             debug.trace('SourceBuffWithDiffs.compare_selection_with_current',
-                'selections differ: %s, %s' % \
-                (repr(data.get_selection()), repr(self.get_selection())))
+                'selections differ: %r, %r',
+                data.get_selection(), self.get_selection())
             return 0
         if data.position() != self.cur_pos():
             debug.trace('SourceBuffWithDiffs.compare_selection_with_current',
-                'positions differ: %d, %d' % (data.position(), self.cur_pos()))
+                'positions differ: %d, %d', data.position(), self.cur_pos())
             return 0
         return 1
 
@@ -977,7 +1102,7 @@ class SourceBuffWithDiffs(SourceBuffCached):
             index = self.cookie_jar.index(cookie.cookie_key)
         except KeyError:
             debug.trace('SourceBuffWithDiffs.valid_cookie',
-                'unknown cookie key %s' % cookie.cookie_key)
+                'unknown cookie key %s', cookie.cookie_key)
             return 0
         try:
             data = self.cookie_jar.peek(index)
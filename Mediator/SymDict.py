@@ -28,14 +28,16 @@ import sb_services, SourceBuff
 from LangDef import LangDef
 import auto_test, PickledObject, sr_interface, vc_globals
 import WordTrie
-import DictConverter
+import PseudoSymbolIndex
+import symbol_harvester
+import DictConverter, SectionedFile, SymDictJournal
 import util
 from debug import trace, tracing
 import debug
 import StringIO
 import math
 
-import copy, cPickle, exceptions, os, re, string, sys
+import copy, cPickle, exceptions, heapq, os, re, string, sys
 import shutil
 import stat
 import time
@@ -46,7 +48,14 @@ import traceback
 
 language_definitions={}
 
-current_version = 5
+# methods whose calls are recorded in the SymDict journal
+journaled_methods = ['add_symbol', 'remove_symbol', 
+    'move_written_form_to_top_of_priority_list', 'prepend_abbreviations',
+    'add_abbreviation', 'add_abbreviations', 'add_alt_abbreviations',
+    'add_pronunciation', 'add_extra_expansion', 'add_acronym', 
+    'cleanup_dictionary']
+
+current_version = 6
 
 #
 # Minimum length for an abbreviation (short abbreviations tend to introduce
@@ -64,6 +73,18 @@ min_abbreviation_len = 2
 
 vocabulary_symbols_with_written_form = 1
 
+#
+# Regular expressions used by get_spoken_forms to split a symbol into
+# words, in the order in which they are applied (see the comments in
+# get_spoken_forms)
+#
+_symbol_splitters = [(re.compile('[^a-zA-Z0-9]+'), ' '),
+                     (re.compile('([0-9]+)'), ' \\1 '),
+                     (re.compile('([A-Z]+?)([A-Z][a-z]+)'), '\\1 \\2'),
+                     (re.compile('([a-z]+)([A-Z]+)'), '\\1 \\2'),
+                     (re.compile('(^\s+|\s+$)'), '')]
+_white_space = re.compile('\s+')
+
 
 def pluralize(word):
     """Finds the plural form of a word
@@ -329,12 +350,101 @@ class SymDict(OwnerObject):
     *{STR: {STR: 1}* _symbols_starting_with -- Caches the written forms of
     all symbols starting with a given letter as a set
 
+    [PseudoSymbolIndex] *_pseudo_symbol_index* -- index of the symbols in
+    *_symbols_starting_with*, used by [match_pseudo_symbol] to find the
+    candidate matches for a pseudo symbol without scanning all the
+    symbols starting with a given letter.
+
+    *BOOL* use_pseudo_symbol_index=1 -- if false, [match_pseudo_symbol]
+    scans the string returned by [symbols_as_one_string] (or all the
+    symbols, for a pseudo symbol starting with a digit) instead of
+    using *_pseudo_symbol_index*.  Used only for benchmarking.
+
+    [PseudoSymbolMatcherCache] *_matcher_cache* -- cache of the regexps
+    compiled by [match_pseudo_symbol] for recent pseudo symbols, and of
+    the native symbols they matched.  Must be invalidated for a given
+    letter whenever the set of symbols starting with that letter changes.
+
+    *{STR: regexp}* _word_regexps -- the regexps compiled by
+    [_score_symbol_match] to match each word of a pseudo symbol against
+    the corresponding part of a native symbol.  Cleared when it
+    reaches *max_word_regexps* entries.
+
     *[STR] standard_symbol_sources* -- List of files in which standard
     symbols for different languages are defined.
 
     *[STR] symbol_sources_read* -- List of files from which standard
     symbols have already been scanned.
 
+    *INT* harvest_processes=0 -- maximum number of worker processes
+    which [parse_symbols_from_files] may use to extract symbols from
+    source files in parallel.  If less than 2, the files are parsed
+    one after the other in the mediator process.
+
+    *{STR: ([STR], [STR], BOOL)} _expansion_memo* -- memo of
+    [expand_word], used by [get_spoken_forms].  Maps each word to its
+    expansions in order of preference, the same expansions sorted,
+    and a flag indicating whether the word is an unresolved
+    abbreviation.  Entries are forgotten whenever *expansions* changes
+    for the word (or its singular form), or when an entry with the
+    same spoken form (regardless of case) is added to or deleted from
+    the SR vocabulary through sr_interface, and the whole memo is
+    cleared whenever *expansions* is rebuilt or *word_exists* changes.
+    Call [clear_expansion_memo] after changing *common_hyphenated* or
+    *max_auto_acronym*.
+
+    *FCT BOOL(STR, STR) _memo_word_exists* -- value of *word_exists*
+    with which *_expansion_memo* was computed
+
+    *{STR: {STR: 1}} _memo_words_by_lower* -- the words in
+    *_expansion_memo*, indexed by their lowercase form
+
+    *INT _memo_vocabulary_generation* -- value of
+    sr_interface.vocabulary_generation up to which the changes to
+    the SR vocabulary have been applied to *_expansion_memo*
+
+    *INT* max_spoken_forms=32 -- maximum number of spoken forms
+    generated by [get_spoken_forms] for a symbol, or 0 for no limit.
+    When a symbol has more possible spoken forms, those using the
+    preferred expansion of most of its words are kept.
+
+    [HarvestCache] *_harvest_cache* -- symbols extracted from each of
+    the *standard_symbol_sources*, with the size, modification time and
+    digest of the file, so that only files whose contents changed are
+    parsed again, and only the symbols added to or removed from them
+    are applied to the dictionary.  Stored in the persistent symbol
+    dictionary file.
+
+    *BOOL* use_harvest_cache=1 -- if false, [parse_symbols_from_files]
+    parses the standard symbol sources again even if they haven't
+    changed.
+
+    *BOOL* use_sectioned_file=1 -- if true, [save] stores the persistent
+    dictionary as a binary [SectionedFile], from which
+    [init_from_file] loads *spoken_form_info* only when it is first
+    used.  Otherwise, it is stored as a single text pickle, as in older
+    versions.  Both formats can be read.
+
+    *BOOL* use_journal=1 -- if true, once the configuration is finished,
+    calls to the methods listed in *journaled_methods* are recorded in
+    *_journal*, which is appended to a journal file after each
+    utterance, instead of saving the whole dictionary.  The journal is
+    replayed by [init_from_file] if the mediator crashed before the
+    next [save].
+
+    [SymDictJournal] *_journal=None* -- the journal of changes made
+    since the last [save], or None if journaling hasn't started.
+
+    *INT* max_journal_entries=200 -- [flush_journal] saves the whole
+    dictionary (and empties the journal) once the journal holds this
+    many entries.
+
+    *INT* _journal_suspended=0 -- if positive, changes are not
+    recorded in the journal, because the operation making them ends
+    by saving the whole dictionary anyway, or is a journaled method
+    whose own call was recorded (so that replaying the journal doesn't
+    repeat the calls it makes to other journaled methods).
+
     *[STR] abbrev_sources* -- List of files in which
     abbreviations and expansions for symbol terms are defined.
 
@@ -395,10 +505,28 @@ class SymDict(OwnerObject):
     *{STR: * [LangDef] *}* language_definitions={} -- Key is the name
      of a language and the value is a language definition object which
      defines rules for parsing symbols in that language.
+
+    *INT* max_word_regexps=1000 -- maximum number of entries in
+    *_word_regexps*
         
     .. [LangDef] file:///./LangDef.LangDef.html
     .. [SymbolInfo] file:///./SymDict.SymbolInfo.html
-    .. [symbols_as_one_string] file:///./SymDict.SymDict.html#symbols_as_one_string"""
+    .. [PseudoSymbolIndex] file:///./PseudoSymbolIndex.PseudoSymbolIndex.html
+    .. [expand_word] file:///./SymDict.SymDict.html#expand_word
+    .. [get_spoken_forms] file:///./SymDict.SymDict.html#get_spoken_forms
+    .. [clear_expansion_memo] file:///./SymDict.SymDict.html#clear_expansion_memo
+    .. [HarvestCache] file:///./symbol_harvester.HarvestCache.html
+    .. [SectionedFile] file:///./SectionedFile.html
+    .. [save] file:///./SymDict.SymDict.html#save
+    .. [SymDictJournal] file:///./SymDictJournal.SymDictJournal.html
+    .. [flush_journal] file:///./SymDict.SymDict.html#flush_journal
+    .. [init_from_file] file:///./SymDict.SymDict.html#init_from_file
+    .. [PseudoSymbolMatcherCache] file:///./PseudoSymbolIndex.PseudoSymbolMatcherCache.html
+    .. [match_pseudo_symbol] file:///./SymDict.SymDict.html#match_pseudo_symbol
+    .. [symbols_as_one_string] file:///./SymDict.SymDict.html#symbols_as_one_string
+    .. [_score_symbol_match] file:///./SymDict.SymDict.html#_score_symbol_match"""
+
+    max_word_regexps = 1000
 
     def __init__(self, sym_file = None, interp = None, 
         export_file = None, match_threshold = 0.4, **attrs):
@@ -406,6 +534,12 @@ class SymDict(OwnerObject):
         # These attributes can't be set with constructor arguments
         self.decl_attrs({'_cached_symbols_as_one_string': {},
                          '_symbols_starting_with': {},
+                         '_pseudo_symbol_index': \
+                             PseudoSymbolIndex.PseudoSymbolIndex(),
+                         'use_pseudo_symbol_index': 1,
+                         '_matcher_cache': \
+                             PseudoSymbolIndex.PseudoSymbolMatcherCache(),
+                         '_word_regexps': {},
                          'spoken_form_info': WordTrie.WordTrie(),
                          'symbol_info': {},
                          'tentative_symbols': {},
@@ -415,6 +549,11 @@ class SymDict(OwnerObject):
                          'pronunciations': {},
                          'acronyms': {},
                          'extra_expansions': {},
+                         '_expansion_memo': {},
+                         '_memo_word_exists': None,
+                         '_memo_words_by_lower': {},
+                         '_memo_vocabulary_generation': None,
+                         'max_spoken_forms': 32,
                          'standard_symbol_sources': [],
                          'symbol_sources_read': [],
                          'abbrev_sources': [],
@@ -426,6 +565,14 @@ class SymDict(OwnerObject):
                          'min_chars_run_together': 4,
                          'min_non_consec_chars_for_approx_match': 3,
                          'max_auto_acronym': 3,
+                         'harvest_processes': 0,
+                         '_harvest_cache': symbol_harvester.HarvestCache(),
+                         'use_harvest_cache': 1,
+                         'use_sectioned_file': 1,
+                         'use_journal': 1,
+                         '_journal': None,
+                         'max_journal_entries': 200,
+                         '_journal_suspended': 0,
                          'word_exists': None,
                          'common_hyphenated': {'un': 0 , 'co': 0, 'non': 0, 
                              're': 0},
@@ -567,7 +714,7 @@ class SymDict(OwnerObject):
 # at the moment, spoken_form_info is redundant with symbol_info, except for 
 # ordering, but I'm not sure that will always be true, or what to do 
 # about ordering, so for now let's just store both
-        d['spoken_form_info'] = self.spoken_form_info
+        d['spoken_form_info'] = SectionedFile.resolved(self.spoken_form_info)
         d['abbreviations'] = self.abbreviations
         d['alt_abbreviations'] = self.alt_abbreviations
         d['acronyms'] = self.acronyms
@@ -576,6 +723,8 @@ class SymDict(OwnerObject):
         d['abbreviations'] = self.abbreviations
         d['unresolved_abbreviations'] = self.unresolved_abbreviations
         d['symbol_sources_read'] = self.symbol_sources_read
+        d['harvested_symbols'] = self._harvest_cache.entries
+        d['symbols_added_by_harvest'] = self._harvest_cache.added
         return d
 
     def save(self, file = None, export_abbreviations = 1):
@@ -600,6 +749,9 @@ class SymDict(OwnerObject):
             file = self.sym_file
         if file is None:
             return
+# build the dictionary first: lazily loaded sections are read from the
+# file, which is about to be overwritten
+        d = self.persistent_dict()
         try:
             backup = None
             if os.path.exists(file):
@@ -609,16 +761,20 @@ class SymDict(OwnerObject):
                 else:
                     backup = backup + '.bak'
                 shutil.copyfile(file, backup)
-            f = open(file, "w")
+            if self.use_sectioned_file:
+                f = open(file, "wb")
+            else:
+                f = open(file, "w")
         except:
             msg = 'WARNING: error creating SymDict state file %s\n' % file
             sys.stderr.write(msg)
             return
-            
-        d = self.persistent_dict()
 
         try:
-            cPickle.dump(d, f)
+            if self.use_sectioned_file:
+                SectionedFile.write_sections(f, d)
+            else:
+                cPickle.dump(d, f)
         except:
             msg = 'WARNING: error writing to SymDict state file %s\n' % file
             sys.stderr.write(msg)
@@ -630,6 +786,12 @@ class SymDict(OwnerObject):
             return
 
         f.close()
+        if file == self.sym_file:
+# the new file includes all the changes in the journal
+            if self._journal:
+                self._journal.start()
+            else:
+                SymDictJournal.SymDictJournal(file).discard()
         if self.sym_file and export_abbreviations:
 # unless we are running regression tests, export abbreviation
 # preferences to a file as well
@@ -727,8 +889,10 @@ class SymDict(OwnerObject):
         if self.expansions.has_key(abbreviation):
             if expansion not in self.expansions[abbreviation]:
                 self.expansions[abbreviation].append(expansion)
+                self._forget_expansions(abbreviation)
         else:
             self.expansions[abbreviation] = [expansion]
+            self._forget_expansions(abbreviation)
         if self.unresolved_abbreviations.has_key(abbreviation):
             if tracing('SymDict._add_corresponding_expansion'):
                 trace('SymDict._add_corresponding_expansion', 
@@ -749,7 +913,7 @@ class SymDict(OwnerObject):
                     trace('SymDict._add_corresponding_expansion', 
                         'updating forms for %s' % a_symbol)
                 spoken_forms = self.get_spoken_forms(a_symbol)
-                self.add_symbol(a_symbol, spoken_forms)
+                self._add_symbol(a_symbol, spoken_forms)
 
             del self.unresolved_abbreviations[abbreviation]
                 
@@ -808,22 +972,27 @@ class SymDict(OwnerObject):
 
         *none*
         """
-        #
-        # Make sure the word is the SR vocabulary
-        #
+        self._record_mutation('prepend_abbreviations', (word, abbreviations))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            #
+            # Make sure the word is the SR vocabulary
+            #
 #        clean_word = sr_interface.clean_spoken_form(word)
 #        sr_interface.addWord(clean_word)
-        if not self.abbreviations.has_key(word):
-            self.abbreviations[word] = abbreviations
-        else:
+            if not self.abbreviations.has_key(word):
+                self.abbreviations[word] = abbreviations
+            else:
+                for abbreviation in abbreviations:
+                    try:
+                        self.abbreviations[word].remove(abbreviation)
+                    except ValueError:
+                        pass
+                self.abbreviations[word] = abbreviations + self.abbreviations[word]
             for abbreviation in abbreviations:
-                try:
-                    self.abbreviations[word].remove(abbreviation)
-                except ValueError:
-                    pass
-            self.abbreviations[word] = abbreviations + self.abbreviations[word]
-        for abbreviation in abbreviations:
-            self._add_corresponding_expansion(abbreviation, word)
+                self._add_corresponding_expansion(abbreviation, word)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
        
     def add_abbreviation(self, word, abbreviation):
         """Appends an abbreviation to the list of abbreviations for a word, 
@@ -840,16 +1009,21 @@ class SymDict(OwnerObject):
         
         *none* -- 
         """
+        self._record_mutation('add_abbreviation', (word, abbreviation))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
 #        clean_word = sr_interface.clean_spoken_form(word)
 #        sr_interface.addWord(clean_word)
-        if not self.abbreviations.has_key(word):
-            self.abbreviations[word] = [abbreviation]
-        else:
-            try:
-                self.abbreviations[word].index(abbreviation)
-            except ValueError:
-                self.abbreviations[word].append(abbreviation)
-        self._add_corresponding_expansion(abbreviation, word)
+            if not self.abbreviations.has_key(word):
+                self.abbreviations[word] = [abbreviation]
+            else:
+                try:
+                    self.abbreviations[word].index(abbreviation)
+                except ValueError:
+                    self.abbreviations[word].append(abbreviation)
+            self._add_corresponding_expansion(abbreviation, word)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def add_abbreviations(self, word, abbreviations):
         """Appends one or more abbreviations to the list of abbreviations 
@@ -866,18 +1040,23 @@ class SymDict(OwnerObject):
         
         *none* -- 
         """
+        self._record_mutation('add_abbreviations', (word, abbreviations))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
 #        clean_word = sr_interface.clean_spoken_form(word)
 #        sr_interface.addWord(clean_word)
-        if not self.abbreviations.has_key(word):
-            self.abbreviations[word] = abbreviations
-        else:
+            if not self.abbreviations.has_key(word):
+                self.abbreviations[word] = abbreviations
+            else:
+                for abbreviation in abbreviations:
+                    try:
+                        self.abbreviations[word].index(abbreviation)
+                    except ValueError:
+                        self.abbreviations[word].append(abbreviation)
             for abbreviation in abbreviations:
-                try:
-                    self.abbreviations[word].index(abbreviation)
-                except ValueError:
-                    self.abbreviations[word].append(abbreviation)
-        for abbreviation in abbreviations:
-            self._add_corresponding_expansion(abbreviation, word)
+                self._add_corresponding_expansion(abbreviation, word)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def add_alt_abbreviations(self, word, abbreviations):
         """Appends one or more abbreviations to the list of 
@@ -895,18 +1074,23 @@ class SymDict(OwnerObject):
         
         *none* -- 
         """
+        self._record_mutation('add_alt_abbreviations', (word, abbreviations))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
 #        clean_word = sr_interface.clean_spoken_form(word)
 #        sr_interface.addWord(clean_word)
-        if not self.alt_abbreviations.has_key(word):
-            self.alt_abbreviations[word] = abbreviations
-        else:
+            if not self.alt_abbreviations.has_key(word):
+                self.alt_abbreviations[word] = abbreviations
+            else:
+                for abbreviation in abbreviations:
+                    try:
+                        self.alt_abbreviations[word].index(abbreviation)
+                    except ValueError:
+                        self.alt_abbreviations[word].append(abbreviation)
             for abbreviation in abbreviations:
-                try:
-                    self.alt_abbreviations[word].index(abbreviation)
-                except ValueError:
-                    self.alt_abbreviations[word].append(abbreviation)
-        for abbreviation in abbreviations:
-            self._add_corresponding_expansion(abbreviation, word)
+                self._add_corresponding_expansion(abbreviation, word)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def add_pronunciation(self, abbreviation, pronunciation):
         """Appends a pronunciation expansion for an abbreviation
@@ -922,14 +1106,20 @@ class SymDict(OwnerObject):
         
         *none* -- 
         """
-        if not self.pronunciations.has_key(abbreviation):
-            self.pronunciations[abbreviation] = [pronunciation]
-        else:
-            try:
-                self.pronunciations[abbreviation].index(pronunciation)
-            except ValueError:
-                self.pronunciations[abbreviation].append(pronunciation)
-        self._add_corresponding_expansion(abbreviation, pronunciation)
+        self._record_mutation('add_pronunciation', 
+            (abbreviation, pronunciation))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            if not self.pronunciations.has_key(abbreviation):
+                self.pronunciations[abbreviation] = [pronunciation]
+            else:
+                try:
+                    self.pronunciations[abbreviation].index(pronunciation)
+                except ValueError:
+                    self.pronunciations[abbreviation].append(pronunciation)
+            self._add_corresponding_expansion(abbreviation, pronunciation)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def add_extra_expansion(self, abbreviation, word):
         """adds an extra expansion for an abbreviation
@@ -944,14 +1134,19 @@ class SymDict(OwnerObject):
         
         *none* -- 
         """
-        if not self.extra_expansions.has_key(abbreviation):
-            self.extra_expansions[abbreviation] = [word]
-        else:
-            try:
-                self.extra_expansions[abbreviation].index(word)
-            except ValueError:
-                self.extra_expansions[abbreviation].append(word)
-        self._add_corresponding_expansion(abbreviation, word)
+        self._record_mutation('add_extra_expansion', (abbreviation, word))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            if not self.extra_expansions.has_key(abbreviation):
+                self.extra_expansions[abbreviation] = [word]
+            else:
+                try:
+                    self.extra_expansions[abbreviation].index(word)
+                except ValueError:
+                    self.extra_expansions[abbreviation].append(word)
+            self._add_corresponding_expansion(abbreviation, word)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def add_acronym(self, acronym):
         """shorthand method for adding an expansion constructed from 
@@ -967,11 +1162,16 @@ class SymDict(OwnerObject):
         
         *STR* -- the spoken form of the expanded acronym
         """
-        acronym = string.lower(acronym)
-        self.acronyms[acronym] = 1
-        spoken = sr_interface.spoken_acronym(acronym)
-        self._add_corresponding_expansion(acronym, spoken)
-        return spoken
+        self._record_mutation('add_acronym', (acronym,))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            acronym = string.lower(acronym)
+            self.acronyms[acronym] = 1
+            spoken = sr_interface.spoken_acronym(acronym)
+            self._add_corresponding_expansion(acronym, spoken)
+            return spoken
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def preferred_abbreviations(self, word):
         """returns the preferred abbreviations for the given word
@@ -1221,6 +1421,7 @@ class SymDict(OwnerObject):
         self.pronunciations = {}
         self.acronyms = {}
         self.extra_expansions = {}
+        self.clear_expansion_memo()
 
     def import_abbreviations(self, f, instructions = None):
         """import abbreviations and expansions from standard files
@@ -1323,6 +1524,101 @@ class SymDict(OwnerObject):
         self.maybe_parse_standard_symbols()
 # mark this user so we don't have to scan the symbol files every time
         sr_interface.mark_user()
+        self.start_journal()
+
+    def start_journal(self):
+        """Start recording changes to the dictionary in the journal
+        file, instead of saving the whole dictionary after each change.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if not self.use_journal or self.sym_file is None:
+            return
+        if not os.path.exists(self.sym_file):
+# the journal must apply to an existing dictionary file
+            self.save(export_abbreviations = 0)
+        journal = SymDictJournal.SymDictJournal(self.sym_file)
+        if journal.start():
+            self._journal = journal
+
+    def flush_journal(self):
+        """Append the changes made since the last call to the journal
+        file.  Called after each utterance.  If the journal has grown
+        too large, save the whole dictionary instead, which empties the
+        journal.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if not self._journal:
+            return
+        if not self._journal.flush():
+            msg = 'WARNING: error writing to SymDict journal file %s\n' \
+                % self._journal.file_name
+            sys.stderr.write(msg)
+            self.save()
+        elif self._journal.num_entries >= self.max_journal_entries:
+            self.save()
+
+    def _record_mutation(self, method_name, args):
+        """private method called by the methods listed in
+        *journaled_methods* to record their calls in the journal
+
+        **INPUTS**
+
+        *STR method_name* -- name of the method
+
+        *(ANY)* args -- its positional arguments
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if self._journal and not self._journal_suspended:
+            self._journal.record(method_name, args)
+
+    def _replay_journal(self, entries):
+        """private method which replays the calls recorded in the
+        journal, after the dictionary has been read from its file
+
+        **INPUTS**
+
+        *[(STR, (ANY))]* entries -- the recorded calls, as returned by
+        SymDictJournal.read_entries
+
+        **OUTPUTS**
+
+        *INT* -- the number of calls replayed
+        """
+        replayed = 0
+        for method_name, args in entries:
+            if method_name not in journaled_methods:
+                break
+            try:
+                apply(getattr(self, method_name), args)
+            except:
+                msg = 'WARNING: error replaying call to %s from SymDict ' \
+                    % method_name + 'journal for \n%s\n' % self.sym_file
+                sys.stderr.write(msg)
+                traceback.print_exc()
+                break
+            replayed = replayed + 1
+        if replayed:
+            msg = 'Recovered %d changes to the symbol dictionary ' \
+                % replayed + 'from the journal of\n%s\n' % self.sym_file
+            sys.stderr.write(msg)
+        return replayed
 
     def maybe_parse_standard_symbols(self):
         """Parse standard symbols for the various programming languages,
@@ -1351,6 +1647,7 @@ class SymDict(OwnerObject):
             if file in self.standard_symbol_sources:
                 files_read.append(file)
         self.symbol_sources_read = files_read
+        self._harvest_cache.keep_only(self.standard_symbol_sources)
 
 #        print 'existing files:', existing
 #        print 'from_file = ', self.from_file
@@ -1407,10 +1704,28 @@ class SymDict(OwnerObject):
         *none* --
         """
 
+        harvest = self.harvest_processes > 1 and len(file_list) > 1
+        for a_file in file_list:
+            if self._caches_symbols_of(a_file):
+                harvest = 1
+# we save the whole dictionary below, so there's no point in journaling
+# every symbol, and changes to the SR vocabulary are made in one batch
+        self._journal_suspended = self._journal_suspended + 1
+        sr_interface.begin_vocabulary_transaction()
+        try:
+            if harvest:
+                self.harvest_symbols_from_files(file_list, 
+                    add_sr_entries=add_sr_entries)
+            else:
+                for a_file in file_list:
+                    print 'Compiling symbols for file \'%s\'' \
+                        % util.within_VCode(a_file)
+                    self.parse_symbols_from_file(a_file, 
+                        add_sr_entries=add_sr_entries)
+        finally:
+            sr_interface.end_vocabulary_transaction()
+            self._journal_suspended = self._journal_suspended - 1
         for a_file in file_list:
-            print 'Compiling symbols for file \'%s\'' \
-                % util.within_VCode(a_file)
-            self.parse_symbols_from_file(a_file, add_sr_entries=add_sr_entries)
 # add to list of files already scanned and up to date
             if a_file in self.standard_symbol_sources and \
                 a_file not in self.symbol_sources_read:
@@ -1422,6 +1737,151 @@ class SymDict(OwnerObject):
         self.save()
                 
 
+    def harvest_symbols_from_files(self, file_list, add_sr_entries=1):
+        """Parse symbols from a series of source files, extracting the
+        symbols from the files in up to *harvest_processes* worker 
+        processes.
+
+        The symbols found are then added in the order in which the files
+        would have been parsed one after the other, so the resulting
+        dictionary is the same.  Additions to the SR vocabulary are done
+        in the mediator process.
+
+        Standard symbol sources whose contents haven't changed since
+        they were last parsed are skipped (see *_harvest_cache*).  For
+        those which have, symbols which have disappeared from the file,
+        and aren't defined in any other standard symbol source, are
+        removed from the dictionary, unless they were also added by
+        other means (by the user, or from a file other than a standard
+        symbol source).
+
+        **INPUTS**
+
+        *[STR] file_list -- List of files to be compiled
+
+        *BOOL* add_sr_entries = 1 -- If true, add symbols to the SR vocabulary
+
+        **OUTPUT**
+
+        *none* --
+        """
+        files = []
+        definitions = {}
+        harvested = {}
+        unchanged = {}
+        signatures = {}
+        for a_file in file_list:
+            language_name = self.get_language_by_filename(a_file)
+            definition = self.get_language_definition(language_name)
+            if definition is None:
+#               let parse_symbols_from_file deal with it below
+                continue
+            definitions[language_name] = definition
+            source = None
+            if self._caches_symbols_of(a_file):
+                current, signature, source = self._harvest_cache.check(a_file)
+                if current:
+                    unchanged[a_file] = 1
+                    continue
+                signatures[a_file] = signature
+            if source is None or self.harvest_processes > 1:
+                files.append((a_file, language_name))
+            else:
+                harvested[a_file] = \
+                    symbol_harvester.symbols_in_source(source, definition)
+
+        if self.harvest_processes > 1 and len(files) > 1:
+            results = symbol_harvester.harvest_files(files, definitions,
+                self.harvest_processes, vc_globals.tmp)
+        else:
+            results = []
+            for a_file, language_name in files:
+                results.append((a_file, symbol_harvester.symbols_in_file(
+                    a_file, definitions[language_name])))
+        for a_file, symbols in results:
+            harvested[a_file] = symbols
+
+        previous = {}
+        for a_file, signature in signatures.items():
+            previous[a_file] = self._harvest_cache.symbols(a_file)
+            if signature is None or harvested[a_file] is None:
+                self._harvest_cache.remove(a_file)
+            else:
+                self._harvest_cache.update(a_file, signature, 
+                    harvested[a_file])
+        still_defined = None
+
+        for a_file in file_list:
+            if unchanged.has_key(a_file):
+                debug.trace('SymDict.harvest_symbols_from_files',
+                    'symbols of %s are up to date' % a_file)
+                continue
+            print 'Compiling symbols for file \'%s\'' \
+                % util.within_VCode(a_file)
+            if not harvested.has_key(a_file):
+                self.parse_symbols_from_file(a_file, 
+                    add_sr_entries=add_sr_entries)
+                continue
+            symbols = harvested[a_file]
+            if symbols is None:
+                print 'WARNING: source file \'%s\' doesn\'t exist.' % a_file
+                continue
+            self._add_symbols(symbols, add_sr_entries, 
+                harvested = signatures.has_key(a_file))
+            if not previous.get(a_file):
+                continue
+            if still_defined is None:
+                still_defined = self._harvest_cache.defined_symbols()
+            for a_symbol in previous[a_file]:
+                if not still_defined.has_key(a_symbol) \
+                        and self._harvest_cache.added_by_harvest(a_symbol):
+                    debug.trace('SymDict.harvest_symbols_from_files',
+                        'symbol %s no longer defined' % a_symbol)
+                    self.remove_symbol(a_symbol, 
+                        remove_sr_entries = add_sr_entries)
+
+    def _caches_symbols_of(self, file_name):
+        """private method which indicates whether the symbols extracted
+        from a file are recorded in *_harvest_cache*
+
+        **INPUTS**
+
+        *STR file_name* -- path of the file
+
+        **OUTPUT**
+
+        *BOOL* -- true if the file is a standard symbol source, and the
+        cache is enabled
+        """
+        return self.use_harvest_cache and \
+            file_name in self.standard_symbol_sources
+
+    def _add_symbols(self, symbols, add_sr_entries, harvested = 0):
+        """private method which adds a batch of parsed symbols to the
+        dictionary
+
+        **INPUTS**
+
+        *[STR] symbols* -- the symbols
+
+        *BOOL* add_sr_entries -- If true, add symbols to the SR vocabulary
+
+        *BOOL* harvested -- If true, the symbols come from a file whose
+        symbols are recorded in *_harvest_cache*, and those which are
+        added can later be removed if they disappear from the file
+
+        **OUTPUT**
+
+        *none* --
+        """
+        for a_symbol in symbols:
+            if not self.symbol_info.has_key(a_symbol):
+                self.add_symbol(a_symbol, add_sr_entries=add_sr_entries)
+                if harvested:
+                    self._harvest_cache.record_added(a_symbol)
+            elif not harvested:
+                self._harvest_cache.forget_added(a_symbol)
+
     def parse_symbols_from_file(self, file_name, add_sr_entries=1):
         """Parse symbols from a source file.
 
@@ -1469,20 +1929,9 @@ class SymDict(OwnerObject):
 
         language_definition = self.get_language_definition(language_name)
         debug.trace('SymDict.parse_symbols', 'language_name=%s, language_definition=%s' % (language_name, language_definition))
-        stripped_contents = self.strip_source(contents, language_definition)
 
-            #
-            # Parse symbols from the first chunk
-            #
-        while stripped_contents != '':
-            a_match = re.search('(' + \
-                language_definition.regexp_symbol + ')', stripped_contents)
-            if a_match:
-                self.add_symbol(a_match.group(1), 
-                    add_sr_entries=add_sr_entries)
-                stripped_contents = stripped_contents[a_match.end()+1:]
-            else:
-                stripped_contents = ''
+        for a_symbol in language_definition.symbols_in(contents):
+            self.add_symbol(a_symbol, add_sr_entries=add_sr_entries)
                 
     def strip_source(self, source, language_definition):
         """Removes all parts of a source file that don't contain symbols.
@@ -1505,36 +1954,7 @@ class SymDict(OwnerObject):
 
         .. [LangDef] file:///./LangDef.LangDef.html"""
 
-#        print '-- SymDict.strip_source: source=\n%s\n*** End of source' % source
-        stripped_source = ''
-        while source != '':
-            #
-            # Identify earliest chunk of code that doesn't contain any symbols
-            #
-            non_symbol_start = None
-            non_symbol_end = None
-            for a_regexp in language_definition.regexps_no_symbols:
-#                print '-- SymDict.strip_source: trying to strip regexp: %s ' % a_regexp
-                a_match = re.search(a_regexp, source)
-                if a_match:
-#                    print '-- SymDict.strip_source: we have a match for that regexp'
-                    if non_symbol_start == None or a_match.start() < non_symbol_start:
-                        non_symbol_start = a_match.start()
-                        non_symbol_end = a_match.end()
-#                        print '-- SymDict.strip_source: updated non_symbol_start=%s, non_symbol_end=%s' % (non_symbol_start, non_symbol_end)                        
-
-            #
-            # Rip that part of the code out
-            #
-            if non_symbol_start != None:
-#                print '-- SymDict.strip_source: stripping following text\n%s\n*** End of stripped text' % source[non_symbol_start:non_symbol_end]                
-                stripped_source = stripped_source + source[0:non_symbol_start]
-                source = source[non_symbol_end:]
-            else:
-                stripped_source = stripped_source + source
-                source = ''
-                
-        return stripped_source
+        return language_definition.strip_source(source)
 
     def clear_standard_symbols_file_list(self):
         """Clears the list of files defining standard symbols"""
@@ -1611,49 +2031,57 @@ class SymDict(OwnerObject):
         """
         debug.trace('SymDict.remove_symbol',
             'symbol = %s' % symbol)
+        self._record_mutation('remove_symbol', (symbol, remove_sr_entries))
+        self._journal_suspended = self._journal_suspended + 1
         try:
-            symbol_info = self.symbol_info[symbol]
-        except KeyError:
-            debug.trace('SymDict.remove_symbol',
-                'unknown symbol')
-            return 0
-
-        spoken_forms = symbol_info.spoken_forms
-        for spoken_form in spoken_forms:
-            phrase = self.spoken_to_phrase(spoken_form)
-            debug.trace('SymDict.remove_symbol',
-                'removing spoken forms: phrase = \n%s' % phrase)
-            symbol_list = self.spoken_form_info.complete_match(phrase)
-            debug.trace('SymDict.remove_symbol',
-                'complete match returned %s' % symbol_list)
-            if remove_sr_entries:
-                self.remove_vocabulary_entry(symbol, spoken_form)
-            if not (symbol_list is None):
-                try:
-                    symbol_list.remove(symbol)
-                    debug.trace('SymDict.remove_symbol',
-                        'symbol_list now %s' % repr(symbol_list))
-                    if not symbol_list:
-                        remove_branch = \
-                            self.spoken_form_info.remove_phrase(phrase)
-                        if remove_branch is None:
-                            debug.trace('SymDict.remove_symbol',
-                                'failed to remove empty branch')
-                except ValueError:
-                    debug.trace('SymDict.remove_symbol',
-                        'symbol not found in symbol_list')
-                    pass
-
-        del self.symbol_info[symbol]
-        if self.tentative_symbols.has_key(symbol):
-            del self.tentative_symbols[symbol]
-
-        letter = self.first_letter(symbol)
-        del self._symbols_starting_with[letter][symbol]
+            try:
+                symbol_info = self.symbol_info[symbol]
+            except KeyError:
+                debug.trace('SymDict.remove_symbol',
+                    'unknown symbol')
+                return 0
 
-        if self._cached_symbols_as_one_string.has_key(letter):
-            del self._cached_symbols_as_one_string[letter]
-        return 1
+            spoken_forms = symbol_info.spoken_forms
+            for spoken_form in spoken_forms:
+                phrase = self.spoken_to_phrase(spoken_form)
+                debug.trace('SymDict.remove_symbol',
+                    'removing spoken forms: phrase = \n%s' % phrase)
+                symbol_list = self.spoken_form_info.complete_match(phrase)
+                debug.trace('SymDict.remove_symbol',
+                    'complete match returned %s' % symbol_list)
+                if remove_sr_entries:
+                    self.remove_vocabulary_entry(symbol, spoken_form)
+                if not (symbol_list is None):
+                    try:
+                        symbol_list.remove(symbol)
+                        debug.trace('SymDict.remove_symbol',
+                            'symbol_list now %s' % repr(symbol_list))
+                        if not symbol_list:
+                            remove_branch = \
+                                self.spoken_form_info.remove_phrase(phrase)
+                            if remove_branch is None:
+                                debug.trace('SymDict.remove_symbol',
+                                    'failed to remove empty branch')
+                    except ValueError:
+                        debug.trace('SymDict.remove_symbol',
+                            'symbol not found in symbol_list')
+                        pass
+
+            del self.symbol_info[symbol]
+            if self.tentative_symbols.has_key(symbol):
+                del self.tentative_symbols[symbol]
+            self._harvest_cache.forget_added(symbol)
+
+            letter = self.first_letter(symbol)
+            del self._symbols_starting_with[letter][symbol]
+            self._pseudo_symbol_index.remove_symbol(symbol, letter)
+            self._invalidate_matches(symbol, letter)
+
+            if self._cached_symbols_as_one_string.has_key(letter):
+                del self._cached_symbols_as_one_string[letter]
+            return 1
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
     def _add_symbol_starting_with(self, symbol):
         """private method which adds a symbol to the dictionary of
@@ -1674,8 +2102,33 @@ class SymDict(OwnerObject):
             common = {}
             self._symbols_starting_with[first_letter] = common
         common[symbol] = 1
+        self._pseudo_symbol_index.add_symbol(symbol, first_letter)
+        self._invalidate_matches(symbol, first_letter)
         return first_letter
 
+    def _invalidate_matches(self, symbol, first_letter):
+        """private method which invalidates the cached matches of the
+        pseudo symbols which a symbol being added or removed could match.
+        Matches are cached under the first character of the pseudo
+        symbol, which is the first character of the skeleton of the
+        symbols it matches (see PseudoSymbolIndex), and may be a digit
+        rather than the first letter of the symbol.
+
+        **INPUTS**
+
+        *STR symbol* -- the written form of the symbol
+
+        *STR first_letter* -- the first letter of the symbol
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self._matcher_cache.invalidate(first_letter)
+        initial = self._pseudo_symbol_index.skeleton(symbol)[:1]
+        if initial and initial != first_letter:
+            self._matcher_cache.invalidate(initial)
+
 
     def add_symbol(self, symbol, user_supplied_spoken_forms=[], 
                    tentative = 1, add_sr_entries=1):
@@ -1710,7 +2163,43 @@ class SymDict(OwnerObject):
         
         if tracing('SymDict.add_symbol'):
             trace('SymDict.add_symbol', 'symbol=%s' % symbol)
+        self._record_mutation('add_symbol', (symbol, 
+            user_supplied_spoken_forms, tentative, add_sr_entries))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            self._harvest_cache.forget_added(symbol)
+            self._add_symbol(symbol, user_supplied_spoken_forms, 
+                tentative = tentative, add_sr_entries = add_sr_entries)
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
+
+    def _add_symbol(self, symbol, user_supplied_spoken_forms=[], 
+                   tentative = 1, add_sr_entries=1):
+        """private method which adds a symbol to the dictionary, or
+        updates its spoken forms if it is already there.
+
+        Unlike [add_symbol], this doesn't change whether the symbol
+        counts as added by harvesting, so it is used when the
+        dictionary re-adds a symbol for its own purposes, rather than
+        because the symbol was given by the user or found in a file.
+
+        **INPUTS**
+        
+        *STR* symbol -- Symbol to add
+
+        *[STR] user_supplied_spoken_forms* -- Spoken forms for the
+         symbol which were supplied explicitly
+
+        *BOOL* tentative = 1 -- If true, symbol is added tentatively,
+        and can be removed on undo/correction/reformatting
+
+        *BOOL* add_sr_entries = 1 -- If true, adds symbol to the SR vocabulary.
 
+        **OUTPUTS**
+        
+        *none* -- 
+
+        .. [add_symbol] file:///./SymDict.SymDict.html#add_symbol"""
         spoken_forms = user_supplied_spoken_forms[:]
         
         if not self.symbol_info.has_key(symbol):
@@ -1891,7 +2380,10 @@ class SymDict(OwnerObject):
         self.move_written_form_to_top_of_priority_list(spoken_form_used,
                                                        correct_written_form)
         self.add_symbol(correct_written_form, [spoken_form_used], tentative=0)
-        self.save()
+        if self._journal:
+            self.flush_journal()
+        else:
+            self.save()
 
     def move_written_form_to_top_of_priority_list(self, spoken_form, written_form):
         """Moves a written form to the top of the priority list for a spoken form
@@ -1910,19 +2402,25 @@ class SymDict(OwnerObject):
         """
         debug.trace('SymDict.move_written_form_to_top_of_priority_list', 
                     'spoken_form=%s, written_form=%s, string.split(spoken_form)=%s' % (spoken_form, written_form, repr(string.split(spoken_form))))
-        written_forms_priority_list = self.match_phrase(string.split(spoken_form))[0]
-        debug.trace('SymDict.move_written_form_to_top_of_priority_list',
-                    "written_forms_priority_list=%s" % repr(written_forms_priority_list))
-        if (written_forms_priority_list == None):
-           written_forms_priority_list = []
-        written_forms_priority_list = \
-           util.remove_occurences_from_list(written_form, written_forms_priority_list)
-        written_forms_priority_list = [written_form] + written_forms_priority_list
-        self.spoken_form_info.add_phrase(string.split(spoken_form), written_forms_priority_list)
-        debug.trace('SymDict.move_written_form_to_top_of_priority_list',
-                    "** after bumping, written_forms_priority_list=%s" % repr(self.match_phrase(spoken_form)[0]))        
-        debug.trace('SymDict.move_written_form_to_top_of_priority_list',
-                    "after bumping, priority list =%s" % repr(self.match_phrase(spoken_form)[0]))        
+        self._record_mutation('move_written_form_to_top_of_priority_list',
+            (spoken_form, written_form))
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            written_forms_priority_list = self.match_phrase(string.split(spoken_form))[0]
+            debug.trace('SymDict.move_written_form_to_top_of_priority_list',
+                        "written_forms_priority_list=%s" % repr(written_forms_priority_list))
+            if (written_forms_priority_list == None):
+               written_forms_priority_list = []
+            written_forms_priority_list = \
+               util.remove_occurences_from_list(written_form, written_forms_priority_list)
+            written_forms_priority_list = [written_form] + written_forms_priority_list
+            self.spoken_form_info.add_phrase(string.split(spoken_form), written_forms_priority_list)
+            debug.trace('SymDict.move_written_form_to_top_of_priority_list',
+                        "** after bumping, written_forms_priority_list=%s" % repr(self.match_phrase(spoken_form)[0]))        
+            debug.trace('SymDict.move_written_form_to_top_of_priority_list',
+                        "after bumping, priority list =%s" % repr(self.match_phrase(spoken_form)[0]))        
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
 
 
     def remove_vocabulary_entry(self, symbol, spoken_form):
@@ -1980,26 +2478,7 @@ class SymDict(OwnerObject):
         #
         # First, split the symbol into words or abbreviations
         #
-        mod_symbol = symbol
-               # Replace non alphanums by space
-        mod_symbol = re.sub('[^a-zA-Z0-9]+', ' ', mod_symbol)
-#        print '-- SymDict.get_spoken: after 1st sub, mod_symbol=\'%s\'' % mod_symbol
-               # Split before and after string of numbers
-        mod_symbol = re.sub('([0-9]+)', ' \\1 ', mod_symbol)
-
-               # Split when there is a change of case. Must distinguish between
-               # the following cases:
-               #    'XXXyyy'   -> 'XX Xyyy'
-               #    'xxxYYY'   -> 'xxx YYY'               
-        mod_symbol = re.sub('([A-Z]+?)([A-Z][a-z]+)', '\\1 \\2', mod_symbol)
-#        print '-- SymDict.get_spoken: after 1st sub, mod_symbol=\'%s\'' % mod_symbol                
-        mod_symbol = re.sub('([a-z]+)([A-Z]+)', '\\1 \\2', mod_symbol)
-#        print '-- SymDict.get_spoken: after 2nd sub, mod_symbol=\'%s\'' % mod_symbol        
-               # Remove leading/trailing spaces
-        mod_symbol = re.sub('(^\s+|\s+$)', '', mod_symbol)
-#        print '-- SymDict.get_spoken: after 3rd sub, mod_symbol=\'%s\'' % mod_symbol
-        mod_symbol = string.lower(mod_symbol)
-        words = re.split('\s+', mod_symbol)
+        words = self.symbol_words(symbol)
         
 
 #        print '-- SymDict.get_spoken: mod_symbol=\'%s\', words=%s' % (mod_symbol, str(words))
@@ -2007,15 +2486,26 @@ class SymDict(OwnerObject):
         # Replace each abbreviated word by its possible expansion
         #
         possibilities = []
+        ranked = []
+        num_forms = 1
         for a_word in words:
-            possibilities = possibilities + [self.expand_word(a_word, symbol)]
+            preferred, sorted_expansions = \
+                self._memoized_expansions(a_word, symbol)
+            possibilities.append(sorted_expansions)
+            ranked.append(preferred)
+            num_forms = num_forms * len(preferred)
 #        print '-- SymDict.get_spoken_forms: possibilities=%s' % possibilities
 
         #
-        # Generate all possible spoken forms for that symbol
+        # Generate all possible spoken forms for that symbol, or only
+        # the best ones if there are too many
         #
-        
-        the_spoken_forms = self.expand_possible_forms([''], possibilities)
+        if self.max_spoken_forms and num_forms > self.max_spoken_forms:
+            the_spoken_forms = self.best_possible_forms(ranked, 
+                self.max_spoken_forms)
+        else:
+            the_spoken_forms = self.expand_possible_forms([''], 
+                possibilities)
                                                       
         # don't add unknown words to the vocabulary, otherwise next
         # time we won't be able to tell that they are unknown
@@ -2029,6 +2519,32 @@ class SymDict(OwnerObject):
         return the_spoken_forms
 
 
+    def symbol_words(self, symbol):
+        """Splits a symbol into words or abbreviations
+
+        **INPUTS**
+        
+        *STR* symbol -- the symbol in question 
+
+        **OUTPUTS**
+        
+        *[STR]* -- the words, in lower case
+        """
+        # The regexps in _symbol_splitters, in order:
+        #    - replace non alphanums by space
+        #    - split before and after string of numbers
+        #    - split when there is a change of case. Must distinguish
+        #      between the following cases:
+        #         'XXXyyy'   -> 'XX Xyyy'
+        #         'xxxYYY'   -> 'xxx YYY'               
+        #    - remove leading/trailing spaces
+        mod_symbol = symbol
+        for a_regexp, replacement in _symbol_splitters:
+            mod_symbol = a_regexp.sub(replacement, mod_symbol)
+#        print '-- SymDict.symbol_words: after subs, mod_symbol=\'%s\'' % mod_symbol
+        mod_symbol = string.lower(mod_symbol)
+        return _white_space.split(mod_symbol)
+
     def expand_word(self, word, symbol):
         """Expands a word from a symbol to its possible spoken forms.
 
@@ -2060,7 +2576,65 @@ class SymDict(OwnerObject):
         """
         
 #        print '-- SymDict.expand_word: expanding word: \'%s\'' % word
+        preferred, expansions = self._memoized_expansions(word, symbol)
+#        print '-- SymDict.expand_word: returning expansions=%s' % expansions
+        return expansions[:]
+
+    def _memoized_expansions(self, word, symbol):
+        """private method which expands a word from a symbol, like
+        [expand_word], using *_expansion_memo*.
+
+        **INPUTS**
+        
+        *STR* word -- word to be expanded 
+        
+        *STR* symbol -- Symbol in which the word appeared
+
+        **OUTPUTS**
+        
+        *([STR], [STR])* -- the possible expansions of the word, in
+        order of preference and sorted.  The caller must not modify
+        these lists.
+
+        .. [expand_word] file:///./SymDict.SymDict.html#expand_word"""
+        if self.word_exists is not self._memo_word_exists:
+            self.clear_expansion_memo()
+            self._memo_word_exists = self.word_exists
+        if self._memo_vocabulary_generation != \
+               sr_interface.vocabulary_generation:
+            self._forget_vocabulary_changes()
+        memo = self._expansion_memo.get(word)
+        if memo is None:
+            memo = self._expand_word_preferred(word)
+            self._expansion_memo[word] = memo
+            lower = string.lower(word)
+            if self._memo_words_by_lower.has_key(lower):
+                self._memo_words_by_lower[lower][word] = 1
+            else:
+                self._memo_words_by_lower[lower] = {word: 1}
+        preferred, expansions, unresolved = memo
+        if unresolved:
+            if self.unresolved_abbreviations.has_key(word):
+                self.unresolved_abbreviations[word][symbol] = 1
+            else:
+                self.unresolved_abbreviations[word] = {symbol: 1}
+        return preferred, expansions
+
+    def _expand_word_preferred(self, word):
+        """private method which computes the value of 
+        *_expansion_memo* for a word (see [expand_word])
 
+        **INPUTS**
+        
+        *STR* word -- word to be expanded 
+
+        **OUTPUTS**
+        
+        *([STR], [STR], BOOL)* -- the possible expansions of the word,
+        in order of preference and sorted, and a flag indicating whether
+        the word is an unresolved abbreviation
+
+        .. [expand_word] file:///./SymDict.SymDict.html#expand_word"""
         #
         # Check if word might be a pluralised word
         #
@@ -2070,17 +2644,18 @@ class SymDict(OwnerObject):
         else:
             single_form = word
         
-        expansions = [word]
+        unresolved = 0
         if self.expansions.has_key(word):
             #
-            # word is a known abbreviation. Add expansions.
+            # word is a known abbreviation. Its expansions are more 
+            # likely to be pronounceable than the abbreviation itself
             #
-            expansions = expansions + self.expansions[word]            
+            preferred = self.expansions[word] + [word]
         elif self.expansions.has_key(single_form):
             #
             # word is the plural of an abbreviation
             #
-            expansions = map(lambda an_expansion: pluralize(an_expansion), 
+            preferred = map(lambda an_expansion: pluralize(an_expansion), 
                 self.expansions[single_form])
         else:
             #
@@ -2089,11 +2664,95 @@ class SymDict(OwnerObject):
             # Check if this is an unresolved abbreviation
             # (note: flag=4 means case unsensitive)
             #
-            expansions = self.check_word(word, symbol)
+            preferred, unresolved = self._check_word(word)
 
-#        print '-- SymDict.expand_word: returning expansions=%s' % expansions
+        expansions = preferred[:]
         expansions.sort()
-        return expansions
+        return preferred, expansions, unresolved
+
+    def _forget_expansions(self, abbreviation):
+        """private method which removes from *_expansion_memo* the
+        words whose expansions depend on those of an abbreviation
+
+        **INPUTS**
+        
+        *STR* abbreviation -- the abbreviation whose expansions changed
+
+        **OUTPUTS**
+        
+        *none*
+        """
+        for a_word in [abbreviation, pluralize(abbreviation)]:
+            self._forget_memoized_word(a_word)
+
+    def _forget_memoized_word(self, word):
+        """private method which removes a word from *_expansion_memo*
+
+        **INPUTS**
+        
+        *STR* word -- the word
+
+        **OUTPUTS**
+        
+        *none*
+        """
+        if not self._expansion_memo.has_key(word):
+            return
+        del self._expansion_memo[word]
+        lower = string.lower(word)
+        same_lower = self._memo_words_by_lower[lower]
+        del same_lower[word]
+        if not same_lower:
+            del self._memo_words_by_lower[lower]
+
+    def _forget_vocabulary_changes(self):
+        """private method which removes from *_expansion_memo* the
+        words whose expansions may depend on the entries added to or
+        deleted from the SR vocabulary since it was last updated
+
+        **INPUTS**
+        
+        *none*
+
+        **OUTPUTS**
+        
+        *none*
+        """
+        changes = sr_interface.vocabulary_changes_since(
+            self._memo_vocabulary_generation)
+        if changes is None:
+            self.clear_expansion_memo()
+            return
+        for an_entry in changes:
+#
+# _check_word looks up the word itself, its capitalized and all-caps
+# forms, and the word with a hyphen, always as the spoken form
+#
+            spoken, written = sr_interface.spoken_written_form(an_entry,
+                clean_written = 0, clean_spoken = 0)
+            lower = string.lower(spoken)
+            same_lower = self._memo_words_by_lower.get(lower)
+            if same_lower:
+                for a_word in same_lower.keys():
+                    self._forget_memoized_word(a_word)
+        self._memo_vocabulary_generation = \
+            sr_interface.vocabulary_generation
+
+    def clear_expansion_memo(self):
+        """forgets the memoized expansions of all words
+
+        **INPUTS**
+        
+        *none*
+
+        **OUTPUTS**
+        
+        *none*
+        """
+        self._expansion_memo = {}
+        self._memo_words_by_lower = {}
+        self._memo_vocabulary_generation = \
+            sr_interface.vocabulary_generation
 
     def std_word_exists(self, spoken_form, written_form = None):
         """
@@ -2128,6 +2787,29 @@ class SymDict(OwnerObject):
 
         *[STR] expansions * -- list of possible expansions of the word.
         """
+        expansions, unresolved = self._check_word(word)
+        if unresolved:
+            if self.unresolved_abbreviations.has_key(word):
+                self.unresolved_abbreviations[word][symbol] = 1
+            else:
+                self.unresolved_abbreviations[word] = {symbol: 1}
+        return expansions
+
+    def _check_word(self, word):
+        """private method which finds pronunciation expansions of a
+        word, like [check_word], but without recording unresolved 
+        abbreviations
+
+        **INPUTS**
+        
+        *STR* word -- word to check
+
+        **OUTPUTS**
+
+        *([STR], BOOL)* -- list of possible expansions of the word, and
+        a flag indicating whether it is an unresolved abbreviation
+
+        .. [check_word] file:///./SymDict.SymDict.html#check_word"""
         word_exists = self.word_exists
         if not word_exists:
             word_exists = self.std_word_exists
@@ -2139,22 +2821,22 @@ class SymDict(OwnerObject):
         hyphenated_pron = \
             sr_interface.vocabulary_entry(word, hyphenated)
         if self.common_hyphenated.has_key(word):
-            return [hyphenated]
+            return [hyphenated], 0
         if word_exists(word):
             expansions = [word]
             if len(word) == 1 and word[0].isalpha():
                 acronym = string.lower(word)
                 spoken = sr_interface.spoken_acronym(acronym)
                 expansions.append(spoken)
-            return expansions
+            return expansions, 0
         if word_exists(word, hyphenated):
-            return [hyphenated]
+            return [hyphenated], 0
         if len(word) > 1:
             capped =  word.capitalize()
 # if capitalized form exists, assume that the word is pronouncable (even
 # without the capitalization)
             if word_exists(capped):
-                return [word]
+                return [word], 0
         upper = word.upper()
         if word_exists(upper):
 # if word exists only in all-caps form, assume that the effective
@@ -2168,11 +2850,7 @@ class SymDict(OwnerObject):
                     expansions = [spoken]
                 else:
                     expansions.append(spoken)
-            return expansions
-        if self.unresolved_abbreviations.has_key(word):
-            self.unresolved_abbreviations[word][symbol] = 1
-        else:
-            self.unresolved_abbreviations[word] = {symbol: 1}
+            return expansions, 0
         expansions = [word]
         if len(word) <= self.max_auto_acronym and word.isalpha():
             acronym = string.lower(word)
@@ -2181,7 +2859,7 @@ class SymDict(OwnerObject):
                 expansions = [spoken]
             else:
                 expansions.append(spoken)
-        return expansions
+        return expansions, 1
             
     def expand_possible_forms(self, partial_forms, further_extensions):
         """Returns a list of possible spoken forms for a symbol.
@@ -2233,6 +2911,57 @@ class SymDict(OwnerObject):
             expanded_forms = self.expand_possible_forms(extended_partial_forms , further_extensions)
                     
             return expanded_forms
+
+    def best_possible_forms(self, ranked_extensions, max_forms):
+        """Returns the best spoken forms for a symbol, without 
+        generating all possible ones.
+
+        The rank of a spoken form is the sum of the ranks of the
+        expansions of its words, so the first spoken form uses the
+        preferred expansion of each word, the next ones use the second
+        choice for one of the words, etc.  Forms of equal rank are
+        ordered like those returned by [expand_possible_forms].
+        
+        **INPUTS**
+        
+        *[[STR]]* ranked_extensions -- the possible expansions of each 
+        word of the symbol, in order of preference
+
+        *INT* max_forms -- maximum number of spoken forms to return
+
+        **OUTPUTS**
+        
+        *[STR]* -- the best spoken forms for the symbol, best first
+        
+        .. [expand_possible_forms] file:///./SymDict.SymDict.html#expand_possible_forms"""
+        for extensions in ranked_extensions:
+            if not extensions:
+                return []
+        start = tuple([0] * len(ranked_extensions))
+        candidates = [(0, start)]
+        seen = {start: 1}
+        forms = []
+        while candidates and len(forms) < max_forms:
+            rank, choice = heapq.heappop(candidates)
+            a_form = ''
+            for ii in range(len(choice)):
+                an_extension = ranked_extensions[ii][choice[ii]]
+                if a_form == '':
+                    a_form = an_extension
+                elif a_form[-1] == '-':
+                    a_form = a_form + an_extension
+                else:
+                    a_form = a_form + ' ' + an_extension
+            forms.append(a_form)
+            for ii in range(len(choice)):
+                if choice[ii] + 1 < len(ranked_extensions[ii]):
+                    next_choice = list(choice)
+                    next_choice[ii] = next_choice[ii] + 1
+                    next_choice = tuple(next_choice)
+                    if not seen.has_key(next_choice):
+                        seen[next_choice] = 1
+                        heapq.heappush(candidates, (rank + 1, next_choice))
+        return forms
             
     def get_language_by_filename(self, file_name):
         """Gets the name of the language associated with a source file.
@@ -2398,8 +3127,7 @@ class SymDict(OwnerObject):
            if tracing('SymDict._score_symbol_match'):
                trace('SymDict._score_symbol_match',
                    'word = %s, matched text = %s' % (word, repr(matched_text)))
-           s = self.reg_word_to_native(word, map_letter = lambda x:"(%s)" % x)
-           word_match = re.match(s, matched_text, re.IGNORECASE)
+           word_match = self._word_regexp(word).match(matched_text)
            if tracing('SymDict._score_symbol_match'):
                trace('SymDict._score_symbol_match',
                    'word_match = %s' % word_match)
@@ -2430,6 +3158,30 @@ class SymDict(OwnerObject):
 
        return forbidden, confidence
    
+    def _word_regexp(self, word):
+       """private method which returns the compiled regexp used by
+       _score_symbol_match to match a word of a pseudo symbol, with
+       one group for each letter
+
+       **INPUTS**
+
+       *STR word* -- the word
+
+       **OUTPUTS**
+
+       *regexp* -- the compiled regexp
+       """
+       regexp = self._word_regexps.get(word)
+       if regexp is None:
+# compiling the regexps takes most of the time spent scoring matches,
+# and re's own cache is too small for all the words dictated
+           if len(self._word_regexps) >= self.max_word_regexps:
+               self._word_regexps = {}
+           s = self.reg_word_to_native(word, map_letter = lambda x:"(%s)" % x)
+           regexp = re.compile(s, re.IGNORECASE)
+           self._word_regexps[word] = regexp
+       return regexp
+
     def _score_word_match(self, word, word_match):
        """Helper method used by _score_symbol_match to see how the
        match for an individual word in the pseudo_symbol modifies the
@@ -2850,17 +3602,25 @@ class SymDict(OwnerObject):
         if len(words) > 0 and words[len(words)-1] == '':
             words = words[:len(words)-1]
         #
-        # Find all known native symbols that match *pseudo_symbol*
+        # Reuse the regexp and matches from the last time this pseudo 
+        # symbol was dictated, if they are still in the cache
         #
-        all_symbols = self.symbols_as_one_string(words[0][0])
-
+        regexp, raw_matches = self._matcher_cache.lookup(words)
             
 #        print '-- SymDict.match_pseudo_symbols: words=%s' % words        
-        regexp = self.reg_pseudo_to_native_symbol(words)
+        if regexp is None:
+            regexp = self.reg_pseudo_to_native_symbol(words)
 
 #        print '-- SymDict.match_pseudo_symbol: regexp=%s, all_symbols=\'%s\'' % (regexp.__dict__, all_symbols)
         
-        raw_matches = regexp.finditer(all_symbols)
+        if raw_matches is None:
+            if self.use_pseudo_symbol_index:
+                raw_matches = self._pseudo_symbol_index.matches(regexp, words)
+            else:
+                raw_matches = regexp.finditer(self._symbols_to_scan(words[0]))
+            raw_matches = list(raw_matches)
+            self._matcher_cache.store(words, string.lower(words[0][0]),
+                                      regexp, raw_matches)
 
 #        print '-- SymDict.match_pseudo_symbol: raw_matches = %s' % raw_matches
 
@@ -2882,6 +3642,51 @@ class SymDict(OwnerObject):
 
         return good_matches, weak_matches, forbidden
         
+    def _symbols_to_scan(self, first_word):
+        """private method which returns the string of symbols scanned
+        by [match_pseudo_symbol] when it doesn't use the index
+
+        **INPUTS**
+
+        *STR first_word* -- the first word of the pseudo symbol
+
+        **OUTPUTS**
+
+        *STR* -- the symbols, in the format of [symbols_as_one_string]
+
+        .. [match_pseudo_symbol] file:///./SymDict.SymDict.html#match_pseudo_symbol
+        .. [symbols_as_one_string] file:///./SymDict.SymDict.html#symbols_as_one_string"""
+        if first_word[0].isalpha():
+            return self.symbols_as_one_string(first_word[0])
+        #
+        # Symbols are listed under their first letter, so those which
+        # start with a digit may be listed under any letter (or under 
+        # None, if they have no letters at all)
+        #
+        symbol_list = []
+        for symbols in self._symbols_starting_with.values():
+            symbol_list.extend(symbols.keys())
+        symbol_list.sort()
+        symbol_list.append('')
+        return ' ' + string.join(symbol_list, '  ')
+
+    def matcher_cache_stats(self):
+        """returns the counters of the cache of regexps used by
+        [match_pseudo_symbol]
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: INT}* -- the counters, as returned by
+        [PseudoSymbolMatcherCache.stats]
+
+        .. [match_pseudo_symbol] file:///./SymDict.SymDict.html#match_pseudo_symbol
+        .. [PseudoSymbolMatcherCache.stats] file:///./PseudoSymbolIndex.PseudoSymbolMatcherCache.html#stats"""
+        return self._matcher_cache.stats()
+
     def reg_word_to_native(self, word, map_letter = None):
         """
         Returns a regular expression string for matching a single
@@ -3064,65 +3869,75 @@ class SymDict(OwnerObject):
 
         global vocabulary_symbols_with_written_form
 
+        if not resave:
+            self._record_mutation('cleanup_dictionary', 
+                (clean_sr_voc, clean_symdict, resave))
 
-        self._cached_symbols_as_one_string = {}
+        self._journal_suspended = self._journal_suspended + 1
+        try:
+            self._cached_symbols_as_one_string = {}
+            self._matcher_cache.invalidate()
 
-        #
-        # Delete vocabulary entries for symbols
-        #
-        if clean_sr_voc:
-            for (phrase, symbol_list) in \
-                self.spoken_form_info.all_phrase_values():
-                a_form = string.join(phrase)
+            #
+            # Delete vocabulary entries for symbols
+            #
+            if clean_sr_voc:
+                for (phrase, symbol_list) in \
+                    self.spoken_form_info.all_phrase_values():
+                    a_form = string.join(phrase)
         
-                #
-                # This spoken form was added specifically by VoiceCode.
-                # Remove it.
-                #
-#                print '-- SymDict.cleanup: removing word %s' % a_form
-                if not vocabulary_symbols_with_written_form:
-                    #
-                    # Just remove the spoken form
-                    #
-                    sr_interface.deleteWord(a_form)
-                else:
                     #
-                    # Remove every spoken\written entry in the vocabulary
+                    # This spoken form was added specifically by VoiceCode.
+                    # Remove it.
                     #
-                    for a_written_form in symbol_list:
-                        entry = sr_interface.vocabulary_entry(a_form, a_written_form)
-                        sr_interface.deleteWord(entry)
+#                print '-- SymDict.cleanup: removing word %s' % a_form
+                    if not vocabulary_symbols_with_written_form:
+                        #
+                        # Just remove the spoken form
+                        #
+                        sr_interface.deleteWord(a_form)
+                    else:
+                        #
+                        # Remove every spoken\written entry in the vocabulary
+                        #
+                        for a_written_form in symbol_list:
+                            entry = sr_interface.vocabulary_entry(a_form, a_written_form)
+                            sr_interface.deleteWord(entry)
 
-        #
-        # Possibly clean up the symbol dictionary itself
-        #
-        if clean_symdict:
+            #
+            # Possibly clean up the symbol dictionary itself
+            #
+            if clean_symdict:
 #            print '-- SymDict.cleanup: abbreviations are:'; self.print_abbreviations(show_unresolved=1)
-            self.spoken_form_info = WordTrie.WordTrie()
-            self.symbol_info = {}
-            for an_unresolved in self.unresolved_abbreviations.keys():
+                self.spoken_form_info = WordTrie.WordTrie()
+                self.symbol_info = {}
+                self._harvest_cache.clear()
+                for an_unresolved in self.unresolved_abbreviations.keys():
 #                print '-- SymDict.cleanup: removing unresolved abbreviation %s' % an_unresolved
-                if self.expansions.has_key(an_unresolved):
-                    del self.expansions[an_unresolved]
-            self.unresolved_abbreviations = {}
+                    if self.expansions.has_key(an_unresolved):
+                        del self.expansions[an_unresolved]
+                self.unresolved_abbreviations = {}
+                self.clear_expansion_memo()
 
-        #
-        # Recompile sources of standard symbols.
-        # Add symbols to the SR vocabulary only if the SR vocabulary has been
-        # cleansed of symbols. This is because addition of thouasands of
-        # symbols to the SR vocabulary is slow.
-        #
-        if clean_sr_voc:
-            add_sr_entries = 1
-        else:
-            add_sr_entries = 0
-        if clean_sr_voc or clean_symdict:
-            self.parse_symbols_from_files(self.standard_symbol_sources, add_sr_entries=add_sr_entries)
+            #
+            # Recompile sources of standard symbols.
+            # Add symbols to the SR vocabulary only if the SR vocabulary has been
+            # cleansed of symbols. This is because addition of thouasands of
+            # symbols to the SR vocabulary is slow.
+            #
+            if clean_sr_voc:
+                add_sr_entries = 1
+            else:
+                add_sr_entries = 0
+            if clean_sr_voc or clean_symdict:
+                self.parse_symbols_from_files(self.standard_symbol_sources, add_sr_entries=add_sr_entries)
 
-        #
-        # Resave dictionary to disk
-        #
-        if resave: self.save()
+            #
+            # Resave dictionary to disk
+            #
+            if resave: self.save()
+        finally:
+            self._journal_suspended = self._journal_suspended - 1
             
 
     def _version_update(self, old_version):
@@ -3194,7 +4009,7 @@ class SymDict(OwnerObject):
                 raise RuntimeError(msg)
         return fatal
 
-    def dict_from_file(self, on_failure = None):
+    def dict_from_file(self, on_failure = None, lazy = 0):
         """Unpickles the dictionary containing a persistent version of
         the symbol dictionary.
 
@@ -3208,11 +4023,17 @@ class SymDict(OwnerObject):
         so the user knows the consequences of the failure to read.  The
         only case when on_failure should be specified differently is
         during regression testing of the persistent SymDict system.
+
+        *BOOL lazy* -- if true, and the file is a [SectionedFile], return
+        a [SectionedFileReader] which only unpickles each section when
+        it is accessed.
         
         **OUTPUTS**
         
         *{STR: ANY}* -- the dictionary, or None if we failed to read it.
-        """
+
+        .. [SectionedFile] file:///./SectionedFile.html
+        .. [SectionedFileReader] file:///./SectionedFile.SectionedFileReader.html"""
         if on_failure is None:
             on_failure = self._failed_read
         file = self.sym_file
@@ -3221,6 +4042,20 @@ class SymDict(OwnerObject):
         if not os.path.exists(file):
             self.import_recent()
             return None
+        if SectionedFile.is_sectioned_file(file):
+            try:
+                try:
+                    values = SectionedFile.SectionedFileReader(file)
+                    if not lazy:
+                        values = values.load_all()
+                except:
+                    msg = 'WARNING: error reading symbol dictionary file\n%s\n' \
+                        % self.sym_file
+                    raise ErrorReadingPersistDict(msg)
+            except ErrorReadingPersistDict, e:
+                on_failure(e.message)
+                return None
+            return values
         try:
             f = open(file, "r")
         except:
@@ -3265,13 +4100,19 @@ class SymDict(OwnerObject):
         """
         if on_failure is None:
             on_failure = self._failed_read
-        values = self.dict_from_file()
+        values = self.dict_from_file(lazy = 1)
         if values is None:
             return 0
+# read the journal now, since it must match the file as it was saved
+        journal_entries = SymDictJournal.read_entries(self.sym_file)
         try:
             version = values['version']
         except KeyError:
             version = 1
+        except SectionedFile.BadSectionedFile, e:
+            on_failure('WARNING: error reading symbol dictionary file\n%s\n' \
+                % self.sym_file)
+            return 0
         debug.trace('SymDict.init_from_file',
             'state file version %s (current is %s)' \
             % (version, current_version))
@@ -3285,7 +4126,8 @@ class SymDict(OwnerObject):
                         + ' of the symbol dictionary file\n%s\n' % self.sym_file
                     raise ErrorReadingPersistDict(msg)
                 try:
-                    values = symdict_cvtr.convert(values, version)
+                    values = symdict_cvtr.convert(SectionedFile.loaded(values),
+                        version)
                 except DictConverter.ConversionFailure, e:
                     msg = 'Error while trying to convert symbol dictionary file' \
                         + '\n%s\n' % self.sym_file \
@@ -3297,7 +4139,8 @@ class SymDict(OwnerObject):
             okay = self.init_from_dictionary(values)
             if okay:
                 self.file_time = util.last_mod(self.sym_file)
-                if version != current_version:
+                replayed = self._replay_journal(journal_entries)
+                if version != current_version or replayed:
 # don't export abbreviations automatically, because we want to use a different
 # file name
                     self.save(export_abbreviations = 0)
@@ -3353,7 +4196,8 @@ class SymDict(OwnerObject):
 ##} wrong version
             fields = ['symbol_info', 'spoken_form_info', 'abbreviations',
                 'alt_abbreviations', 'unresolved_abbreviations',
-                'symbol_sources_read']
+                'symbol_sources_read', 'harvested_symbols', 
+                'symbols_added_by_harvest']
             current_field = None
             for field in fields:
                 current_field = field
@@ -3371,7 +4215,10 @@ class SymDict(OwnerObject):
 
         try:
             self.symbol_info = dict['symbol_info']
-            self.spoken_form_info = dict['spoken_form_info']
+# spoken_form_info is only needed once we start interpreting utterances
+            self.spoken_form_info = SectionedFile.lazy_section(dict, 
+                'spoken_form_info', self, 'spoken_form_info',
+                self._rebuild_spoken_form_info)
             self.abbreviations = dict['abbreviations'] 
             self.alt_abbreviations = dict['alt_abbreviations'] 
             self.acronyms = dict['acronyms']
@@ -3379,6 +4226,8 @@ class SymDict(OwnerObject):
             self.extra_expansions = dict['extra_expansions']
             self.unresolved_abbreviations = dict['unresolved_abbreviations'] 
             self.symbol_sources_read = dict['symbol_sources_read']
+            self._harvest_cache.entries = dict['harvested_symbols']
+            self._harvest_cache.added = dict['symbols_added_by_harvest']
 
 # re-create expansions from abbreviations, etc.
             self.regenerate_expansions()
@@ -3405,6 +4254,29 @@ class SymDict(OwnerObject):
             return 0
         return 1
 
+    def _rebuild_spoken_form_info(self, msg):
+        """private method which rebuilds *spoken_form_info* from the 
+        spoken forms in *symbol_info*, when it couldn't be loaded lazily
+        from the persistent dictionary file
+
+        **INPUTS**
+
+        *STR msg* -- the reason why it couldn't be loaded
+
+        **OUTPUTS**
+
+        *WordTrie* -- the new value of *spoken_form_info*
+        """
+        msg = 'WARNING: failed to read spoken forms from symbol ' \
+            + 'dictionary file\n%s\n%s\n' % (self.sym_file, msg) \
+            + 'Rebuilding them from the known symbols\n'
+        sys.stderr.write(msg)
+        self.spoken_form_info = WordTrie.WordTrie()
+        for written_as, symbol_info in self.symbol_info.items():
+            self._update_spoken_form_info(written_as, 
+                symbol_info.spoken_forms)
+        return self.spoken_form_info
+
     def regenerate_expansions(self):
         """re-creates the dictionary of expansions from the dictionaries
         of abbreviations and alternate abbreviations
@@ -3418,6 +4290,7 @@ class SymDict(OwnerObject):
         *none*
         """
         self.expansions = {}
+        self.clear_expansion_memo()
         for word, abbreviations in self.abbreviations.items():
             for abbreviation in abbreviations:
                 self._add_corresponding_expansion(abbreviation, word)
@@ -3697,6 +4570,53 @@ class MoreExpansionCategories(SymDictSingleConverter):
             raise DictConverter.ConversionFailure(msg)
         return d
 
+class AddHarvestedSymbols(SymDictSingleConverter):
+
+    def __init__(self, **args):
+        self.deep_construct(AddHarvestedSymbols, {}, args,
+           enforce_value = {'initial_version': 5,
+                            'final_version': 6})
+
+    def convert(self, original, initial_version):
+        """converts a dictionary from one version to another
+
+        NOTE: If DictConverter is unable to convert the dictionary, it
+        will raise a ConversionFailure exception
+
+        **INPUTS**
+
+        *INT initial_version* -- initial version of the dictionary
+
+        *[ANY:ANY] original* -- original dictionary
+        
+        *none*
+
+        **OUTPUTS**
+
+        *[ANY:ANY]* -- final dictionary
+        """
+        if initial_version != self.initial:
+            msg =  "unknown version %s" % initial_version
+            raise DictConverter.ConversionFailure(msg)
+        try:
+            d = copy.deepcopy(original)
+            d['version'] = self.final_version()
+# symbols in version 5 files came from unknown versions of the standard
+# symbol files, so leave the harvest cache empty to parse them in full
+            d['harvested_symbols'] = {}
+            d['symbols_added_by_harvest'] = {}
+        except:
+            extype, value, trace = sys.exc_info()
+            ex = traceback.format_exception(extype, value, trace)
+            msg = 'Unexpected exception:\n'
+            for line in ex:
+                msg = msg + line
+            msg = msg + '\converting dictionary data\n'
+            msg = msg + 'from version %s to %s' % (initial_version,
+                self.final_version())
+            raise DictConverter.ConversionFailure(msg)
+        return d
+
 
 # global converter
 symdict_cvtr = DictConverter.CompoundDictConverter(SymDict, current_version)
@@ -3708,6 +4628,7 @@ symdict_cvtr = DictConverter.CompoundDictConverter(SymDict, current_version)
 # obsolete because we switched file formats after version 2
 #symdict_cvtr.add_converter(AddSymbolSourcesRead())
 
+symdict_cvtr.add_converter(AddHarvestedSymbols())
 symdict_cvtr.add_converter(MoreExpansionCategories())
 symdict_cvtr.add_converter(SpokenFormsAsWordTrie())
 
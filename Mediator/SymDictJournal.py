@@ -0,0 +1,241 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Append-only journal of the changes made to a [SymDict] since its
+persistent file was last saved.
+
+Saving the whole symbol dictionary after every change is expensive, so
+[SymDict] records each call to one of its mutating methods (method
+name and arguments) in a [SymDictJournal], appends the new records to
+the journal file after each utterance, and only saves the full
+dictionary (which empties the journal) from time to time and on exit.
+If the mediator crashes, the calls in the journal are replayed on the
+dictionary read from the file.
+
+The journal file starts with a header identifying the dictionary file
+it applies to (its size and modification time right after it was
+saved), so a journal left over from before the last save is ignored.
+Each record is preceded by its length and CRC32, so a record which was
+only partly written when the mediator crashed is ignored, along with
+everything after it.
+
+.. [SymDict] file:///./SymDict.SymDict.html
+.. [SymDictJournal] file:///./SymDictJournal.SymDictJournal.html"""
+
+import cPickle, os, struct, zlib
+from Object import Object
+
+magic = 'VCJRNL1\n'
+
+_header_format = '>Id'
+_record_format = '>II'
+
+
+def journal_file_for(sym_file):
+    """returns the name of the journal file for a dictionary file
+
+    **INPUTS**
+
+    *STR sym_file* -- path of the dictionary file
+
+    **OUTPUTS**
+
+    *STR* -- path of the journal file
+    """
+    return sym_file + '.jnl'
+
+def snapshot_signature(sym_file):
+    """returns the size and modification time of a dictionary file
+
+    **INPUTS**
+
+    *STR sym_file* -- path of the dictionary file
+
+    **OUTPUTS**
+
+    *(INT, FLOAT)* -- the signature, or None if the file doesn't exist
+    """
+    try:
+        info = os.stat(sym_file)
+    except OSError:
+        return None
+    return (info.st_size, info.st_mtime)
+
+def read_entries(sym_file):
+    """reads the entries of the journal for a dictionary file
+
+    **INPUTS**
+
+    *STR sym_file* -- path of the dictionary file
+
+    **OUTPUTS**
+
+    *[(STR, (ANY))]* -- the (method name, arguments) entries, in the
+    order in which they were recorded.  Empty if there is no journal,
+    or if it applies to an older version of the dictionary file.
+    """
+    signature = snapshot_signature(sym_file)
+    try:
+        f = open(journal_file_for(sym_file), 'rb')
+    except IOError:
+        return []
+    entries = []
+    try:
+        if f.read(len(magic)) != magic:
+            return []
+        header = f.read(struct.calcsize(_header_format))
+        if len(header) != struct.calcsize(_header_format) or \
+           struct.unpack(_header_format, header) != signature:
+            return []
+        while 1:
+            prefix = f.read(struct.calcsize(_record_format))
+            if len(prefix) != struct.calcsize(_record_format):
+                break
+            length, crc = struct.unpack(_record_format, prefix)
+            data = f.read(length)
+            if len(data) != length or zlib.crc32(data) & 0xffffffffL != crc:
+                break
+            try:
+                entries.append(cPickle.loads(data))
+            except:
+                break
+    finally:
+        f.close()
+    return entries
+
+
+class SymDictJournal(Object):
+    """journal of the calls to the mutating methods of a [SymDict]
+
+    **INSTANCE ATTRIBUTES**
+
+    *STR sym_file* -- path of the dictionary file to which the journal
+    applies
+
+    *STR file_name* -- path of the journal file
+
+    *[STR] pending* -- records which haven't been appended to the file
+    yet
+
+    *INT* num_entries -- number of records in the file
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [SymDict] file:///./SymDict.SymDict.html"""
+
+    def __init__(self, sym_file, **args):
+        self.deep_construct(SymDictJournal,
+                            {'sym_file': sym_file,
+                             'file_name': journal_file_for(sym_file),
+                             'pending': [],
+                             'num_entries': 0},
+                            args)
+
+    def start(self):
+        """empties the journal, which should be done right after the
+        dictionary file has been saved
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the journal file was created successfully
+        """
+        self.pending = []
+        self.num_entries = 0
+        signature = snapshot_signature(self.sym_file)
+        if signature is None:
+            self.discard()
+            return 0
+        try:
+            f = open(self.file_name, 'wb')
+            f.write(magic + struct.pack(_header_format, signature[0],
+                signature[1]))
+            f.close()
+        except IOError:
+            return 0
+        return 1
+
+    def record(self, method_name, args):
+        """records a call to a mutating method
+
+        The arguments are pickled right away, since the caller may
+        modify them afterwards.
+
+        **INPUTS**
+
+        *STR method_name* -- name of the method
+
+        *(ANY)* args -- its positional arguments
+
+        **OUTPUTS**
+
+        *none*
+        """
+        data = cPickle.dumps((method_name, args), 1)
+        self.pending.append(struct.pack(_record_format, len(data),
+            zlib.crc32(data) & 0xffffffffL) + data)
+
+    def flush(self):
+        """appends the pending records to the journal file
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the records were written successfully
+        """
+        if not self.pending:
+            return 1
+        try:
+            f = open(self.file_name, 'ab')
+            for a_record in self.pending:
+                f.write(a_record)
+            f.close()
+        except IOError:
+            return 0
+        self.num_entries = self.num_entries + len(self.pending)
+        self.pending = []
+        return 1
+
+    def discard(self):
+        """removes the journal file
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.pending = []
+        self.num_entries = 0
+        try:
+            os.remove(self.file_name)
+        except OSError:
+            pass
@@ -0,0 +1,391 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2002, National Research Council of Canada
+#
+##############################################################################
+
+"""stores for the text of buffers cached by [SourceBuffCached]
+
+A text store holds the text of a buffer, and can return any part of it.
+Text stores are immutable: [TextStore.replace] returns a new store, so
+a store can be kept (e.g. as a snapshot of the buffer) while the buffer
+keeps changing.
+
+[StringTextStore] keeps the text in a single string, so every change
+copies the whole buffer.  [RopeTextStore] keeps it in a balanced tree
+of short strings (a rope), so changes and slices only copy the pieces
+they touch.  But reading around the cursor and reading the whole text
+are much slower with a rope, so on Admin/bench_textstore.py it only
+comes out ahead for buffers of several megabytes.  SourceBuffCached
+uses [StringTextStore] unless told otherwise.
+
+..[SourceBuffCached] file:///./SourceBuffCached.SourceBuffCached.html
+..[TextStore.replace] file:///./TextStore.TextStore.html#replace
+..[StringTextStore] file:///./TextStore.StringTextStore.html
+..[RopeTextStore] file:///./TextStore.RopeTextStore.html"""
+
+import string
+from types import TupleType
+
+import debug
+from Object import Object
+
+def _clamp(pos, length, default):
+    """converts a position in a text to an offset between 0 and the
+    length of the text, like Python's slices do
+
+    **INPUTS**
+
+    *INT pos* -- the position, possibly negative (counting from the
+    end), or None
+
+    *INT length* -- the length of the text
+
+    *INT default* -- the offset to return if pos is None
+
+    **OUTPUTS**
+
+    *INT* -- the offset
+    """
+    if pos is None:
+        return default
+    if pos < 0:
+        pos = pos + length
+        if pos < 0:
+            return 0
+    if pos > length:
+        return length
+    return pos
+
+class TextStore(Object):
+    """abstract class for the text of a buffer
+
+    **INSTANCE ATTRIBUTES**
+
+    *none*
+
+    CLASS ATTRIBUTES**
+
+    *none*
+    """
+    def __init__(self, **args):
+        self.deep_construct(TextStore, {}, args)
+
+    def len(self):
+        """returns the length of the text
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *INT* -- the length
+        """
+        debug.virtual('TextStore.len')
+
+    def text(self, start = None, end = None):
+        """returns a portion of the text
+
+        **INPUTS**
+
+        *INT start* -- the start of the portion (defaults to the start
+        of the text)
+
+        *INT end* -- the offset of the character following the portion
+        (defaults to the end of the text).  Like for Python's slices,
+        negative offsets count from the end of the text.
+
+        **OUTPUTS**
+
+        *STR* -- the portion of the text
+        """
+        debug.virtual('TextStore.text')
+
+    def replace(self, start, end, text):
+        """returns a store with a portion of the text replaced
+
+        **INPUTS**
+
+        *INT start* -- the start of the portion
+
+        *INT end* -- the offset of the character following the portion,
+        or None for the end of the text
+
+        *STR text* -- the text replacing the portion
+
+        **OUTPUTS**
+
+        *TextStore* -- the new store, of the same class (this store is
+        unchanged)
+        """
+        debug.virtual('TextStore.replace')
+
+class StringTextStore(TextStore):
+    """text store which keeps the text in a single string
+
+    **INSTANCE ATTRIBUTES**
+
+    *STR contents* -- the text
+
+    CLASS ATTRIBUTES**
+
+    *none*
+    """
+    def __init__(self, contents = '', **args):
+        self.deep_construct(StringTextStore, {'contents': contents}, args)
+
+    def len(self):
+        return len(self.contents)
+
+    def text(self, start = None, end = None):
+        if start is None:
+            start = 0
+        if end is None:
+            end = len(self.contents)
+        return self.contents[start:end]
+
+    def replace(self, start, end, text):
+        return StringTextStore(self.contents[:start] + text + \
+            self.contents[end:])
+
+#
+# A rope is either a leaf, which is a string, or a node, which is a tuple
+# (left, right, length, depth), where left and right are the two ropes
+# concatenated, length the total length of the text and depth the depth
+# of the tree.  The depths of the two halves of a node never differ by
+# more than one, like in AVL trees.
+#
+# maximum length of the leaves
+leaf_length = 1024
+
+def _length(rope):
+    if type(rope) is TupleType:
+        return rope[2]
+    return len(rope)
+
+def _depth(rope):
+    if type(rope) is TupleType:
+        return rope[3]
+    return 0
+
+def _node(left, right):
+    if type(left) is TupleType:
+        length, depth = left[2], left[3]
+    else:
+        length, depth = len(left), 0
+    if type(right) is TupleType:
+        length = length + right[2]
+        depth = max(depth, right[3])
+    else:
+        length = length + len(right)
+    return (left, right, length, depth + 1)
+
+def _balanced_node(left, right):
+    """returns a node with the given halves, rotated if their depths
+    differ by two"""
+    left_depth = _depth(left)
+    right_depth = _depth(right)
+    if left_depth > right_depth + 1:
+        outer, inner = left[0], left[1]
+        if _depth(outer) >= _depth(inner):
+            return _node(outer, _node(inner, right))
+        return _node(_node(outer, inner[0]), _node(inner[1], right))
+    if right_depth > left_depth + 1:
+        inner, outer = right[0], right[1]
+        if _depth(outer) >= _depth(inner):
+            return _node(_node(left, inner), outer)
+        return _node(_node(left, inner[0]), _node(inner[1], outer))
+    return _node(left, right)
+
+def _join(left, right):
+    """returns the concatenation of two ropes, descending into the
+    deeper one only as far as needed to keep the result balanced"""
+    if type(left) is TupleType:
+        left_depth = left[3]
+    elif not left:
+        return right
+    else:
+        left_depth = 0
+    if type(right) is TupleType:
+        right_depth = right[3]
+    elif not right:
+        return left
+    else:
+        right_depth = 0
+    if left_depth > right_depth + 1:
+        return _balanced_node(left[0], _join(left[1], right))
+    if right_depth > left_depth + 1:
+        return _balanced_node(_join(left, right[0]), right[1])
+    return _node(left, right)
+
+def _split(rope, pos):
+    """splits a rope at an offset between 0 and its length, returning
+    the two parts"""
+    if type(rope) is not TupleType:
+        return rope[:pos], rope[pos:]
+    left, right = rope[0], rope[1]
+    left_length = _length(left)
+    if pos < left_length:
+        first, second = _split(left, pos)
+        return first, _join(second, right)
+    if pos > left_length:
+        first, second = _split(right, pos - left_length)
+        return _join(left, first), second
+    return left, right
+
+def _split_first_leaf(rope):
+    """returns the first leaf of a rope, and the rest of the rope"""
+    if type(rope) is not TupleType:
+        return rope, ''
+    first, rest = _split_first_leaf(rope[0])
+    return first, _join(rest, rope[1])
+
+def _split_last_leaf(rope):
+    """returns the rope without its last leaf, and the last leaf"""
+    if type(rope) is not TupleType:
+        return '', rope
+    rest, last = _split_last_leaf(rope[1])
+    return _join(rope[0], rest), last
+
+def _build(text):
+    """returns a balanced rope holding a string"""
+    if len(text) <= leaf_length:
+        return text
+    leaves = []
+    for start in range(0, len(text), leaf_length):
+        leaves.append(text[start:start + leaf_length])
+    return _build_leaves(leaves, 0, len(leaves))
+
+def _build_leaves(leaves, first, last):
+    if last - first == 1:
+        return leaves[first]
+    middle = (first + last) / 2
+    return _node(_build_leaves(leaves, first, middle),
+                 _build_leaves(leaves, middle, last))
+
+def _collect(rope, start, end, pieces):
+    """appends the leaves (or parts of leaves) between two offsets of a
+    rope to a list"""
+    if type(rope) is not TupleType:
+        pieces.append(rope[start:end])
+        return
+    left_length = _length(rope[0])
+    if start < left_length:
+        _collect(rope[0], start, min(end, left_length), pieces)
+    if end > left_length:
+        _collect(rope[1], max(start - left_length, 0), end - left_length,
+            pieces)
+
+class RopeTextStore(TextStore):
+    """text store which keeps the text in a rope (a balanced tree of
+    short strings).  Replacing a portion of the text, or getting a
+    portion of it, takes a time proportional to the log of the length of
+    the text, plus the length of the portion.  Getting the whole text
+    takes a time proportional to its length, but only the first time.
+
+    **INSTANCE ATTRIBUTES**
+
+    *ANY rope* -- the rope (see the comments of the module)
+
+    *STR whole* -- the whole text, once it has been requested, or None
+
+    CLASS ATTRIBUTES**
+
+    *none*
+    """
+    def __init__(self, contents = '', rope = None, **args):
+        """
+        **INPUTS**
+
+        *STR contents* -- the text, if rope is None
+
+        *ANY rope* -- the rope holding the text
+        """
+        self.deep_construct(RopeTextStore, {'rope': rope, 'whole': None},
+            args)
+        if self.rope is None:
+            self.rope = _build(contents)
+
+    def len(self):
+        return _length(self.rope)
+
+    def text(self, start = None, end = None):
+        length = _length(self.rope)
+        start = _clamp(start, length, 0)
+        end = _clamp(end, length, length)
+        if start == 0 and end == length:
+            if self.whole is None:
+                self.whole = self._collected(0, length)
+            return self.whole
+        if end <= start:
+            return ''
+# descend to the smallest subtree holding the whole portion
+        rope = self.rope
+        while type(rope) is TupleType:
+            left_length = _length(rope[0])
+            if end <= left_length:
+                rope = rope[0]
+            elif start >= left_length:
+                rope = rope[1]
+                start = start - left_length
+                end = end - left_length
+            else:
+                break
+        if type(rope) is not TupleType:
+            return rope[start:end]
+        pieces = []
+        _collect(rope, start, end, pieces)
+        return string.join(pieces, '')
+
+    def _collected(self, start, end):
+        """returns the text between two offsets, from the leaves of the
+        rope
+
+        **INPUTS**
+
+        *INT start, end* -- the offsets, between 0 and the length of the
+        text
+
+        **OUTPUTS**
+
+        *STR* -- the text
+        """
+        if end <= start:
+            return ''
+        pieces = []
+        _collect(self.rope, start, end, pieces)
+        if len(pieces) == 1:
+            return pieces[0]
+        return string.join(pieces, '')
+
+    def replace(self, start, end, text):
+        length = _length(self.rope)
+        start = _clamp(start, length, 0)
+        end = max(_clamp(end, length, length), start)
+        before, rest = _split(self.rope, start)
+        replaced, after = _split(rest, end - start)
+# the new text is merged with the leaves around it, so that typing one
+# character at a time doesn't create one leaf per character
+        before, last = _split_last_leaf(before)
+        first, after = _split_first_leaf(after)
+        middle = _build(last + text + first)
+        return RopeTextStore(rope = _join(_join(before, middle), after))
+
+# class of the text stores used by SourceBuffCached, unless specified
+default_store_class = StringTextStore
@@ -24,6 +24,7 @@
 import copy, exceptions, os, re
 import Object, vc_globals
 import debug
+import latency
 import sr_interface
 import symbol_formatting
 
@@ -88,7 +89,11 @@ class Action(Object.Object):
         debug.trace('Action.log_execute', 'invoking action log()')        
         action_copy.log(app, cont_copy)
         debug.trace('Action.log_execute', 'invoking action execute()')                
-        return action_copy.execute(app, cont, state = state)
+        span = latency.start('Action.execute')
+        try:
+            return action_copy.execute(app, cont, state = state)
+        finally:
+            latency.end(span)
 
 
     def log(self, app, cont):
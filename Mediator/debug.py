@@ -139,7 +139,7 @@ def dont_print_trace(trace_id, message, insert_nl=1):
 def print_trace(trace_id, message, insert_nl=1):
     global to_be_traced, trace_listeners
 
-    if trace_is_active(trace_id):
+    if _trace_flag(trace_id):
         trace = '-- %s: %s' % (trace_id, message)
         if insert_nl:
            trace = "%s\n" % trace
@@ -186,9 +186,26 @@ def traces_are_on():
 
 
 def tracing(trace_id):
-    return trace_is_active(trace_id) and trace_fct != dont_print_trace
+    """Indicates whether traces with a given id are printed.
+
+    Call sites whose trace messages are expensive to build should test
+    this first.  When traces are off, this costs a single comparison."""
+    return trace_fct is not dont_print_trace and _trace_flag(trace_id)
+
+def _trace_flag(trace_id):
+    """Returns trace_is_active(trace_id), computed only once per trace
+    id until the traces are configured again."""
+    try:
+        return _trace_flags[trace_id]
+    except KeyError:
+        flag = _trace_is_active(trace_id)
+        _trace_flags[trace_id] = flag
+        return flag
 
 def trace_is_active(trace_id):
+    return _trace_flag(trace_id)
+
+def _trace_is_active(trace_id):
     global to_be_traced, activate_trace_id_substrings
 #    print '-- debug.trace_is_active: trace_id=%s' % trace_id
 
@@ -206,7 +223,14 @@ def trace_is_active(trace_id):
     return 0
         
 
-def trace(trace_id, message):
+def trace(trace_id, message, *args):
+    """Prints a trace message, if traces with that id are active.
+
+    To avoid building messages which won't be printed, pass the
+    arguments of the message format separately, e.g. 
+    trace('encode_data_item', 'item=%r', item) rather than
+    trace('encode_data_item', 'item=%r' % item).  The message may also
+    be a function returning the message."""
     #
     # This may look like we have an unnecessary level of indirection, i.e.
     # why not call trace_fct() direction instead of trace()?
@@ -216,8 +240,12 @@ def trace(trace_id, message):
     # config_traces() to change trace_fct after import, we will still be
     # invoking the old trace_fct(), not the new one.
     #
+    if trace_fct is dont_print_trace or not _trace_flag(trace_id):
+       return
     if callable(message):
        mess_string = message()
+    elif args:
+       mess_string = message % args
     else: 
        mess_string = message
     trace_fct(trace_id, mess_string)
@@ -226,7 +254,8 @@ def config_traces(status=None, active_traces=None,
                   allow_trace_id_substrings=None):
     """Configures what traces are printed, and where"""
 
-    global trace_fct, to_be_traced, activate_trace_id_substrings
+    global trace_fct, to_be_traced, activate_trace_id_substrings, \
+        _trace_flags
 
     #
     # trace_fct is a function that we set on the fly. It's never defined explicitly
@@ -245,6 +274,8 @@ def config_traces(status=None, active_traces=None,
 
     if allow_trace_id_substrings != None:
         activate_trace_id_substrings = allow_trace_id_substrings
+
+    _trace_flags = {}
         
 
 trace_fct = dont_print_trace
@@ -252,5 +283,7 @@ traces_on = False
 trace_listeners = [STDERR_TraceListener()]
 to_be_traced = {}
 activate_trace_id_substrings = 0
+# cache of trace_is_active for each trace id, emptied by config_traces
+_trace_flags = {}
 
     
@@ -0,0 +1,516 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Timing of the stages of the interpretation of each utterance.
+
+The stages of the recognition pipeline (from the results callback of
+the dictation grammar to the end of recognition in the editor) mark
+where they start and end with [start] and [end], and the messages
+exchanged with the editor are counted with [message_sent] and
+[message_received].  The timings of each utterance are collected in a
+[UtteranceTimings], and the most recent ones are kept in a
+[LatencyLog], which can be printed from the mediator console or saved
+as JSON for offline analysis.
+
+Only the thread which started the utterance is timed, so that messages
+read by the data threads of other connections are not counted.
+
+.. [start] file:///./latency.html#start
+.. [end] file:///./latency.html#end
+.. [message_sent] file:///./latency.html#message_sent
+.. [message_received] file:///./latency.html#message_received
+.. [UtteranceTimings] file:///./latency.UtteranceTimings.html
+.. [LatencyLog] file:///./latency.LatencyLog.html"""
+
+import string, sys, thread, time, types
+from Object import Object
+from LeakyStack import LeakyStack
+
+#
+# time.clock is wall-clock time with a high resolution on Windows, but
+# CPU time elsewhere
+#
+if sys.platform == 'win32':
+    timer = time.clock
+else:
+    timer = time.time
+
+
+class UtteranceTimings(Object):
+    """timings of the stages of the interpretation of one utterance
+
+    **INSTANCE ATTRIBUTES**
+
+    *INT number* -- sequential number of the utterance
+
+    *STR words* -- the words of the utterance
+
+    *FLOAT started* -- time at which the utterance was received
+    (time.time())
+
+    *FLOAT total* -- time taken by the whole utterance, in seconds, or
+    None if it isn't finished yet
+
+    *[(STR, INT, FLOAT, FLOAT)] spans* -- name, nesting depth, start
+    (relative to the start of the utterance) and duration of each stage,
+    in the order in which they ended
+
+    *INT messages_sent* -- number of messages sent to the editor
+
+    *INT messages_received* -- number of messages received from the
+    editor (i.e. number of round trips)
+
+    *FLOAT message_wait* -- time spent waiting for messages from the
+    editor
+
+    *INT thread_id* -- identifier of the thread interpreting the utterance
+
+    *FLOAT start_time* -- value of the timer when the utterance was
+    received
+
+    *[(STR, FLOAT)] open_spans* -- name and start time of the stages
+    which haven't ended yet, innermost last
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+    """
+
+    def __init__(self, number, words = None, **args):
+        self.deep_construct(UtteranceTimings,
+                            {'number': number,
+                             'words': words,
+                             'started': time.time(),
+                             'total': None,
+                             'spans': [],
+                             'messages_sent': 0,
+                             'messages_received': 0,
+                             'message_wait': 0.0,
+                             'thread_id': thread.get_ident(),
+                             'start_time': timer(),
+                             'open_spans': []},
+                            args)
+
+    def start(self, name):
+        """marks the start of a stage
+
+        **INPUTS**
+
+        *STR name* -- name of the stage
+
+        **OUTPUTS**
+
+        *INT* -- nesting depth of the stage, to be passed to [end]
+
+        .. [end] file:///./latency.UtteranceTimings.html#end"""
+        self.open_spans.append((name, timer()))
+        return len(self.open_spans) - 1
+
+    def end(self, depth):
+        """marks the end of a stage, and of any stage nested in it which
+        hasn't ended yet
+
+        **INPUTS**
+
+        *INT depth* -- nesting depth returned by [start]
+
+        **OUTPUTS**
+
+        *none*
+
+        .. [start] file:///./latency.UtteranceTimings.html#start"""
+        now = timer()
+        while len(self.open_spans) > depth:
+            name, started = self.open_spans.pop()
+            self.spans.append((name, len(self.open_spans),
+                               started - self.start_time, now - started))
+
+    def finish(self):
+        """marks the end of the utterance
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.end(0)
+        self.total = timer() - self.start_time
+
+    def stages(self):
+        """returns the total time taken by each stage
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: (INT, FLOAT)}* -- map from the name of each stage to the
+        number of times it ran and its total duration
+        """
+        totals = {}
+        for name, depth, start, duration in self.spans:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + duration)
+        return totals
+
+    def as_dict(self):
+        """returns the timings as a dictionary of simple values, e.g.
+        for exporting them
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: ANY}* -- the timings.  Times are in milliseconds.
+        """
+        spans = []
+        for name, depth, start, duration in self.spans:
+            spans.append({'name': name, 'depth': depth,
+                          'start': start * 1000,
+                          'duration': duration * 1000})
+        total = self.total
+        if total is not None:
+            total = total * 1000
+        return {'number': self.number, 'words': self.words,
+                'started': self.started, 'total': total, 'spans': spans,
+                'messages_sent': self.messages_sent,
+                'messages_received': self.messages_received,
+                'message_wait': self.message_wait * 1000}
+
+    def summary(self):
+        """returns a human readable summary of the timings
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *STR* -- the summary, with one line for the utterance followed
+        by one line for each stage (slowest first)
+        """
+        total = self.total
+        if total is None:
+            total = timer() - self.start_time
+        lines = ['#%d %s: %.1f ms, %d round trips (%.1f ms waiting)' \
+                 % (self.number, repr(self.words), total * 1000,
+                    self.messages_received, self.message_wait * 1000)]
+        totals = self.stages()
+        ranked = []
+        for name in totals.keys():
+            count, stage_total = totals[name]
+            ranked.append((-stage_total, name, count))
+        ranked.sort()
+        for stage_total, name, count in ranked:
+            lines.append('   %-40s %3d x %8.1f ms' \
+                         % (name, count, -stage_total * 1000))
+        return string.join(lines, '\n')
+
+
+class LatencyLog(Object):
+    """timings of the most recent utterances
+
+    **INSTANCE ATTRIBUTES**
+
+    *LeakyStack timings* -- the [UtteranceTimings] of the most recent
+    utterances, oldest first
+
+    *UtteranceTimings current* -- the timings of the utterance being
+    interpreted, or None
+
+    *BOOL enabled* -- if false, no timings are recorded
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [UtteranceTimings] file:///./latency.UtteranceTimings.html"""
+
+    def __init__(self, max_utterances = 100, **args):
+        self.deep_construct(LatencyLog,
+                            {'timings': LeakyStack(max_utterances),
+                             'current': None,
+                             'enabled': 1},
+                            args)
+
+    def begin_utterance(self, words = None):
+        """starts timing a new utterance, unless one is already being
+        timed
+
+        **INPUTS**
+
+        *STR words* -- the words of the utterance
+
+        **OUTPUTS**
+
+        *BOOL* -- true if a new utterance was started, in which case the
+        caller must call [end_utterance] when it is done
+
+        .. [end_utterance] file:///./latency.LatencyLog.html#end_utterance"""
+        if not self.enabled or self.current is not None:
+            return 0
+        self.current = UtteranceTimings(self.timings.height() + 1, words)
+        return 1
+
+    def end_utterance(self):
+        """finishes timing the current utterance, and adds it to the log
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        current = self.current
+        if current is None:
+            return
+        self.current = None
+        current.finish()
+        self.timings.push(current)
+
+    def timed(self):
+        """returns the timings of the current utterance, if it is being
+        interpreted by the calling thread
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *UtteranceTimings* -- the timings, or None
+        """
+        current = self.current
+        if current is None or current.thread_id != thread.get_ident():
+            return None
+        return current
+
+    def recent(self, n = None):
+        """returns the timings of the most recent utterances
+
+        **INPUTS**
+
+        *INT n* -- maximum number of utterances, or None for all those
+        in the log
+
+        **OUTPUTS**
+
+        *[UtteranceTimings]* -- the timings, oldest first
+        """
+        timings = self.timings.items()
+        if n is None:
+            return timings[:]
+        return timings[max(0, len(timings) - n):]
+
+    def clear(self):
+        """empties the log
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.timings = LeakyStack(self.timings.max_height)
+
+
+def json_value(value):
+    """returns the JSON representation of a value
+
+    **INPUTS**
+
+    *ANY value* -- None, a number, a string, or a list, tuple or
+    dictionary of such values.  Keys of dictionaries are converted to
+    strings.
+
+    **OUTPUTS**
+
+    *STR* -- the JSON text
+    """
+    if value is None:
+        return 'null'
+    if type(value) in (types.IntType, types.LongType):
+        return str(value)
+    if type(value) == types.FloatType:
+        return repr(value)
+    if type(value) in (types.ListType, types.TupleType):
+        return '[' + string.join(map(json_value, value), ', ') + ']'
+    if type(value) == types.DictType:
+        keys = value.keys()
+        keys.sort()
+        items = []
+        for a_key in keys:
+            items.append('%s: %s' % (json_value(str(a_key)),
+                                     json_value(value[a_key])))
+        return '{' + string.join(items, ', ') + '}'
+    if type(value) == types.StringType:
+        value = unicode(value, 'latin-1')
+    if type(value) != types.UnicodeType:
+        value = unicode(str(value), 'latin-1')
+    chunks = ['"']
+    for char in value:
+        if char == '"' or char == '\\':
+            chunks.append('\\' + char)
+        elif char < u' ' or char > u'~':
+            chunks.append('\\u%04x' % ord(char))
+        else:
+            chunks.append(str(char))
+    chunks.append('"')
+    return string.join(chunks, '')
+
+
+#
+# the log of the mediator
+#
+the_log = LatencyLog()
+
+def begin_utterance(words = None):
+    """starts timing a new utterance (see [LatencyLog.begin_utterance])
+
+    .. [LatencyLog.begin_utterance] file:///./latency.LatencyLog.html#begin_utterance"""
+    return the_log.begin_utterance(words)
+
+def end_utterance():
+    """finishes timing the current utterance"""
+    the_log.end_utterance()
+
+def start(name):
+    """marks the start of a stage of the current utterance
+
+    **INPUTS**
+
+    *STR name* -- name of the stage
+
+    **OUTPUTS**
+
+    *INT* -- value to pass to [end], or None if no utterance is being
+    timed by this thread
+
+    .. [end] file:///./latency.html#end"""
+    current = the_log.timed()
+    if current is None:
+        return None
+    return current.start(name)
+
+def end(span):
+    """marks the end of a stage of the current utterance
+
+    **INPUTS**
+
+    *INT span* -- value returned by [start]
+
+    **OUTPUTS**
+
+    *none*
+
+    .. [start] file:///./latency.html#start"""
+    if span is None:
+        return
+    current = the_log.timed()
+    if current is not None:
+        current.end(span)
+
+def message_sent():
+    """counts a message sent to the editor during the current utterance"""
+    current = the_log.timed()
+    if current is not None:
+        current.messages_sent = current.messages_sent + 1
+
+def message_received(waited):
+    """counts a message received from the editor during the current
+    utterance
+
+    **INPUTS**
+
+    *FLOAT waited* -- time spent waiting for the message, in seconds
+
+    **OUTPUTS**
+
+    *none*
+    """
+    current = the_log.timed()
+    if current is not None:
+        current.messages_received = current.messages_received + 1
+        current.message_wait = current.message_wait + waited
+
+def config_latency(enabled = None, max_utterances = None):
+    """configures the timing of utterances
+
+    **INPUTS**
+
+    *BOOL enabled* -- if not None, whether to time utterances
+
+    *INT max_utterances* -- if not None, the number of utterances to
+    keep in the log (which is emptied)
+
+    **OUTPUTS**
+
+    *none*
+    """
+    if enabled is not None:
+        the_log.enabled = enabled
+    if max_utterances is not None:
+        the_log.timings = LeakyStack(max_utterances)
+
+def print_latencies(n = 10):
+    """prints the timings of the most recent utterances
+
+    **INPUTS**
+
+    *INT n* -- maximum number of utterances
+
+    **OUTPUTS**
+
+    *none*
+    """
+    for timings in the_log.recent(n):
+        print timings.summary()
+
+def save_latencies(file_name, n = None):
+    """saves the timings of the most recent utterances as a JSON list
+
+    **INPUTS**
+
+    *STR file_name* -- path of the file
+
+    *INT n* -- maximum number of utterances, or None for all those in
+    the log
+
+    **OUTPUTS**
+
+    *none*
+    """
+    exported = []
+    for timings in the_log.recent(n):
+        exported.append(timings.as_dict())
+    f = open(file_name, 'w')
+    f.write(json_value(exported) + '\n')
+    f.close()
@@ -22,7 +22,7 @@
 """Classes for communicating with an external editor through a messaging protocol"""
 
 import socket
-import re, sys, types
+import re, string, struct, sys, types
 import copy
 from xml.marshal.wddx import WDDXMarshaller, WDDXUnmarshaller
 from debug import trace, tracing
@@ -31,19 +31,185 @@ import time
 import select
 import threading
 
-import debug, Object
+import debug, latency, Object
 
 class SocketError(RuntimeError):
     def __init__(self, msg):
         RuntimeError.__init__(self, msg)
 #        self.msg = msg
 
+class MalformedMessage(RuntimeError):
+    def __init__(self, msg):
+        RuntimeError.__init__(self, msg)
+
 # exception to allow receive_string to signal that it was woken from its
 # sleep
 class WokenUp:
     def __init__(self, msg):
         self.msg = msg
 
+def connected_socket_pair():
+    """creates a pair of sockets connected to each other through the
+    loopback interface (a portable replacement for a pipe, since only
+    sockets can be used with select on all platforms)
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *(socket, socket)* -- the two ends of the connection
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        one_end = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        one_end.connect(server.getsockname())
+        other_end, dummy = server.accept()
+    finally:
+        server.close()
+    return one_end, other_end
+
+class WakeupEvent(Object.Object):
+    """event with the same interface as threading.Event, which can
+    also wake up threads waiting with select for data on a socket.
+
+    Setting the event writes a byte to a socket connected to
+    *wakeup_sock* (the self-pipe trick), so a thread which includes
+    *wakeup_sock* in its select call returns as soon as the event is
+    set.  The owner of the event must [close] it when it is no longer
+    needed, to free the sockets.
+
+    .. [close] file:///./messaging.WakeupEvent.html#close
+    **INSTANCE ATTRIBUTES**
+
+    *threading.Event event* -- the underlying threading.Event
+
+    *socket wakeup_sock* -- socket which becomes readable when the
+    event is set, or None if the sockets couldn't be created
+
+    *socket wakeup_sender* -- the other end of the connection
+
+    **CLASS ATTRIBUTES**
+
+    *none*
+    """
+    def __init__(self, **args):
+        self.deep_construct(WakeupEvent,
+                            {'event': threading.Event(),
+                             'wakeup_sock': None,
+                             'wakeup_sender': None}, args)
+        try:
+            self.wakeup_sender, self.wakeup_sock = connected_socket_pair()
+        except socket.error:
+            self.wakeup_sender = None
+            self.wakeup_sock = None
+
+    def set(self):
+        """sets the event, waking up any threads waiting for it
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.event.set()
+        if self.wakeup_sender is not None:
+            try:
+                self.wakeup_sender.send('!')
+            except socket.error:
+                pass
+
+    def clear(self):
+        """clears the event
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.event.clear()
+        if self.wakeup_sock is None:
+            return
+        try:
+            while select.select([self.wakeup_sock], [], [], 0)[0]:
+                if not self.wakeup_sock.recv(1024):
+                    break
+        except (socket.error, select.error):
+            pass
+
+    def isSet(self):
+        """checks whether the event is set
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the event is set
+        """
+        return self.event.isSet()
+
+    def wait(self, timeout = None):
+        """waits until the event is set, or the timeout expires
+
+        **INPUTS**
+
+        *FLOAT timeout* -- the timeout in seconds, or None to wait
+        indefinitely
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.event.wait(timeout)
+
+    def wakeup_socket(self):
+        """returns the socket which becomes readable when the event is
+        set
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *socket* -- the socket, or None if not available
+        """
+        return self.wakeup_sock
+
+    def close(self):
+        """closes the sockets used to wake up threads waiting with
+        select.  The event can still be set and waited for.  Threads
+        may still be using *wakeup_sock*, so the event should be set
+        before it is closed: threads check whether the event is set
+        before waiting with select (see
+        MessTransporter_Socket.wait_for_data).
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        for a_sock in [self.wakeup_sender, self.wakeup_sock]:
+            if a_sock is not None:
+                a_sock.close()
+        self.wakeup_sender = None
+        self.wakeup_sock = None
+
+
 class LightSleeper(Object.Object):
     """class with a sleep method, like the time module, but which
     can be woken by another thread, by setting a threading.Event
@@ -51,8 +217,9 @@ class LightSleeper(Object.Object):
     **INSTANCE ATTRIBUTES**
 
     *threading.Event wakeup_event* -- the underlying threading.Event
-    which supplies the wait method and can be checked upon wakeup to see
-    if the wait method timed out, or was stopped early.
+    (or [WakeupEvent]) which supplies the wait method and can be 
+    checked upon wakeup to see if the wait method timed out, or was
+    stopped early.
 
     **CLASS ATTRIBUTES**
 
@@ -105,6 +272,25 @@ class LightSleeper(Object.Object):
         """
         return self.wakeup_event.isSet()
 
+    def wakeup_socket(self):
+        """returns a socket which becomes readable when the
+        wakeup_event is set, so that a thread waiting with select for
+        data on another socket can be woken up
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *socket* -- the socket, or None if the wakeup_event is not a
+        [WakeupEvent]
+
+        .. [WakeupEvent] file:///./messaging.WakeupEvent.html"""
+        if isinstance(self.wakeup_event, WakeupEvent):
+            return self.wakeup_event.wakeup_socket()
+        return None
+
 
 class Messenger(Object.Object):
    
@@ -285,16 +471,17 @@ class MessengerBasic(Messenger):
 
         trace_id = 'send_mess.%s' % mess_name
         if tracing(trace_id):
-            trace(trace_id, 'self=%s, mess_name=\'%s\'' % (self, mess_name))
+            trace(trace_id, 'self=%s, mess_name=\'%s\'', self, mess_name)
         if mess_argvals == None:
             tmp_args = {}
         else:
             tmp_args = copy.copy(mess_argvals)
         if tracing(trace_id):
-            trace(trace_id, 'mess_argvals=\'%s\'' % tmp_args)        
+            trace(trace_id, 'mess_argvals=\'%s\'', tmp_args)        
         unpkd_mess = self.encoder.encode(mess_name, tmp_args)
         pkd_mess = self.packager.pack_mess(unpkd_mess)        
         self.packager.send_packed_mess(pkd_mess, self.transporter)
+        latency.message_sent()
 
 
     def get_mess(self, expect=None):
@@ -313,15 +500,17 @@ class MessengerBasic(Messenger):
          from external editor in *(mess_name, {arg:val})* format, or
          None if no message is available."""
 
-        trace('get_mess', 'self=%s, expecting %s' % (self, repr(expect)))
+        trace('get_mess', 'self=%s, expecting %r', self, expect)
         
+        started = latency.timer()
         pkd_mess = self.packager.get_packed_mess(self.transporter)
+        latency.message_received(latency.timer() - started)
         unpkd_mess = self.packager.unpack_mess(pkd_mess)
         name_argvals_mess = self.encoder.decode(unpkd_mess)
 
         if expect != None and (not (name_argvals_mess[0] in expect)):
-            trace('get_mess', 'wrong_message %s, expecting %s' % \
-                (repr(name_argvals_mess), repr(expect)))
+            trace('get_mess', 'wrong_message %r, expecting %r',
+                              name_argvals_mess, expect)
             self.wrong_message(name_argvals_mess, expect)
 
         if tracing('get_mess.%s' % name_argvals_mess[0]):
@@ -391,7 +580,7 @@ class MixedMessenger(Messenger):
          from external editor in *(mess_name, {arg:val})* format, or
          None if no message is available."""
 
-        trace('get_mess', 'self=%s, expecting %s' % (self, repr(expect)))        
+        trace('get_mess', 'self=%s, expecting %r', self, expect)        
         
         try:
             name_argvals_mess = self.receiver.get(block=0)
@@ -427,8 +616,18 @@ class MessPackager(Object.Object):
     
     CLASS ATTRIBUTES**
     
-    *none* -- 
-    """
+    *INT head_len* -- number of bytes at the start of a message which
+    [find_packed_mess] needs to see at once
+
+    *BOOL delimits_messages* -- true if [unpack_mess] returns exactly
+    the message which was packed (without padding), so that the
+    encoder doesn't need to record the length of the message
+
+    .. [find_packed_mess] file:///./messaging.MessPackager.html#find_packed_mess
+    .. [unpack_mess] file:///./messaging.MessPackager.html#unpack_mess"""
+
+    head_len = 0
+    delimits_messages = 0
     
     def __init__(self, **args_super):
         self.deep_construct(MessPackager, \
@@ -472,6 +671,36 @@ class MessPackager(Object.Object):
         
         debug.virtual('get_pkd_mess')        
 
+    def find_packed_mess(self, data, start = 0, searched = None):
+        """Finds the length of a packed message in some data received
+        on a transport channel, without blocking to receive more data.
+        Used to read messages from channels whose data is received
+        incrementally, as it becomes available.
+
+        The data received earlier doesn't need to be searched again, 
+        so *data* can be just the end of the data received, as long as
+        it includes the first *head_len* bytes of the message.
+        
+        **INPUTS**
+                
+        STR *data* -- the data received (or the end of it)
+
+        INT *start* -- offset in *data* of the start of the message.
+        It is negative if the message started in data received
+        earlier.
+
+        INT *searched* -- offset in *data* of the data not searched
+        by earlier calls, or None to search from *start*
+        
+
+        **OUTPUTS**
+
+        INT *length* -- length of the packed message, or None if it
+        can't be known yet.  The length may be greater than the data
+        received so far.
+        """
+        debug.virtual('find_packed_mess')        
+
 
 
     def pack_mess(self, mess):
@@ -563,7 +792,7 @@ class MessPackager_FixedLenSeq(MessPackager):
         ..[MessTransporter] file:///./messaging.MessTransporter.html"""
 
         if tracing('send_packed_mess'):
-            trace('send_packed_mess', 'pkd_mess="%s"' % pkd_mess)
+            trace('send_packed_mess', 'pkd_mess="%s"', pkd_mess)
         
         #
         # Nothing particular about how such messages need to be sent.
@@ -589,18 +818,48 @@ class MessPackager_FixedLenSeq(MessPackager):
         #
         # Read the fixed length messages until we get one that starts with 1
         #
-        pkd_message = ''
+        chunks = []
         last_chunk = 0
         while not (last_chunk == '1'):
             a_chunk = transporter.receive_string(self.chunk_len)
             trace('messaging.MessPackager_FixedLenSeq.get_packed_mess:',
-                  'read a_chunk="%s"' % a_chunk)
+                  'read a_chunk="%s"', a_chunk)
             
-            pkd_message = pkd_message + a_chunk
+            chunks.append(a_chunk)
             last_chunk = a_chunk[0]
 
         
-        return pkd_message
+        return string.join(chunks, '')
+
+    def find_packed_mess(self, data, start = 0, searched = None):
+        """Finds the length of a message packed as a sequence of fixed
+        length chunks, from the first character of its chunks.
+        
+        **INPUTS**
+                
+        STR *data* -- the data received (or the end of it)
+
+        INT *start* -- offset in *data* of the start of the message.
+        It is negative if the message started in data received
+        earlier.
+
+        INT *searched* -- offset in *data* of the data not searched
+        by earlier calls, or None to search from *start*
+        
+
+        **OUTPUTS**
+
+        INT *length* -- length of the packed message, or None if its
+        last chunk hasn't started yet
+        """
+        if searched == None:
+            searched = start
+# first chunk which starts in the data not searched yet
+        first = searched + (start - searched) % self.chunk_len
+        for chunk_start in range(first, len(data), self.chunk_len):
+            if data[chunk_start] == '1':
+                return chunk_start - start + self.chunk_len
+        return None
 
 
     def pack_mess(self, mess):
@@ -616,30 +875,30 @@ class MessPackager_FixedLenSeq(MessPackager):
         
         *STR packed_mess* -- The packed message
         """
-        packed_mess = ''
-        while not mess == '':            
+        chunks = []
+        start = 0
+        while start < len(mess):
             #
             # Make sure you leave room for the single character prefix
             #
-            a_chunk = mess[:self.chunk_len-1]
+            a_chunk = mess[start:start + self.chunk_len-1]
+            start = start + self.chunk_len - 1
 
             #
-            # If this is last chunk in message, pad it with blanks to the
-            # right
-            #
-            num_padding = (self.chunk_len - 1) - len(a_chunk)
-            a_chunk = a_chunk + self.large_white_space[:num_padding]
-                                  
-            #
-            # Is this last chunk in the message?
+            # Is this last chunk in the message?  If so, pad it with
+            # blanks to the right
             # 
-            mess = mess[self.chunk_len-1:]
-            prefix = int(mess == '')
-            
-            a_chunk = "%s%s" % (prefix, a_chunk)
-            packed_mess = packed_mess + a_chunk
+            if start < len(mess):
+                chunks.append('0')
+                chunks.append(a_chunk)
+            else:
+                num_padding = (self.chunk_len - 1) - len(a_chunk)
+                chunks.append('1')
+                chunks.append(a_chunk)
+                chunks.append(self.large_white_space[:num_padding])
+        packed_mess = string.join(chunks, '')
             
-        trace('MessPackager_FixedLenSeq.pack_mess', 'returning packed_mess="%s"' % packed_mess)
+        trace('MessPackager_FixedLenSeq.pack_mess', 'returning packed_mess="%s"', packed_mess)
 
         return packed_mess
             
@@ -658,13 +917,142 @@ class MessPackager_FixedLenSeq(MessPackager):
         *STR unpacked_mess* -- The message unpacked to a raw string.
         """
 
-        unpacked_mess = ''
-        while mess != '':
-            a_chunk = mess[:self.chunk_len]
-            unpacked_mess = unpacked_mess + a_chunk[1:]
-            mess = mess[self.chunk_len:]
+        chunks = []
+        for start in range(0, len(mess), self.chunk_len):
+            chunks.append(mess[start + 1:start + self.chunk_len])
+
+        return string.join(chunks, '')
+
+
+class MessPackager_LenPrefix(MessPackager):
+    """Packages messages as a length prefix followed by the message.
+
+    The prefix is the length of the message, as a 4 byte big-endian
+    unsigned integer.  Unlike [MessPackager_FixedLenSeq], the message
+    is never padded, and a message is received with a single call to
+    the transporter for its whole length, whatever its size.
+
+    **INSTANCE ATTRIBUTES**
+    
+    *INT max_len* -- maximum length of a message.  A longer prefix is
+    assumed to come from a peer which doesn't use the same packager,
+    and raises a [MalformedMessage] exception.
+    
+    CLASS ATTRIBUTES**
+    
+    *INT head_len* -- the length of the prefix
+
+    *BOOL delimits_messages* -- true
 
-        return unpacked_mess
+    .. [MessPackager_FixedLenSeq] file:///./messaging.MessPackager_FixedLenSeq.html
+    .. [MalformedMessage] file:///./messaging.MalformedMessage.html"""
+
+    head_len = 4
+    delimits_messages = 1
+    
+    def __init__(self, max_len = 64*1024*1024, **args_super):
+        self.deep_construct(MessPackager_LenPrefix, 
+                            {'max_len': max_len}, 
+                            args_super, 
+                            {})
+
+    def send_packed_mess(self, pkd_mess, transporter):
+        """Send a length prefixed message.
+        
+        **INPUTS**
+        
+        STR *pkd_mess* -- The packed message
+        
+        [MessTransporter] *transporter* -- Transport channel to be used
+        
+
+        **OUTPUTS**
+        
+        *none* --
+
+        ..[MessTransporter] file:///./messaging.MessTransporter.html"""
+
+        if tracing('send_packed_mess'):
+            trace('send_packed_mess', 'pkd_mess="%s"', pkd_mess)
+        transporter.send_string(pkd_mess)
+
+    def get_packed_mess(self, transporter):
+        """Receive a length prefixed message.
+        
+        **INPUTS**
+                
+        [MessTransporter] *transporter* -- Transport channel to be used
+        
+
+        **OUTPUTS**
+
+        STR *pkd_mess* -- The packed message        
+
+        .. [MessTransporter] file:///./messaging.MessTransporter.html"""
+
+        prefix = transporter.receive_string(4)
+        length, = struct.unpack('>I', prefix)
+        if length > self.max_len:
+            raise MalformedMessage('message length %d exceeds maximum' \
+                % length)
+        if tracing('messaging.MessPackager_LenPrefix.get_packed_mess'):
+            trace('messaging.MessPackager_LenPrefix.get_packed_mess',
+                  'receiving %d bytes', length)
+        return prefix + transporter.receive_string(length)
+
+    def find_packed_mess(self, data, start = 0, searched = None):
+        """Finds the length of a length prefixed message, from its 
+        prefix.
+        
+        **INPUTS**
+                
+        STR *data* -- the data received (or the end of it)
+
+        INT *start* -- offset in *data* of the start of the message
+
+        INT *searched* -- ignored
+        
+
+        **OUTPUTS**
+
+        INT *length* -- length of the packed message, or None if the
+        prefix hasn't been received yet
+        """
+        if start < 0 or len(data) < start + 4:
+            return None
+        length, = struct.unpack('>I', data[start:start + 4])
+        if length > self.max_len:
+            raise MalformedMessage('message length %d exceeds maximum' \
+                % length)
+        return 4 + length
+
+    def pack_mess(self, mess):
+        """Prefix the message with its length.
+        
+        **INPUTS**
+        
+        STR *mess* -- The message as a raw string
+        
+
+        **OUTPUTS**
+        
+        *STR packed_mess* -- The packed message
+        """
+        return struct.pack('>I', len(mess)) + mess
+
+    def unpack_mess(self, mess):
+        """Removes the length prefix from a message.
+        
+        **INPUTS**
+        
+        *STR* mess -- The packed message
+        
+
+        **OUTPUTS**
+        
+        *STR unpacked_mess* -- The message unpacked to a raw string.
+        """
+        return mess[4:]
 
 
 class MessEncoder(Object.Object):
@@ -700,6 +1088,21 @@ class MessEncoder(Object.Object):
                             args_super, \
                             {})
 
+    def use_packaging(self, packager_class):
+        """informs the encoder of the packaging with which its messages
+        are sent, in case it can leave out information which the
+        packaging already provides.  Does nothing by default.
+
+        **INPUTS**
+
+        *CLASS packager_class* -- the [MessPackager] subclass
+
+        **OUTPUTS**
+
+        *none*
+
+        ..[MessPackager] file:///./messaging.MessPackager.html"""
+        pass
 
 
     def malformed_mess(self, mess, when, malformation=None):
@@ -844,9 +1247,14 @@ class MessTransporter_Socket(MessTransporter):
     
     *socket sock*-- The socket connection used to transport the bytes.
 
-    *FLOAT sleep* -- number of seconds to sleep if before checking again
-    if the socket has no data, or None to block when there is no data,
-    and check repeatedly until the requested number of bytes are received.
+    *FLOAT sleep* -- if not None, the transport waits for data with
+    select, and can be woken up by the *sleeper* while waiting.  If the
+    sleeper has a wakeup socket (see [WakeupEvent]), it is included in
+    the select call, so the wait ends as soon as data arrives or the
+    sleeper is woken.  Otherwise, *sleep* is the maximum number of 
+    seconds to wait before checking whether the sleeper was woken.  If
+    None, block when there is no data, and check repeatedly until the
+    requested number of bytes are received.
 
     *LightSleeper sleeper* -- LightSleeper object used to make the
     thread sleep, but let it be woken early from another thread.  May be
@@ -914,18 +1322,15 @@ class MessTransporter_Socket(MessTransporter):
         STR *a_string* -- The received string
         """
 
-        a_string = ''
-        while len(a_string) < num_bytes:
+        chunks = []
+        received = 0
+        while received < num_bytes:
             if self.sleep:
-                while not self.data_available():
-                    self.sleeper.sleep(self.sleep)
-                    if self.sleeper.was_woken():
-                        raise WokenUp("receive_string woken up")
-#                    time.sleep(self.sleep)
+                self.wait_for_data()
             try:
-                chunk = self.sock.recv(num_bytes - len(a_string))
+                chunk = self.sock.recv(num_bytes - received)
                 if tracing('receive_string'):
-                    trace('receive_string', 'read chunk=\'%s\'' % chunk);
+                    trace('receive_string', 'read chunk=\'%s\'', chunk);
             except socket.error:
                 chunk = ''
             if chunk == '':
@@ -934,11 +1339,50 @@ class MessTransporter_Socket(MessTransporter):
                     threading.currentThread().getName())
                 raise SocketError("socket connection broken (receiving)")
 #                raise SocketError, "socket connection broken"
-            a_string = a_string + chunk
+            chunks.append(chunk)
+            received = received + len(chunk)
 
 #        if tracing('receive_string'):
 #            trace('receive_string', "received string '%s'" % a_chunk)
-        return a_string         
+        if len(chunks) == 1:
+            return chunks[0]
+        return string.join(chunks, '')
+
+    def wait_for_data(self):
+        """waits until the input socket has data, or the sleeper is
+        woken up.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none* -- raises WokenUp if the sleeper was woken up while there
+        was no data
+        """
+        socks = [self.sock]
+        timeout = self.sleep
+        wakeup_sock = self.sleeper.wakeup_socket()
+        if wakeup_sock is not None:
+            socks.append(wakeup_sock)
+            timeout = None
+        while 1:
+# once the sleeper is woken up, the owner of its WakeupEvent may close
+# wakeup_sock at any time
+            if self.sleeper.was_woken():
+                raise WokenUp("receive_string woken up")
+            try:
+                data, dummy, dummy2 = select.select(socks, [], [], timeout)
+            except (socket.error, select.error):
+                sys.stderr.write('MessTransporter_Socket.wait_for_data:')
+                sys.stderr.write(' socket connection broken in %s' % \
+                    threading.currentThread().getName())
+                raise SocketError("socket connection broken (receiving)")
+            if self.sock in data:
+                return
+            if self.sleeper.was_woken():
+                raise WokenUp("receive_string woken up")
 
     def data_available(self):
         """check whether the input socket has data
@@ -1067,7 +1511,7 @@ class MessEncoderWDDX(MessEncoder):
 
         if tracing('messaging.MessEncoderWDDX.decode'):
             trace('messaging.MessEncoderWDDX.decode',
-                  'decoding str_mess="%s"' % str_mess)
+                  'decoding str_mess="%s"', str_mess)
         
         mess_argvals = self.unmarshaller.loads(str_mess)
 
@@ -1080,6 +1524,336 @@ class MessEncoderWDDX(MessEncoder):
         return (mess_name, mess_argvals)
         
 
+###############################################################################
+# Binary message encoder
+###############################################################################
+
+class MessEncoderBinary(MessEncoder):
+    """Compact binary encoding scheme for messages.
+
+    Encoding and decoding a message is a single pass over the data,
+    with no XML to generate or parse.  The format is:
+
+       message ::= length name_item dict_item
+       item ::= 's' length bytes | 'u' length utf8_bytes 
+              | 'i' int32 | 'l' length decimal_digits | 'f' double
+              | 'L' count item* | 'D' count (string_item item)*
+
+    where *length*, *count* and *int32* are 4 byte big-endian integers
+    and *double* is an 8 byte big-endian IEEE float.  The initial
+    *length* is the length of the rest of the message, so anything
+    following it (e.g. padding added by the packager) is ignored.  It
+    is left out when the packaging already delimits each message (see
+    [use_packaging]), since it would only repeat the length prefix of
+    the packaging.
+
+    Values are converted like [MessEncoderWDDX] does, so the receiver
+    gets the same values with either encoder: None is sent as the empty
+    string, booleans as integers and tuples as lists.
+
+    **INSTANCE ATTRIBUTES**
+    
+    *BOOL length_prefix* -- true if messages start with their
+    length
+    
+    CLASS ATTRIBUTES**
+    
+    *none* -- 
+
+    .. [MessEncoderWDDX] file:///./messaging.MessEncoderWDDX.html
+    .. [use_packaging] file:///./messaging.MessEncoderBinary.html#use_packaging"""
+        
+    def __init__(self, length_prefix = 1, **args_super):
+        self.deep_construct(MessEncoderBinary, 
+                            {'length_prefix': length_prefix}, 
+                            args_super, 
+                            {})
+
+    def use_packaging(self, packager_class):
+        """informs the encoder of the packaging with which its messages
+        are sent.  The length of each message is left out if the
+        packaging delimits messages.
+
+        **INPUTS**
+
+        *CLASS packager_class* -- the [MessPackager] subclass
+
+        **OUTPUTS**
+
+        *none*
+
+        ..[MessPackager] file:///./messaging.MessPackager.html"""
+        self.length_prefix = not packager_class.delimits_messages
+
+    def encode(self, mess_name, mess_argvals):
+        """Encodes a message as a raw string
+        
+        **INPUTS**
+
+        STR *mess_name* -- An identifier indicating what type of
+        message this is.
+        
+        {STR: ANY} *mess_argvals* -- The content of the message in
+        *{arg:val}* format.
+        
+        **OUTPUTS**
+        
+        *STR str_mess* -- The message encoded as a string
+        """
+        chunks = []
+        self.encode_item(mess_name, chunks)
+        self.encode_item(mess_argvals, chunks)
+        body = string.join(chunks, '')
+        if not self.length_prefix:
+            return body
+        return struct.pack('>I', len(body)) + body
+
+    def encode_item(self, item, chunks):
+        """Encodes a data item, appending the strings making up its
+        encoding to a list.
+
+        **INPUTS**
+
+        ENCODABLE *item* -- Some encodable item (see [MessEncoder] for
+        details about encodable types), or a number or None.
+
+        [STR] *chunks* -- the list of strings to append to
+        
+        **OUTPUTS**
+        
+        *none*
+
+        .. [MessEncoder] file:///./messaging.MessEncoder.html"""
+        if isinstance(item, types.StringType):
+            chunks.append('s' + struct.pack('>I', len(item)))
+            chunks.append(item)
+        elif isinstance(item, types.IntType):
+            if -2147483648 <= item <= 2147483647:
+                chunks.append('i' + struct.pack('>i', item))
+            else:
+                digits = str(int(item))
+                chunks.append('l' + struct.pack('>I', len(digits)) + digits)
+        elif isinstance(item, types.DictType):
+            chunks.append('D' + struct.pack('>I', len(item)))
+            for key, value in item.items():
+                self.encode_item(key, chunks)
+                self.encode_item(value, chunks)
+        elif isinstance(item, types.ListType) or \
+             isinstance(item, types.TupleType):
+            chunks.append('L' + struct.pack('>I', len(item)))
+            for an_entry in item:
+                self.encode_item(an_entry, chunks)
+        elif item is None:
+            chunks.append('s' + struct.pack('>I', 0))
+        elif isinstance(item, types.LongType):
+            digits = str(item)
+            if digits[-1] == 'L':
+                digits = digits[:-1]
+            chunks.append('l' + struct.pack('>I', len(digits)) + digits)
+        elif isinstance(item, types.FloatType):
+            chunks.append('f' + struct.pack('>d', item))
+        elif isinstance(item, types.UnicodeType):
+            utf8 = item.encode('utf-8')
+            chunks.append('u' + struct.pack('>I', len(utf8)))
+            chunks.append(utf8)
+        else:
+            raise MalformedMessage('cannot encode value %s' % repr(item))
+
+    def decode(self, str_mess):
+        """Decodes a message to {arg:val} format.
+      
+        **INPUTS**
+        
+        *STR* str_mess -- The message in raw string format
+        
+        **OUTPUTS**
+        
+        *(STR, {STR: STR}) name_argvals_mess* -- First element is the
+        message name, second element is message arguments in
+        *(name, {arg:val})* format.  """
+
+        try:
+            if self.length_prefix:
+                length, = struct.unpack('>I', str_mess[:4])
+                start = 4
+                end = 4 + length
+                if len(str_mess) < end:
+                    raise MalformedMessage('truncated message')
+            else:
+                start = 0
+                end = len(str_mess)
+            mess_name, pos = self.decode_item(str_mess, start)
+            mess_argvals, pos = self.decode_item(str_mess, pos)
+        except (struct.error, IndexError, KeyError, ValueError, 
+                UnicodeError, TypeError), err:
+            raise MalformedMessage('malformed message: %s' % err)
+        if pos != end or not isinstance(mess_argvals, types.DictType):
+            raise MalformedMessage('malformed message')
+        return (mess_name, mess_argvals)
+
+    def decode_item(self, str_mess, pos):
+        """Decodes the data item starting at a given position of a
+        message.
+
+        **INPUTS**
+
+        *STR* str_mess -- The message in raw string format
+
+        *INT* pos -- position of the start of the data item
+
+        **OUTPUTS**
+
+        (ENCODABLE, INT) (*data_item, pos*) -- the value of the data
+        item and the position following it
+        """
+        tag = str_mess[pos]
+        pos = pos + 1
+        if tag == 'i':
+            value, = struct.unpack('>i', str_mess[pos:pos + 4])
+            return value, pos + 4
+        if tag == 'f':
+            value, = struct.unpack('>d', str_mess[pos:pos + 8])
+            return value, pos + 8
+        count, = struct.unpack('>I', str_mess[pos:pos + 4])
+        pos = pos + 4
+        if tag == 's':
+            if pos + count > len(str_mess):
+                raise MalformedMessage('truncated string')
+            return str_mess[pos:pos + count], pos + count
+        if tag == 'D':
+            value = {}
+            for ii in xrange(count):
+                key, pos = self.decode_item(str_mess, pos)
+                value[key], pos = self.decode_item(str_mess, pos)
+            return value, pos
+        if tag == 'L':
+            value = []
+            for ii in xrange(count):
+                an_entry, pos = self.decode_item(str_mess, pos)
+                value.append(an_entry)
+            return value, pos
+        if tag == 'u':
+            return unicode(str_mess[pos:pos + count], 'utf-8'), pos + count
+        if tag == 'l':
+            return long(str_mess[pos:pos + count]), pos + count
+        raise MalformedMessage('unknown type %s' % repr(tag))
+
+
+###############################################################################
+# Negotiation of the message encoding
+###############################################################################
+
+#
+# Map from the names of the message encodings to their [MessEncoder]
+# classes.  The 'wddx' encoding is the one used for the handshake, and
+# with editors which don't take part in the negotiation.
+#
+encoders = {'wddx': MessEncoderWDDX,
+            'binary1': MessEncoderBinary}
+
+default_encoding = 'wddx'
+
+#
+# Encodings (other than the default) offered by the client and accepted
+# by the server during the handshake, in order of preference.  Set to []
+# to always use the default encoding.
+#
+preferred_encodings = ['binary1']
+
+#
+# Map from the names of the message packagings to their [MessPackager]
+# classes, default packaging (used for the handshake) and packagings
+# offered and accepted during the handshake, like for the encodings
+# above.
+#
+packagers = {'fixed': MessPackager_FixedLenSeq,
+             'lenprefix': MessPackager_LenPrefix}
+
+default_packaging = 'fixed'
+
+preferred_packagings = ['lenprefix']
+
+def new_encoder(encoding = None, packaging = None):
+    """creates a message encoder
+
+    **INPUTS**
+
+    *STR encoding* -- name of the encoding (one of encoders.keys()), or
+    None for the default encoding
+
+    *STR packaging* -- name of the packaging with which the messages
+    will be sent (one of packagers.keys()), or None for the default
+    packaging.  Both ends of a connection must give the same packaging.
+
+    **OUTPUTS**
+
+    [MessEncoder] -- the new encoder
+
+    ..[MessEncoder] file:///./messaging.MessEncoder.html"""
+    if encoding is None:
+        encoding = default_encoding
+    if packaging is None:
+        packaging = default_packaging
+    encoder = encoders[encoding]()
+    encoder.use_packaging(packagers[packaging])
+    return encoder
+
+def new_packager(packaging = None):
+    """creates a message packager
+
+    **INPUTS**
+
+    *STR packaging* -- name of the packaging (one of packagers.keys()),
+    or None for the default packaging
+
+    **OUTPUTS**
+
+    [MessPackager] -- the new packager
+
+    ..[MessPackager] file:///./messaging.MessPackager.html"""
+    if packaging is None:
+        packaging = default_packaging
+    return packagers[packaging]()
+
+def choose_packaging(offered):
+    """chooses the packaging to use for a new connection, among those
+    offered by the client during the handshake
+
+    **INPUTS**
+
+    *[STR] offered* -- the names of the packagings offered by the
+    client, or None if the client didn't offer any
+
+    **OUTPUTS**
+
+    *STR* -- the name of the packaging to use
+    """
+    if offered:
+        for packaging in preferred_packagings:
+            if packaging in offered and packagers.has_key(packaging):
+                return packaging
+    return default_packaging
+
+def choose_encoding(offered):
+    """chooses the encoding to use for a new connection, among those
+    offered by the client during the handshake
+
+    **INPUTS**
+
+    *[STR] offered* -- the names of the encodings offered by the
+    client, or None if the client didn't offer any
+
+    **OUTPUTS**
+
+    *STR* -- the name of the encoding to use
+    """
+    if offered:
+        for encoding in preferred_encodings:
+            if encoding in offered and encoders.has_key(encoding):
+                return encoding
+    return default_encoding
+
+
 
 
 ###############################################################################
@@ -1114,11 +1888,11 @@ def messarg_is_None(messarg):
         # EmacsLisp's nil value gets encoded as an empty list.
         # 
         if tracing('messarg_is_None'):
-            trace('messarg_is_None', 'messarg=%s, returning 1' % messarg)       
+            trace('messarg_is_None', 'messarg=%s, returning 1', messarg)       
         return 1
     else:
         if tracing('messarg_is_None'):
-            trace('messarg_is_None', 'messarg=%s, returning 0' % messarg)
+            trace('messarg_is_None', 'messarg=%s, returning 0', messarg)
         return 0
 
 
@@ -1331,7 +2105,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         .. [MessEncoder] file:///./messaging.MessEncoder.html
         .. [MessEncoder_LenPrefArgs] file:///./messaging.MessEncoder_LenPrefArgs.html"""
 
-        trace('encode_data_item', 'item=\'%s\'' % repr(item))
+        trace('encode_data_item', 'item=\'%r\'', item)
 
         #
         # Convert numbers and 'None' to strings
@@ -1341,14 +2115,14 @@ class MessEncoder_LenPrefArgs(Object.Object):
             isinstance(item, types.FloatType) or
             item == None):
             item = repr(item)
-            trace('encode_data_item', 'item=\'%s\' converted to string from a number type' % repr(item))
+            trace('encode_data_item', 'item=\'%r\' converted to string from a number type', item)
         
 
         if isinstance(item, types.StringType):
             #
             # Data item is just a string
             #
-            trace('encode_data_item', 'item=\'%s\' is a string' % repr(item))
+            trace('encode_data_item', 'item=\'%r\' is a string', item)
             delims = ('<', '>')
             str_item = item
         elif isinstance(item, types.ListType) or isinstance(item, types.TupleType):
@@ -1381,7 +2155,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         #
         str_item = "%s%s%s%s" % (len(str_item), delims[0], str_item, delims[1])
 
-        trace('encode_data_item', 'string item=\'%s\' yields str_item=\'%s\'' % (repr(item), str_item))
+        trace('encode_data_item', 'string item=\'%r\' yields str_item=\'%s\'', item, str_item)
 
         return str_item
                 
@@ -1452,7 +2226,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         #
         # Get type and length of the data item
         #
-        trace('decode_data_item', 'str_item=\'%s\'' % str_item)
+        trace('decode_data_item', 'str_item=\'%s\'', str_item)
         a_match = re.match('\s*(\d+)\s*([<\\[{])', str_item)
         length = int(float(a_match.group(1)))
         delim_open = a_match.group(2)
@@ -1464,7 +2238,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         descr = str_item[:length]
         str_item = str_item[length:]
 
-        trace('decode_data_item', 'descr=\'%s\'' % descr)
+        trace('decode_data_item', 'descr=\'%s\'', descr)
         
         #
         # Decode appropriate data type, depending on delimiter
@@ -1482,7 +2256,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         #
         # Read past the closing delimiter
         #
-        trace('decode_data_item', 'looking for closing delimiter in \'%s\'' % str_item)
+        trace('decode_data_item', 'looking for closing delimiter in \'%s\'', str_item)
         a_match = re.match('\s*%s\s*' % delim_close, str_item)
         str_item = str_item[a_match.end():]
         
@@ -1564,7 +2338,7 @@ class MessEncoder_LenPrefArgs(Object.Object):
         # Parse description until it's all blanks
         #
         while not re.match('^\s*$', descr):
-            trace('decode_dict_descr', 'descr=\'%s\'' % descr)
+            trace('decode_dict_descr', 'descr=\'%s\'', descr)
 
             #
             # Parse the key and value
@@ -1589,28 +2363,39 @@ class MessEncoder_LenPrefArgs(Object.Object):
 
         return the_dict
 
-def messenger_factory(sock, sleep = None, sleeper = None):
+def messenger_factory(sock, sleep = None, sleeper = None, encoding = None,
+        packaging = None):
     """Creates a messenger from proper compenents
     
     **INPUTS**
     
     *socket sock* -- Socket to use for creating the messenger
+
+    *STR encoding* -- name of the message encoding negotiated for the
+    connection (see [choose_encoding]), or None for the default
+    encoding
+
+    *STR packaging* -- name of the message packaging negotiated for the
+    connection (see [choose_packaging]), or None for the default
+    packaging
     
     
     **OUTPUTS**
     
     [Messenger] *a_messenger* -- The created [Messenger] instance
 
-    ..[Messenger] file:///./messaging.Messenger.html"""
+    ..[Messenger] file:///./messaging.Messenger.html
+    ..[choose_encoding] file:///./messaging.html#choose_encoding
+    ..[choose_packaging] file:///./messaging.html#choose_packaging"""
     
 
     #
     # Create a messenger
     #
-    packager = MessPackager_FixedLenSeq()
+    packager = new_packager(packaging)
     transporter = MessTransporter_Socket(sock=sock, sleep = sleep,
         sleeper = sleeper)
-    encoder = MessEncoderWDDX()
+    encoder = new_encoder(encoding, packaging)
     a_messenger = MessengerBasic(packager=packager, 
         transporter=transporter, encoder=encoder)        
     return a_messenger
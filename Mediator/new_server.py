@@ -29,8 +29,8 @@ import NewMediatorObject
 import tcp_server
 
 import exceptions
-import natlink, os, posixpath, pythoncom, re, select, socket
-import SocketServer, string, sys, threading, time, whrandom, win32event
+import natlink, os, posixpath, re, select, socket
+import SocketServer, string, sys, threading, time, whrandom
 
 import AppStateEmacs, AppStateMessaging, auto_test, debug
 import messaging, Object
@@ -218,26 +218,115 @@ class ExtLoopWin32NewMediator(tcp_server.ExtLoopWin32):
         return self.the_server
 
 
+class ExtLoopSelectNewMediator(tcp_server.ExtLoopSelect):
+    """implementation of ExtLoopSelect for ServerNewMediator 
+
+    **INSTANCE ATTRIBUTES**
+
+    *ServerNewMediator the_server* -- the underlying server
+
+    *NewMediatorObject the_mediator* -- the mediator object
+
+    *BOOL okay* -- true if the configuration was successful
+    """
+    def remove_other_references(self):
+        self.the_server = None
+        self.the_mediator.quit(save_speech_files=0, 
+            disconnect=1)
+        tcp_server.ExtLoopSelect.remove_other_references(self)
+
+    def __init__(self, profile_prefix = None, 
+        bypass_sr_recog = 0, num_words_training = 0, **args_super):
+        """
+        **INPUTS**
+
+        *STR profile_prefix* -- prefix for filename for output of profiler,
+        or None if not profiling (ignored if test_suite is None) 
+
+        *BOOL bypass_sr_recog* -- when testing, bypass natlink for 
+        dictation utterances (ignored if test_suite is None) 
+        """
+
+        self.deep_construct(ExtLoopSelectNewMediator, 
+                            {
+                             'the_server': None,
+                             'the_mediator': None,
+                             'okay': 0
+                            }, 
+                            args_super)
+        self.add_owned('the_mediator')
+        factory = tcp_server.AppStateFactorySimple()
+        test_server = not (self.test_suite == None)
+# the loop itself supplies the data events, and reads the data from the
+# editors
+        self.the_server = \
+            tcp_server.ServerNewMediator(data_events = self,
+                                         test_server = test_server,
+                                         editor_factory = factory) 
+
+        self.the_mediator = \
+            NewMediatorObject.NewMediatorObject(server = self.the_server,
+                test_or_suite = self.test_suite,
+                global_grammars = 1, exclusive = 1,
+                profile_prefix = profile_prefix, 
+                bypass_sr_recog = bypass_sr_recog,
+                num_words_training = num_words_training)
+                
+        sys.stderr.write('Configuring the mediator...\n')
+        sys.stderr.flush()
+        self.okay = self.the_mediator.configure() and self.the_mediator.ready()
+        if not self.okay:
+            sys.stderr.write('Mediator configuration failed...exiting\n')
+        sys.stderr.write('Finished ExtLoop init...\n')
+        sys.stderr.flush()
+
+    def run(self):
+        """Start the server as well as the ExtLoopSelect message loop.
+        """
+        if self.okay:
+            tcp_server.ExtLoopSelect.run(self)
+
+    def server(self):
+        """returns a reference to the server
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *ServerNewMediator* -- the underlying server
+        """
+        return self.the_server
+
+
 ##############################################################################
 # start test standalone server
 ##############################################################################
 def run_new_server(test_suite=None, profile_prefix = None, 
-    bypass_sr_recog = 0, num_words_training=0, extra_opts = None):
+    bypass_sr_recog = 0, num_words_training=0, extra_opts = None,
+    select_loop = 0):
     """Start a ServerNewMediator/ServerMainThread with external message 
-    loop using win32event and the new NewMediatorObject
+    loop using win32event (or select, if select_loop is true) and the new 
+    NewMediatorObject
     """
 
-    sys.stderr.write('running ExtLoopWin32NewMediator with ServerNewMediator\n')
-    print 'running ExtLoopWin32NewMediator with ServerNewMediator'
+    if select_loop:
+        loop_class = ExtLoopSelectNewMediator
+    else:
+        loop_class = ExtLoopWin32NewMediator
+    sys.stderr.write('running %s with ServerNewMediator\n' \
+        % loop_class.__name__)
+    print 'running %s with ServerNewMediator' % loop_class.__name__
     try:
-        a_loop = ExtLoopWin32NewMediator(test_suite = test_suite, 
+        a_loop = loop_class(test_suite = test_suite, 
             profile_prefix = profile_prefix, 
             bypass_sr_recog = bypass_sr_recog,
             num_words_training = num_words_training) 
     except:
         return
 
-    sys.stderr.write('Running ExtLoopWin32...\n')
+    sys.stderr.write('Running message loop...\n')
     a_loop.run()
 #    sys.stderr.write("run_ext_server finishing\n")
     
@@ -272,15 +361,24 @@ OPTIONS
 
 
 -p pfile : profile the code, writing the output of the python profiler
-           to pfile (see Python Profiler in the Python library manual)
+           to pfile (see Python Profiler in the Python library manual).
+           Each test is profiled separately, to pfile.testname.dat, and
+           a report of the hot spots of each subsystem is printed at the
+           end of the tests.  A summary of the run is saved to
+           pfile.summary, and if a file pfile.baseline exists (e.g. the
+           summary of an earlier run), the report is compared with it
+           (see also readprof.py)
 
 --bypass : bypass natlink for dictation utterances (used for profiling)
+
+--select : use a portable, single-threaded message loop based on select,
+           instead of the one based on win32event
     """
 
 
 if __name__ == '__main__':
     opts, args = util.gopt(['h', None, 't=', None, '0', None,
-    'bypass', 0, 'p=', None, 'train=', 0])
+    'bypass', 0, 'p=', None, 'train=', 0, 'select', None])
     non_exclusive_opts = ['0']
     
 #    sr_interface.connect()
@@ -305,7 +403,7 @@ if __name__ == '__main__':
     run_new_server(test_suite=opts['t'], profile_prefix = opts['p'],
         bypass_sr_recog = opts['bypass'], 
         num_words_training = int(opts['train']), 
-        extra_opts = extra_opts)
+        extra_opts = extra_opts, select_loop = opts['select'])
 
 #    sys.stderr.write("run finished\n")
 
@@ -1,22 +1,89 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""utility to simplify reading in multiple profile files generated by
+using the -p option to new_test, new_server, or wxMediator, and to
+report where the time went, by subsystem.
+
+The report can be compared with the summary of an earlier run (a
+baseline), which is saved with [save_summary].
+
+.. [save_summary] file:///./readprof.html#save_summary"""
+
 import re
 import pstats
 import os
 import os.path
+import cPickle, string, sys
 vc = os.environ['VCODE_HOME']
 med = os.path.join(vc, 'Mediator')
 pj = os.path.join
 
-def read_all(prefix, dir = None):
+#
+# subsystems to which the profiled functions are attributed, according
+# to the module in which they are defined.  The first matching regexp
+# wins, and functions of other modules (e.g. the standard library) are
+# attributed to 'other'.
+#
+subsystems = [
+    ('messaging', r'^(messaging|tcp_\w+|thread_communication\w*|AppStateMessaging|SourceBuffMessaging)\.py$'),
+    ('correction', r'^(ResMgr|SpokenUtterance|SymbolResult|SourceBuffState|SourceBuffCookie|LeakyStack)\.py$'),
+    ('editor', r'^(AppState\w*|SourceBuff\w*|EdSim|sb_\w+|as_services|find_difference|find_upds|DiffCrawler|TextBuffer\w*)\.py$'),
+    ('speech', r'^(sr_\w+|GramMgr|RecogStartMgr\w*|AppMgr|TargetWindow|KnownTargetModule|WinSystem\w*|natlink\w*)\.py$'),
+    ('interpreter', r'^(CmdInterp|CSCmd|Context|cont_\w+|actions_\w+|LangDef|SpacingState|WordTrie|symbol_formatting)\.py$'),
+    ('symbols', r'^(SymDict\w*|symbol_harvester|PseudoSymbolIndex|SectionedFile|DictConverter)\.py$'),
+    ('instrumentation', r'^(debug|latency)\.py$'),
+    ('framework', r'^(Object|OwnerObject|util|InstanceSpace|vc_globals|PickledObject)\.py$'),
+    ('tests', r'^(tests_def|auto_test|regression|sim_commands|test_\w+)\.py$'),
+    ('builtins', r'^~?$')]
+
+def read_all(prefix, dir = None, verbose = 1):
+    """reads the profiles of all tests run with a given prefix
+
+    **INPUTS**
+
+    *STR prefix* -- the prefix given to the -p option
+
+    *STR dir* -- the directory containing the profiles (by default,
+    the Mediator directory)
+
+    *BOOL verbose* -- if true, print the names of the files read
+
+    **OUTPUTS**
+
+    *({STR: pstats.Stats}, pstats.Stats)* -- map from the name of each
+    test to its profile, and the profile of all tests together (or None
+    if there were no profiles)
+    """
     if dir is None:
         dir = med
     l = os.listdir(dir)
     pfiles = {}
     for file in l:
-        s = "%s\.(.*)\.dat" % prefix
+        s = "%s\.(.*)\.dat$" % re.escape(prefix)
         m = re.match(s, file)
         if m:
-            pfiles[m.group(0)] = file
-            print file
+            pfiles[m.group(1)] = file
+            if verbose:
+                print file
     profiles = {}
     cumulative = None
     for test, file in pfiles.items():
@@ -28,9 +95,346 @@ def read_all(prefix, dir = None):
             cumulative.add(full_name)
         profiles[test].strip_dirs()
         profiles[test].sort_stats('cumulative')
-    cumulative.strip_dirs()
-    cumulative.sort_stats('cumulative')
+    if cumulative:
+        cumulative.strip_dirs()
+        cumulative.sort_stats('cumulative')
     return profiles, cumulative
 
+def subsystem(file_name):
+    """returns the subsystem to which the functions of a file belong
+
+    **INPUTS**
+
+    *STR file_name* -- name of the file (without directory), as found
+    in the profiles
+
+    **OUTPUTS**
+
+    *STR* -- name of the subsystem
+    """
+    for name, regexp in subsystems:
+        if re.match(regexp, file_name):
+            return name
+    return 'other'
+
+def function_key(func):
+    """returns the key identifying a profiled function in a summary.
+    The line number is left out, so that the function can be compared
+    with a baseline even if lines were added above it.
+
+    **INPUTS**
+
+    *(STR, INT, STR) func* -- file name, line number and function name,
+    as in the keys of pstats.Stats.stats
+
+    **OUTPUTS**
+
+    *(STR, STR)* -- the file name (empty for built-in functions) and
+    the function name
+    """
+    file_name, line, name = func
+    if file_name == '~':
+        file_name = ''
+    return (file_name, name)
+
+def function_name(key, lines = None):
+    """returns a readable name for a profiled function
+
+    **INPUTS**
+
+    *(STR, STR) key* -- the key returned by [function_key]
+
+    *[INT] lines* -- the line numbers of the functions with that key
+    (several methods of a file may have the same name), or None
+
+    **OUTPUTS**
+
+    *STR* -- the name
+
+    .. [function_key] file:///./readprof.html#function_key"""
+    file_name, name = key
+    if not file_name:
+        return name
+    if not lines:
+        return '%s(%s)' % (file_name, name)
+    lines = map(str, lines)
+    return '%s:%s(%s)' % (file_name, string.join(lines, ','), name)
+
+def summarize(profiles, cumulative):
+    """summarizes profiles read by [read_all]
+
+    **INPUTS**
+
+    *{STR: pstats.Stats} profiles* -- the profile of each test
+
+    *pstats.Stats cumulative* -- the profile of all tests
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the summary: under 'tests', a map from the name of
+    each test to its total time; under 'functions', a map from the
+    key of each function (see [function_key]) to its subsystem, own
+    time, cumulative time, number of calls and sorted line numbers
+    (the times and calls of functions with the same key are added, so
+    the cumulative time counts twice the calls they make to each
+    other);
+    under 'subsystems', a map from the name of each subsystem to the
+    own time of its functions.
+
+    .. [function_key] file:///./readprof.html#function_key
+
+    .. [read_all] file:///./readprof.html#read_all"""
+    tests = {}
+    for test in profiles.keys():
+        tests[test] = profiles[test].total_tt
+    functions = {}
+    by_subsystem = {}
+    if cumulative:
+        for func, (cc, nc, tt, ct, callers) in cumulative.stats.items():
+            name = subsystem(func[0])
+            key = function_key(func)
+            if functions.has_key(key):
+                name, old_tt, old_ct, old_nc, lines = functions[key]
+                lines = lines + [func[1]]
+                lines.sort()
+                functions[key] = (name, old_tt + tt, old_ct + ct,
+                    old_nc + nc, lines)
+            else:
+                functions[key] = (name, tt, ct, nc, [func[1]])
+            by_subsystem[name] = by_subsystem.get(name, 0.0) + tt
+    return {'tests': tests, 'functions': functions,
+            'subsystems': by_subsystem}
+
+def save_summary(summary, file_name):
+    """saves a summary, to be used as the baseline of later reports
+
+    **INPUTS**
+
+    *{STR: ANY} summary* -- the summary returned by [summarize]
+
+    *STR file_name* -- path of the file
+
+    **OUTPUTS**
+
+    *none*
+
+    .. [summarize] file:///./readprof.html#summarize"""
+    f = open(file_name, 'wb')
+    cPickle.dump(summary, f, 1)
+    f.close()
+
+def load_summary(file_name):
+    """reads a summary saved by [save_summary]
+
+    **INPUTS**
+
+    *STR file_name* -- path of the file
+
+    **OUTPUTS**
+
+    *{STR: ANY}* -- the summary
+
+    .. [save_summary] file:///./readprof.html#save_summary"""
+    f = open(file_name, 'rb')
+    summary = cPickle.load(f)
+    f.close()
+    return summary
+
+def ranked(values, key = None):
+    """returns the keys of a dictionary, largest value first
+
+    **INPUTS**
+
+    *{STR: ANY} values* -- the dictionary
+
+    *FCT key* -- function returning the number by which to rank each
+    value, or None to rank the values themselves
+
+    **OUTPUTS**
+
+    *[STR]* -- the keys
+    """
+    pairs = []
+    for a_key, value in values.items():
+        if key:
+            value = key(value)
+        pairs.append((-value, a_key))
+    pairs.sort()
+    return map(lambda pair: pair[1], pairs)
+
+def print_report(summary, n = 10, baseline = None):
+    """prints the slowest tests, the time spent in each subsystem and
+    the hot spots of each subsystem, ranked by cumulative time
+
+    **INPUTS**
+
+    *{STR: ANY} summary* -- the summary returned by [summarize]
+
+    *INT n* -- number of tests and of hot spots per subsystem to print
+
+    *{STR: ANY} baseline* -- summary of an earlier run to compare with,
+    or None
+
+    **OUTPUTS**
+
+    *none*
+
+    .. [summarize] file:///./readprof.html#summarize"""
+    tests = summary['tests']
+    print '\nslowest of %d tests:' % len(tests)
+    for test in ranked(tests)[:n]:
+        print '   %-40s %9.3f s' % (test, tests[test])
+
+    by_subsystem = summary['subsystems']
+    total = 0.0
+    for own_time in by_subsystem.values():
+        total = total + own_time
+    print '\ntime spent in each subsystem:'
+    for name in ranked(by_subsystem):
+        print '   %-15s %9.3f s %5.1f%%' % (name, by_subsystem[name],
+            100.0 * by_subsystem[name] / max(total, 1e-9))
+
+    functions = summary['functions']
+    for name in ranked(by_subsystem):
+        print '\nhot spots of %s (cumulative, own time, calls):' % name
+        in_subsystem = {}
+        for func, values in functions.items():
+            if values[0] == name:
+                in_subsystem[func] = values
+        for func in ranked(in_subsystem, lambda values: values[2])[:n]:
+            subsys, own_time, cum_time, calls, lines = in_subsystem[func]
+            print '   %9.3f s %9.3f s %8d  %s' % (cum_time, own_time,
+                calls, function_name(func, lines))
+
+    if baseline is not None:
+        print_changes(summary, baseline, n)
+
+def print_changes(summary, baseline, n = 10):
+    """prints how the time spent in each subsystem, and the cumulative
+    time of the functions which changed the most, compare with a
+    baseline
+
+    **INPUTS**
+
+    *{STR: ANY} summary* -- the summary returned by [summarize]
+
+    *{STR: ANY} baseline* -- summary of an earlier run
+
+    *INT n* -- number of functions to print
+
+    **OUTPUTS**
+
+    *none*
+
+    .. [summarize] file:///./readprof.html#summarize"""
+    print '\nchanges from the baseline (baseline, current, change):'
+    current = summary['subsystems']
+    before = baseline['subsystems']
+    names = current.keys()
+    for name in before.keys():
+        if not current.has_key(name):
+            names.append(name)
+    names.sort()
+    for name in names:
+        old_time = before.get(name, 0.0)
+        new_time = current.get(name, 0.0)
+        print '   %-15s %9.3f s %9.3f s %+9.3f s' % (name, old_time,
+            new_time, new_time - old_time)
+
+    functions = summary['functions']
+    old_functions = baseline['functions']
+    changes = {}
+    for func in functions.keys():
+        old_time = 0.0
+        if old_functions.has_key(func):
+            old_time = old_functions[func][2]
+        changes[func] = functions[func][2] - old_time
+    for func in old_functions.keys():
+        if not functions.has_key(func):
+            changes[func] = -old_functions[func][2]
+    print '\nfunctions whose cumulative time changed the most:'
+    for func in ranked(changes, abs)[:n]:
+        if functions.has_key(func):
+            lines = functions[func][4]
+        else:
+            lines = old_functions[func][4]
+        print '   %+9.3f s  %s' % (changes[func], function_name(func, lines))
+
+def report_profiles(prefix, n = 10, baseline_file = None,
+                    summary_file = None):
+    """reads the profiles of the tests run with a given prefix, and
+    prints a report
+
+    **INPUTS**
+
+    *STR prefix* -- the prefix given to the -p option, possibly
+    including a directory (by default, the current directory)
+
+    *INT n* -- number of tests and of hot spots per subsystem to print
+
+    *STR baseline_file* -- summary of an earlier run to compare with,
+    or None
+
+    *STR summary_file* -- file to which to save the summary of this
+    run, or None
+
+    **OUTPUTS**
+
+    *BOOL* -- true if any profiles were found
+    """
+    dir, base = os.path.split(prefix)
+    if not dir:
+        dir = os.getcwd()
+    profiles, cumulative = read_all(base, dir, verbose = 0)
+    if not cumulative:
+        sys.stderr.write('no profiles found for prefix %s\n' % prefix)
+        return 0
+    summary = summarize(profiles, cumulative)
+    baseline = None
+    if baseline_file:
+        try:
+            baseline = load_summary(baseline_file)
+        except (IOError, EOFError, cPickle.UnpicklingError), e:
+            sys.stderr.write('unable to read baseline %s: %s\n' \
+                % (baseline_file, e))
+    print_report(summary, n = n, baseline = baseline)
+    if summary_file:
+        save_summary(summary, summary_file)
+    return 1
+
+
+def help():
+    print """
+
+Usage: python readprof.py [-n num] [-b baseline] [-s summary] prefix
+
+Reports where the time went in the tests profiled with the -p prefix
+option of new_server or wxMediator (each test is profiled separately,
+to files named prefix.testname.dat): the slowest tests, the time spent
+in each subsystem, and the functions of each subsystem with the largest
+cumulative time.
+
+OPTIONS
+-------
+
+-h          : print this help message
+
+-n num      : number of tests and hot spots per subsystem (default: 10)
+
+-b baseline : compare with the summary of an earlier run, saved with -s
+
+-s summary  : save the summary of this run to a file
+    """
 
-        
+if __name__ == '__main__':
+    import util
+    opts, args = util.gopt(('h', None,
+        'n=', 10,
+        'b=', None,
+        's=', None))
+    if opts['h'] or len(args) != 1:
+        help()
+    elif not report_profiles(args[0], n = int(opts['n']),
+                             baseline_file = opts['b'],
+                             summary_file = opts['s']):
+        sys.exit(1)
@@ -48,7 +48,7 @@ variant would have to be cloned and copied to the two classes.
 ..[SourceBuff] file:///./SourceBuff.SourceBuff.html"""
 
 import Object
-import re
+import bisect, re
 import debug
 
 import SourceBuffState
@@ -248,23 +248,156 @@ class SB_ServiceLineManip(SB_Service):
     Some [SourceBuff] subclasses may decide to use the editor's
     line manipulation capabilities instead of the ones provided by
     this class.
+
+    Line numbers are found by binary search in an index of the
+    positions at which lines start.  The buffer must report every
+    change to its contents through [on_change], which updates
+    the index incrementally: the positions following the change are
+    shifted, and the lines around the change are rescanned the next time
+    the index is used.  Unreported changes are only detected if they
+    change the length of the buffer, so buffers which aren't told about
+    every change to their contents (those whose [SourceBuff.generation]
+    is None) don't keep the index from one query to the next.
     
     **INSTANCE ATTRIBUTES**
     
-    *none*-- 
+    *[INT] line_starts* -- sorted positions of the start of each line
+    (the first one is always 0), or None if the index must be rebuilt
+    from scratch
+
+    *INT indexed_len* -- length of the buffer according to the index.
+    If the actual length differs, a change was not reported, and the
+    index is rebuilt (as a safety net only: an unreported change which
+    doesn't change the length goes unnoticed).
+
+    *(INT, INT) dirty* -- region of the buffer whose line starts are
+    out of date and must be rescanned, or None.  The start of the
+    region is always the start of a line which was not changed, and
+    the end is either the start of such a line or None for the end of
+    the buffer.
     
     CLASS ATTRIBUTES**
     
     *none* -- 
 
-    ..[SourceBuff] file:///./SourceBuff.SourceBuff.html"""
+    ..[SourceBuff] file:///./SourceBuff.SourceBuff.html
+    ..[on_change] file:///./sb_services.SB_ServiceLineManip.html#on_change
+    ..[SourceBuff.generation] file:///./SourceBuff.SourceBuff.html#generation"""
                         
     def __init__(self, **args_super):
         self.deep_construct(SB_ServiceLineManip, 
-                            {}, 
+                            {'line_starts': None,
+                             'indexed_len': 0,
+                             'dirty': None}, 
                             args_super, 
                             {})
 
+    def on_change(self, start, end, text):
+        """updates the index of line starts after a change to the
+        contents of the buffer.  The contents of the buffer are not used,
+        so this may be called before or after the buffer itself is
+        updated.
+
+        **INPUTS**
+
+        *INT* start -- start of the modified range
+
+        *INT* end -- end of the modified range.  If both start and end
+        are None, this is a buffer contents update (which may or may not
+        reflect an actual change)
+
+        *STR* text -- the new text replacing this range
+
+        **OUTPUTS**
+
+        *none*
+        """
+        starts = self.line_starts
+        if starts is None:
+            return
+        if start is None or end is None:
+            self.line_starts = None
+            return
+        if end < start:
+            start, end = end, start
+        delta = len(text) - (end - start)
+#
+# rescan from the start of the line before the change (so that a
+# newline sequence which ends at the change is rescanned), to the start
+# of the second line after the change
+#
+        first = max(bisect.bisect_right(starts, start) - 2, 0)
+        last = bisect.bisect_right(starts, end) + 1
+        low = starts[first]
+        high = None
+        if last < len(starts):
+            high = starts[last]
+        if self.dirty:
+            dirty_low, dirty_high = self.dirty
+            low = min(low, dirty_low)
+            if high is not None and dirty_high is not None:
+                high = max(high, dirty_high)
+            elif dirty_high is None:
+                high = None
+# the line starts in the region to rescan are dropped, and those after
+# it are shifted
+        if high is None:
+            del starts[bisect.bisect_right(starts, low):]
+            self.dirty = (low, None)
+        else:
+            shifted = []
+            for pos in starts[bisect.bisect_right(starts, high):]:
+                shifted.append(pos + delta)
+            starts[bisect.bisect_right(starts, low):] = shifted
+            self.dirty = (low, high + delta)
+        self.indexed_len = self.indexed_len + delta
+
+    def _line_starts(self):
+        """returns the up-to-date index of line starts, rebuilding or
+        rescanning it as needed
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *[INT]* -- sorted positions of the start of each line
+        """
+        length = self.buff.len()
+        if self.line_starts is not None and length != self.indexed_len:
+            debug.trace('SB_ServiceLineManip._line_starts',
+                'length %d instead of %d: rebuilding index', length,
+                self.indexed_len)
+            self.line_starts = None
+# the buffer isn't told about all changes to its contents, so the index
+# may be out of date even if the length is the same
+        if self.buff.generation() is None:
+            self.line_starts = None
+        if self.line_starts is not None and self.dirty is None:
+            return self.line_starts
+        regexp = re.compile(self.buff.newline_regexp())
+        contents = self.buff.contents()
+        if self.line_starts is None:
+            starts = [0]
+            for a_match in regexp.finditer(contents):
+                starts.append(a_match.end())
+            self.line_starts = starts
+        else:
+            low, high = self.dirty
+            if high is None:
+                high = length
+            rescanned = []
+            for a_match in regexp.finditer(contents, low, high):
+                if a_match.end() > low:
+                    rescanned.append(a_match.end())
+            starts = self.line_starts
+            index = bisect.bisect_right(starts, low)
+            starts[index:index] = rescanned
+        self.dirty = None
+        self.indexed_len = length
+        return self.line_starts
+
     def line_num_of(self, position = None):
         """
         Returns the line number for a particular cursor position
@@ -275,6 +408,28 @@ class SB_ServiceLineManip(SB_Service):
         
         **OUTPUTS**
         
+        *INT line_num* -- The line number of that position
+        """
+        if position == None:
+            position = self.buff.cur_pos()
+        position = self.buff.make_within_range(position)
+        line_num = bisect.bisect_right(self._line_starts(), position)
+        debug.trace('SB_ServiceLineManip.line_num_of',
+            'position = %s, returning %d', position, line_num)
+        return line_num
+
+    def line_num_of_scan(self, position = None):
+        """
+        Returns the line number for a particular cursor position, by
+        scanning the buffer from the start, without using the index of
+        line starts (kept for testing the index)
+        
+        **INPUTS**
+        
+        *INT* position -- The position.  (defaults to the current position)
+        
+        **OUTPUTS**
+        
         *INT line_num* -- The line number of that position
         """
         
@@ -413,6 +568,29 @@ class SB_ServiceLineManip(SB_Service):
         line, or None for the current line.
         
 
+        **OUTPUTS**
+        
+        *INT* beg_pos -- Position of the beginning of the line
+        """
+        if pos is None:
+            pos = self.buff.cur_pos()
+        starts = self._line_starts()
+        index = bisect.bisect_right(starts, pos) - 1
+        if index < 0:
+            return 0
+        return starts[index]
+
+    def beginning_of_line_scan(self, pos = None):
+        """Returns the position of the beginning of line at position
+        *pos*, by scanning the buffer from the start, without using the
+        index of line starts (kept for testing the index)
+        
+        **INPUTS**
+        
+        *INT* pos -- Position for which we want to know the beginning of
+        line, or None for the current line.
+        
+
         **OUTPUTS**
         
         *INT* beg_pos -- Position of the beginning of the line
@@ -482,6 +660,26 @@ class SB_ServiceLineManip(SB_Service):
 
         *INT linenum* is the line number.
 
+        *INT where* indicates if the cursor should go at the end
+         (*where > 0*) or at the beginning (*where < 0*) of the line.
+        """
+        starts = self._line_starts()
+        index = min(max(linenum, 1), len(starts)) - 1
+        pos = starts[index]
+        if where > 0:
+            if index + 1 < len(starts):
+                pos = starts[index + 1]
+            else:
+                pos = self.buff.len()
+        self.buff.goto(pos)
+
+    def goto_line_scan(self, linenum, where=-1):
+        """Go to a particular line in a buffer, by searching for each
+        newline from the start of the buffer, without using the index of
+        line starts (kept for testing the index)
+
+        *INT linenum* is the line number.
+
         *INT where* indicates if the cursor should go at the end
          (*where > 0*) or at the beginning (*where < 0*) of the line.
         """
@@ -1019,9 +1217,16 @@ class SB_ServiceFullState(SB_ServiceState):
     """Provides services for saving and restoring the contents of a
     buffer and comparing them with the current state.
 
+    If the buffer knows the generation of its contents (see
+    SourceBuff.generation), cookies stored while the contents are
+    unchanged share the same copy of the contents (or are the same
+    cookie, if the selection is also unchanged), and comparing cookies
+    of the same generation doesn't require comparing their contents.
+
     **INSTANCE ATTRIBUTES**
     
-    *none*-- 
+    *SourceBuffState last_cookie* -- the most recent cookie returned by
+    store_current_state, or None
     
     CLASS ATTRIBUTES**
     
@@ -1030,7 +1235,7 @@ class SB_ServiceFullState(SB_ServiceState):
     
     def __init__(self, **args_super):
         self.deep_construct(SB_ServiceState, 
-                            {}, 
+                            {'last_cookie': None}, 
                             args_super, 
                             {})
 
@@ -1097,10 +1302,25 @@ class SB_ServiceFullState(SB_ServiceState):
             contents = self.buff.contents()
             first_lines = re.match(r'.*\n.*\n', contents).group()
             last_lines = re.search(r'\n.*\n.*\n?$', contents).group()
+        generation = self.buff.generation()
+        last = self.last_cookie
+        if last is not None and generation is not None \
+                and last.generation() == generation:
+# the contents haven't changed since the last cookie, so share them
+            if last.get_selection() == selection \
+                    and last.cursor_at() == cursor_at \
+                    and last.last_search() == self.buff.last_search:
+                return last
+            contents = last.contents()
+        else:
+            contents = self.buff.contents()
         cookie = SourceBuffState.SourceBuffState(buff_name = self.buff.name(), 
-            contents = self.buff.contents(), 
+            contents = contents, 
             selection = selection, cursor_at = cursor_at,
-            last_search = self.buff.last_search)
+            last_search = self.buff.last_search,
+            generation = generation)
+        if generation is not None:
+            self.last_cookie = cookie
         return cookie
 
     def restore_state(self, cookie):
@@ -1167,7 +1387,10 @@ class SB_ServiceFullState(SB_ServiceState):
         if not self.valid_cookie(second_cookie):
             return 0
 
-        if first_cookie.contents() != second_cookie.contents():
+# cookies with the same known generation have the same contents
+        generation = first_cookie.generation()
+        if (generation is None or generation != second_cookie.generation()) \
+                and first_cookie.contents() != second_cookie.contents():
             return 0
         if not selection:
             return 1
@@ -1228,7 +1451,8 @@ class SB_ServiceFullState(SB_ServiceState):
         if not self.valid_cookie(cookie):
             return 0
 # unable to make comparison, so treat as false
-        if self.buff.contents() != cookie.contents():
+        if self.buff.changed_since(cookie.generation()) \
+                and self.buff.contents() != cookie.contents():
             return 0
         if not selection:
             return 1
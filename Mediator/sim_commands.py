@@ -127,6 +127,19 @@ print_error(STR message):
 print_symbols()
    Prints the list of symbols in the known symbols dictionary
 
+print_matcher_cache_stats()
+   Prints the hit/miss counters of the cache of regexps used to match
+   pseudo symbols to known symbols
+
+print_latencies(n=10)
+   Prints how long each stage of the interpretation of the *n* most
+   recent utterances took, and how many messages were exchanged with
+   the editor
+
+save_latencies(STR file_name, n=None)
+   Saves the timings of the *n* most recent utterances (by default, all
+   those which were kept) to file *file_name*, in JSON format
+
 provoke()
    causes an error deliberately
 
@@ -154,7 +167,7 @@ from debug import trace
 sys.path = sys.path + [vc_globals.config, vc_globals.admin]
 
 from messaging import SocketError
-import sr_interface, util, vc_globals
+import latency, sr_interface, util, vc_globals
 from CSCmd import CSCmd
 import Object
 import InstanceSpace
@@ -393,18 +406,23 @@ class SimCmdsObj(Object.Object, InstanceSpace.InstanceSpace):
                     spoken = utterance
 
                 print "Heard %s" % string.join(spoken)
-                dictation_allowed = self.app.recog_begin(None)
-                self.app.synchronize_with_app()
-                buff_name = self.app.curr_buffer_name()
-                active_field = self.app.active_field()
-                dictation_allowed = dictation_allowed and \
-                    (active_field == None)
-                if self.testing and not dictation_allowed:
-                    trace('SimCmdsObj.say', 'cancelling testing')
-                    raise mediator_exceptions.CancelTesting()
-
-                self.interp.interpret_NL_cmd(utterance, self.app)
-                self.app.recog_end()
+                timing = latency.begin_utterance(string.join(spoken))
+                try:
+                    dictation_allowed = self.app.recog_begin(None)
+                    self.app.synchronize_with_app()
+                    buff_name = self.app.curr_buffer_name()
+                    active_field = self.app.active_field()
+                    dictation_allowed = dictation_allowed and \
+                        (active_field == None)
+                    if self.testing and not dictation_allowed:
+                        trace('SimCmdsObj.say', 'cancelling testing')
+                        raise mediator_exceptions.CancelTesting()
+
+                    self.interp.interpret_NL_cmd(utterance, self.app)
+                    self.app.recog_end()
+                finally:
+                    if timing:
+                        latency.end_utterance()
                 self.show_buff()        
             else:
                 trace('SimCmdsObj.say', 'NOT bypassing NatSpeak')
@@ -545,6 +563,22 @@ class SimCmdsObj(Object.Object, InstanceSpace.InstanceSpace):
         if echo_cmd: self.echo_command('print_symbols')
         self.interp.known_symbols.print_symbols(symbols = symbols)
 
+    def print_matcher_cache_stats(self, echo_cmd=0):
+        if echo_cmd: self.echo_command('print_matcher_cache_stats')
+        stats = self.interp.known_symbols.matcher_cache_stats()
+        names = stats.keys()
+        names.sort()
+        for a_name in names:
+            print '%s: %s' % (a_name, stats[a_name])
+
+    def print_latencies(self, n = 10, echo_cmd=0):
+        if echo_cmd: self.echo_command('print_latencies', n)
+        latency.print_latencies(n)
+
+    def save_latencies(self, file_name, n = None, echo_cmd=0):
+        if echo_cmd: self.echo_command('save_latencies', file_name, n)
+        latency.save_latencies(file_name, n)
+
     def print_abbreviations(self, show_unresolved=1, echo_cmd=0):
         if echo_cmd: self.echo_command('print_abbreviations', show_unresolved)
         self.interp.known_symbols.print_abbreviations(show_unresolved)
@@ -24,6 +24,7 @@
 
 from Object import Object, OwnerObject
 import debug
+import latency
 import re
 import string
 import actions_gen
@@ -348,9 +349,16 @@ class DictWinGram(WinGram):
         if debug.tracing('DictWinGram.on_results'):
             debug.trace('DictWinGram.on_results', 'results.words()=%s, self.results_callback=%s, self.manager=%s' % 
                         (repr(results.words()), self.results_callback, self.manager))
-        self.results_callback(results)
-        self.manager.interpret_dictation(results, \
-            initial_buffer = self.buff_name)
+        timing = latency.begin_utterance(results.spoken_form_as_string())
+        span = latency.start('DictWinGram.on_results')
+        try:
+            self.results_callback(results)
+            self.manager.interpret_dictation(results, \
+                initial_buffer = self.buff_name)
+        finally:
+            latency.end(span)
+            if timing:
+                latency.end_utterance()
 
 
 class SelectWinGram(WinGram):
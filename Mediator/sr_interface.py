@@ -28,6 +28,7 @@ import natlink
 from natlinkutils import *
 import debug
 from debug import trace, trace_call_stack
+from Object import Object
 
 import SpokenUtterance
 
@@ -90,6 +91,505 @@ else:
     word_info_flag = 0x40000000
 
 
+class WordInfoCache(Object):
+    """cache of the answers of the speech engine to vocabulary lookups
+
+    Checking whether a word exists takes a round-trip to the speech
+    engine, and [SymDict] checks the same words over and over when
+    generating the spoken forms of symbols.  The cache remembers the
+    word information returned by the engine for each vocabulary entry,
+    including the fact that an entry doesn't exist (None).  Entries
+    are forgotten when they are added or deleted through [addWord] or
+    [deleteWord], and the whole cache is cleared when a different user
+    is opened.  Changes made to the vocabulary outside of VoiceCode
+    (e.g. with the vocabulary editor) are not noticed until the cache
+    is cleared.
+
+    **INSTANCE ATTRIBUTES**
+
+    *{STR: INT}* entries -- map from each vocabulary entry looked up
+    to its word information, or None if it doesn't exist
+
+    *INT* hits -- number of lookups answered from the cache
+
+    *INT* misses -- number of lookups which had to query the engine
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [SymDict] file:///./SymDict.SymDict.html
+    .. [addWord] file:///./sr_interface.html#addWord
+    .. [deleteWord] file:///./sr_interface.html#deleteWord"""
+
+    def __init__(self, **args):
+        self.deep_construct(WordInfoCache,
+                            {'entries': {},
+                             'hits': 0,
+                             'misses': 0},
+                            args)
+
+    def lookup(self, word):
+        """looks up the cached information for a vocabulary entry
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *(BOOL, INT)* -- true if the entry is in the cache, and its
+        word information (None if the entry doesn't exist in the
+        vocabulary)
+        """
+        if self.entries.has_key(word):
+            self.hits = self.hits + 1
+            return 1, self.entries[word]
+        self.misses = self.misses + 1
+        return 0, None
+
+    def has_key(self, word):
+        """indicates whether a vocabulary entry is in the cache,
+        without counting a hit or a miss
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the entry is in the cache
+        """
+        return self.entries.has_key(word)
+
+    def store(self, word, info):
+        """records the word information of a vocabulary entry
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        *INT* info -- its word information, or None if it doesn't exist
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.entries[word] = info
+
+    def forget(self, word):
+        """removes a vocabulary entry from the cache
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if self.entries.has_key(word):
+            del self.entries[word]
+
+    def clear(self):
+        """removes all entries from the cache
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.entries = {}
+
+    def stats(self):
+        """returns statistics about the use of the cache
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *(INT, INT, INT)* -- number of entries in the cache, number of
+        hits and number of misses
+        """
+        return len(self.entries), self.hits, self.misses
+
+    def reset_stats(self):
+        """resets the counts of hits and misses
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.hits = 0
+        self.misses = 0
+
+
+class LocalVocabulary(Object):
+    """stand-in for the vocabulary functions of the natlink module,
+    used to test or benchmark code which looks up, adds or deletes
+    words without a speech engine (see [use_vocabulary_engine]).
+
+    **INSTANCE ATTRIBUTES**
+
+    *{STR: INT}* words -- map from each vocabulary entry to its word
+    information (the flag with which it was added)
+
+    *INT* num_lookups -- number of calls to [getWordInfo] so far
+
+    *INT* num_changes -- number of calls to [addWord] and 
+    [deleteWord] so far
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [use_vocabulary_engine] file:///./sr_interface.html#use_vocabulary_engine
+    .. [getWordInfo] file:///./sr_interface.LocalVocabulary.html#getWordInfo
+    .. [addWord] file:///./sr_interface.LocalVocabulary.html#addWord
+    .. [deleteWord] file:///./sr_interface.LocalVocabulary.html#deleteWord"""
+
+    def __init__(self, words = None, **args):
+        if words is None:
+            words = {}
+        self.deep_construct(LocalVocabulary,
+                            {'words': words,
+                             'num_lookups': 0,
+                             'num_changes': 0},
+                            args)
+
+    def getWordInfo(self, word, flag = None):
+        """returns the word information of a vocabulary entry
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        *INT* flag -- ignored
+
+        **OUTPUTS**
+
+        *INT* -- the word information, or None if the entry doesn't
+        exist
+        """
+        self.num_lookups = self.num_lookups + 1
+        return self.words.get(word)
+
+    def addWord(self, word, flag = word_info_flag):
+        """adds an entry to the vocabulary
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        *INT* flag -- its word information
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.num_changes = self.num_changes + 1
+        self.words[word] = flag
+
+    def deleteWord(self, word):
+        """removes an entry from the vocabulary
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.num_changes = self.num_changes + 1
+        if self.words.has_key(word):
+            del self.words[word]
+
+#
+# Object providing the getWordInfo, addWord and deleteWord functions
+# used to look up, add and delete vocabulary entries (the natlink module,
+# or a LocalVocabulary, see use_vocabulary_engine)
+#
+vocabulary_engine = natlink
+
+#
+# Set *use_word_info_cache* to 0 to send every lookup of a vocabulary
+# entry to the speech engine
+#
+use_word_info_cache = 1
+word_info_cache = WordInfoCache()
+
+#
+# Log of the entries added to or deleted from the vocabulary, so that
+# information derived from the vocabulary (e.g. the expansions memoized
+# by SymDict) can be updated: *vocabulary_generation* is incremented for
+# each entry, and *vocabulary_log* holds the most recent entries (see
+# vocabulary_changes_since)
+#
+vocabulary_generation = 0
+vocabulary_log = []
+max_vocabulary_log = 1000
+
+def _log_vocabulary_change(word):
+    """private function which records that an entry was added to or
+    deleted from the vocabulary"""
+    global vocabulary_generation
+    vocabulary_generation = vocabulary_generation + 1
+    vocabulary_log.append(word)
+    if len(vocabulary_log) > 2 * max_vocabulary_log:
+        del vocabulary_log[:max_vocabulary_log]
+
+def vocabulary_changes_since(generation):
+    """returns the entries added to or deleted from the vocabulary
+    since a given value of *vocabulary_generation*
+
+    **INPUTS**
+
+    *INT* generation -- the earlier value of *vocabulary_generation*,
+    or None
+
+    **OUTPUTS**
+
+    *[STR]* -- the entries, or None if they are no longer all in the
+    log (or if *generation* is None), in which case anything in the
+    vocabulary may have changed
+    """
+    if generation is None:
+        return None
+    num_changes = vocabulary_generation - generation
+    if num_changes > len(vocabulary_log):
+        return None
+    if num_changes == 0:
+        return []
+    return vocabulary_log[-num_changes:]
+
+
+def use_vocabulary_engine(engine):
+    """replaces the object used to look up, add and delete vocabulary
+    entries, and clears the cache of vocabulary lookups
+
+    **INPUTS**
+
+    *ANY* engine -- the natlink module, or a stand-in like
+    [LocalVocabulary]
+
+    **OUTPUTS**
+
+    *ANY* -- the engine used previously
+
+    .. [LocalVocabulary] file:///./sr_interface.LocalVocabulary.html"""
+    global vocabulary_engine, vocabulary_generation
+    previous = vocabulary_engine
+    vocabulary_engine = engine
+    word_info_cache.clear()
+# the whole vocabulary may be different
+    del vocabulary_log[:]
+    vocabulary_generation = vocabulary_generation + 1
+    return previous
+
+
+class VocabularyTransaction(Object):
+    """changes to the vocabulary of the speech engine which are
+    collected, instead of being made right away, and made in one batch
+    when the transaction ends (see [begin_vocabulary_transaction]).
+
+    Only the last change requested for each vocabulary entry is made
+    (e.g. adding an entry several times adds it once, and adding then
+    deleting it only deletes it).  If an entry with a pending change is
+    looked up before the transaction ends, the change is made first.
+
+    **INSTANCE ATTRIBUTES**
+
+    *{STR: (FCT, (ANY))}* pending -- map from each vocabulary entry with
+    a pending change to the function making the change and its extra
+    arguments
+
+    *[STR]* order -- vocabulary entries in the order in which changes
+    were first requested for them
+
+    *INT* depth -- number of nested calls to
+    [begin_vocabulary_transaction] not yet ended
+
+    *INT* num_requested -- number of changes requested
+
+    *INT* num_applied -- number of changes actually made
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [begin_vocabulary_transaction] file:///./sr_interface.html#begin_vocabulary_transaction"""
+
+    def __init__(self, **args):
+        self.deep_construct(VocabularyTransaction,
+                            {'pending': {},
+                             'order': [],
+                             'depth': 0,
+                             'num_requested': 0,
+                             'num_applied': 0},
+                            args)
+
+    def record(self, change, word, rest):
+        """records a change to a vocabulary entry
+
+        **INPUTS**
+
+        *FCT* change -- function making the change (called as
+        change(word, rest))
+
+        *STR* word -- the vocabulary entry
+
+        *(ANY)* rest -- the extra arguments of the change
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.num_requested = self.num_requested + 1
+        if not self.pending.has_key(word):
+            self.order.append(word)
+        self.pending[word] = (change, rest)
+
+    def has_key(self, word):
+        """indicates whether a vocabulary entry has a pending change
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the entry has a pending change
+        """
+        return self.pending.has_key(word)
+
+    def apply(self, word):
+        """makes the pending change to a vocabulary entry
+
+        **INPUTS**
+
+        *STR* word -- the vocabulary entry
+
+        **OUTPUTS**
+
+        *ANY* -- the value returned by the function making the change
+        """
+        change, rest = self.pending[word]
+        del self.pending[word]
+        self.num_applied = self.num_applied + 1
+        return change(word, rest)
+
+    def flush(self):
+        """makes all the pending changes
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        order = self.order
+        self.order = []
+        for word in order:
+            if self.pending.has_key(word):
+                self.apply(word)
+
+    def saved_calls(self):
+        """returns the number of changes which didn't need to be made
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *INT* -- the number of changes requested but not made
+        """
+        return self.num_requested - self.num_applied
+
+#
+# The current vocabulary transaction, or None
+#
+vocabulary_transaction = None
+
+#
+# Total number of changes to the vocabulary saved by vocabulary
+# transactions so far
+#
+vocabulary_calls_saved = 0
+
+
+def begin_vocabulary_transaction():
+    """starts collecting the changes made to the vocabulary through
+    [addWord] and [deleteWord], until the matching call to 
+    [end_vocabulary_transaction].  Transactions can be nested, in which
+    case the changes are made when the outermost transaction ends.
+
+    Callers should use try/finally to make sure that the transaction
+    is ended.
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    [VocabularyTransaction] -- the current transaction
+
+    .. [addWord] file:///./sr_interface.html#addWord
+    .. [deleteWord] file:///./sr_interface.html#deleteWord
+    .. [end_vocabulary_transaction] file:///./sr_interface.html#end_vocabulary_transaction
+    .. [VocabularyTransaction] file:///./sr_interface.VocabularyTransaction.html"""
+    global vocabulary_transaction
+    if vocabulary_transaction is None:
+        vocabulary_transaction = VocabularyTransaction()
+    vocabulary_transaction.depth = vocabulary_transaction.depth + 1
+    return vocabulary_transaction
+
+def end_vocabulary_transaction():
+    """ends a vocabulary transaction started with 
+    [begin_vocabulary_transaction], making the changes collected if it
+    is the outermost one
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    [VocabularyTransaction] -- the transaction, or None if there was
+    none
+
+    .. [begin_vocabulary_transaction] file:///./sr_interface.html#begin_vocabulary_transaction
+    .. [VocabularyTransaction] file:///./sr_interface.VocabularyTransaction.html"""
+    global vocabulary_transaction, vocabulary_calls_saved
+    transaction = vocabulary_transaction
+    if transaction is None:
+        return None
+    transaction.depth = transaction.depth - 1
+    if transaction.depth > 0:
+        return transaction
+    vocabulary_transaction = None
+    transaction.flush()
+    vocabulary_calls_saved = vocabulary_calls_saved + \
+        transaction.saved_calls()
+    trace('sr_interface.end_vocabulary_transaction',
+        '%d changes requested, %d made' % (transaction.num_requested,
+        transaction.num_applied))
+    return transaction
+
+
 def set_mic(mic_state):
     """turns microphone on or off (connecting first, if necessary).
 
@@ -165,6 +665,7 @@ def disconnect():
         natlink.setChangeCallback(None)
         sr_mic_change_callback = None
     natlink.natDisconnect()
+    word_info_cache.clear()
     sr_is_connected = 0        
 
 
@@ -186,6 +687,7 @@ def openUser(user_name):
     *none* -- 
     """
     
+    word_info_cache.clear()
     natlink.openUser(user_name)
 
 def saveUser():
@@ -256,14 +758,32 @@ def addedByVC(flag):
     return indicator
 
 def getWordInfo(word, flag = None):
+    """returns the word information of a vocabulary entry, or None if
+    it doesn't exist.  Lookups without a flag are cached (see
+    *word_info_cache*)."""
     
 #    trace('sr_interface.getWordInfo', 'word=%s, rest=%s' % (word, rest))
+    if vocabulary_transaction is not None and \
+       vocabulary_transaction.has_key(word):
+# make the pending change now, so the answer is up to date
+        vocabulary_transaction.apply(word)
+    if flag is None and use_word_info_cache:
+        cached, answer = word_info_cache.lookup(word)
+        if not cached:
+            answer = _engine_word_info(word)
+            word_info_cache.store(word, answer)
+        return answer
+    return _engine_word_info(word, flag)
+
+def _engine_word_info(word, flag = None):
+    """private function which looks up a vocabulary entry in the
+    speech engine, bypassing the cache"""
     
     try:
        if flag is None:
-           answer = natlink.getWordInfo(word)
+           answer = vocabulary_engine.getWordInfo(word)
        else:
-           answer = natlink.getWordInfo(word, flag)
+           answer = vocabulary_engine.getWordInfo(word, flag)
     except:
        # In case the word's spelling is not allowed by
        # NatSpeak
@@ -291,9 +811,21 @@ def addWord(word, *rest):
 
     We only add the word if it doesn't already exist in the vocabulary.
     
-    Returns *TRUE* iif the word was successfully added.
+    Returns *TRUE* iif the word was successfully added.  During a
+    vocabulary transaction, the word is only added when the transaction
+    ends, and *TRUE* is returned.
     
     """
+    if word == 'g' or word == 'g\\g':
+        raise RuntimeError('I thought we agreed not to add single letters')
+    if vocabulary_transaction is not None:
+        vocabulary_transaction.record(_add_word, word, rest)
+        return 1
+    return _add_word(word, rest)
+
+def _add_word(word, rest):
+    """private function which adds a word to the vocabulary right
+    away (see addWord)"""
         
     global word_info_flag
 
@@ -313,8 +845,6 @@ def addWord(word, *rest):
     # Make sure we are connected to SR system
     #
                 
-    if word == 'g' or word == 'g\\g':
-        raise RuntimeError('I thought we agreed not to add single letters')
     if getWordInfo(word) == None:
         trace('sr_interface.addWord', 'this word is new to NatSpeak')
                    
@@ -325,13 +855,16 @@ def addWord(word, *rest):
         else:
             return None
                
+# the information cached for the word won't be valid anymore
+        word_info_cache.forget(word)
         try:
-           natlink.addWord(word, flag)        
+           vocabulary_engine.addWord(word, flag)        
            sr_user_needs_saving = 1
         except:
            # In case the word's spoken form is rejected by
            # NatSpeak
            return None
+        _log_vocabulary_change(word)
 
         #
         # Note: Need to add redundant entry without special
@@ -347,10 +880,12 @@ def addWord(word, *rest):
         word_no_special_chars = re.sub('{Spacebar}', '', word)
         if word_no_special_chars != word:
 #            trace('sr_interface.addWord', 'adding redundant form with no spaces \'%s\'' % word_no_special_chars)
+            word_info_cache.forget(word_no_special_chars)
             try:
-               natlink.addWord(word_no_special_chars, flag)
+               vocabulary_engine.addWord(word_no_special_chars, flag)
             except:
                return None
+            _log_vocabulary_change(word_no_special_chars)
                
     return 1
  
@@ -361,7 +896,18 @@ def deleteWord(word, *rest):
     Also, we only remove it if the word was added to the vocabulary by
     VoiceCode, i.e. if the word info has 'added by Vocabulary Builder'
     flag set and if the word is a phrase (single words might actually
-    have ben added by the real Vocabulary Builder)"""
+    have ben added by the real Vocabulary Builder)
+
+    During a vocabulary transaction, the word is only deleted when the
+    transaction ends, and None is returned."""
+    if vocabulary_transaction is not None:
+        vocabulary_transaction.record(_delete_word, word, rest)
+        return None
+    return _delete_word(word, rest)
+
+def _delete_word(word, rest):
+    """private function which deletes a word from the vocabulary right
+    away (see deleteWord)"""
 
 #    trace('sr_interface.deleteWord', 'word=%s, rest=%s' % (word, rest))
     flag = getWordInfo(word)
@@ -369,7 +915,9 @@ def deleteWord(word, *rest):
     if addedByVC(flag) and num_words > 1:
 #            trace('sr_interface.deleteWord', 'actually deleting word %s' % word)
         sr_user_needs_saving = 1
-        return natlink.deleteWord(word)
+        word_info_cache.forget(word)
+        _log_vocabulary_change(word)
+        return vocabulary_engine.deleteWord(word)
     else:
 #            trace('sr_interface.deleteWord', 'word not added by VoiceCode %s' % word)
         return None
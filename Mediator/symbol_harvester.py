@@ -0,0 +1,545 @@
+##############################################################################
+# VoiceCode, a programming-by-voice environment
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+# (C)2000, National Research Council of Canada
+#
+##############################################################################
+
+"""Bulk extraction of the symbols defined in source files.
+
+Extracting symbols from a source file is pure regexp work, which
+doesn't involve the speech engine or the symbol dictionary, so
+[SymDict.parse_symbols_from_files] can farm it out to a series of
+worker processes, each of which runs this module as a script on a
+subset of the files.  The symbols found are then added to the symbol
+dictionary (and to the SR vocabulary) on the main thread.
+
+A job is described by a pickled dictionary with keys:
+
+*[(STR, STR)]* files -- list of (file name, language name) pairs
+
+*{STR: (STR, [STR])}* definitions -- the *regexp_symbol* and
+*regexps_no_symbols* attributes of the [LangDef] of each language.
+
+The results are a pickled list of (file name, symbols) pairs, in the
+same order as the files of the job, where symbols is the list of
+distinct symbols found in the file (in order of first appearance), or
+None if the file couldn't be read.
+
+[HarvestCache] records, for each standard symbol file, the symbols
+extracted from it along with the size, modification time and MD5 digest
+of the file, so that only files whose contents actually changed need
+to be parsed again, and only the difference between the old and new
+sets of symbols needs to be applied to the symbol dictionary.
+
+Usage (normally only by [harvest_files]):
+
+   python symbol_harvester.py job_file result_file
+
+.. [SymDict.parse_symbols_from_files] file:///./SymDict.SymDict.html#parse_symbols_from_files
+.. [LangDef] file:///./LangDef.LangDef.html
+.. [harvest_files] file:///./symbol_harvester.html#harvest_files
+.. [HarvestCache] file:///./symbol_harvester.HarvestCache.html"""
+
+import cPickle, md5, os, sys
+import string
+from LangDef import LangDef
+from Object import Object
+
+
+def symbols_in_file(file_name, language_definition):
+    """extracts the distinct symbols defined in a source file
+
+    **INPUTS**
+
+    *STR file_name* -- path of the file
+
+    [LangDef] *language_definition* -- definition of the language the
+    file is written in
+
+    **OUTPUTS**
+
+    *[STR]* -- the distinct symbols, in order of first appearance, or
+    None if the file couldn't be read
+
+    .. [LangDef] file:///./LangDef.LangDef.html"""
+    source = read_source(file_name)
+    if source is None:
+        return None
+    return symbols_in_source(source, language_definition)
+
+def read_source(file_name):
+    """reads the contents of a source file
+
+    **INPUTS**
+
+    *STR file_name* -- path of the file
+
+    **OUTPUTS**
+
+    *STR* -- the contents of the file, or None if it couldn't be read
+    """
+    try:
+        source_file = open(file_name, 'r')
+        source = source_file.read()
+        source_file.close()
+    except (IOError, OSError):
+        return None
+    return source
+
+def symbols_in_source(source, language_definition):
+    """extracts the distinct symbols defined in the contents of a
+    source file
+
+    **INPUTS**
+
+    *STR source* -- the contents of the file
+
+    [LangDef] *language_definition* -- definition of the language the
+    file is written in
+
+    **OUTPUTS**
+
+    *[STR]* -- the distinct symbols, in order of first appearance
+
+    .. [LangDef] file:///./LangDef.LangDef.html"""
+    seen = {}
+    symbols = []
+    for a_symbol in language_definition.symbols_in(source):
+        if not seen.has_key(a_symbol):
+            seen[a_symbol] = 1
+            symbols.append(a_symbol)
+    return symbols
+
+def run_job(job):
+    """extracts the symbols for all the files of a job
+
+    **INPUTS**
+
+    *{STR: ANY} job* -- the job description (see module documentation)
+
+    **OUTPUTS**
+
+    *[(STR, [STR])]* -- the results (see module documentation)
+    """
+    definitions = {}
+    for language_name, (regexp_symbol, regexps_no_symbols) in \
+            job['definitions'].items():
+        definitions[language_name] = \
+            LangDef(name = language_name, regexp_symbol = regexp_symbol,
+                    regexps_no_symbols = regexps_no_symbols)
+    results = []
+    for file_name, language_name in job['files']:
+        results.append((file_name,
+            symbols_in_file(file_name, definitions[language_name])))
+    return results
+
+def _quote_arg(arg):
+    """private function which quotes an argument for os.spawnv, which
+    doesn't do it on Windows
+
+    **INPUTS**
+
+    *STR arg* -- the argument
+
+    **OUTPUTS**
+
+    *STR* -- the quoted argument
+    """
+    if sys.platform == 'win32':
+        return '"%s"' % arg
+    return arg
+
+def python_executable():
+    """finds the Python interpreter with which to run worker processes
+
+    When running inside NatSpeak, *sys.executable* is NatSpeak itself,
+    so we look for the interpreter in *sys.prefix* instead.
+
+    **INPUTS**
+
+    *none*
+
+    **OUTPUTS**
+
+    *STR* -- path of the interpreter, or None if we can't find one
+    """
+    executable = sys.executable
+    if executable and \
+       string.find(string.lower(os.path.basename(executable)), 'python') == 0:
+        return executable
+    for name in ['python.exe', 'python']:
+        executable = os.path.join(sys.prefix, name)
+        if os.path.exists(executable):
+            return executable
+    return None
+
+def harvest_files(files, definitions, num_processes, tmp_dir):
+    """extracts the symbols from a list of files, using several worker
+    processes
+
+    Files are dealt round-robin to the workers.  If a worker fails, the
+    files it was given are processed in the current process instead, so
+    the results are always complete.
+
+    **INPUTS**
+
+    *[(STR, STR)] files* -- list of (file name, language name) pairs
+
+    *{STR: * [LangDef] *}* definitions -- the definitions of the
+    languages of *files*
+
+    *INT num_processes* -- maximum number of worker processes
+
+    *STR tmp_dir* -- directory in which to write the job and result
+    files
+
+    **OUTPUTS**
+
+    *[(STR, [STR])]* -- the results (see module documentation), in the
+    same order as *files*
+
+    .. [LangDef] file:///./LangDef.LangDef.html"""
+    job_definitions = {}
+    for language_name, a_definition in definitions.items():
+        job_definitions[language_name] = (a_definition.regexp_symbol,
+            a_definition.regexps_no_symbols)
+
+    num_processes = min(num_processes, len(files))
+    python = python_executable()
+    script = os.path.abspath(__file__)
+    if os.path.splitext(script)[1] != '.py':
+        script = os.path.splitext(script)[0] + '.py'
+    workers = []
+    for ii in range(num_processes):
+        job = {'files': files[ii::num_processes],
+               'definitions': job_definitions}
+        job_file = os.path.join(tmp_dir,
+            'harvest.%d.%d.job' % (os.getpid(), ii))
+        result_file = os.path.join(tmp_dir,
+            'harvest.%d.%d.res' % (os.getpid(), ii))
+        pid = None
+        if python:
+            try:
+                f = open(job_file, 'wb')
+                cPickle.dump(job, f, 1)
+                f.close()
+                args = map(_quote_arg, [python, script, job_file, result_file])
+                pid = os.spawnv(os.P_NOWAIT, python, args)
+            except (IOError, OSError):
+                pid = None
+        workers.append((job, job_file, result_file, pid))
+
+    results = {}
+    for job, job_file, result_file, pid in workers:
+        job_results = None
+        if pid is not None:
+            try:
+                os.waitpid(pid, 0)
+                f = open(result_file, 'rb')
+                job_results = cPickle.load(f)
+                f.close()
+            except:
+                job_results = None
+        if job_results is None:
+            job_results = run_job({'files': job['files'],
+                                   'definitions': job_definitions})
+        for a_file, symbols in job_results:
+            results[a_file] = symbols
+        for a_file in [job_file, result_file]:
+            try:
+                os.remove(a_file)
+            except OSError:
+                pass
+
+    ordered = []
+    for a_file, language_name in files:
+        ordered.append((a_file, results[a_file]))
+    return ordered
+
+class HarvestCache(Object):
+    """persistent record of the symbols extracted from each source file
+
+    Looking up a file first compares its size and modification time
+    with the cached ones.  If they differ, the file is read and its MD5
+    digest is compared with the cached one, so that files which have
+    merely been touched (e.g. checked out again) don't need to be
+    parsed.
+
+    The cache only works if [SymDict] applies to its symbol information
+    every change in the symbols recorded here, so [SymDict] must [clear]
+    the cache whenever it discards its symbols.
+
+    **INSTANCE ATTRIBUTES**
+
+    *{STR: (INT, INT, STR, [STR])}* entries -- map from the name of a
+    file to its size, modification time, MD5 digest and list of
+    distinct symbols.  This is a plain dictionary, so [SymDict] can
+    store it in the persistent symbol dictionary file.
+
+    *{STR: 1}* added -- the symbols which [SymDict] added because they
+    were found in one of the files, and which nothing else (the user,
+    or a file which isn't cached) has added since.  Only these may be
+    removed when they disappear from the files.  This is also a plain
+    dictionary, stored in the persistent symbol dictionary file.
+
+    *INT* hits -- number of lookups for which the size and
+    modification time were unchanged.
+
+    *INT* digest_hits -- number of lookups for which the size or
+    modification time had changed, but the contents hadn't.
+
+    *INT* misses -- number of lookups for which the file wasn't in the
+    cache or its contents had changed.
+
+    CLASS ATTRIBUTES**
+
+    *none* --
+
+    .. [SymDict] file:///./SymDict.SymDict.html
+    .. [clear] file:///./symbol_harvester.HarvestCache.html#clear"""
+
+    def __init__(self, **args):
+        self.deep_construct(HarvestCache,
+                            {'entries': {},
+                             'added': {},
+                             'hits': 0,
+                             'digest_hits': 0,
+                             'misses': 0},
+                            args)
+
+    def check(self, file_name):
+        """checks whether the symbols cached for a file are up to date
+
+        If the contents are unchanged but the size or modification time
+        differ, the entry is updated with the new ones.
+
+        **INPUTS**
+
+        *STR file_name* -- path of the file
+
+        **OUTPUTS**
+
+        *(BOOL, (INT, INT, STR), STR)* -- true if the cached symbols are
+        up to date, the (size, modification time, digest) signature of
+        the file (or None if it couldn't be read), and the contents of
+        the file if they had to be read (None otherwise)
+        """
+        try:
+            info = os.stat(file_name)
+        except OSError:
+            self.misses = self.misses + 1
+            return 0, None, None
+        size = info.st_size
+        mtime = int(info.st_mtime)
+        entry = self.entries.get(file_name)
+        if entry and entry[0] == size and entry[1] == mtime:
+            self.hits = self.hits + 1
+            return 1, entry[:3], None
+        source = read_source(file_name)
+        if source is None:
+            self.misses = self.misses + 1
+            return 0, None, None
+        digest = md5.new(source).hexdigest()
+        if entry and entry[2] == digest:
+            self.digest_hits = self.digest_hits + 1
+            self.entries[file_name] = (size, mtime, digest, entry[3])
+            return 1, (size, mtime, digest), source
+        self.misses = self.misses + 1
+        return 0, (size, mtime, digest), source
+
+    def symbols(self, file_name):
+        """returns the symbols cached for a file
+
+        **INPUTS**
+
+        *STR file_name* -- path of the file
+
+        **OUTPUTS**
+
+        *[STR]* -- the symbols, or None if the file isn't in the cache
+        """
+        entry = self.entries.get(file_name)
+        if entry is None:
+            return None
+        return entry[3]
+
+    def update(self, file_name, signature, symbols):
+        """records the symbols extracted from a file
+
+        **INPUTS**
+
+        *STR file_name* -- path of the file
+
+        *(INT, INT, STR) signature* -- the signature of the file, as
+        returned by [check]
+
+        *[STR] symbols* -- the distinct symbols of the file
+
+        **OUTPUTS**
+
+        *none*
+
+        .. [check] file:///./symbol_harvester.HarvestCache.html#check"""
+        size, mtime, digest = signature
+        self.entries[file_name] = (size, mtime, digest, symbols)
+
+    def remove(self, file_name):
+        """forgets the symbols of a file
+
+        **INPUTS**
+
+        *STR file_name* -- path of the file
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if self.entries.has_key(file_name):
+            del self.entries[file_name]
+
+    def keep_only(self, file_names):
+        """forgets the symbols of all files except the given ones
+
+        **INPUTS**
+
+        *[STR] file_names* -- paths of the files to keep
+
+        **OUTPUTS**
+
+        *none*
+        """
+        for a_file in self.entries.keys():
+            if a_file not in file_names:
+                del self.entries[a_file]
+
+    def clear(self):
+        """forgets the symbols of all files
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.entries = {}
+        self.added = {}
+
+    def record_added(self, symbol):
+        """records that a symbol was added only because it was found in
+        one of the files
+
+        **INPUTS**
+
+        *STR symbol* -- the symbol
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.added[symbol] = 1
+
+    def forget_added(self, symbol):
+        """records that a symbol was added (or removed) by other means
+        than finding it in one of the files
+
+        **INPUTS**
+
+        *STR symbol* -- the symbol
+
+        **OUTPUTS**
+
+        *none*
+        """
+        if self.added.has_key(symbol):
+            del self.added[symbol]
+
+    def added_by_harvest(self, symbol):
+        """tells whether a symbol was added only because it was found
+        in one of the files
+
+        **INPUTS**
+
+        *STR symbol* -- the symbol
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the symbol was only added by the harvest
+        """
+        return self.added.has_key(symbol)
+
+    def defined_symbols(self):
+        """returns the set of symbols defined by any of the files in
+        the cache
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: 1}* -- the symbols
+        """
+        defined = {}
+        for size, mtime, digest, symbols in self.entries.values():
+            for a_symbol in symbols:
+                defined[a_symbol] = 1
+        return defined
+
+    def stats(self):
+        """returns the cache counters
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *{STR: INT}* -- the values of the counters, plus the current
+        number of entries (*size*)
+        """
+        return {'size': len(self.entries),
+                'hits': self.hits,
+                'digest_hits': self.digest_hits,
+                'misses': self.misses}
+
+    def reset_stats(self):
+        """resets the cache counters to 0
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.hits = 0
+        self.digest_hits = 0
+        self.misses = 0
+
+
+if __name__ == '__main__':
+    f = open(sys.argv[1], 'rb')
+    job = cPickle.load(f)
+    f.close()
+    results = run_job(job)
+    f = open(sys.argv[2], 'wb')
+    cPickle.dump(results, f, 1)
+    f.close()
@@ -93,7 +93,15 @@ class ClientConnection(Object.Object):
 
     STR *ID* -- unique ID assigned to this connection
 
-    Event *client_quitting* -- threading.Event 
+    STR *encoding* -- name of the message encoding negotiated with the
+    mediator during the handshake
+
+    STR *packaging* -- name of the message packaging negotiated with the
+    mediator during the handshake
+
+    Event *client_quitting* -- threading.Event (actually a
+    messaging.WakeupEvent, which can also wake up the data thread while 
+    it waits for data)
     used to signal to the data thread that the connection is 
     ending, or the client is quitting
  
@@ -111,6 +119,8 @@ class ClientConnection(Object.Object):
                              'connecting': 0,
                              'connected': 0,
                              'ID': None,
+                             'encoding': messaging.default_encoding,
+                             'packaging': messaging.default_packaging,
                              'client_quitting': None
                              }, 
                             args_super)
@@ -136,10 +146,11 @@ class ClientConnection(Object.Object):
         file:///./tcp_server.ListenAndQueueMsgsThread.html"""        
         queue = Queue.Queue()
         broken_connection = ('broken_connection', {})
-        self.client_quitting = threading.Event()
+        self.client_quitting = messaging.WakeupEvent()
         sleeper = messaging.LightSleeper(self.client_quitting)
         a_msgr = messaging.messenger_factory(listen_sock, sleep = 0.05,
-            sleeper = sleeper)
+            sleeper = sleeper, encoding = self.encoding, 
+            packaging = self.packaging)
         thread = ListenAndQueueMsgsThread(a_msgr, queue, data_event,
            self.client_quitting, broken_connection)
         return thread
@@ -190,9 +201,9 @@ class ClientConnection(Object.Object):
         #
         # Create a messenger
         #
-        packager = messaging.MessPackager_FixedLenSeq()
+        packager = messaging.new_packager()
         transporter = messaging.MessTransporter_Socket(sock=a_socket)
-        encoder = messaging.MessEncoderWDDX()
+        encoder = messaging.new_encoder()
         vc_listen_msgr = messaging.MessengerBasic(packager=packager, 
             transporter=transporter, encoder=encoder)
 
@@ -203,7 +214,12 @@ class ClientConnection(Object.Object):
         # Send name of editor
         #
         vc_listen_msgr.get_mess(expect=['send_app_name'])
-        vc_listen_msgr.send_mess('app_name', {'value': app_name})
+        app_args = {'value': app_name}
+        if messaging.preferred_encodings:
+            app_args['encodings'] = messaging.preferred_encodings
+        if messaging.preferred_packagings:
+            app_args['packagings'] = messaging.preferred_packagings
+        vc_listen_msgr.send_mess('app_name', app_args)
 
 
         debug.trace('ClientConnection.open_vc_listener_conn',
@@ -214,6 +230,15 @@ class ClientConnection(Object.Object):
         #
         msg = vc_listen_msgr.get_mess(expect=['your_id_is'])
         self.ID = msg[1]['value']
+        # older mediators don't negotiate the encoding or packaging
+        self.encoding = messaging.default_encoding
+        if msg[1].has_key('encoding') and \
+           messaging.encoders.has_key(msg[1]['encoding']):
+            self.encoding = msg[1]['encoding']
+        self.packaging = messaging.default_packaging
+        if msg[1].has_key('packaging') and \
+           messaging.packagers.has_key(msg[1]['packaging']):
+            self.packaging = msg[1]['packaging']
         vc_listen_msgr.send_mess('ok')
         
         # indicate whether this is a test client expecting to run 
@@ -226,8 +251,15 @@ class ClientConnection(Object.Object):
         vc_listen_msgr.send_mess('test_client_query_resp', 
             {'value': test_client})
 
+        # the rest of the conversation uses the negotiated encoding and
+        # packaging
+        vc_listen_msgr.encoder = messaging.new_encoder(self.encoding,
+            self.packaging)
+        vc_listen_msgr.packager = messaging.new_packager(self.packaging)
+
         debug.trace('ClientConnection.open_vc_listener_conn',
-              'done')
+              'done, using encoding %s, packaging %s' \
+              % (self.encoding, self.packaging))
 
         return vc_listen_msgr
 
@@ -262,9 +294,9 @@ class ClientConnection(Object.Object):
         #
         # Create a temporary messenger
         #
-        packager = messaging.MessPackager_FixedLenSeq()
+        packager = messaging.new_packager()
         transporter = messaging.MessTransporter_Socket(sock=a_socket)
-        encoder = messaging.MessEncoderWDDX()
+        encoder = messaging.new_encoder()
         vc_talk_msgr = messaging.MessengerBasic(packager=packager, transporter=transporter, encoder=encoder)
         
 
@@ -371,6 +403,7 @@ class ClientConnection(Object.Object):
         self.connected = 0
         self.connecting = 0
         self.client_quitting.set()
+        self.client_quitting.close()
         self.client_quitting = None
         return 1
 
@@ -396,7 +429,8 @@ class ClientConnection(Object.Object):
         data_thread.start()
 
         listen_response_msgr = messaging.messenger_factory(listen_sock, 
-            sleep = 0.05)        
+            sleep = 0.05, encoding = self.encoding, 
+            packaging = self.packaging)
         listen_msgr = messaging.MixedMessenger(listen_response_msgr, messages)
  
         return listen_msgr
@@ -1262,11 +1296,21 @@ class ClientEditorChangeSpec(ClientEditor):
 
 class DummyDataEvent(thread_communication.SocketHasDataEvent):
     """dummy SocketHasDataEvent for UneventfulLoop
+
+    **INSTANCE ATTRIBUTES**
+
+    *threading.Event data_ready* -- event set when data has been 
+    received, which UneventfulLoop can wait for instead of polling
     """
+    def __init__(self, **args):
+        self.deep_construct(DummyDataEvent,
+                            {'data_ready': threading.Event()},
+                            args)
+
     def notify(self):
-# UneventfulLoop will poll for data, and has no event loops, so we 
-# don't need to notify the main thread of anything.
-        pass
+# UneventfulLoop has no event loops, so we just wake it up if it is
+# waiting for data
+        self.data_ready.set()
 
 class UneventfulLoop(Object.OwnerObject):
     """class for running the EdSim editor simulator as a TCP client
@@ -1338,7 +1382,8 @@ class UneventfulLoop(Object.OwnerObject):
         client_name = 'EdSim'
         if self.client_indentation:
             client_name = 'EdSimClientIndent'
-        messengers = self.connection.connect(client_name, DummyDataEvent(), 
+        data_event = DummyDataEvent()
+        messengers = self.connection.connect(client_name, data_event, 
             host = host, listen_port = listen_port, talk_port = talk_port, 
             test_client = 1)
         if messengers == None:
@@ -1349,7 +1394,8 @@ class UneventfulLoop(Object.OwnerObject):
         self.quit_flag = 0
         while not self.quit_flag:
             if listen.receiver.empty():
-                time.sleep(.05)
+                data_event.data_ready.wait(.05)
+                data_event.data_ready.clear()
             else:
                 self.editor.mediator_cmd()
         self.editor.disconnected()
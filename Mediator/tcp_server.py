@@ -24,8 +24,8 @@
 
 import vc_globals
 
-import natlink, os, posixpath, pythoncom, re, select, socket
-import SocketServer, string, sys, threading, time, whrandom, win32event
+import natlink, os, posixpath, re, select, socket
+import SocketServer, string, sys, threading, time, traceback, whrandom
 
 import AppStateEmacs, AppStateMessaging, auto_test, debug
 import messaging, Object
@@ -36,7 +36,17 @@ import Queue
 import regression
 
 from tcp_threads import *
-from thread_communication_win32 import *
+from thread_communication import *
+
+# ExtLoopWin32 needs the win32all extensions, but ExtLoopSelect doesn't,
+# so the server can also run on other platforms
+try:
+    import pythoncom, win32event
+    from thread_communication_win32 import *
+except ImportError:
+# pythoncom may have been imported even if the rest failed
+    if not globals().has_key('pythoncom'):
+        pythoncom = None
 
 #
 # Port numbers for the communication link
@@ -97,6 +107,11 @@ class SB_MessExtEdSim(SourceBuffMessaging.SourceBuffMessaging):
     def decr_indent_level(self, levels=1, range=None):
         self.indent_srv.decr_indent_level(levels=levels, range=range)
         
+    def on_change(self, start, end, text, program_initiated):
+        self.lines_srv.on_change(start, end, text)
+        SourceBuffMessaging.SourceBuffMessaging.on_change(self, start, end,
+            text, program_initiated)
+
     def line_num_of(self, position = None):
         return self.lines_srv.line_num_of(position)
 
@@ -413,15 +428,16 @@ class ServerMainThread(Object.OwnerObject):
     element of each 2ple is a new (uninitialised) socked
      on the VC_TALK port.  The data part of the 2ple is useless.
 
-    [(socket, (STR, STR, (INT, STR, STR), BOOL)] 
+    [(socket, (STR, STR, (INT, STR, STR), BOOL, STR, STR)] 
     *pending_listen_socks=[]* -- Each entry is
     a 2ple consiting of a new (uninitialised) socket on the VC_LISTEN
-    port, and data about that socket. The data is itself a 4ple
+    port, and data about that socket. The data is itself a 6ple
     consisting of: (a) identifier of external editor, (b) name of the
     external editor, (c) another tuple, consisting of window handle, title, 
     and module name of the active window, assumed to be the external editor, 
-    and (d) a flag indicating whether the client is expecting to be used for
-    regression testing. 
+    (d) a flag indicating whether the client is expecting to be used for
+    regression testing, (e) the name of the message encoding and (f) the
+    name of the message packaging negotiated with the editor. 
     Socks on the pending_listen_socks list have been through
     handshaking, but have not yet been packaged with corresponding
     talk_socks.
@@ -440,7 +456,8 @@ class ServerMainThread(Object.OwnerObject):
     socket IDs to threads which poll for data from the listen messenger
   
     {STR : Event} *connection_ending* -- map from each unique 
-    socket IDs to a corresponding threading.Event 
+    socket IDs to a corresponding threading.Event (actually a 
+    messaging.WakeupEvent)
     used to signal to the corresponding data thread that the connection is 
     ending, or the server is quitting
 
@@ -516,7 +533,7 @@ class ServerMainThread(Object.OwnerObject):
         debug.virtual('ServerMainThread.data_event')
 
     def new_data_thread(self, id, listen_sock, connection_ending,
-        testing = 0):
+        testing = 0, encoding = None, packaging = None):
         """creates a new ListenAndQueueMsgsThread to monitor the
         listen_sock
         
@@ -532,6 +549,14 @@ class ServerMainThread(Object.OwnerObject):
 
         *BOOL testing* -- indicates whether we are running in regression
         testing mode
+
+        *STR encoding* -- name of the message encoding negotiated with
+        the editor during the handshake, or None for the default
+        encoding
+
+        *STR packaging* -- name of the message packaging negotiated with
+        the editor during the handshake, or None for the default
+        packaging
         
         **OUTPUTS**
         
@@ -541,10 +566,12 @@ class ServerMainThread(Object.OwnerObject):
         file:///./tcp_server.ListenAndQueueMsgsThread.html"""        
         data_event = self.data_event(id)
         return self.new_data_thread_given_event(id, listen_sock, data_event, 
-            connection_ending, testing = testing)
+            connection_ending, testing = testing, encoding = encoding,
+            packaging = packaging)
 
     def new_data_thread_given_event(self, id, listen_sock, data_event,
-            connection_ending, testing = 0):
+            connection_ending, testing = 0, encoding = None, 
+            packaging = None):
         """creates a new ListenAndQueueMsgsThread to monitor the
         listen_sock
         
@@ -563,6 +590,14 @@ class ServerMainThread(Object.OwnerObject):
 
         *BOOL testing* -- indicates whether we are running in regression
         testing mode
+
+        *STR encoding* -- name of the message encoding negotiated with
+        the editor during the handshake, or None for the default
+        encoding
+
+        *STR packaging* -- name of the message packaging negotiated with
+        the editor during the handshake, or None for the default
+        packaging
         
         **OUTPUTS**
         
@@ -575,7 +610,7 @@ class ServerMainThread(Object.OwnerObject):
         if testing:
             sleepy_time = 0.10
         a_msgr = messaging.messenger_factory(listen_sock, sleep = sleepy_time,
-            sleeper = sleeper)
+            sleeper = sleeper, encoding = encoding, packaging = packaging)
         queue = Queue.Queue(-1)
 # a finite queue is causing problems for the text_mode regression test
 #        queue = Queue.Queue(10)
@@ -608,6 +643,7 @@ class ServerMainThread(Object.OwnerObject):
 # as long as the caller also removes the corresponding mediator, this
 # may be sufficient.
         self.connection_ending[id].set()
+        self.connection_ending[id].close()
         del self.connection_ending[id]
         try:
             del self.data_threads[id]
@@ -687,7 +723,8 @@ class ServerMainThread(Object.OwnerObject):
         print message
 
     def package_sock_pair(self, id, app_name, window_info, 
-        listen_sock, talk_sock, test_client = 0):
+        listen_sock, talk_sock, test_client = 0, encoding = None,
+        packaging = None):
         
         """Packages a listen and talk socket into an
         [AppStateMessaging] instance
@@ -708,6 +745,12 @@ class ServerMainThread(Object.OwnerObject):
         BOOL *test_client* -- flag indicating whether or not the client
         is expecting to be used for regression testing
 
+        STR *encoding* -- name of the message encoding negotiated with
+        the editor, or None for the default encoding
+
+        STR *packaging* -- name of the message packaging negotiated with
+        the editor, or None for the default packaging
+
         **OUTPUTS**
         
         *BOOL* -- false if the server should exit (because we're done
@@ -716,15 +759,18 @@ class ServerMainThread(Object.OwnerObject):
         ..[AppStateMessaging] file:///./messaging.AppStateMessaging.html"""        
         
         self.user_message('creating messengers')
-        disconnect_event = threading.Event()
+        disconnect_event = messaging.WakeupEvent()
         self.connection_ending[id] = disconnect_event
         testing = test_client and self.is_test_server()
         data_thread = self.new_data_thread(id, listen_sock, 
-            disconnect_event, testing = testing)
+            disconnect_event, testing = testing, encoding = encoding,
+            packaging = packaging)
         messages = data_thread.message_queue()
 
-        talk_msgr = messaging.messenger_factory(talk_sock)        
-        listen_response_msgr = messaging.messenger_factory(listen_sock)        
+        talk_msgr = messaging.messenger_factory(talk_sock, 
+            encoding = encoding, packaging = packaging)
+        listen_response_msgr = messaging.messenger_factory(listen_sock,
+            encoding = encoding, packaging = packaging)
         listen_msgr = messaging.MixedMessenger(listen_response_msgr, messages)
         an_app_state = self.editor_factory.new_instance(app_name, id, 
             listen_msgr, talk_msgr)
@@ -809,6 +855,23 @@ class ServerMainThread(Object.OwnerObject):
         a_messenger.send_mess('send_app_name')
         mess = a_messenger.get_mess(expect=['app_name'])
         app_name = mess[1]['value']
+
+        #
+        # Newer clients offer a list of message encodings and packagings 
+        # they support, besides the default ones used for the handshake.
+        # Older clients (and those which don't offer any) only get the
+        # defaults, and are not told about encodings or packagings at all.
+        #
+        offered = None
+        if mess[1].has_key('encodings') and \
+           not messaging.messarg_is_None(mess[1]['encodings']):
+            offered = mess[1]['encodings']
+        encoding = messaging.choose_encoding(offered)
+        offered_packagings = None
+        if mess[1].has_key('packagings') and \
+           not messaging.messarg_is_None(mess[1]['packagings']):
+            offered_packagings = mess[1]['packagings']
+        packaging = messaging.choose_packaging(offered_packagings)
                 
         self.user_message('New connection from %s' % app_name)
         #
@@ -816,7 +879,12 @@ class ServerMainThread(Object.OwnerObject):
         # connection.
         #
         id = '%s_%s' % (app_name, repr(whrandom.random()))
-        a_messenger.send_mess('your_id_is', {'value': id})
+        id_args = {'value': id}
+        if offered is not None:
+            id_args['encoding'] = encoding
+        if offered_packagings is not None:
+            id_args['packaging'] = packaging
+        a_messenger.send_mess('your_id_is', id_args)
         a_messenger.get_mess(expect=['ok'])
 
         # query whether client expects to be used for regression tests
@@ -828,7 +896,8 @@ class ServerMainThread(Object.OwnerObject):
         # Assign window_info, id and app_name to the last socket in the list of
         # new listen sockets
         #
-        most_rec_data = (id, app_name, window_info, test_client)
+        most_rec_data = (id, app_name, window_info, test_client, encoding,
+            packaging)
         
 # using this lock shouldn't be necessary, since only
 # handshake_talk_socks is the only other one accessing
@@ -886,7 +955,8 @@ class ServerMainThread(Object.OwnerObject):
             jj = 0
             while jj < len(self.pending_listen_socks):
                 (listen_sock, listen_data) = self.pending_listen_socks[jj]
-                (a_listen_id, app_name, window_info, test_client) = listen_data
+                (a_listen_id, app_name, window_info, test_client,
+                    encoding, packaging) = listen_data
                 if a_listen_id == id:
                     #
                     # Found it. Remove the two sockets from the list of
@@ -900,7 +970,8 @@ class ServerMainThread(Object.OwnerObject):
                 
             if found != None:
                 stay_alive = self.package_sock_pair(id, app_name, 
-                    window_info, listen_sock, talk_sock, test_client)
+                    window_info, listen_sock, talk_sock, test_client,
+                    encoding = encoding, packaging = packaging)
             else:
                 talk_sock.close()
                 self.user_message('no corresponding listen connection')
@@ -996,6 +1067,10 @@ class DataEvtSource(Object.Object):
     """abstract class which supplies a data_event for ServerMainThread 
     subclasses with external message loops.
 
+    The external message loop may also read the data from the editors
+    itself, instead of having a data thread for each editor, by
+    overriding new_data_reader.
+
     **INSTANCE ATTRIBUTES**
 
     *none*
@@ -1019,7 +1094,40 @@ class DataEvtSource(Object.Object):
         """
         debug.virtual('DataEvtSource.data_event')
 
-class DataEvtSourceWin32(Object.Object):
+    def new_data_reader(self, id, listen_sock, data_event, 
+            connection_ending, encoding = None, packaging = None):
+        """creates an object which takes the place of the data thread
+        for a new editor connection, if the external message loop reads
+        the data from the editors itself
+
+        **INPUTS**
+
+        STR *id* -- The unique ID of the listen socket
+        
+        socket *listen_sock* -- The listen socket
+
+        SocketHasDataEvent *data_event* -- the data event returned by 
+        data_event
+
+        Event *connection_ending* -- threading.Event 
+        used to signal that the connection is ending, or the server is 
+        quitting
+
+        *STR encoding* -- name of the message encoding negotiated with
+        the editor, or None for the default encoding
+
+        *STR packaging* -- name of the message packaging negotiated with
+        the editor, or None for the default packaging
+        
+        **OUTPUTS**
+        
+        *ListenAndQueueMsgsSelect* -- the reader (which has the same
+        interface as a ListenAndQueueMsgsThread), or None to use a
+        regular data thread
+        """
+        return None
+
+class DataEvtSourceWin32(DataEvtSource):
     """implementation of DataEvtSource using Win32 events
 
     **INSTANCE ATTRIBUTES**
@@ -1243,6 +1351,632 @@ class ExtLoopWin32(Object.OwnerObject):
             self.cleanup()
             sys.stderr.write('ExtLoopWin32.run returning\n')
 
+class ListenAndQueueMsgsSelect(Object.Object):
+    """replacement for ListenAndQueueMsgsThread used by ExtLoopSelect, 
+    which reads messages from a listen socket in the thread running the
+    event loop, whenever select indicates that the socket has data, 
+    instead of in a separate thread.
+
+    The data is read as it becomes available, without blocking, and
+    complete messages are decoded and put on a Queue, just like
+    ListenAndQueueMsgsThread does.
+
+    **INSTANCE ATTRIBUTES**
+
+    *ExtLoopSelect loop* -- the event loop
+
+    *socket sock* -- the listen socket
+
+    [MessPackager] *packager* -- the packager used on the connection
+
+    [MessEncoder] *encoder* -- the encoder used on the connection
+
+    Queue.Queue *completed_msgs* -- Queue on which to deposit the
+    completed messages.
+
+    SocketHasDataEvent *event* -- object used to notify the main thread
+    that a socket has data
+
+    Event *connection_ending* -- threading.Event object which will be set
+    to true if the connection has been terminated
+
+    (STR, {STR: STR}) conn_broken_msg -- message to put onto the Queue to 
+    indicate that the connection was broken unexpectedly
+
+    [STR] *chunks* -- data received which doesn't form a complete
+    message yet.  The first chunk may start with the end of messages
+    which were already queued.
+
+    *INT offset* -- offset in the first chunk of the start of the next
+    message
+
+    *INT pending* -- number of bytes of the next message received so
+    far
+
+    *INT searched* -- number of bytes of the next message already
+    searched by the packager
+
+    *INT mess_len* -- length of the next message, or None if it isn't
+    known yet
+
+    CLASS ATTRIBUTES**
+    
+    *INT read_size* -- maximum number of bytes to read at once
+
+    .. [MessPackager] file:///./messaging.MessPackager.html
+    .. [MessEncoder] file:///./messaging.MessEncoder.html"""
+
+    read_size = 65536
+
+    def __init__(self, loop, sock, packager, encoder, completed_msgs, event,
+            connection_ending, conn_broken_msg, **args_super):
+        self.deep_construct(ListenAndQueueMsgsSelect, 
+                            {'loop': loop,
+                             'sock': sock,
+                             'packager': packager,
+                             'encoder': encoder,
+                             'completed_msgs': completed_msgs,
+                             'event': event,
+                             'connection_ending': connection_ending,
+                             'conn_broken_msg': conn_broken_msg,
+                             'chunks': [],
+                             'offset': 0,
+                             'pending': 0,
+                             'searched': 0,
+                             'mess_len': None
+                            }, 
+                            args_super)
+
+    def message_queue(self):
+        """returns a reference to the message queue in which the reader
+        puts completed messages
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *Queue.Queue* -- the message queue
+        """
+        return self.completed_msgs
+
+    def setDaemon(self, daemonic):
+        """does nothing, since there is no thread (provided for
+        compatibility with ListenAndQueueMsgsThread)
+        
+        **INPUTS**
+
+        *BOOL daemonic* -- ignored
+
+        **OUTPUTS**
+
+        *none*
+        """
+        pass
+
+    def start(self):
+        """start reading data, by registering with the event loop
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.loop.add_reader(self)
+
+    def is_ending(self):
+        """indicates whether the connection is ending, in which case
+        the event loop should stop reading from it
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if the connection is ending
+        """
+        return self.connection_ending.isSet()
+
+    def read_ready(self):
+        """reads the data available on the socket, and queues any
+        messages which are now complete.  Should only be called when
+        select indicates that the socket has data, so it won't block.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- false if the connection was closed or broken, in which
+        case the event loop should stop reading from it
+        """
+        try:
+            chunk = self.sock.recv(self.read_size)
+        except socket.error:
+            chunk = ''
+        if chunk == '':
+            if not self.is_ending():
+                self.completed_msgs.put(self.conn_broken_msg)
+                self.event.notify()
+            return 0
+        self.chunks.append(chunk)
+        self.pending = self.pending + len(chunk)
+        try:
+            while self.pending:
+                if self.mess_len == None:
+                    self.mess_len = self.find_mess_len()
+                    if self.mess_len == None:
+                        break
+                if self.pending < self.mess_len:
+                    break
+                pkd_mess = self.next_packed_mess()
+                mess = self.encoder.decode(self.packager.unpack_mess(pkd_mess))
+                if debug.tracing('ListenAndQueueMsgsSelect.read_ready'):
+                    debug.trace('ListenAndQueueMsgsSelect.read_ready', 
+                        '** data=%s' % repr(mess))
+                self.completed_msgs.put(mess)
+                self.event.notify()
+        except messaging.MalformedMessage:
+            self.completed_msgs.put(self.conn_broken_msg)
+            self.event.notify()
+            return 0
+        except:
+# the encoders can raise other exceptions on data they can't decode
+# (e.g. parse errors from WDDX), but this editor is the only one we
+# should stop listening to
+            sys.stderr.write('error decoding a message, closing connection\n')
+            traceback.print_exc()
+            self.completed_msgs.put(self.conn_broken_msg)
+            self.event.notify()
+            return 0
+        return 1
+
+    def pending_data(self):
+        """joins the chunks of data received for the next message, so 
+        that they can be searched or unpacked at once
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *STR* -- the first (and only) chunk, in which the next message 
+        starts at *offset*
+        """
+        if len(self.chunks) > 1:
+            self.chunks = [self.chunks[0][self.offset:]] + self.chunks[1:]
+            self.chunks = [string.join(self.chunks, '')]
+            self.offset = 0
+        return self.chunks[0]
+
+    def find_mess_len(self):
+        """asks the packager for the length of the next message, 
+        searching only the data it hasn't seen yet (so that a large
+        message received in many chunks isn't searched over and over)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *INT* -- the length of the message, or None if it isn't known
+        yet
+        """
+        if self.searched < self.packager.head_len:
+            self.pending_data()
+        last = self.chunks[-1]
+        start = len(last) - self.pending
+        length = self.packager.find_packed_mess(last, start, 
+            start + self.searched)
+        self.searched = self.pending
+        return length
+
+    def next_packed_mess(self):
+        """removes the next packed message from the data received, once
+        it is complete
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *STR* -- the packed message
+        """
+        data = self.pending_data()
+        end = self.offset + self.mess_len
+        pkd_mess = data[self.offset:end]
+        self.offset = end
+        self.pending = self.pending - self.mess_len
+        self.searched = 0
+        self.mess_len = None
+        if not self.pending:
+            self.chunks = []
+            self.offset = 0
+        return pkd_mess
+
+
+class SocketHasDataSelect(SocketHasDataEvent):
+    """implementation of SocketHasDataEvent for ExtLoopSelect, which 
+    just records the ID of the socket, since the loop runs in the same 
+    thread as the server
+
+    **INSTANCE ATTRIBUTES**
+
+    *ExtLoopSelect loop* -- the event loop
+
+    STR *socket_ID* -- The unique ID of the listen socket
+    """
+    def __init__(self, loop, socket_ID, **args):
+        self.deep_construct(SocketHasDataSelect,
+                            {'loop': loop,
+                             'socket_ID': socket_ID},
+                            args)
+
+    def notify(self):
+        """record that the socket has messages waiting
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.loop.socket_has_data(self.socket_ID)
+
+
+class ExtLoopSelect(DataEvtSource, Object.OwnerObject):
+    """abstract class providing a portable, single-threaded external 
+    message loop for concrete subclasses of ServerMainThread, using
+    select.
+
+    Unlike ExtLoopWin32, there are no ListenNewEditorsThread,
+    NewConnListThread or ListenAndQueueMsgsThread threads: the loop
+    accepts new connections on the VC_LISTEN and VC_TALK ports, and
+    reads the data from all editors itself (see 
+    ListenAndQueueMsgsSelect), and calls the corresponding methods of
+    the server when select indicates that one of those sockets is 
+    ready.  Since everything runs in the main thread, this also works 
+    on platforms other than Windows.
+
+    **Note:** since the server handles the editors one at a time, a 
+    slow handshake or transaction with one editor delays the others,
+    just like with the other message loops.
+
+    **INSTANCE ATTRIBUTES**
+
+    STR *test_suite=None* -- name of regression test suite to run
+
+    *STR host* -- name or IP address on which to listen for new
+    connections, or None for this host
+
+    *INT listen_port* -- port on which editors open their VC_LISTEN
+    connection
+
+    *INT talk_port* -- port on which editors open their VC_TALK 
+    connection
+
+    *FLOAT timeout* -- maximum number of seconds to wait in select, or
+    None to wait until a socket is ready
+
+    {INT: ListenAndQueueMsgsSelect} *readers* -- map from the file
+    number of each listen socket to the corresponding reader
+
+    [STR] *ready_ids* -- IDs of the sockets which have messages
+    waiting, once for each message
+
+    *messaging.WakeupEvent evt_quit* -- event set to exit the message 
+    loop
+
+    CLASS ATTRIBUTES**
+
+    *FLOAT pump_timeout* -- maximum number of seconds to wait in 
+    select when the win32all extensions are available, so that the
+    Windows messages (including the speech events from NatSpeak) are 
+    pumped regularly
+    """
+
+    pump_timeout = 0.05
+
+    def __init__(self, test_suite = None, host = None, 
+            listen_port = VC_LISTEN_PORT, talk_port = VC_TALK_PORT,
+            timeout = None, **args_super):
+        self.deep_construct(ExtLoopSelect, 
+                            {'test_suite': test_suite,
+                             'host': host,
+                             'listen_port': listen_port,
+                             'talk_port': talk_port,
+                             'timeout': timeout,
+                             'readers': {},
+                             'ready_ids': [],
+                             'evt_quit': messaging.WakeupEvent()
+                             }, 
+                            args_super)
+
+    def remove_other_references(self):
+        """Perform any cleanup prior to quitting.  Called when the 
+        message loop has ended.  Subclasses which override this method
+        should be sure to call their parent class's version after doing
+        their own cleanup.
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+# the loop no longer waits for evt_quit, but quit may still set it
+        self.evt_quit.close()
+        Object.OwnerObject.remove_other_references(self)
+
+    def server(self):
+        """returns a reference to the server
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *ServerMainThread* -- the underlying server
+        """
+        debug.virtual('ExtLoopSelect.server')
+
+    def data_event(self, id):
+        """supplies a data_event for ServerMainThread subclasses 
+        
+        **INPUTS**
+
+        STR *id* -- The unique ID of the listen socket
+        
+        **OUTPUTS**
+        
+        *SocketHasDataEvent* -- the data event which will allow the
+        reader to ensure that process_ready_socks is called.
+        """
+        return SocketHasDataSelect(self, id)
+
+    def new_data_reader(self, id, listen_sock, data_event, 
+            connection_ending, encoding = None, packaging = None):
+        """creates a ListenAndQueueMsgsSelect, which takes the place of 
+        the data thread for a new editor connection
+
+        **INPUTS**
+
+        STR *id* -- The unique ID of the listen socket
+        
+        socket *listen_sock* -- The listen socket
+
+        SocketHasDataEvent *data_event* -- the data event returned by 
+        data_event
+
+        Event *connection_ending* -- threading.Event 
+        used to signal that the connection is ending, or the server is 
+        quitting
+
+        *STR encoding* -- name of the message encoding negotiated with
+        the editor, or None for the default encoding
+
+        *STR packaging* -- name of the message packaging negotiated with
+        the editor, or None for the default packaging
+        
+        **OUTPUTS**
+        
+        *ListenAndQueueMsgsSelect* -- the reader
+        """
+        return ListenAndQueueMsgsSelect(self, listen_sock, 
+            messaging.new_packager(packaging), 
+            messaging.new_encoder(encoding, packaging), Queue.Queue(-1), 
+            data_event, connection_ending, ('connection_broken', {}))
+
+    def add_reader(self, reader):
+        """starts monitoring the socket of a reader
+
+        **INPUTS**
+
+        *ListenAndQueueMsgsSelect reader* -- the reader
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.readers[reader.sock.fileno()] = reader
+
+    def socket_has_data(self, id):
+        """records that a socket has one more message waiting
+
+        **INPUTS**
+
+        STR *id* -- The unique ID of the listen socket
+
+        **OUTPUTS**
+
+        *none*
+        """
+# process_ready_socks processes one message per ID, like one event per
+# message with ExtLoopWin32
+        self.ready_ids.append(id)
+
+    def quit(self):
+        """makes the message loop exit (may be called from another
+        thread)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *none*
+        """
+        self.evt_quit.set()
+
+    def process_other_events(self):
+        """called by the message loop after handling the sockets which
+        were ready, to let subclasses do other work in the main thread
+        (the way ExtLoopWin32 also handles recognition events)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if there is more work to do, in which case the
+        loop will only check the sockets which are ready, without 
+        waiting
+        """
+        return 0
+
+    def pump_messages(self):
+        """forwards the Windows messages waiting for the main thread, 
+        like ExtLoopWin32 does, so that the speech events from NatSpeak
+        are processed (does nothing without the win32all extensions)
+
+        **INPUTS**
+
+        *none*
+
+        **OUTPUTS**
+
+        *BOOL* -- true if WM_QUIT was received
+        """
+        if pythoncom == None:
+            return 0
+        return pythoncom.PumpWaitingMessages()
+
+    def open_server_socket(self, port):
+        """opens a socket listening for new connections
+
+        **INPUTS**
+
+        *INT port* -- the port number
+
+        **OUTPUTS**
+
+        *socket* -- the socket
+        """
+        host = self.host
+        if host == None:
+            host = socket.gethostname()
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((host, port))
+# the handshake with each editor blocks the loop, so allow many editors
+# to wait to be accepted (with a backlog of 5, the connections of the
+# others could be left hanging)
+        server_socket.listen(socket.SOMAXCONN)
+        return server_socket
+
+    def run(self):
+        """Start the server as well as the ExtLoopSelect message loop.
+
+        **INPUTS**
+        
+        *none* -- 
+        
+        **OUTPUTS**
+        
+        *none* -- 
+        """
+        server = self.server()
+        listen_acceptor = self.open_server_socket(self.listen_port)
+        talk_acceptor = self.open_server_socket(self.talk_port)
+        quit_sock = self.evt_quit.wakeup_socket()
+        timeout = self.timeout
+        if quit_sock == None and timeout == None:
+# we can't be woken up by quit, so check evt_quit regularly
+            timeout = 0.2
+        if pythoncom != None:
+            if timeout == None or timeout > self.pump_timeout:
+                timeout = self.pump_timeout
+        busy = 0
+        try:
+            sys.stderr.write('Starting message loop...\n')
+            try:
+                while not self.evt_quit.isSet():
+                    for fileno, reader in self.readers.items():
+                        if reader.is_ending():
+                            del self.readers[fileno]
+                    socks = [listen_acceptor, talk_acceptor]
+                    if quit_sock != None:
+                        socks.append(quit_sock)
+                    for reader in self.readers.values():
+                        socks.append(reader.sock)
+                    debug.trace('ExtLoopSelect.run', 'waiting for a socket')
+                    if busy:
+                        ready, dummy, dummy2 = select.select(socks, [], [], 0)
+                    else:
+                        ready, dummy, dummy2 = select.select(socks, [], [], 
+                            timeout)
+                    stay_alive = 1
+                    for sock in ready:
+                        if sock is listen_acceptor:
+                            #
+                            # A new VC_LISTEN connection was opened
+                            #
+                            new_sock, address = listen_acceptor.accept()
+                            server.new_listen_socks.put(new_sock)
+                            try:
+                                server.handshake_listen_socks()
+                            except messaging.SocketError:
+                                sys.stderr.write('handshake failed\n')
+                                new_sock.close()
+                        elif sock is talk_acceptor:
+                            #
+                            # A new VC_TALK connection was opened
+                            #
+                            new_sock, address = talk_acceptor.accept()
+                            server.new_socks_lock.acquire()
+                            server.new_talk_socks.append((new_sock, 
+                                [None, None, None, None]))
+                            server.new_socks_lock.release()
+                            try:
+                                if not server.handshake_talk_socks():
+                                    stay_alive = 0
+                            except messaging.SocketError:
+                                sys.stderr.write('handshake failed\n')
+                                new_sock.close()
+                        elif sock is not quit_sock:
+                            #
+                            # One of the editors has sent data
+                            #
+                            reader = self.readers.get(sock.fileno())
+                            if reader != None and not reader.read_ready():
+                                del self.readers[sock.fileno()]
+                    if self.ready_ids:
+                        ready_ids = self.ready_ids
+                        self.ready_ids = []
+                        server.process_ready_socks(ready_ids)
+                    if not stay_alive:
+                        break
+                    if self.pump_messages():
+                        break # wm_quit
+                    busy = self.process_other_events()
+            except KeyboardInterrupt:
+                msg = 'Received KeyboardInterrupt in message loop, exiting\n'
+                sys.stderr.write(msg)
+
+        finally:
+            listen_acceptor.close()
+            talk_acceptor.close()
+            sys.stderr.write('Message loop ended, cleaning up\n')
+            self.cleanup()
+            sys.stderr.write('ExtLoopSelect.run returning\n')
+
+
 class ServerNewMediator(ServerMainThread):
     """implementation of ServerMainThread designed to work with the 
     new design of MediatorObject (currently called NewMediatorObject)
@@ -1334,6 +2068,53 @@ class ServerNewMediator(ServerMainThread):
         """
         return self.data_events.data_event(id)
 
+    def new_data_thread_given_event(self, id, listen_sock, data_event,
+            connection_ending, testing = 0, encoding = None, 
+            packaging = None):
+        """creates a new ListenAndQueueMsgsThread to monitor the
+        listen_sock, unless our data_events reads the data itself
+        
+        **INPUTS**
+
+        STR *id* -- The unique ID of the listen socket
+        
+        socket *listen_sock* -- The listen socket
+
+        SocketHasDataEvent *data_event* -- the SocketHasDataEvent event
+        to pass to the new thread
+
+        Event *connection_ending* -- threading.Event 
+        used to signal to the data thread that the connection is 
+        ending, or the server is quitting
+
+        *BOOL testing* -- indicates whether we are running in regression
+        testing mode
+
+        *STR encoding* -- name of the message encoding negotiated with
+        the editor during the handshake, or None for the default
+        encoding
+
+        *STR packaging* -- name of the message packaging negotiated with
+        the editor during the handshake, or None for the default
+        packaging
+        
+        **OUTPUTS**
+        
+        [ListenAndQueueMsgsThread] -- the new threading.Thread object,
+        or an object with the same interface supplied by 
+        data_events.new_data_reader
+
+        ..[ListenAndQueueMsgsThread] 
+        file:///./tcp_server.ListenAndQueueMsgsThread.html"""        
+        reader = self.data_events.new_data_reader(id, listen_sock, 
+            data_event, connection_ending, encoding = encoding, 
+            packaging = packaging)
+        if reader != None:
+            return reader
+        return ServerMainThread.new_data_thread_given_event(self, id, 
+            listen_sock, data_event, connection_ending, testing = testing,
+            encoding = encoding, packaging = packaging)
+
     def possible_editor_cleanup(self, app):
         """cleanup AppState corresponding to editor used in regression
         tests, unless we are using NewMediatorObject, where AppMgr will
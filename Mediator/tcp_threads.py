@@ -186,9 +186,9 @@ class ListenAndQueueMsgsThread(threading.Thread, Object.Object):
                 self.notify_main()
 #            time.sleep(0.01)
 #            time.sleep(1)
-#           waits for timeout, or until connection_ending is set
-            self.connection_ending.wait(0.01)
-#            self.connection_ending.wait(1.0)
+# get_mess waits until there is data, or connection_ending is set, so
+# there is no need to wait here
+#            self.connection_ending.wait(0.01)
             if self.connection_ending.isSet():
 #                sys.stderr.write('connection_ending detected\n')
                 break
@@ -268,10 +268,11 @@ class ListenNewConnThread(threading.Thread, Object.Object):
             self.notify_main()
 
             #
-            # When debugging, increase this if you want to see things happen
-            # in slow motion
+            # When debugging, uncomment this if you want to see things 
+            # happen in slow motion (accept already blocks until there is
+            # a new connection)
             #
-            time.sleep(0.05)
+#            time.sleep(0.05)
 #            time.sleep(1)
 
 